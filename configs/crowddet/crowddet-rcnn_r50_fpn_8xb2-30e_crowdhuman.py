@@ -88,7 +88,8 @@ model = dict(
                 neg_iou_thr=(0.3, 0.7),
                 min_pos_iou=0.3,
                 match_low_quality=True,
-                ignore_iof_thr=-1),
+                ignore_iof_thr=-1,
+                chunk_size=65536),
             sampler=dict(
                 type='RandomSampler',
                 num=256,
@@ -1,9 +1,12 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from .det_inferencer import DetInferencer
-from .inference import (async_inference_detector, inference_detector,
-                        inference_mot, init_detector, init_track_model)
+from .inference import (MultiStreamTracker, async_inference_detector,
+                        inference_detector, inference_mot, init_detector,
+                        init_track_model)
 from .init_backbone import init_backbone_neck
+
 __all__ = [
     'init_detector', 'async_inference_detector', 'inference_detector',
-    'DetInferencer', 'inference_mot', 'init_track_model', 'init_backbone_neck'
+    'DetInferencer', 'inference_mot', 'init_track_model', 'init_backbone_neck',
+    'MultiStreamTracker'
 ]
@@ -1,9 +1,16 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import copy
+import math
 import os.path as osp
+import queue
+import threading
+import time
 import warnings
-from typing import Dict, Iterable, List, Optional, Sequence, Union
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
 
+import cv2
 import mmcv
 import mmengine
 import numpy as np
@@ -39,6 +46,10 @@ ImgType = Union[np.ndarray, Sequence[np.ndarray]]
 
 IMG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.ppm', '.bmp', '.pgm', '.tif',
                   '.tiff', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.mpeg', '.mpg', '.webm')
+
+# marks the end of a stream queue
+_END = object()
 
 
 class DetInferencer(BaseInferencer):
@@ -290,9 +301,9 @@ class DetInferencer(BaseInferencer):
                     yield chunk_data
                 break
 
-    # TODO: Video and Webcam are currently not supported and
-    #  may consume too much memory if your input folder has a lot of images.
-    #  We will be optimized later.
+    # TODO: Webcam is currently not supported and this may consume too much
+    #  memory if your input folder has a lot of images, use ``stream`` for
+    #  videos and long frame sequences.
     def __call__(
             self,
             inputs: InputsType,
@@ -415,6 +426,243 @@ class DetInferencer(BaseInferencer):
                 results_dict['visualization'].extend(results['visualization'])
         return results_dict
 
+    def stream(self,
+               inputs: InputsType,
+               batch_size: int = 1,
+               num_workers: int = 2,
+               queue_depth: int = 4,
+               return_vis: bool = False,
+               show: bool = False,
+               wait_time: int = 0,
+               no_save_vis: bool = False,
+               draw_pred: bool = True,
+               pred_score_thr: float = 0.3,
+               return_datasample: bool = False,
+               print_result: bool = False,
+               no_save_pred: bool = True,
+               out_dir: str = '',
+               out_video: str = '',
+               **kwargs) -> dict:
+        """Call the inferencer on a video or a sequence of frames.
+
+        Unlike :meth:`__call__`, the stages run concurrently: the frames are
+        read and processed by the test pipeline in ``num_workers`` background
+        threads, the model runs in the calling thread and the visualization
+        and the postprocessing run in another thread. The stages are
+        connected by queues of ``queue_depth`` batches, so decoding and
+        drawing overlap with the model and at most a few batches are held in
+        memory whatever the length of the sequence.
+
+        Args:
+            inputs (InputsType): A video file, a directory of frames, which
+                are sorted by name, or a list of images.
+            batch_size (int): Inference batch size. Defaults to 1.
+            num_workers (int): Number of threads running the test pipeline.
+                Defaults to 2.
+            queue_depth (int): Maximum number of batches waiting between two
+                stages. Defaults to 4.
+            out_video (str): Path of a video file to write the visualization
+                results to. If left as empty, no video will be written.
+                Defaults to ''.
+            **kwargs: Other arguments, see :meth:`__call__`. Text prompts are
+                not supported.
+
+        Returns:
+            dict: Inference and visualization results, and the average time
+            per frame in ms of each stage in ``stage_times``: ``decode`` to
+            read the frames of a video, ``preprocess`` to run the test
+            pipeline, which also reads image files, ``forward``,
+            ``visualize`` and ``postprocess``, and the throughput in ``fps``.
+        """
+        assert num_workers >= 1 and queue_depth >= 1
+        (
+            preprocess_kwargs,
+            forward_kwargs,
+            visualize_kwargs,
+            postprocess_kwargs,
+        ) = self._dispatch_kwargs(**kwargs)
+
+        frames, num_frames = self._get_stream_frames(inputs)
+        stage_times: Dict[str, float] = defaultdict(float)
+        stop = threading.Event()
+        errors: List[Exception] = []
+        batch_queue: queue.Queue = queue.Queue(maxsize=queue_depth)
+        pred_queue: queue.Queue = queue.Queue(maxsize=queue_depth)
+        results_dict = {'predictions': [], 'visualization': []}
+
+        def put(item_queue: queue.Queue, item) -> bool:
+            while not stop.is_set():
+                try:
+                    item_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def get(item_queue: queue.Queue):
+            while not stop.is_set():
+                try:
+                    return item_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return _END
+
+        def load(frame):
+            start_time = time.perf_counter()
+            data = self.pipeline(frame)
+            return data, time.perf_counter() - start_time
+
+        def read(executor: ThreadPoolExecutor) -> None:
+            # each stage time is only updated by one thread
+            try:
+                chunk = []
+                while not stop.is_set():
+                    start_time = time.perf_counter()
+                    frame = next(frames, _END)
+                    stage_times['decode'] += time.perf_counter() - start_time
+                    if frame is _END:
+                        break
+                    chunk.append((frame, executor.submit(load, frame)))
+                    if len(chunk) == batch_size:
+                        put(batch_queue, chunk)
+                        chunk = []
+                if chunk:
+                    put(batch_queue, chunk)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                put(batch_queue, _END)
+
+        def write() -> None:
+            video_writer = None
+            try:
+                while True:
+                    item = get(pred_queue)
+                    if item is _END:
+                        break
+                    ori_imgs, preds = item
+                    start_time = time.perf_counter()
+                    visualization = self.visualize(
+                        ori_imgs,
+                        preds,
+                        return_vis=return_vis or out_video != '',
+                        show=show,
+                        wait_time=wait_time,
+                        draw_pred=draw_pred,
+                        pred_score_thr=pred_score_thr,
+                        no_save_vis=no_save_vis,
+                        img_out_dir=out_dir,
+                        **visualize_kwargs)
+                    if out_video != '':
+                        for ori_img, vis in zip(ori_imgs, visualization):
+                            # images read from files are drawn in RGB
+                            if isinstance(ori_img, str):
+                                vis = mmcv.rgb2bgr(vis)
+                            if video_writer is None:
+                                mmengine.mkdir_or_exist(
+                                    osp.dirname(osp.abspath(out_video)))
+                                video_writer = cv2.VideoWriter(
+                                    out_video, cv2.VideoWriter_fourcc(*'mp4v'),
+                                    getattr(frames, 'fps', 30),
+                                    (vis.shape[1], vis.shape[0]))
+                            video_writer.write(vis)
+                        if not return_vis:
+                            visualization = None
+                    stage_times['visualize'] += \
+                        time.perf_counter() - start_time
+
+                    start_time = time.perf_counter()
+                    results = self.postprocess(
+                        preds,
+                        visualization,
+                        return_datasample=return_datasample,
+                        print_result=print_result,
+                        no_save_pred=no_save_pred,
+                        pred_out_dir=out_dir,
+                        **postprocess_kwargs)
+                    stage_times['postprocess'] += \
+                        time.perf_counter() - start_time
+                    results_dict['predictions'].extend(results['predictions'])
+                    if results['visualization'] is not None:
+                        results_dict['visualization'].extend(
+                            results['visualization'])
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                if video_writer is not None:
+                    video_writer.release()
+
+        def infer() -> Iterator[int]:
+            while True:
+                chunk = get(batch_queue)
+                if chunk is _END:
+                    break
+                chunk_data = []
+                for frame, future in chunk:
+                    data, elapsed = future.result()
+                    stage_times['preprocess'] += elapsed
+                    chunk_data.append((frame, data))
+                ori_imgs, data = self.collate_fn(chunk_data)
+
+                start_time = time.perf_counter()
+                preds = self.forward(data, **forward_kwargs)
+                stage_times['forward'] += time.perf_counter() - start_time
+                if not put(pred_queue, (ori_imgs, preds)):
+                    break
+                yield len(ori_imgs)
+
+        start_time = time.perf_counter()
+        processed_frames = 0
+        with ThreadPoolExecutor(num_workers) as executor:
+            reader = threading.Thread(
+                target=read, args=(executor, ), daemon=True)
+            writer = threading.Thread(target=write, daemon=True)
+            reader.start()
+            writer.start()
+            batches = infer()
+            if self.show_progress:
+                batches = track(
+                    batches,
+                    description='Inference',
+                    total=None if num_frames is None else math.ceil(
+                        num_frames / batch_size))
+            try:
+                for num_batch_frames in batches:
+                    processed_frames += num_batch_frames
+            except BaseException:
+                stop.set()
+                raise
+            finally:
+                put(pred_queue, _END)
+                writer.join()
+                stop.set()
+                reader.join()
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start_time
+        results_dict['stage_times'] = {
+            stage: round(stage_time * 1000 / max(processed_frames, 1), 3)
+            for stage, stage_time in stage_times.items()
+        }
+        results_dict['stage_times']['fps'] = round(
+            processed_frames / max(elapsed, 1e-6), 2)
+        return results_dict
+
+    def _get_stream_frames(self, inputs: InputsType) -> tuple:
+        """Get an iterator of the frames of :meth:`stream` and their number,
+        None if it is unknown."""
+        if isinstance(inputs, str):
+            if osp.splitext(inputs)[1].lower() in VIDEO_EXTENSIONS:
+                frames = mmcv.VideoReader(inputs)
+                return frames, len(frames)
+            frames = sorted(self._inputs_to_list(inputs))
+        else:
+            frames = self._inputs_to_list(inputs)
+        return iter(frames), len(frames)
+
     def visualize(self,
                   inputs: InputsType,
                   preds: PredType,
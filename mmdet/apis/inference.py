@@ -1,8 +1,10 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import copy
+import time
 import warnings
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Sequence, Union
+from typing import Container, Dict, Hashable, List, Optional, Sequence, Union
 
 import numpy as np
 import torch
@@ -18,8 +20,9 @@ from mmengine.runner import load_checkpoint
 from mmdet.registry import DATASETS
 from mmdet.utils import ConfigType
 from ..evaluation import get_classes
+from ..models.mot import QDTrack
 from ..registry import MODELS
-from ..structures import DetDataSample, SampleList
+from ..structures import DetDataSample, SampleList, TrackDataSample
 from ..utils import get_test_pipeline_cfg
 
 
@@ -370,3 +373,195 @@ def init_track_model(config: Union[str, Config],
     model.to(device)
     model.eval()
     return model
+
+
+class MultiStreamTracker:
+    """Online multiple object tracking of several video streams with one
+    model.
+
+    :func:`inference_mot` tracks the frames of one video with the single
+    ``tracker`` of the model. Here each stream, e.g. a camera, gets its own
+    copy of the tracker, so the tracks of the streams never mix, while the
+    frames of the streams submitted together go through the detector in one
+    batch. The tracker of a stream is created at its first frame, and dropped
+    once the stream sent no frame for ``idle_timeout`` seconds or, when there
+    are more than ``max_streams`` streams, for the longest time. The streams
+    of the frames submitted together are never dropped for one another, so
+    more than ``max_streams`` streams submitted at once are all tracked and
+    the extra ones are dropped at the next calls.
+
+    Args:
+        model (nn.Module): The loaded mot model, e.g. by
+            :func:`init_track_model`.
+        idle_timeout (float, optional): Seconds without frame after which the
+            tracker of a stream is dropped. None means never. Defaults to 60.
+        max_streams (int, optional): Maximum number of streams tracked at the
+            same time. None means no limit. Defaults to None.
+
+    Examples:
+        >>> model = init_track_model(config, checkpoint, device='cuda:0')
+        >>> tracker = MultiStreamTracker(model, idle_timeout=30)
+        >>> results = tracker.track({'cam0': frame0, 'cam1': frame1})
+        >>> results['cam0'][0].pred_track_instances
+    """
+
+    def __init__(self,
+                 model: nn.Module,
+                 idle_timeout: Optional[float] = 60.,
+                 max_streams: Optional[int] = None) -> None:
+        assert getattr(model, 'tracker', None) is not None, \
+            'the model must be a mot model with a tracker'
+        self.model = model
+        self.idle_timeout = idle_timeout
+        self.max_streams = max_streams
+        self.test_pipeline = build_test_pipeline(model.cfg)
+        # streams ordered from the least recently used one
+        self.streams: OrderedDict[Hashable, dict] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.streams)
+
+    def __contains__(self, stream_id: Hashable) -> bool:
+        return stream_id in self.streams
+
+    def _get_stream(self, stream_id: Hashable, now: float) -> dict:
+        """Get the state of a stream, created at its first frame."""
+        if stream_id in self.streams:
+            self.streams.move_to_end(stream_id)
+            return self.streams[stream_id]
+        tracker = copy.deepcopy(self.model.tracker)
+        tracker.reset()
+        stream = dict(tracker=tracker, frame_id=0, last_time=now)
+        self.streams[stream_id] = stream
+        return stream
+
+    def _drop_lru_streams(self, in_use: Container) -> None:
+        """Drop the least recently used streams beyond ``max_streams``,
+        except the streams ``in_use``, i.e. tracked by the current call."""
+        if self.max_streams is None:
+            return
+        lru_ids = [
+            stream_id for stream_id in self.streams if stream_id not in in_use
+        ]
+        num_dropped = max(len(self.streams) - self.max_streams, 0)
+        for stream_id in lru_ids[:num_dropped]:
+            self.streams.pop(stream_id)
+
+    def remove_stream(self, stream_id: Hashable) -> None:
+        """Drop the tracker of a stream, e.g. at the end of its video."""
+        self.streams.pop(stream_id, None)
+
+    def evict_idle_streams(self, now: Optional[float] = None) -> List:
+        """Drop the trackers of the streams idle for more than
+        ``idle_timeout`` seconds.
+
+        Args:
+            now (float, optional): Current :func:`time.monotonic` time.
+                Defaults to None.
+
+        Returns:
+            list: The ids of the dropped streams.
+        """
+        if self.idle_timeout is None:
+            return []
+        if now is None:
+            now = time.monotonic()
+        idle_ids = [
+            stream_id for stream_id, stream in self.streams.items()
+            if now - stream['last_time'] > self.idle_timeout
+        ]
+        for stream_id in idle_ids:
+            self.streams.pop(stream_id)
+        return idle_ids
+
+    def track(
+        self,
+        frames: Dict[Hashable, np.ndarray],
+        frame_ids: Optional[Dict[Hashable, int]] = None
+    ) -> Dict[Hashable, TrackDataSample]:
+        """Track the next frame of some streams.
+
+        Args:
+            frames (dict[Hashable, np.ndarray]): The loaded frame of each
+                stream.
+            frame_ids (dict[Hashable, int], optional): The frame id of each
+                stream. Frame ids start from 0 for a new video of a stream,
+                which resets its tracker. Defaults to None, i.e. the frames
+                of a stream are numbered in the order they are submitted.
+
+        Returns:
+            dict[Hashable, :obj:`TrackDataSample`]: The tracking data sample
+            of each stream, like :func:`inference_mot`.
+        """
+        model = self.model
+        now = time.monotonic()
+        self.evict_idle_streams(now)
+        if not frames:
+            return dict()
+        stream_ids = list(frames)
+        streams = [
+            self._get_stream(stream_id, now) for stream_id in stream_ids
+        ]
+        self._drop_lru_streams(in_use=frames)
+
+        data = []
+        for stream_id, stream in zip(stream_ids, streams):
+            if frame_ids is not None and stream_id in frame_ids:
+                stream['frame_id'] = frame_ids[stream_id]
+            if stream['frame_id'] == 0:
+                stream['tracker'].reset()
+            img = frames[stream_id]
+            data.append(
+                self.test_pipeline(
+                    dict(
+                        img=[img.astype(np.float32)],
+                        frame_id=[stream['frame_id']],
+                        ori_shape=[img.shape[:2]],
+                        img_id=[stream['frame_id'] + 1])))
+
+        if not next(model.parameters()).is_cuda:
+            for m in model.modules():
+                assert not isinstance(
+                    m, RoIPool
+                ), 'CPU inference with RoIPool is not supported currently.'
+
+        with torch.no_grad():
+            data = model.data_preprocessor(default_collate(data), False)
+            # the frames of all the streams are detected in one batch
+            imgs = data['inputs'][:, 0].contiguous()
+            track_data_samples = data['data_samples']
+            det_data_samples = [
+                track_data_sample[0]
+                for track_data_sample in track_data_samples
+            ]
+            feats = None
+            if isinstance(model, QDTrack):
+                # the tracker of QDTrack needs the features of the detector
+                feats = model.detector.extract_feat(imgs)
+                rpn_results_list = model.detector.rpn_head.predict(
+                    feats, det_data_samples)
+                det_results = model.detector.roi_head.predict(
+                    feats, rpn_results_list, det_data_samples, rescale=True)
+                for det_data_sample, det_result in zip(det_data_samples,
+                                                       det_results):
+                    det_data_sample.pred_instances = det_result
+            else:
+                det_data_samples = model.detector.predict(
+                    imgs, det_data_samples)
+
+            results = dict()
+            for i, (stream_id, stream) in enumerate(zip(stream_ids, streams)):
+                pred_track_instances = stream['tracker'].track(
+                    model=model,
+                    img=imgs[i:i + 1],
+                    feats=None if feats is None else tuple(feat[i:i + 1]
+                                                           for feat in feats),
+                    data_sample=det_data_samples[i],
+                    data_preprocessor=getattr(model, 'preprocess_cfg', None),
+                    rescale=True)
+                det_data_samples[i].pred_track_instances = \
+                    pred_track_instances
+                results[stream_id] = track_data_samples[i]
+                stream['frame_id'] += 1
+                stream['last_time'] = now
+        return results
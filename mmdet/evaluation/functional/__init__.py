@@ -7,10 +7,13 @@ from .class_names import (cityscapes_classes, coco_classes,
                           objects365v1_classes, objects365v2_classes,
                           oid_challenge_classes, oid_v6_classes, voc_classes)
 from .mean_ap import average_precision, eval_map, print_map_summary
+from .missrate import (MissrateEval, missrate_bbox_iou, missrate_greedy_match,
+                       missrate_gt_ignore)
 from .panoptic_utils import (INSTANCE_OFFSET, pq_compute_multi_core,
                              pq_compute_single_core)
 from .recall import (eval_recalls, plot_iou_recall, plot_num_recall,
                      print_recall_summary)
+from .result_buffer import DetResultBuffer
 from .ytvis import YTVIS
 from .ytviseval import YTVISeval
 
@@ -22,5 +25,7 @@ __all__ = [
     'oid_v6_classes', 'oid_challenge_classes', 'INSTANCE_OFFSET',
     'pq_compute_single_core', 'pq_compute_multi_core', 'bbox_overlaps',
     'objects365v1_classes', 'objects365v2_classes', 'coco_panoptic_classes',
-    'evaluateImgLists', 'YTVIS', 'YTVISeval'
+    'evaluateImgLists', 'YTVIS', 'YTVISeval', 'missrate_bbox_iou',
+    'missrate_greedy_match', 'MissrateEval', 'missrate_gt_ignore',
+    'DetResultBuffer'
 ]
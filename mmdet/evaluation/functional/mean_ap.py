@@ -1,4 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import atexit
 from multiprocessing import Pool
 
 import numpy as np
@@ -99,7 +100,6 @@ def tpfp_imagenet(det_bboxes,
     gt_bboxes = np.vstack((gt_bboxes, gt_bboxes_ignore))
 
     num_dets = det_bboxes.shape[0]
-    num_gts = gt_bboxes.shape[0]
     if area_ranges is None:
         area_ranges = [(None, None)]
     num_scales = len(area_ranges)
@@ -119,50 +119,54 @@ def tpfp_imagenet(det_bboxes,
         return tp, fp
     ious = bbox_overlaps(
         det_bboxes, gt_bboxes - 1, use_legacy_coordinate=use_legacy_coordinate)
+    return _match_imagenet(ious, det_bboxes, gt_bboxes, gt_ignore_inds,
+                           default_iou_thr, area_ranges, extra_length)
+
+
+def _match_imagenet(ious, det_bboxes, gt_bboxes, gt_ignore_inds,
+                    default_iou_thr, area_ranges, extra_length):
+    """Greedy matching of :func:`tpfp_imagenet` given the IoUs of an image,
+    with at least one gt bbox."""
+    num_dets = det_bboxes.shape[0]
+    num_scales = len(area_ranges)
+    tp = np.zeros((num_scales, num_dets), dtype=np.float32)
+    fp = np.zeros((num_scales, num_dets), dtype=np.float32)
     gt_w = gt_bboxes[:, 2] - gt_bboxes[:, 0] + extra_length
     gt_h = gt_bboxes[:, 3] - gt_bboxes[:, 1] + extra_length
     iou_thrs = np.minimum((gt_w * gt_h) / ((gt_w + 10.0) * (gt_h + 10.0)),
                           default_iou_thr)
     # sort all detections by scores in descending order
     sort_inds = np.argsort(-det_bboxes[:, -1])
+    # different from PASCAL VOC: a det bbox matches the best overlapped gt
+    # that is not already matched by another det bbox. The matching does
+    # not depend on the area range, so it runs once for all the ranges, and
+    # only the det bboxes with a gt above its threshold are visited.
+    candidates = ious >= iou_thrs
+    gt_covered = np.zeros(gt_bboxes.shape[0], dtype=bool)
+    matched_gt = np.full(num_dets, -1)
+    for i in sort_inds[candidates[sort_inds].any(axis=1)]:
+        cand_ious = np.where(candidates[i] & ~gt_covered, ious[i], -1)
+        j = cand_ious.argmax()
+        if cand_ious[j] > -1:
+            gt_covered[j] = True
+            matched_gt[i] = j
+    matched = matched_gt >= 0
+    det_areas = (det_bboxes[:, 2] - det_bboxes[:, 0] + extra_length) * (
+        det_bboxes[:, 3] - det_bboxes[:, 1] + extra_length)
     for k, (min_area, max_area) in enumerate(area_ranges):
-        gt_covered = np.zeros(num_gts, dtype=bool)
-        # if no area range is specified, gt_area_ignore is all False
-        if min_area is None:
-            gt_area_ignore = np.zeros_like(gt_ignore_inds, dtype=bool)
-        else:
+        # there are 4 cases for a det bbox:
+        # 1. it matches a gt, tp = 1, fp = 0
+        # 2. it matches an ignored gt, tp = 0, fp = 0
+        # 3. it matches no gt and within area range, tp = 0, fp = 1
+        # 4. it matches no gt but is beyond area range, tp = 0, fp = 0
+        gt_ignored = gt_ignore_inds.copy()
+        in_range = ~matched
+        if min_area is not None:
             gt_areas = gt_w * gt_h
-            gt_area_ignore = (gt_areas < min_area) | (gt_areas >= max_area)
-        for i in sort_inds:
-            max_iou = -1
-            matched_gt = -1
-            # find best overlapped available gt
-            for j in range(num_gts):
-                # different from PASCAL VOC: allow finding other gts if the
-                # best overlapped ones are already matched by other det bboxes
-                if gt_covered[j]:
-                    continue
-                elif ious[i, j] >= iou_thrs[j] and ious[i, j] > max_iou:
-                    max_iou = ious[i, j]
-                    matched_gt = j
-            # there are 4 cases for a det bbox:
-            # 1. it matches a gt, tp = 1, fp = 0
-            # 2. it matches an ignored gt, tp = 0, fp = 0
-            # 3. it matches no gt and within area range, tp = 0, fp = 1
-            # 4. it matches no gt but is beyond area range, tp = 0, fp = 0
-            if matched_gt >= 0:
-                gt_covered[matched_gt] = 1
-                if not (gt_ignore_inds[matched_gt]
-                        or gt_area_ignore[matched_gt]):
-                    tp[k, i] = 1
-            elif min_area is None:
-                fp[k, i] = 1
-            else:
-                bbox = det_bboxes[i, :4]
-                area = (bbox[2] - bbox[0] + extra_length) * (
-                    bbox[3] - bbox[1] + extra_length)
-                if area >= min_area and area < max_area:
-                    fp[k, i] = 1
+            gt_ignored |= (gt_areas < min_area) | (gt_areas >= max_area)
+            in_range &= (det_areas >= min_area) & (det_areas < max_area)
+        tp[k, matched] = ~gt_ignored[matched_gt[matched]]
+        fp[k, in_range] = 1
     return tp, fp
 
 
@@ -208,7 +212,6 @@ def tpfp_default(det_bboxes,
     gt_bboxes = np.vstack((gt_bboxes, gt_bboxes_ignore))
 
     num_dets = det_bboxes.shape[0]
-    num_gts = gt_bboxes.shape[0]
     if area_ranges is None:
         area_ranges = [(None, None)]
     num_scales = len(area_ranges)
@@ -232,40 +235,47 @@ def tpfp_default(det_bboxes,
 
     ious = bbox_overlaps(
         det_bboxes, gt_bboxes, use_legacy_coordinate=use_legacy_coordinate)
-    # for each det, the max iou with all gts
-    ious_max = ious.max(axis=1)
-    # for each det, which gt overlaps most with it
-    ious_argmax = ious.argmax(axis=1)
+    return _match_default(ious, det_bboxes, gt_bboxes, gt_ignore_inds, iou_thr,
+                          area_ranges, extra_length)
+
+
+def _match_default(ious, det_bboxes, gt_bboxes, gt_ignore_inds, iou_thr,
+                   area_ranges, extra_length):
+    """Matching of :func:`tpfp_default` given the IoUs of an image, with at
+    least one gt bbox."""
+    num_dets = det_bboxes.shape[0]
+    num_scales = len(area_ranges)
+    tp = np.zeros((num_scales, num_dets), dtype=np.float32)
+    fp = np.zeros((num_scales, num_dets), dtype=np.float32)
     # sort all dets in descending order by scores
     sort_inds = np.argsort(-det_bboxes[:, -1])
+    # for each det, the max iou with all gts and which gt overlaps most
+    matched = ious.max(axis=1)[sort_inds] >= iou_thr
+    matched_gt = ious.argmax(axis=1)[sort_inds]
+    det_areas = (det_bboxes[:, 2] - det_bboxes[:, 0] + extra_length) * (
+        det_bboxes[:, 3] - det_bboxes[:, 1] + extra_length)
+    det_areas = det_areas[sort_inds]
     for k, (min_area, max_area) in enumerate(area_ranges):
-        gt_covered = np.zeros(num_gts, dtype=bool)
         # if no area range is specified, gt_area_ignore is all False
-        if min_area is None:
-            gt_area_ignore = np.zeros_like(gt_ignore_inds, dtype=bool)
-        else:
+        gt_ignored = gt_ignore_inds.copy()
+        unmatched = ~matched
+        if min_area is not None:
             gt_areas = (gt_bboxes[:, 2] - gt_bboxes[:, 0] + extra_length) * (
                 gt_bboxes[:, 3] - gt_bboxes[:, 1] + extra_length)
-            gt_area_ignore = (gt_areas < min_area) | (gt_areas >= max_area)
-        for i in sort_inds:
-            if ious_max[i] >= iou_thr:
-                matched_gt = ious_argmax[i]
-                if not (gt_ignore_inds[matched_gt]
-                        or gt_area_ignore[matched_gt]):
-                    if not gt_covered[matched_gt]:
-                        gt_covered[matched_gt] = True
-                        tp[k, i] = 1
-                    else:
-                        fp[k, i] = 1
-                # otherwise ignore this detected bbox, tp = 0, fp = 0
-            elif min_area is None:
-                fp[k, i] = 1
-            else:
-                bbox = det_bboxes[i, :4]
-                area = (bbox[2] - bbox[0] + extra_length) * (
-                    bbox[3] - bbox[1] + extra_length)
-                if area >= min_area and area < max_area:
-                    fp[k, i] = 1
+            gt_ignored |= (gt_areas < min_area) | (gt_areas >= max_area)
+            unmatched &= (det_areas >= min_area) & (det_areas < max_area)
+        # dets matching an ignored gt are ignored, tp = 0, fp = 0. Among
+        # the dets in score order matching the same gt, the first one is a
+        # tp and the others are fps
+        counted = np.flatnonzero(matched & ~gt_ignored[matched_gt])
+        _, first = np.unique(matched_gt[counted], return_index=True)
+        sorted_tp = np.zeros(num_dets, dtype=np.float32)
+        sorted_fp = unmatched.astype(np.float32)
+        sorted_fp[counted] = 1
+        sorted_tp[counted[first]] = 1
+        sorted_fp[counted[first]] = 0
+        tp[k, sort_inds] = sorted_tp
+        fp[k, sort_inds] = sorted_fp
     return tp, fp
 
 
@@ -522,6 +532,152 @@ def get_cls_group_ofs(annotations, class_id):
     return gt_group_ofs
 
 
+# worker pools of `eval_map`, kept alive across calls by their size
+_EVAL_POOLS = dict()
+
+
+def close_eval_pools():
+    """Close the pools created by :func:`get_eval_pool` and wait for their
+    worker processes to exit.
+
+    It is called at exit, and can be called earlier to release the workers.
+    The following :func:`get_eval_pool` calls create new pools.
+    """
+    while _EVAL_POOLS:
+        _, pool = _EVAL_POOLS.popitem()
+        pool.close()
+        pool.join()
+
+
+atexit.register(close_eval_pools)
+
+
+def get_eval_pool(nproc):
+    """Get a persistent pool of ``nproc`` worker processes.
+
+    Creating a pool costs more than matching the detections of a VOC sized
+    dataset, so the pools are created once and reused by the following
+    evaluations, e.g. of the other IoU thresholds and epochs. They are
+    closed at exit, see :func:`close_eval_pools`.
+
+    Args:
+        nproc (int): Number of worker processes.
+
+    Returns:
+        :obj:`multiprocessing.Pool`: The pool.
+    """
+    if nproc not in _EVAL_POOLS:
+        _EVAL_POOLS[nproc] = Pool(nproc)
+    return _EVAL_POOLS[nproc]
+
+
+def tpfp_image(img_dets,
+               ann,
+               iou_thr,
+               area_ranges,
+               use_legacy_coordinate,
+               tpfp_fn,
+               use_group_of=False,
+               ioa_thr=None):
+    """Compute the tp and fp of all the classes of an image.
+
+    For :func:`tpfp_default` and :func:`tpfp_imagenet`, the IoUs between the
+    detections and the gts of the image are computed once for all the
+    classes, and the matching of each class reads its block of the IoUs.
+    Other functions are called class by class.
+
+    Args:
+        img_dets (list[np.ndarray]): Detected bboxes of each class, of shape
+            (m, 5).
+        ann (dict): Ground truth annotations of the image, same as an item of
+            ``annotations`` of :func:`eval_map`.
+        iou_thr (float): IoU threshold to be considered as matched.
+        area_ranges (list[tuple] | None): Range of bbox areas to be
+            evaluated, in the format [(min1, max1), (min2, max2), ...].
+        use_legacy_coordinate (bool): Whether to use coordinate system in
+            mmdet v1.x.
+        tpfp_fn (callable): The function used to determine true/false
+            positives.
+        use_group_of (bool): Whether to use group of when calculate TP and
+            FP. Defaults to False.
+        ioa_thr (float | None): IoA threshold to be considered as matched.
+            Defaults to None.
+
+    Returns:
+        list[tuple]: The output of ``tpfp_fn`` for each class.
+    """
+    anns = [ann]
+    if tpfp_fn not in (tpfp_default, tpfp_imagenet):
+        results = []
+        for class_id in range(len(img_dets)):
+            _, cls_gts, cls_gts_ignore = get_cls_results([img_dets], anns,
+                                                         class_id)
+            args = []
+            if use_group_of:
+                args.append(get_cls_group_ofs(anns, class_id)[0])
+                args.append(use_group_of)
+            if ioa_thr is not None:
+                args.append(ioa_thr)
+            results.append(
+                tpfp_fn(img_dets[class_id], cls_gts[0], cls_gts_ignore[0],
+                        iou_thr, area_ranges, use_legacy_coordinate, *args))
+        return results
+
+    extra_length = 1. if use_legacy_coordinate else 0.
+    if area_ranges is None:
+        area_ranges = [(None, None)]
+    gt_labels = ann['labels']
+    gt_bboxes = ann['bboxes']
+    gt_ignore_inds = np.zeros(gt_labels.shape[0], dtype=bool)
+    if ann.get('labels_ignore', None) is not None:
+        gt_labels = np.concatenate((gt_labels, ann['labels_ignore']))
+        gt_bboxes = np.vstack((gt_bboxes, ann['bboxes_ignore']))
+        gt_ignore_inds = np.concatenate(
+            (gt_ignore_inds,
+             np.ones(ann['labels_ignore'].shape[0], dtype=bool)))
+    det_bboxes = np.vstack(img_dets)
+    if tpfp_fn is tpfp_imagenet:
+        ious = bbox_overlaps(
+            det_bboxes,
+            gt_bboxes - 1,
+            use_legacy_coordinate=use_legacy_coordinate)
+        match_fn = _match_imagenet
+    else:
+        ious = bbox_overlaps(
+            det_bboxes, gt_bboxes, use_legacy_coordinate=use_legacy_coordinate)
+        match_fn = _match_default
+
+    # group the gts by class, the gts of a class coming before its ignored
+    # gts as in `get_cls_results`
+    gt_order = np.argsort(gt_labels, kind='stable')
+    gt_bounds = np.searchsorted(gt_labels[gt_order],
+                                np.arange(len(img_dets) + 1))
+    results = []
+    start = 0
+    for class_id, cls_dets in enumerate(img_dets):
+        end = start + cls_dets.shape[0]
+        gt_inds = gt_order[gt_bounds[class_id]:gt_bounds[class_id + 1]]
+        if start == end or gt_inds.size == 0:
+            # no det bbox is matched, all of them within the area range are
+            # false positives
+            tp = np.zeros((len(area_ranges), end - start), dtype=np.float32)
+            fp = np.ones_like(tp)
+            if area_ranges != [(None, None)]:
+                det_areas = (
+                    cls_dets[:, 2] - cls_dets[:, 0] + extra_length) * (
+                        cls_dets[:, 3] - cls_dets[:, 1] + extra_length)
+                for k, (min_area, max_area) in enumerate(area_ranges):
+                    fp[k] = (det_areas >= min_area) & (det_areas < max_area)
+            results.append((tp, fp))
+        else:
+            results.append(
+                match_fn(ious[start:end, gt_inds], cls_dets,
+                         gt_bboxes[gt_inds], gt_ignore_inds[gt_inds], iou_thr,
+                         area_ranges, extra_length))
+        start = end
+    return results
+
+
 def eval_map(det_results,
              annotations,
              scale_ranges=None,
@@ -530,7 +686,7 @@ def eval_map(det_results,
              dataset=None,
              logger=None,
              tpfp_fn=None,
-             nproc=4,
+             nproc=1,
              use_legacy_coordinate=False,
              use_group_of=False,
              eval_mode='area'):
@@ -566,8 +722,10 @@ def eval_map(det_results,
             unless dataset is 'det' or 'vid' (:func:`tpfp_imagenet` in this
             case). If it is given as a function, then this function is used
             to evaluate tp & fp. Default None.
-        nproc (int): Processes used for computing TP and FP.
-            Defaults to 4.
+        nproc (int): Processes used for computing TP and FP. The images are
+            split among the processes of a persistent pool, see
+            :func:`get_eval_pool`, if it is larger than 1, otherwise they are
+            processed in the current process. Defaults to 1.
         use_legacy_coordinate (bool): Whether to use coordinate system in
             mmdet v1.x. which means width, height should be
             calculated as 'x2 - x1 + 1` and 'y2 - y1 + 1' respectively.
@@ -598,61 +756,39 @@ def eval_map(det_results,
     area_ranges = ([(rg[0]**2, rg[1]**2) for rg in scale_ranges]
                    if scale_ranges is not None else None)
 
-    # There is no need to use multi processes to process
-    # when num_imgs = 1 .
-    if num_imgs > 1:
-        assert nproc > 0, 'nproc must be at least one.'
-        nproc = min(nproc, num_imgs)
-        pool = Pool(nproc)
+    # choose proper function according to datasets to compute tp and fp
+    if tpfp_fn is None:
+        if dataset in ['det', 'vid']:
+            tpfp_fn = tpfp_imagenet
+        elif dataset in ['oid_challenge', 'oid_v6'] \
+                or use_group_of is True:
+            tpfp_fn = tpfp_openimages
+        else:
+            tpfp_fn = tpfp_default
+    if not callable(tpfp_fn):
+        raise ValueError(
+            f'tpfp_fn has to be a function or None, but got {tpfp_fn}')
+
+    # compute tp and fp of all the classes image by image, with multiple
+    # processes if required
+    assert nproc > 0, 'nproc must be at least one.'
+    args = [(img_dets, ann, iou_thr, area_ranges, use_legacy_coordinate,
+             tpfp_fn, use_group_of, ioa_thr)
+            for img_dets, ann in zip(det_results, annotations)]
+    nproc = min(nproc, num_imgs)
+    if nproc > 1:
+        pool = get_eval_pool(nproc)
+        img_tpfps = pool.starmap(
+            tpfp_image, args, chunksize=max(num_imgs // (nproc * 4), 1))
+    else:
+        img_tpfps = [tpfp_image(*img_args) for img_args in args]
 
     eval_results = []
     for i in range(num_classes):
         # get gt and det bboxes of this class
         cls_dets, cls_gts, cls_gts_ignore = get_cls_results(
             det_results, annotations, i)
-        # choose proper function according to datasets to compute tp and fp
-        if tpfp_fn is None:
-            if dataset in ['det', 'vid']:
-                tpfp_fn = tpfp_imagenet
-            elif dataset in ['oid_challenge', 'oid_v6'] \
-                    or use_group_of is True:
-                tpfp_fn = tpfp_openimages
-            else:
-                tpfp_fn = tpfp_default
-        if not callable(tpfp_fn):
-            raise ValueError(
-                f'tpfp_fn has to be a function or None, but got {tpfp_fn}')
-
-        if num_imgs > 1:
-            # compute tp and fp for each image with multiple processes
-            args = []
-            if use_group_of:
-                # used in Open Images Dataset evaluation
-                gt_group_ofs = get_cls_group_ofs(annotations, i)
-                args.append(gt_group_ofs)
-                args.append([use_group_of for _ in range(num_imgs)])
-            if ioa_thr is not None:
-                args.append([ioa_thr for _ in range(num_imgs)])
-
-            tpfp = pool.starmap(
-                tpfp_fn,
-                zip(cls_dets, cls_gts, cls_gts_ignore,
-                    [iou_thr for _ in range(num_imgs)],
-                    [area_ranges for _ in range(num_imgs)],
-                    [use_legacy_coordinate for _ in range(num_imgs)], *args))
-        else:
-            tpfp = tpfp_fn(
-                cls_dets[0],
-                cls_gts[0],
-                cls_gts_ignore[0],
-                iou_thr,
-                area_ranges,
-                use_legacy_coordinate,
-                gt_bboxes_group_of=(get_cls_group_ofs(annotations, i)[0]
-                                    if use_group_of else None),
-                use_group_of=use_group_of,
-                ioa_thr=ioa_thr)
-            tpfp = [tpfp]
+        tpfp = [img_tpfp[i] for img_tpfp in img_tpfps]
 
         if use_group_of:
             tp, fp, cls_dets = tuple(zip(*tpfp))
@@ -696,9 +832,6 @@ def eval_map(det_results,
             'ap': ap
         })
 
-    if num_imgs > 1:
-        pool.close()
-
     if scale_ranges is not None:
         # shape (num_classes, num_scales)
         all_ap = np.vstack([cls_result['ap'] for cls_result in eval_results])
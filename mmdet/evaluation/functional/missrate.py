@@ -0,0 +1,346 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def missrate_bbox_iou(dt_bboxes: np.ndarray, gt_bboxes: np.ndarray,
+                      gt_ignore: np.ndarray) -> np.ndarray:
+    """Compute the IoU matrix used by the KAIST/Caltech miss-rate protocol.
+
+    Ignored ground truths are treated like crowd regions, i.e. the union
+    area is replaced with the detection area. The arithmetic follows the
+    scalar reference implementation step by step, so the returned values
+    are bit-identical to it.
+
+    Args:
+        dt_bboxes (np.ndarray): Detections of shape (D, 4) in ``xywh`` order.
+        gt_bboxes (np.ndarray): Ground truths of shape (G, 4) in ``xywh``
+            order.
+        gt_ignore (np.ndarray): Ignore flags of the ground truths, shape (G, ).
+
+    Returns:
+        np.ndarray: IoUs of shape (D, G).
+    """
+    dt_bboxes = np.asarray(dt_bboxes)
+    gt_bboxes = np.asarray(gt_bboxes)
+    gt_ignore = np.asarray(gt_ignore)
+    ious = np.zeros((len(dt_bboxes), len(gt_bboxes)))
+    if ious.size == 0:
+        return ious
+
+    dx1 = dt_bboxes[:, 0:1]
+    dy1 = dt_bboxes[:, 1:2]
+    dx2 = dt_bboxes[:, 0:1] + dt_bboxes[:, 2:3]
+    dy2 = dt_bboxes[:, 1:2] + dt_bboxes[:, 3:4]
+    darea = dt_bboxes[:, 2:3] * dt_bboxes[:, 3:4]
+    gx1 = gt_bboxes[None, :, 0]
+    gy1 = gt_bboxes[None, :, 1]
+    gx2 = gt_bboxes[None, :, 0] + gt_bboxes[None, :, 2]
+    gy2 = gt_bboxes[None, :, 1] + gt_bboxes[None, :, 3]
+    garea = gt_bboxes[None, :, 2] * gt_bboxes[None, :, 3]
+
+    inter_w = np.minimum(dx2, gx2) - np.maximum(dx1, gx1)
+    inter_h = np.minimum(dy2, gy2) - np.maximum(dy1, gy1)
+    valid = (inter_w > 0) & (inter_h > 0)
+    overlap = inter_w * inter_h
+    union = np.where(gt_ignore[None, :].astype(bool), darea,
+                     darea + garea - overlap)
+    np.divide(
+        overlap.astype(np.float64),
+        union,
+        out=ious,
+        where=valid,
+        casting='unsafe')
+    return ious
+
+
+def missrate_greedy_match(
+        ious: np.ndarray, gt_ignore: np.ndarray, dt_ids: Sequence,
+        gt_ids: Sequence, iou_thrs: Sequence[float]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Greedily match detections to ground truths for the miss-rate protocol.
+
+    This is a vectorized equivalent of the triple loop in
+    ``KAISTPedEval.evaluateImg``. Detections that do not reach the IoU
+    threshold with any ground truth are resolved at once, and the search over
+    ground truths for the remaining ones is done with array operations. The
+    outputs are bit-identical to the loop implementation.
+
+    Args:
+        ious (np.ndarray): IoUs of shape (N, G) with N >= D. Detections must
+            be sorted by descending score and ground truths must have the
+            ignored ones last. Only the first D rows are used.
+        gt_ignore (np.ndarray): Ignore flags of the sorted ground truths,
+            shape (G, ).
+        dt_ids (Sequence): Annotation ids of the sorted detections.
+        gt_ids (Sequence): Annotation ids of the sorted ground truths.
+        iou_thrs (Sequence[float]): IoU thresholds, shape (T, ).
+
+    Returns:
+        tuple[np.ndarray]: ``(dtMatches, gtMatches, dtIgnore)`` with shapes
+        (T, D), (T, G) and (T, D).
+    """
+    num_thrs = len(iou_thrs)
+    num_dts = len(dt_ids)
+    num_gts = len(gt_ids)
+    gtm = np.zeros((num_thrs, num_gts))
+    dtm = np.zeros((num_thrs, num_dts))
+    dtIg = np.zeros((num_thrs, num_dts))
+    if len(ious) == 0 or num_gts == 0:
+        return dtm, gtm, dtIg
+
+    # ious may hold more rows than the kept detections when maxDet applies
+    ious = ious[:num_dts]
+    gt_ignore = np.asarray(gt_ignore)
+    is_ignore = gt_ignore == 1
+    is_regular = gt_ignore == 0
+    gt_ids = np.asarray(gt_ids)
+    gt_index = np.arange(num_gts)
+    for tind, t in enumerate(iou_thrs):
+        thr = min([t, 1 - 1e-10])
+        candidates = ious >= thr
+        # detections that cannot be matched to any gt are left unmatched
+        for dind in np.flatnonzero(candidates.any(axis=1)):
+            free = candidates[dind] & ~(gtm[tind] > 0)
+            regular = free & is_regular
+            if regular.any():
+                # the loop keeps the last gt reaching the best IoU
+                row = np.where(regular, ious[dind], -np.inf)
+                bstg = gt_index[regular & (row == row.max())][-1]
+                gtm[tind, bstg] = dt_ids[dind]
+            else:
+                # without a regular match, the first ignored gt above the
+                # threshold absorbs the detection
+                ignored = free & is_ignore
+                if not ignored.any():
+                    continue
+                bstg = np.argmax(ignored)
+            dtIg[tind, dind] = gt_ignore[bstg]
+            dtm[tind, dind] = gt_ids[bstg]
+    return dtm, gtm, dtIg
+
+
+def missrate_gt_ignore(
+    gt_bboxes: np.ndarray,
+    gt_ignore: np.ndarray,
+    gt_heights: np.ndarray,
+    gt_occlusions: np.ndarray,
+    height_range: Sequence[float] = (55, 1e5**2),
+    occ_range: Sequence[int] = (0, 1),
+    bnd_range: Sequence[float] = (5, 5, 635, 507)
+) -> np.ndarray:
+    """Compute the ignore flags of ground truths under a miss-rate setup.
+
+    A ground truth is ignored if it is ignored by its annotation, if its
+    height or occlusion level is out of the setup or if it crosses the
+    border of the valid image region. The default setup is ``Reasonable``.
+
+    Args:
+        gt_bboxes (np.ndarray): Ground truths of shape (G, 4) in ``xywh``
+            order.
+        gt_ignore (np.ndarray): Ignore flags from the annotations, shape
+            (G, ).
+        gt_heights (np.ndarray): Heights, shape (G, ).
+        gt_occlusions (np.ndarray): Occlusion levels, shape (G, ).
+        height_range (Sequence[float]): Kept height range.
+            Defaults to (55, 1e10).
+        occ_range (Sequence[int]): Kept occlusion levels. Defaults to (0, 1).
+        bnd_range (Sequence[float]): Valid ``(x1, y1, x2, y2)`` region.
+            Defaults to (5, 5, 635, 507).
+
+    Returns:
+        np.ndarray: Boolean ignore flags of shape (G, ).
+    """
+    gt_bboxes = np.asarray(gt_bboxes, dtype=np.float64).reshape(-1, 4)
+    gt_heights = np.asarray(gt_heights)
+    h_min, h_max = height_range
+    x_min, y_min, x_max, y_max = bnd_range
+    out_of_setup = (gt_heights < h_min) | (gt_heights > h_max) | \
+        ~np.isin(gt_occlusions, occ_range) | \
+        (gt_bboxes[:, 0] < x_min) | (gt_bboxes[:, 1] < y_min) | \
+        (gt_bboxes[:, 0] + gt_bboxes[:, 2] > x_max) | \
+        (gt_bboxes[:, 1] + gt_bboxes[:, 3] > y_max)
+    return out_of_setup | np.asarray(gt_ignore, dtype=bool)
+
+
+class MissrateEval:
+    """Array based evaluator for the KAIST/Caltech log-average miss rate.
+
+    It reproduces ``KAISTPedEval`` (setup ``Reasonable`` by default) without
+    building COCO apis: the ground truths are indexed once with
+    :meth:`prepare_gts`, each image is matched with :meth:`evaluate_img` and
+    the compact per-image records are merged by :meth:`accumulate` for any
+    subset of images.
+
+    Args:
+        iou_thrs (Sequence[float]): IoU thresholds. Defaults to (0.5, ).
+        fppi_thrs (Sequence[float]): False positives per image at which the
+            miss rate is sampled. Defaults to 9 points evenly spaced in
+            log-space in [1e-2, 1].
+        height_range (Sequence[float]): Ground truths out of this height
+            range are ignored. Defaults to (55, 1e10).
+        occ_range (Sequence[int]): Occlusion levels that are not ignored.
+            Defaults to (0, 1).
+        bnd_range (Sequence[float]): Ground truths crossing this
+            ``(x1, y1, x2, y2)`` border are ignored.
+            Defaults to (5, 5, 635, 507).
+        max_det (int): Maximum number of detections per image.
+            Defaults to 1000.
+    """
+
+    def __init__(self,
+                 iou_thrs: Sequence[float] = (0.5, ),
+                 fppi_thrs: Sequence[float] = (0.0100, 0.0178, 0.0316, 0.0562,
+                                               0.1000, 0.1778, 0.3162, 0.5623,
+                                               1.0000),
+                 height_range: Sequence[float] = (55, 1e5**2),
+                 occ_range: Sequence[int] = (0, 1),
+                 bnd_range: Sequence[float] = (5, 5, 635, 507),
+                 max_det: int = 1000) -> None:
+        self.iou_thrs = np.array(iou_thrs)
+        self.fppi_thrs = np.array(fppi_thrs)
+        self.height_range = height_range
+        self.occ_range = occ_range
+        self.bnd_range = bnd_range
+        self.max_det = max_det
+        self.gt_index = dict()
+
+    def prepare_gts(self, img_ids: Sequence[int],
+                    gt_bboxes: Sequence[np.ndarray],
+                    gt_ids: Sequence[np.ndarray],
+                    gt_ignore: Sequence[np.ndarray],
+                    gt_heights: Sequence[np.ndarray],
+                    gt_occlusions: Sequence[np.ndarray]) -> None:
+        """Index the ground truths of each image.
+
+        The ignore flags of the evaluation setup are computed and the ignored
+        ground truths are moved last, as expected by the greedy matching.
+
+        Args:
+            img_ids (Sequence[int]): Image ids.
+            gt_bboxes (Sequence[np.ndarray]): Boxes of each image, shape
+                (G, 4) in ``xywh`` order.
+            gt_ids (Sequence[np.ndarray]): Annotation ids, shape (G, ).
+            gt_ignore (Sequence[np.ndarray]): Ignore flags from the
+                annotation, shape (G, ).
+            gt_heights (Sequence[np.ndarray]): Heights, shape (G, ).
+            gt_occlusions (Sequence[np.ndarray]): Occlusion levels,
+                shape (G, ).
+        """
+        self.gt_index = dict()
+        for img_id, bboxes, ids, ignore, heights, occlusions in zip(
+                img_ids, gt_bboxes, gt_ids, gt_ignore, gt_heights,
+                gt_occlusions):
+            bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+            ignore = missrate_gt_ignore(bboxes, ignore, heights, occlusions,
+                                        self.height_range, self.occ_range,
+                                        self.bnd_range).astype(int)
+            order = np.argsort(ignore, kind='mergesort')
+            self.gt_index[img_id] = (bboxes[order], np.asarray(ids)[order],
+                                     ignore[order])
+
+    def evaluate_img(self, img_id: int, dt_bboxes: np.ndarray,
+                     dt_scores: np.ndarray) -> Optional[dict]:
+        """Match the detections of one image.
+
+        Args:
+            img_id (int): Image id, must have been indexed by
+                :meth:`prepare_gts`.
+            dt_bboxes (np.ndarray): Detections of shape (D, 4) in ``xywh``
+                order.
+            dt_scores (np.ndarray): Scores of shape (D, ).
+
+        Returns:
+            dict, optional: The compact record of the image with the scores
+            of the kept detections, their match and ignore flags for every
+            IoU threshold and the number of non-ignored ground truths. None
+            if the image has no detection, like ``KAISTPedEval``.
+        """
+        gt_bboxes, gt_ids, gt_ignore = self.gt_index[img_id]
+        dt_scores = np.asarray(dt_scores, dtype=np.float64)
+        if len(dt_scores) == 0:
+            return None
+        order = np.argsort(-dt_scores, kind='mergesort')[:self.max_det]
+        dt_bboxes = np.asarray(dt_bboxes, dtype=np.float64)[order]
+        dt_scores = dt_scores[order]
+
+        ious = missrate_bbox_iou(dt_bboxes, gt_bboxes, gt_ignore)
+        dtm, _, dtIg = missrate_greedy_match(ious, gt_ignore,
+                                             np.arange(1,
+                                                       len(order) + 1), gt_ids,
+                                             self.iou_thrs)
+        return dict(
+            dtScores=dt_scores,
+            dtMatches=dtm.astype(bool),
+            dtIgnore=dtIg.astype(bool),
+            numPos=int(np.count_nonzero(gt_ignore == 0)))
+
+    def accumulate(self, records: Sequence[Optional[dict]],
+                   num_imgs: int) -> dict:
+        """Accumulate per-image records into miss rate - fppi curves.
+
+        Args:
+            records (Sequence[dict, optional]): Records of the images to
+                accumulate, in image id order. None records are skipped.
+            num_imgs (int): Number of images used to normalize the false
+                positives.
+
+        Returns:
+            dict: The sampled recall ``TP`` of shape (T, R, 1, 1) and the
+            curves ``xx`` (fppi) and ``yy`` (miss rate) of each threshold.
+        """
+        T = len(self.iou_thrs)
+        R = len(self.fppi_thrs)
+        ys = -np.ones((T, R, 1, 1))
+        xx_graph, yy_graph = [], []
+
+        E = [e for e in records if e is not None]
+        npig = sum(e['numPos'] for e in E)
+        if len(E) == 0 or npig == 0:
+            return dict(TP=ys, xx=xx_graph, yy=yy_graph)
+
+        dtScores = np.concatenate([e['dtScores'] for e in E])
+        inds = np.argsort(-dtScores, kind='mergesort')
+        dtm = np.concatenate([e['dtMatches'] for e in E], axis=1)[:, inds]
+        dtIg = np.concatenate([e['dtIgnore'] for e in E], axis=1)[:, inds]
+        tps = np.logical_and(dtm, np.logical_not(dtIg))
+        fps = np.logical_and(np.logical_not(dtm), np.logical_not(dtIg))
+        inds = np.where(dtIg == 0)[1]
+        tps = tps[:, inds]
+        fps = fps[:, inds]
+
+        tp_sum = np.cumsum(tps, axis=1).astype(dtype=np.float64)
+        fp_sum = np.cumsum(fps, axis=1).astype(dtype=np.float64)
+        for t, (tp, fp) in enumerate(zip(tp_sum, fp_sum)):
+            fppi = fp / num_imgs
+            # recall is a cumulative sum and hence already monotonic
+            recall = tp / npig
+            xx_graph.append(fppi)
+            yy_graph.append(1 - recall)
+
+            recall = recall.tolist()
+            q = np.zeros((R, )).tolist()
+            inds = np.searchsorted(fppi, self.fppi_thrs, side='right') - 1
+            try:
+                for ri, pi in enumerate(inds):
+                    q[ri] = recall[pi]
+            except IndexError:
+                pass
+            ys[t, :, 0, 0] = np.array(q)
+        return dict(TP=ys, xx=xx_graph, yy=yy_graph)
+
+    @staticmethod
+    def summarize(eval_result: dict) -> float:
+        """Log-average miss rate over the sampled fppi points.
+
+        Args:
+            eval_result (dict): Output of :meth:`accumulate`.
+
+        Returns:
+            float: The log-average miss rate, -1 if there is no valid point.
+        """
+        mrs = 1 - eval_result['TP']
+        if len(mrs[mrs < 2]) == 0:
+            return -1
+        return np.exp(np.mean(np.log(mrs[mrs < 2])))
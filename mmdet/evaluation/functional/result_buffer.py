@@ -0,0 +1,351 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import itertools
+from collections import defaultdict
+from numbers import Number
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# per-detection arrays of the results stored by the detection metrics
+DET_FIELDS = ('bboxes', 'scores', 'labels', 'mask_scores')
+
+
+class DetResultBuffer:
+    """Columnar buffer of the per-image results collected by a metric.
+
+    The per-detection arrays of the images, e.g. ``bboxes``, ``scores`` and
+    ``labels``, are appended to one flat array per field, the detections of
+    image ``i`` being the rows ``offsets[i]:offsets[i + 1]``. Per-image
+    values, e.g. ``img_id``, ``width`` or the RLE ``masks``, are kept in one
+    list per field. Pickling the buffer, e.g. when ``collect_results``
+    gathers the results of the ranks, thus serializes a few contiguous
+    arrays instead of a dict of small arrays per image, and the evaluators
+    read the flat arrays directly.
+
+    Indexing returns the result dict of an image, whose arrays are views of
+    the flat arrays, so code written for lists of result dicts still works.
+
+    Examples:
+        >>> buffer = DetResultBuffer()
+        >>> buffer.append(
+        ...     dict(bboxes=np.zeros((2, 4)), scores=np.ones(2),
+        ...          labels=np.zeros(2, dtype=np.int64)),
+        ...     img_id=3, width=640, height=512)
+        >>> len(buffer), buffer.offsets
+        (1, array([0, 2]))
+        >>> buffer[0]['img_id'], buffer.get_dets('scores')
+        (3, array([1., 1.]))
+    """
+
+    def __init__(self) -> None:
+        self.det_fields: Optional[tuple] = None
+        self.img_fields: Dict[str, list] = dict()
+        self._arrays: Dict[str, np.ndarray] = dict()
+        self._chunks: Dict[str, List[np.ndarray]] = defaultdict(list)
+        self._num_dets: List[int] = []
+        self._offsets: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self._num_dets)
+
+    def append(self, dets: Dict[str, np.ndarray], **img_fields) -> None:
+        """Append the results of one image.
+
+        Args:
+            dets (dict[str, np.ndarray]): Per-detection arrays of the image,
+                with the same first dimension. Every image must have the same
+                fields.
+            **img_fields: Per-image values of the image.
+        """
+        if self.det_fields is None:
+            self.det_fields = tuple(dets)
+        assert set(dets) == set(self.det_fields), \
+            f'expect the detection fields {self.det_fields}, ' \
+            f'got {tuple(dets)}'
+        num_dets = {len(array) for array in dets.values()}
+        assert len(num_dets) <= 1, \
+            'detection fields should have the same length'
+        for name, array in dets.items():
+            self._chunks[name].append(np.asarray(array))
+        for name, value in img_fields.items():
+            if name not in self.img_fields:
+                self.img_fields[name] = [None] * len(self)
+            self.img_fields[name].append(value)
+        self._num_dets.append(num_dets.pop() if num_dets else 0)
+        for values in self.img_fields.values():
+            if len(values) < len(self):
+                values.append(None)
+        self._offsets = None
+
+    def _compact(self) -> None:
+        """Concatenate the appended chunks to the flat arrays."""
+        for name, chunks in self._chunks.items():
+            if not chunks:
+                continue
+            if name in self._arrays:
+                chunks = [self._arrays[name]] + chunks
+            self._arrays[name] = np.concatenate(chunks)
+            chunks.clear()
+
+    @property
+    def num_dets(self) -> np.ndarray:
+        """np.ndarray: Number of detections of each image."""
+        return np.asarray(self._num_dets, dtype=np.int64)
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """np.ndarray: Offsets of the detections of each image in the flat
+        arrays, with shape (N + 1, )."""
+        if self._offsets is None:
+            self._offsets = np.zeros(len(self) + 1, dtype=np.int64)
+            np.cumsum(self._num_dets, out=self._offsets[1:])
+        return self._offsets
+
+    def get_dets(self, name: str) -> np.ndarray:
+        """Get the flat array of a per-detection field."""
+        self._compact()
+        return self._arrays[name]
+
+    def get_field(self, name: str) -> list:
+        """Get the per-image values of a field, None for the images that do
+        not have it."""
+        if name not in self.img_fields:
+            return [None] * len(self)
+        return self.img_fields[name]
+
+    def get_img_ids(self) -> list:
+        """Get the image ids, the index of the image if it has no id."""
+        return [
+            idx if img_id is None else img_id
+            for idx, img_id in enumerate(self.get_field('img_id'))
+        ]
+
+    def __getitem__(self, idx: int) -> dict:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f'index {idx} is out of range')
+        self._compact()
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        result = {
+            name: self._arrays[name][start:end]
+            for name in self.det_fields or ()
+        }
+        for name, values in self.img_fields.items():
+            if values[idx] is not None:
+                result[name] = values[idx]
+        return result
+
+    def __iter__(self) -> Iterator[dict]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __getstate__(self) -> dict:
+        self._compact()
+        # numeric per-image fields are serialized as arrays as well
+        img_fields, array_fields = dict(), []
+        for name, values in self.img_fields.items():
+            if all(
+                    isinstance(value, Number) and not isinstance(value, bool)
+                    for value in values):
+                img_fields[name] = np.asarray(values)
+                array_fields.append(name)
+            else:
+                img_fields[name] = values
+        return dict(
+            det_fields=self.det_fields,
+            arrays=self._arrays,
+            num_dets=self.num_dets,
+            img_fields=img_fields,
+            array_fields=array_fields)
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__()
+        self.det_fields = state['det_fields']
+        self._arrays = state['arrays']
+        self._num_dets = state['num_dets'].tolist()
+        self.img_fields = {
+            name: values.tolist() if name in state['array_fields'] else values
+            for name, values in state['img_fields'].items()
+        }
+
+    def to_coco_dicts(self,
+                      cat_ids: Sequence[int]) -> Tuple[list, Optional[list]]:
+        """Convert the results to COCO style detection dicts.
+
+        The columns of all the images are converted at once instead of box
+        by box.
+
+        Args:
+            cat_ids (Sequence[int]): Category id of each label.
+
+        Returns:
+            tuple[list, list | None]: The bbox results, and the segm results
+            or None if the results have no ``masks``.
+        """
+        bbox_results = []
+        segm_results = [] if 'masks' in self.img_fields else None
+        if not self.det_fields:
+            return bbox_results, segm_results
+        image_ids = np.repeat(self.get_img_ids(), self.num_dets).tolist()
+        bboxes = self.get_dets('bboxes').astype(np.float64).reshape(-1, 4)
+        bboxes[:, 2:] -= bboxes[:, :2]
+        bboxes = bboxes.tolist()
+        scores = self.get_dets('scores').tolist()
+        category_ids = np.asarray(cat_ids)[self.get_dets('labels').astype(
+            np.int64)].tolist()
+        bbox_results = [
+            dict(
+                image_id=image_id,
+                bbox=bbox,
+                score=score,
+                category_id=category_id)
+            for image_id, bbox, score, category_id in zip(
+                image_ids, bboxes, scores, category_ids)
+        ]
+        if segm_results is None:
+            return bbox_results, segm_results
+
+        # some detectors use different scores for bbox and mask
+        if 'mask_scores' in self.det_fields:
+            scores = self.get_dets('mask_scores').tolist()
+        masks = itertools.chain.from_iterable(self.get_field('masks'))
+        for image_id, bbox, score, category_id, mask in zip(
+                image_ids, bboxes, scores, category_ids, masks):
+            if isinstance(mask['counts'], bytes):
+                mask['counts'] = mask['counts'].decode()
+            segm_results.append(
+                dict(
+                    image_id=image_id,
+                    bbox=list(bbox),
+                    score=score,
+                    category_id=category_id,
+                    segmentation=mask))
+        return bbox_results, segm_results
+
+    def take(self, indices: Sequence[int]) -> 'DetResultBuffer':
+        """Build a buffer with the results of some images.
+
+        Args:
+            indices (Sequence[int]): Indices of the images, in the order of
+                the new buffer.
+
+        Returns:
+            :obj:`DetResultBuffer`: The new buffer.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        self._compact()
+        num_dets = self.num_dets[indices]
+        new_offsets = np.concatenate([[0], np.cumsum(num_dets)])
+        rows = np.arange(new_offsets[-1]) + np.repeat(
+            self.offsets[indices] - new_offsets[:-1], num_dets)
+        buffer = DetResultBuffer()
+        buffer.det_fields = self.det_fields
+        buffer._arrays = {
+            name: array[rows]
+            for name, array in self._arrays.items()
+        }
+        buffer._num_dets = num_dets.tolist()
+        buffer.img_fields = {
+            name: [values[idx] for idx in indices.tolist()]
+            for name, values in self.img_fields.items()
+        }
+        return buffer
+
+    @classmethod
+    def concat(cls, buffers: Sequence['DetResultBuffer']) -> 'DetResultBuffer':
+        """Concatenate buffers with the same detection fields."""
+        buffers = [buffer for buffer in buffers if len(buffer) > 0]
+        result = cls()
+        if not buffers:
+            return result
+        det_fields = {buffer.det_fields for buffer in buffers}
+        assert len(det_fields) == 1, \
+            f'buffers have different detection fields {det_fields}'
+        result.det_fields = buffers[0].det_fields
+        for buffer in buffers:
+            buffer._compact()
+        result._arrays = {
+            name: np.concatenate([buffer._arrays[name] for buffer in buffers])
+            for name in buffers[0]._arrays
+        }
+        result._num_dets = [
+            num_dets for buffer in buffers for num_dets in buffer._num_dets
+        ]
+        names = {name for buffer in buffers for name in buffer.img_fields}
+        result.img_fields = {
+            name:
+            [value for buffer in buffers for value in buffer.get_field(name)]
+            for name in names
+        }
+        return result
+
+    @classmethod
+    def merge_ranks(cls,
+                    buffers: Sequence['DetResultBuffer']) -> 'DetResultBuffer':
+        """Merge the buffers gathered from the ranks.
+
+        The images are interleaved in the order of the distributed sampler,
+        i.e. image ``j`` of rank ``r`` comes at position
+        ``j * world_size + r``, and the images padded by the sampler, which
+        repeat images of the dataset, are dropped by their ``img_id``.
+
+        Args:
+            buffers (Sequence[:obj:`DetResultBuffer`]): The buffer of each
+                rank, in rank order.
+
+        Returns:
+            :obj:`DetResultBuffer`: The merged buffer.
+        """
+        if len(buffers) == 1:
+            return buffers[0]
+        merged = cls.concat(buffers)
+        positions = np.concatenate([
+            np.arange(len(buffer)) * len(buffers) + rank
+            for rank, buffer in enumerate(buffers)
+        ])
+        order = np.argsort(positions, kind='stable')
+        if 'img_id' in merged.img_fields:
+            img_ids = merged.img_fields['img_id']
+            seen = set()
+            keep = []
+            for idx in order.tolist():
+                if img_ids[idx] not in seen:
+                    seen.add(img_ids[idx])
+                    keep.append(idx)
+            order = keep
+        return merged.take(order)
+
+    @classmethod
+    def from_results(cls, results) -> 'DetResultBuffer':
+        """Convert collected results to a buffer.
+
+        Args:
+            results: A buffer, the list of buffers gathered from the ranks,
+                or a sequence of result dicts or of ``(gt, result)`` dict
+                pairs, the keys in :data:`DET_FIELDS` being per-detection
+                arrays.
+
+        Returns:
+            :obj:`DetResultBuffer`: The buffer of the results.
+        """
+        if isinstance(results, cls):
+            return results
+        results = list(results)
+        if results and all(isinstance(result, cls) for result in results):
+            return cls.merge_ranks(results)
+        buffer = cls()
+        for result in results:
+            if isinstance(result, tuple):
+                fields = dict()
+                for part in result:
+                    if part is not None:
+                        fields.update(part)
+            else:
+                fields = dict(result)
+            dets = {
+                name: fields.pop(name)
+                for name in DET_FIELDS if name in fields
+            }
+            buffer.append(dets, **fields)
+        return buffer
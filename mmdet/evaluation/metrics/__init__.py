@@ -17,5 +17,5 @@ __all__ = [
     'CityScapesMetric', 'CocoMetric', 'CocoPanopticMetric', 'OpenImagesMetric',
     'VOCMetric', 'LVISMetric', 'CrowdHumanMetric', 'DumpProposals',
     'CocoOccludedSeparatedMetric', 'DumpDetResults', 'KAISTMissrateMetric', 'FLIRMissrateMetric', 
-    'ReasonableCocoMetric'
+    'ReasonableCocoMetric', 'GlareKAISTMissrateMetric'
 ]
@@ -16,7 +16,7 @@ from terminaltables import AsciiTable
 from mmdet.datasets.api_wrappers import COCO, COCOeval
 from mmdet.registry import METRICS
 from mmdet.structures.mask import encode_mask_results
-from ..functional import eval_recalls
+from ..functional import DetResultBuffer, eval_recalls
 
 
 @METRICS.register_module()
@@ -212,8 +212,8 @@ class CocoMetric(BaseMetric):
         automatically recognize the type, and dump them to json files.
 
         Args:
-            results (Sequence[dict]): Testing results of the
-                dataset.
+            results (Sequence[dict] | :obj:`DetResultBuffer`): Testing
+                results of the dataset.
             outfile_prefix (str): The filename prefix of the json files. If the
                 prefix is "somepath/xxx", the json files will be named
                 "somepath/xxx.bbox.json", "somepath/xxx.segm.json",
@@ -223,38 +223,9 @@ class CocoMetric(BaseMetric):
             dict: Possible keys are "bbox", "segm", "proposal", and
             values are corresponding filenames.
         """
-        bbox_json_results = []
-        segm_json_results = [] if 'masks' in results[0] else None
-        for idx, result in enumerate(results):
-            image_id = result.get('img_id', idx)
-            labels = result['labels']
-            bboxes = result['bboxes']
-            scores = result['scores']
-            # bbox results
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(scores[i])
-                data['category_id'] = self.cat_ids[label]
-                bbox_json_results.append(data)
-
-            if segm_json_results is None:
-                continue
-
-            # segm results
-            masks = result['masks']
-            mask_scores = result.get('mask_scores', scores)
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(mask_scores[i])
-                data['category_id'] = self.cat_ids[label]
-                if isinstance(masks[i]['counts'], bytes):
-                    masks[i]['counts'] = masks[i]['counts'].decode()
-                data['segmentation'] = masks[i]
-                segm_json_results.append(data)
+        results = DetResultBuffer.from_results(results)
+        bbox_json_results, segm_json_results = results.to_coco_dicts(
+            self.cat_ids)
 
         result_files = dict()
         result_files['bbox'] = f'{outfile_prefix}.bbox.json'
@@ -349,35 +320,37 @@ class CocoMetric(BaseMetric):
             data_samples (Sequence[dict]): A batch of data samples that
                 contain annotations and predictions.
         """
+        # the results of the rank are appended to one columnar buffer
+        if not self.results:
+            self.results.append(DetResultBuffer())
+        buffer = self.results[0]
         for data_sample in data_samples:
-            result = dict()
             pred = data_sample['pred_instances']
-            result['img_id'] = data_sample['img_id']
-            result['bboxes'] = pred['bboxes'].cpu().numpy()
-            result['scores'] = pred['scores'].cpu().numpy()
-            result['labels'] = pred['labels'].cpu().numpy()
+            dets = dict(
+                bboxes=pred['bboxes'].cpu().numpy(),
+                scores=pred['scores'].cpu().numpy(),
+                labels=pred['labels'].cpu().numpy())
+            # some detectors use different scores for bbox and mask
+            if 'mask_scores' in pred:
+                dets['mask_scores'] = pred['mask_scores'].cpu().numpy()
+            img_fields = dict(
+                img_id=data_sample['img_id'],
+                width=data_sample['ori_shape'][1],
+                height=data_sample['ori_shape'][0])
             # encode mask to RLE
             if 'masks' in pred:
-                result['masks'] = encode_mask_results(
+                img_fields['masks'] = encode_mask_results(
                     pred['masks'].detach().cpu().numpy()) if isinstance(
                         pred['masks'], torch.Tensor) else pred['masks']
-            # some detectors use different scores for bbox and mask
-            if 'mask_scores' in pred:
-                result['mask_scores'] = pred['mask_scores'].cpu().numpy()
 
             # parse gt
-            gt = dict()
-            gt['width'] = data_sample['ori_shape'][1]
-            gt['height'] = data_sample['ori_shape'][0]
-            gt['img_id'] = data_sample['img_id']
             if self._coco_api is None:
                 # TODO: Need to refactor to support LoadAnnotations
                 assert 'instances' in data_sample, \
                     'ground truth is required for evaluation when ' \
                     '`ann_file` is not provided'
-                gt['anns'] = data_sample['instances']
-            # add converted result to the results list
-            self.results.append((gt, result))
+                img_fields['anns'] = data_sample['instances']
+            buffer.append(dets, **img_fields)
 
     def compute_metrics(self, results: list) -> Dict[str, float]:
         """Compute the metrics from processed results.
@@ -391,8 +364,9 @@ class CocoMetric(BaseMetric):
         """
         logger: MMLogger = MMLogger.get_current_instance()
 
-        # split gt and prediction list
-        gts, preds = zip(*results)
+        # the buffers gathered from the ranks hold both the gt and the
+        # predictions of every image
+        gts = preds = DetResultBuffer.from_results(results)
 
         tmp_dir = None
         if self.outfile_prefix is None:
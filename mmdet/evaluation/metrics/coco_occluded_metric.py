@@ -9,6 +9,7 @@ from pycocotools import mask as coco_mask
 from terminaltables import AsciiTable
 
 from mmdet.registry import METRICS
+from ..functional import DetResultBuffer
 from .coco_metric import CocoMetric
 
 
@@ -81,25 +82,27 @@ class CocoOccludedSeparatedMetric(CocoMetric):
             Dict[str, float]: The computed metrics. The keys are the names of
             the metrics, and the values are corresponding results.
         """
+        results = DetResultBuffer.from_results(results)
         coco_metric_res = super().compute_metrics(results)
         eval_res = self.evaluate_occluded_separated(results)
         coco_metric_res.update(eval_res)
         return coco_metric_res
 
-    def evaluate_occluded_separated(self, results: List[tuple]) -> dict:
+    def evaluate_occluded_separated(self, results: list) -> dict:
         """Compute the recall of occluded and separated masks.
 
         Args:
-            results (list[tuple]): Testing results of the dataset.
+            results (list): Testing results of the dataset, the buffers
+                gathered from the ranks or ``(gt, result)`` pairs.
 
         Returns:
             dict[str, float]: The recall of occluded and separated masks.
         """
+        results = DetResultBuffer.from_results(results)
         dict_det = {}
         print_log('processing detection results...')
         prog_bar = mmengine.ProgressBar(len(results))
-        for i in range(len(results)):
-            gt, dt = results[i]
+        for dt in results:
             img_id = dt['img_id']
             cur_img_name = self._coco_api.imgs[img_id]['file_name']
             if cur_img_name not in dict_det.keys():
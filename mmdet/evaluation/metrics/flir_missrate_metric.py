@@ -1,995 +1,21 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-import datetime
-import itertools
-import os.path as osp
-import tempfile
 from collections import OrderedDict
-from typing import Dict, List, Optional, Sequence, Union
-from collections import defaultdict
-import numpy as np
-import torch
-from mmengine.evaluator import BaseMetric
-from mmengine.fileio import dump, get_local_path, load
-from mmengine.logging import MMLogger
-from terminaltables import AsciiTable
-from mmdet.datasets.api_wrappers import COCO, COCOeval, Params
-from mmdet.registry import METRICS
-from mmdet.structures.mask import encode_mask_results
-from ..functional import eval_recalls
-import matplotlib
-import matplotlib.pyplot as plt
-import copy
-import tempfile
-import traceback
-import sys
-import pdb
-
-font = {'size': 22}
-matplotlib.rc('font', **font)
-
-class KAISTParams(Params):
-    """Params for KAISTPed evaluation api"""
-
-    def setDetParams(self):
-        super().setDetParams()
-
-        # Override variables for KAISTPed benchmark
-        self.iouThrs = np.array([0.5])
-        self.maxDets = [1000]
-
-        # KAISTPed specific settings
-        self.fppiThrs = np.array([0.0100, 0.0178, 0.0316, 0.0562,
-                                 0.1000, 0.1778, 0.3162, 0.5623, 1.0000])
-        self.HtRng = [[55, 1e5 ** 2], [50, 75], [50, 1e5 ** 2], [20, 1e5 ** 2]]
-        self.OccRng = [[0, 1], [0, 1], [2], [0, 1, 2]]
-        self.SetupLbl = ['Reasonable', 'Reasonable_small', 'Reasonable_occ=heavy', 'All']
-
-        self.bndRng = [5, 5, 635, 507]  # discard bbs outside this pixel range
-        self.catIds = [0]
-
-class KAISTPedEval(COCOeval):
-
-    def __init__(self, kaistGt=None, kaistDt=None, iouType='segm', method='unknown'):
-        '''
-        Initialize CocoEval using coco APIs for gt and dt
-        :param cocoGt: coco object with ground truth annotations
-        :param cocoDt: coco object with detection results
-        :return: None
-        '''
-        super().__init__(kaistGt, kaistDt, iouType)
-
-        self.params = KAISTParams(iouType=iouType)   # parameters
-        self.method = method
-
-    def _prepare(self, id_setup):
-        '''
-        Prepare ._gts and ._dts for evaluation based on params
-        :return: None
-        '''
-        # id_setup = 0
-        p = self.params
-        if p.useCats:  # catIds = [1]
-            gts = self.cocoGt.loadAnns(self.cocoGt.getAnnIds(imgIds=p.imgIds, catIds=p.catIds))
-            dts = self.cocoDt.loadAnns(self.cocoDt.getAnnIds(imgIds=p.imgIds, catIds=p.catIds))
-        else:
-            gts = self.cocoGt.loadAnns(self.cocoGt.getAnnIds(imgIds=p.imgIds))
-            dts = self.cocoDt.loadAnns(self.cocoDt.getAnnIds(imgIds=p.imgIds))
-
-        # set ignore flag
-        for gt in gts:
-            gt['ignore'] = gt['ignore'] if 'ignore' in gt else 0
-            gbox = gt['bbox']
-            gt['height'] = gbox[3]
-            gt['occlusion'] = 0
-            gt['ignore'] = 1 \
-                if gt['height'] < self.params.HtRng[id_setup][0] \
-                or gt['height'] > self.params.HtRng[id_setup][1] \
-                or gt['occlusion'] not in self.params.OccRng[id_setup] \
-                or gbox[0] < self.params.bndRng[0] \
-                or gbox[1] < self.params.bndRng[1] \
-                or gbox[0] + gbox[2] > self.params.bndRng[2] \
-                or gbox[1] + gbox[3] > self.params.bndRng[3] \
-                else gt['ignore']
-            # OccRng [[0, 1], [0, 1],[2], [0, 1, 2]]
-            # bndRng: [5, 5, 635, 507]
-        self._gts = defaultdict(list)       # gt for evaluation
-        self._dts = defaultdict(list)       # dt for evaluation
-        for gt in gts:
-            self._gts[gt['image_id'], gt['category_id']].append(gt)  # (img_id, cat_id) -> gt
-        for dt in dts:
-            self._dts[dt['image_id'], dt['category_id']].append(dt)
-
-        self.evalImgs = defaultdict(list)   # per-image per-category evaluation results
-        self.eval = {}                      # accumulated evaluation results
-
-    def evaluate(self, id_setup):
-        '''
-        Run per image evaluation on given images and store results (a list of dict) in self.evalImgs
-        :return: None
-        '''
-        # update the self.params
-        p = self.params
-        # add backward compatibility if useSegm is specified in params
-        if p.useSegm is not None:
-            p.iouType = 'segm' if p.useSegm == 1 else 'bbox'
-            print('useSegm (deprecated) is not None. Running {} evaluation'.format(p.iouType))
-        # print('Evaluate annotation type *{}*'.format(p.iouType))
-        p.imgIds = list(np.unique(p.imgIds))
-        if p.useCats:
-            p.catIds = list(np.unique(p.catIds))
-        p.maxDets = sorted(p.maxDets)
-        self.params = p
-
-        # prepare for self._gts and _dts
-        self._prepare(id_setup)
-        # loop through images, area range, max detection number
-        catIds = p.catIds if p.useCats else [-1]  # 1
-
-        computeIoU = self.computeIoU
-
-        self.ious = {(imgId, catId): computeIoU(imgId, catId)
-                     for imgId in p.imgIds for catId in catIds}
-
-        evaluateImg = self.evaluateImg
-        maxDet = p.maxDets[-1]
-        HtRng = self.params.HtRng[id_setup]
-        OccRng = self.params.OccRng[id_setup]
-        self.evalImgs = [evaluateImg(imgId, catId, HtRng, OccRng, maxDet)
-                         for catId in catIds
-                         for imgId in p.imgIds]
-
-        self._paramsEval = copy.deepcopy(self.params)
-
-    def computeIoU(self, imgId, catId):
-        p = self.params
-        if p.useCats:
-            gt = self._gts[imgId, catId]
-            dt = self._dts[imgId, catId]
-        else:
-            gt = [_ for cId in p.catIds for _ in self._gts[imgId, cId]]
-            dt = [_ for cId in p.catIds for _ in self._dts[imgId, cId]]
-        if len(gt) == 0 and len(dt) == 0:
-            return []
-        inds = np.argsort([-d['score'] for d in dt], kind='mergesort')
-        dt = [dt[i] for i in inds]
-        if len(dt) > p.maxDets[-1]:
-            dt = dt[0:p.maxDets[-1]]
-
-        if p.iouType == 'segm':
-            g = [g['segmentation'] for g in gt]
-            d = [d['segmentation'] for d in dt]
-        elif p.iouType == 'bbox':
-            g = [g['bbox'] for g in gt]
-            d = [d['bbox'] for d in dt]
-        else:
-            raise Exception('unknown iouType for iou computation')
-
-        # compute iou between each dt and gt region
-        iscrowd = [int(o['ignore']) for o in gt]
-        ious = self.iou(d, g, iscrowd)
-        return ious
-
-    def iou(self, dts, gts, pyiscrowd):
-        dts = np.asarray(dts)
-        gts = np.asarray(gts)
-        pyiscrowd = np.asarray(pyiscrowd)
-        ious = np.zeros((len(dts), len(gts)))
-        for j, gt in enumerate(gts):
-            gx1 = gt[0]
-            gy1 = gt[1]
-            gx2 = gt[0] + gt[2]
-            gy2 = gt[1] + gt[3]
-            garea = gt[2] * gt[3]
-            for i, dt in enumerate(dts):
-                dx1 = dt[0]
-                dy1 = dt[1]
-                dx2 = dt[0] + dt[2]
-                dy2 = dt[1] + dt[3]
-                darea = dt[2] * dt[3]
-
-                unionw = min(dx2, gx2) - max(dx1, gx1)
-                if unionw <= 0:
-                    continue
-                unionh = min(dy2, gy2) - max(dy1, gy1)
-                if unionh <= 0:
-                    continue
-                t = unionw * unionh
-                if pyiscrowd[j]:
-                    unionarea = darea
-                else:
-                    unionarea = darea + garea - t
-
-                ious[i, j] = float(t) / unionarea
-        return ious
-
-    def evaluateImg(self, imgId, catId, hRng, oRng, maxDet):
-        '''
-        perform evaluation for single category and image
-        :return: dict (single image results)
-        '''
-        try:
-            p = self.params
-            if p.useCats:
-                gt = self._gts[imgId, catId]
-                dt = self._dts[imgId, catId]
-            else:
-                gt = [_ for cId in p.catIds for _ in self._gts[imgId, cId]]
-                dt = [_ for cId in p.catIds for _ in self._dts[imgId, cId]]
-
-            if len(gt) == 0 and len(dt) == 0:
-                return None
-
-            for g in gt:
-                if g['ignore']:
-                    g['_ignore'] = 1
-                else:
-                    g['_ignore'] = 0
-
-            # sort dt highest score first, sort gt ignore last
-            gtind = np.argsort([g['_ignore'] for g in gt], kind='mergesort')
-            gt = [gt[i] for i in gtind]
-            dtind = np.argsort([-d['score'] for d in dt], kind='mergesort')
-            dt = [dt[i] for i in dtind[0:maxDet]]
-
-            if len(dt) == 0:
-                return None
-
-            # load computed ious
-            ious = self.ious[imgId, catId][dtind, :] if len(
-                self.ious[imgId, catId]) > 0 else self.ious[imgId, catId]
-            ious = ious[:, gtind]
-
-            T = len(p.iouThrs)
-            G = len(gt)
-            D = len(dt)
-            gtm = np.zeros((T, G))
-            dtm = np.zeros((T, D))
-            gtIg = np.array([g['_ignore'] for g in gt])
-            dtIg = np.zeros((T, D))
-
-            if not len(ious) == 0:
-                for tind, t in enumerate(p.iouThrs):
-                    for dind, d in enumerate(dt):
-                        # information about best match so far (m=-1 -> unmatched)
-                        iou = min([t, 1 - 1e-10])
-                        bstOa = iou
-                        bstg = -2
-                        bstm = -2
-                        for gind, g in enumerate(gt):
-                            m = gtm[tind, gind]
-                            # if this gt already matched, and not a crowd, continue
-                            if m > 0:
-                                continue
-                            # if dt matched to reg gt, and on ignore gt, stop
-                            if bstm != -2 and gtIg[gind] == 1:
-                                break
-                            # continue to next gt unless better match made
-                            if ious[dind, gind] < bstOa:
-                                continue
-                            # if match successful and best so far, store appropriately
-                            bstOa = ious[dind, gind]
-                            bstg = gind
-                            if gtIg[gind] == 0:
-                                bstm = 1
-                            else:
-                                bstm = -1
-
-                        # if match made store id of match for both dt and gt
-                        if bstg == -2:
-                            continue
-                        dtIg[tind, dind] = gtIg[bstg]
-                        dtm[tind, dind] = gt[bstg]['id']
-                        if bstm == 1:
-                            gtm[tind, bstg] = d['id']
-
-        except Exception:
-
-            ex_type, ex_value, ex_traceback = sys.exc_info()
-
-            # Extract unformatter stack traces as tuples
-            trace_back = traceback.extract_tb(ex_traceback)
-
-            # Format stacktrace
-            stack_trace = list()
-
-            for trace in trace_back:
-                stack_trace.append("File : %s , Line : %d, Func.Name : %s, Message : %s" %
-                                   (trace[0], trace[1], trace[2], trace[3]))
-
-            sys.stderr.write("[Error] Exception type : %s \n" % ex_type.__name__)
-            sys.stderr.write("[Error] Exception message : %s \n" % ex_value)
-            for trace in stack_trace:
-                sys.stderr.write("[Error] (Stack trace) %s\n" % trace)
-
-            pdb.set_trace()
-
-        # store results for given image and category
-        return {
-            'image_id': imgId,
-            'category_id': catId,
-            'hRng': hRng,
-            'oRng': oRng,
-            'maxDet': maxDet,
-            'dtIds': [d['id'] for d in dt],
-            'gtIds': [g['id'] for g in gt],
-            'dtMatches': dtm,
-            'gtMatches': gtm,
-            'dtScores': [d['score'] for d in dt],
-            'gtIgnore': gtIg,
-            'dtIgnore': dtIg,
-        }
-
-    def accumulate(self, p=None):
-        '''
-        Accumulate per image evaluation results and store the result in self.eval
-        :param p: input params for evaluation
-        :return: None
-        '''
-        if not self.evalImgs:
-            print('Please run evaluate() first')
-        # allows input customized parameters
-        if p is None:
-            p = self.params
-        p.catIds = p.catIds if p.useCats == 1 else [-1]
-        T = len(p.iouThrs)  # 0.5
-        R = len(p.fppiThrs)  # [0.01, 0.0178, 0.0316, 0.0562, 0.1, 0.1778, 0.3162, 0.5623, 1.0], 9
-        K = len(p.catIds) if p.useCats else 1  # 1
-        M = len(p.maxDets)  # 1
-        ys = -np.ones((T, R, K, M))     # -1 for the precision of absent categories
-
-        xx_graph = []
-        yy_graph = []
-
-        # create dictionary for future indexing
-        _pe = self._paramsEval
-        catIds = [0]                    # _pe.catIds if _pe.useCats else [-1]
-        setK = set(catIds)
-        setM = set(_pe.maxDets)
-        setI = set(_pe.imgIds)
-        # get inds to evaluate
-        k_list = [n for n, k in enumerate(p.catIds) if k in setK]  # 1
-        m_list = [m for n, m in enumerate(p.maxDets) if m in setM]  # 1000
-        i_list = [n for n, i in enumerate(p.imgIds) if i in setI]  # 0,..,2255
-        I0 = len(_pe.imgIds)
-
-        # retrieve E at each category, area range, and max number of detections
-        for k, k0 in enumerate(k_list):
-            Nk = k0 * I0
-            for m, maxDet in enumerate(m_list):
-                E = [self.evalImgs[Nk + i] for i in i_list]
-                E = [e for e in E if e is not None]
-                if len(E) == 0:
-                    continue
-
-                dtScores = np.concatenate([e['dtScores'][0:maxDet] for e in E])
-
-                # different sorting method generates slightly different results.
-                # mergesort is used to be consistent as Matlab implementation.
-
-                inds = np.argsort(-dtScores, kind='mergesort')
-
-                dtm = np.concatenate([e['dtMatches'][:, 0:maxDet] for e in E], axis=1)[:, inds]
-                dtIg = np.concatenate([e['dtIgnore'][:, 0:maxDet] for e in E], axis=1)[:, inds]
-                gtIg = np.concatenate([e['gtIgnore'] for e in E])
-                npig = np.count_nonzero(gtIg == 0)
-                if npig == 0:
-                    continue
-                tps = np.logical_and(dtm, np.logical_not(dtIg))
-                fps = np.logical_and(np.logical_not(dtm), np.logical_not(dtIg))
-                inds = np.where(dtIg == 0)[1]
-                tps = tps[:, inds]
-                fps = fps[:, inds]
-
-                tp_sum = np.cumsum(tps, axis=1).astype(dtype=np.float64)
-                fp_sum = np.cumsum(fps, axis=1).astype(dtype=np.float64)
-
-                for t, (tp, fp) in enumerate(zip(tp_sum, fp_sum)):
-                    tp = np.array(tp)
-                    fppi = np.array(fp) / I0
-                    nd = len(tp)
-                    recall = tp / npig
-                    q = np.zeros((R,))
-
-                    xx_graph.append(fppi)
-                    yy_graph.append(1 - recall)
-
-                    # numpy is slow without cython optimization for accessing elements
-                    # use python array gets significant speed improvement
-                    recall = recall.tolist()
-                    q = q.tolist()
-
-                    for i in range(nd - 1, 0, -1):
-                        if recall[i] < recall[i - 1]:
-                            recall[i - 1] = recall[i]
-
-                    inds = np.searchsorted(fppi, p.fppiThrs, side='right') - 1
-                    try:
-                        for ri, pi in enumerate(inds):
-                            q[ri] = recall[pi]
-                    except Exception:
-                        pass
-                    ys[t, :, k, m] = np.array(q)
-
-        self.eval = {
-            'params': p,
-            'counts': [T, R, K, M],
-            'date': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'TP': ys,
-            'xx': xx_graph,
-            'yy': yy_graph
-        }
-
-    @staticmethod
-    def draw_figure(ax, eval_results, methods, colors):
-        """Draw figure"""
-        assert len(eval_results) == len(methods) == len(colors)
-
-        for eval_result, method, color in zip(eval_results, methods, colors):
-            mrs = 1 - eval_result['TP']
-            mean_s = np.log(mrs[mrs < 2])
-            mean_s = np.mean(mean_s)
-            mean_s = float(np.exp(mean_s) * 100)
-
-            xx = eval_result['xx']
-            yy = eval_result['yy']
-
-            ax.plot(xx[0], yy[0], color=color, linewidth=3, label=f'{mean_s:.2f}%, {method}')
-
-        ax.set_yscale('log')
-        ax.set_xscale('log')
-        ax.legend()
-
-        yt = [1, 5] + list(range(10, 60, 10)) + [64, 80]
-        yticklabels = ['.{:02d}'.format(num) for num in yt]
-
-        yt += [100]
-        yt = [yy / 100.0 for yy in yt]
-        yticklabels += [1]
+from typing import Optional
 
-        ax.set_yticks(yt)
-        ax.set_yticklabels(yticklabels)
-        ax.grid(which='major', axis='both')
-        ax.set_ylim(0.01, 1)
-        ax.set_xlim(2e-4, 50)
-        ax.set_ylabel('miss rate')
-        ax.set_xlabel('false positives per image')
-
-    def summarize(self, id_setup, res_file=None):
-        '''
-        Compute and display summary metrics for evaluation results.
-        Note this functin can *only* be applied on the default parameter setting
-        '''
-        def _summarize(iouThr=None, maxDets=100):
-            OCC_TO_TEXT = ['none', 'partial_occ', 'heavy_occ']
-
-            p = self.params
-            iStr = ' {:<18} {} @ {:<18} [ IoU={:<9} | height={:>6s} | visibility={:>6s} ] = {:0.2f}%'
-            titleStr = 'Average Miss Rate'
-            typeStr = '(MR)'
-            setupStr = p.SetupLbl[id_setup]
-            iouStr = '{:0.2f}:{:0.2f}'.format(p.iouThrs[0], p.iouThrs[-1]) \
-                if iouThr is None else '{:0.2f}'.format(iouThr)
-            heightStr = '[{:0.0f}:{:0.0f}]'.format(p.HtRng[id_setup][0], p.HtRng[id_setup][1])
-            occlStr = '[' + '+'.join(['{:s}'.format(OCC_TO_TEXT[occ])
-                                     for occ in p.OccRng[id_setup]]) + ']'
-
-            mind = [i for i, mDet in enumerate(p.maxDets) if mDet == maxDets]
-
-            # dimension of precision: [TxRxKxAxM]
-            s = self.eval['TP']
-            # IoU
-            if iouThr is not None:
-                t = np.where(iouThr == p.iouThrs)[0]
-                s = s[t]
-            mrs = 1 - s[:, :, :, mind]
-
-            if len(mrs[mrs < 2]) == 0:
-                mean_s = -1
-            else:
-                mean_s = np.log(mrs[mrs < 2])
-                mean_s = np.mean(mean_s)
-                mean_s = np.exp(mean_s)
-
-            if res_file:
-                res_file.write(iStr.format(titleStr, typeStr, setupStr,
-                               iouStr, heightStr, occlStr, mean_s * 100))
-                res_file.write('\n')
-            return mean_s
-
-        if not self.eval:
-            raise Exception('Please run accumulate() first')
+from mmdet.registry import METRICS
+from .kaist_missrate_metric import KAISTMissrateMetric
 
-        return _summarize(iouThr=.5, maxDets=1000)
 
 @METRICS.register_module()
-class FLIRMissrateMetric(BaseMetric):
-    """Missrate evaluation metric.
-
-    Evaluate AR, AP, and mAP for detection tasks including proposal/box
-    detection and instance segmentation. Please refer to
-    https://cocodataset.org/#detection-eval for more details.
-
-    Args:
-        ann_file (str, optional): Path to the coco format annotation file.
-            If not specified, ground truth annotations from the dataset will
-            be converted to coco format. Defaults to None.
-        metric (str | List[str]): Metrics to be evaluated. Valid metrics
-            include 'bbox', 'segm', 'proposal', and 'proposal_fast'.
-            Defaults to 'bbox'.
-        classwise (bool): Whether to evaluate the metric class-wise.
-            Defaults to False.
-        proposal_nums (Sequence[int]): Numbers of proposals to be evaluated.
-            Defaults to (100, 300, 1000).
-        iou_thrs (float | List[float], optional): IoU threshold to compute AP
-            and AR. If not specified, IoUs from 0.5 to 0.95 will be used.
-            Defaults to None.
-        metric_items (List[str], optional): Metric result names to be
-            recorded in the evaluation result. Defaults to None.
-        format_only (bool): Format the output results without perform
-            evaluation. It is useful when you want to format the result
-            to a specific format and submit it to the test server.
-            Defaults to False.
-        outfile_prefix (str, optional): The prefix of json files. It includes
-            the file path and the prefix of filename, e.g., "a/b/prefix".
-            If not specified, a temp file will be created. Defaults to None.
-        file_client_args (dict, optional): Arguments to instantiate the
-            corresponding backend in mmdet <= 3.0.0rc6. Defaults to None.
-        backend_args (dict, optional): Arguments to instantiate the
-            corresponding backend. Defaults to None.
-        collect_device (str): Device name used for collecting results from
-            different ranks during distributed training. Must be 'cpu' or
-            'gpu'. Defaults to 'cpu'.
-        prefix (str, optional): The prefix that will be added in the metric
-            names to disambiguate homonymous metrics of different evaluators.
-            If prefix is not provided in the argument, self.default_prefix
-            will be used instead. Defaults to None.
-        sort_categories (bool): Whether sort categories in annotations. Only
-            used for `Objects365V1Dataset`. Defaults to False.
+class FLIRMissrateMetric(KAISTMissrateMetric):
+    """Missrate evaluation metric for FLIR.
+
+    FLIR annotations have neither height nor occlusion fields, so the box
+    height is used and every person is considered visible. FLIR has no
+    day/night tag either, so by default the ``day`` and ``night`` results
+    repeat ``all`` to keep the result keys of the KAIST metric. See
+    :class:`KAISTMissrateMetric` for the arguments.
     """
     default_prefix: Optional[str] = 'coco'
-
-    def __init__(self,
-                 ann_file: Optional[str] = None,
-                 metric: Union[str, List[str]] = 'bbox',
-                 classwise: bool = False,
-                 proposal_nums: Sequence[int] = (100, 300, 1000),
-                 iou_thrs: Optional[Union[float, Sequence[float]]] = None,
-                 metric_items: Optional[Sequence[str]] = None,
-                 format_only: bool = False,
-                 outfile_prefix: Optional[str] = None,
-                 file_client_args: dict = None,
-                 backend_args: dict = None,
-                 collect_device: str = 'cpu',
-                 prefix: Optional[str] = None,
-                 sort_categories: bool = False) -> None:
-        super().__init__(collect_device=collect_device, prefix=prefix)
-        # coco evaluation metrics
-        self.metrics = metric if isinstance(metric, list) else [metric]
-        allowed_metrics = ['bbox', 'segm', 'proposal', 'proposal_fast']
-        for metric in self.metrics:
-            if metric not in allowed_metrics:
-                raise KeyError(
-                    "metric should be one of 'bbox', 'segm', 'proposal', "
-                    f"'proposal_fast', but got {metric}.")
-
-        # do class wise evaluation, default False
-        self.classwise = classwise
-
-        # proposal_nums used to compute recall or precision.
-        self.proposal_nums = list(proposal_nums)
-
-        # iou_thrs used to compute recall or precision.
-        if iou_thrs is None:
-            iou_thrs = np.linspace(
-                .5, 0.95, int(np.round((0.95 - .5) / .05)) + 1, endpoint=True)
-        self.iou_thrs = iou_thrs
-        self.metric_items = metric_items
-        self.format_only = format_only
-        if self.format_only:
-            assert outfile_prefix is not None, 'outfile_prefix must be not'
-            'None when format_only is True, otherwise the result files will'
-            'be saved to a temp directory which will be cleaned up at the end.'
-
-        self.outfile_prefix = outfile_prefix
-
-        self.backend_args = backend_args
-        if file_client_args is not None:
-            raise RuntimeError(
-                'The `file_client_args` is deprecated, '
-                'please use `backend_args` instead, please refer to'
-                'https://github.com/open-mmlab/mmdetection/blob/main/configs/_base_/datasets/coco_detection.py'  # noqa: E501
-            )
-
-        # if ann_file is not specified,
-        # initialize coco api with the converted dataset
-        if ann_file is not None:
-            with get_local_path(
-                    ann_file, backend_args=self.backend_args) as local_path:
-                self._coco_api = COCO(local_path)
-                if sort_categories:
-                    # 'categories' list in objects365_train.json and
-                    # objects365_val.json is inconsistent, need sort
-                    # list(or dict) before get cat_ids.
-                    cats = self._coco_api.cats
-                    sorted_cats = {i: cats[i] for i in sorted(cats)}
-                    self._coco_api.cats = sorted_cats
-                    categories = self._coco_api.dataset['categories']
-                    sorted_categories = sorted(
-                        categories, key=lambda i: i['id'])
-                    self._coco_api.dataset['categories'] = sorted_categories
-        else:
-            self._coco_api = None
-
-        # handle dataset lazy init
-        self.cat_ids = None
-        self.img_ids = None
-
-    def fast_eval_recall(self,
-                         results: List[dict],
-                         proposal_nums: Sequence[int],
-                         iou_thrs: Sequence[float],
-                         logger: Optional[MMLogger] = None) -> np.ndarray:
-        """Evaluate proposal recall with COCO's fast_eval_recall.
-
-        Args:
-            results (List[dict]): Results of the dataset.
-            proposal_nums (Sequence[int]): Proposal numbers used for
-                evaluation.
-            iou_thrs (Sequence[float]): IoU thresholds used for evaluation.
-            logger (MMLogger, optional): Logger used for logging the recall
-                summary.
-        Returns:
-            np.ndarray: Averaged recall results.
-        """
-        gt_bboxes = []
-        pred_bboxes = [result['bboxes'] for result in results]
-        for i in range(len(self.img_ids)):
-            ann_ids = self._coco_api.get_ann_ids(img_ids=self.img_ids[i])
-            ann_info = self._coco_api.load_anns(ann_ids)
-            if len(ann_info) == 0:
-                gt_bboxes.append(np.zeros((0, 4)))
-                continue
-            bboxes = []
-            for ann in ann_info:
-                if ann.get('ignore', False) or ann['iscrowd']:
-                    continue
-                x1, y1, w, h = ann['bbox']
-                bboxes.append([x1, y1, x1 + w, y1 + h])
-            bboxes = np.array(bboxes, dtype=np.float32)
-            if bboxes.shape[0] == 0:
-                bboxes = np.zeros((0, 4))
-            gt_bboxes.append(bboxes)
-
-        recalls = eval_recalls(
-            gt_bboxes, pred_bboxes, proposal_nums, iou_thrs, logger=logger)
-        ar = recalls.mean(axis=1)
-        return ar
-
-    def xyxy2xywh(self, bbox: np.ndarray) -> list:
-        """Convert ``xyxy`` style bounding boxes to ``xywh`` style for COCO
-        evaluation.
-
-        Args:
-            bbox (numpy.ndarray): The bounding boxes, shape (4, ), in
-                ``xyxy`` order.
-
-        Returns:
-            list[float]: The converted bounding boxes, in ``xywh`` order.
-        """
-
-        _bbox: List = bbox.tolist()
-        return [
-            _bbox[0],
-            _bbox[1],
-            _bbox[2] - _bbox[0],
-            _bbox[3] - _bbox[1],
-        ]
-
-    def results2json(self, results: Sequence[dict],
-                     outfile_prefix: str) -> dict:
-        """Dump the detection results to a COCO style json file.
-
-        There are 3 types of results: proposals, bbox predictions, mask
-        predictions, and they have different data types. This method will
-        automatically recognize the type, and dump them to json files.
-
-        Args:
-            results (Sequence[dict]): Testing results of the
-                dataset.
-            outfile_prefix (str): The filename prefix of the json files. If the
-                prefix is "somepath/xxx", the json files will be named
-                "somepath/xxx.bbox.json", "somepath/xxx.segm.json",
-                "somepath/xxx.proposal.json".
-
-        Returns:
-            dict: Possible keys are "bbox", "segm", "proposal", and
-            values are corresponding filenames.
-        """
-        bbox_json_results = []
-        segm_json_results = [] if 'masks' in results[0] else None
-        for idx, result in enumerate(results):
-            image_id = result.get('img_id', idx)
-            labels = result['labels']
-            bboxes = result['bboxes']
-            scores = result['scores']
-            # bbox results
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(scores[i])
-                data['category_id'] = self.cat_ids[label]
-                bbox_json_results.append(data)
-
-            if segm_json_results is None:
-                continue
-
-            # segm results
-            masks = result['masks']
-            mask_scores = result.get('mask_scores', scores)
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(mask_scores[i])
-                data['category_id'] = self.cat_ids[label]
-                if isinstance(masks[i]['counts'], bytes):
-                    masks[i]['counts'] = masks[i]['counts'].decode()
-                data['segmentation'] = masks[i]
-                segm_json_results.append(data)
-
-        result_files = dict()
-        result_files['bbox'] = f'{outfile_prefix}.bbox.json'
-        result_files['proposal'] = f'{outfile_prefix}.bbox.json'
-        dump(bbox_json_results, result_files['bbox'])
-
-        if segm_json_results is not None:
-            result_files['segm'] = f'{outfile_prefix}.segm.json'
-            dump(segm_json_results, result_files['segm'])
-
-        return result_files
-
-    def gt_to_coco_json(self, gt_dicts: Sequence[dict],
-                        outfile_prefix: str) -> str:
-        """Convert ground truth to coco format json file.
-
-        Args:
-            gt_dicts (Sequence[dict]): Ground truth of the dataset.
-            outfile_prefix (str): The filename prefix of the json files. If the
-                prefix is "somepath/xxx", the json file will be named
-                "somepath/xxx.gt.json".
-        Returns:
-            str: The filename of the json file.
-        """
-        categories = [
-            dict(id=id, name=name)
-            for id, name in enumerate(self.dataset_meta['classes'])
-        ]
-        image_infos = []
-        annotations = []
-
-        for idx, gt_dict in enumerate(gt_dicts):
-            img_id = gt_dict.get('img_id', idx)
-            image_info = dict(
-                id=img_id,
-                width=gt_dict['width'],
-                height=gt_dict['height'],
-                file_name='')
-            image_infos.append(image_info)
-            for ann in gt_dict['anns']:
-                label = ann['bbox_label']
-                bbox = ann['bbox']
-                coco_bbox = [
-                    bbox[0],
-                    bbox[1],
-                    bbox[2] - bbox[0],
-                    bbox[3] - bbox[1],
-                ]
-
-                annotation = dict(
-                    id=len(annotations) +
-                    1,  # coco api requires id starts with 1
-                    image_id=img_id,
-                    bbox=coco_bbox,
-                    iscrowd=ann.get('ignore_flag', 0),
-                    category_id=int(label),
-                    area=coco_bbox[2] * coco_bbox[3])
-                if ann.get('mask', None):
-                    mask = ann['mask']
-                    # area = mask_util.area(mask)
-                    if isinstance(mask, dict) and isinstance(
-                            mask['counts'], bytes):
-                        mask['counts'] = mask['counts'].decode()
-                    annotation['segmentation'] = mask
-                    # annotation['area'] = float(area)
-                annotations.append(annotation)
-
-        info = dict(
-            date_created=str(datetime.datetime.now()),
-            description='Coco json file converted by mmdet CocoMetric.')
-        coco_json = dict(
-            info=info,
-            images=image_infos,
-            categories=categories,
-            licenses=None,
-        )
-        if len(annotations) > 0:
-            coco_json['annotations'] = annotations
-        converted_json_path = f'{outfile_prefix}.gt.json'
-        dump(coco_json, converted_json_path)
-        return converted_json_path
-
-    # TODO: data_batch is no longer needed, consider adjusting the
-    #  parameter position
-    def process(self, data_batch: dict, data_samples: Sequence[dict]) -> None:
-        """Process one batch of data samples and predictions. The processed
-        results should be stored in ``self.results``, which will be used to
-        compute the metrics when all batches have been processed.
-
-        Args:
-            data_batch (dict): A batch of data from the dataloader.
-            data_samples (Sequence[dict]): A batch of data samples that
-                contain annotations and predictions.
-        """
-        for data_sample in data_samples:
-            result = dict()
-            pred = data_sample['pred_instances']
-            result['img_id'] = data_sample['img_id']
-            result['bboxes'] = pred['bboxes'].cpu().numpy()
-            result['scores'] = pred['scores'].cpu().numpy()
-            result['labels'] = pred['labels'].cpu().numpy()
-            # encode mask to RLE
-            if 'masks' in pred:
-                result['masks'] = encode_mask_results(
-                    pred['masks'].detach().cpu().numpy()) if isinstance(
-                        pred['masks'], torch.Tensor) else pred['masks']
-            # some detectors use different scores for bbox and mask
-            if 'mask_scores' in pred:
-                result['mask_scores'] = pred['mask_scores'].cpu().numpy()
-
-            # parse gt
-            gt = dict()
-            gt['width'] = data_sample['ori_shape'][1]
-            gt['height'] = data_sample['ori_shape'][0]
-            gt['img_id'] = data_sample['img_id']
-            if self._coco_api is None:
-                # TODO: Need to refactor to support LoadAnnotations
-                assert 'instances' in data_sample, \
-                    'ground truth is required for evaluation when ' \
-                    '`ann_file` is not provided'
-                gt['anns'] = data_sample['instances']
-            # add converted result to the results list
-            self.results.append((gt, result))
-
-    def compute_metrics(self, results: list) -> Dict[str, float]:
-        """Compute the metrics from processed results.
-
-        Args:
-            results (list): The processed results of each batch.
-
-        Returns:
-            Dict[str, float]: The computed metrics. The keys are the names of
-            the metrics, and the values are corresponding results.
-        """
-        logger: MMLogger = MMLogger.get_current_instance()
-
-        # split gt and prediction list
-        gts, preds = zip(*results)
-
-        tmp_dir = None
-        if self.outfile_prefix is None:
-            tmp_dir = tempfile.TemporaryDirectory()
-            outfile_prefix = osp.join(tmp_dir.name, 'results')
-        else:
-            outfile_prefix = self.outfile_prefix
-
-        if self._coco_api is None:
-            # use converted gt json file to initialize coco api
-            logger.info('Converting ground truth to coco format...')
-            coco_json_path = self.gt_to_coco_json(
-                gt_dicts=gts, outfile_prefix=outfile_prefix)
-            self._coco_api = COCO(coco_json_path)
-
-        # handle lazy init
-        if self.cat_ids is None:
-            self.cat_ids = self._coco_api.get_cat_ids(
-                cat_names=self.dataset_meta['classes'])
-        if self.img_ids is None:
-            self.img_ids = self._coco_api.get_img_ids()
-
-        # convert predictions to coco format and dump to json file
-        result_files = self.results2json(preds, outfile_prefix)
-
-        eval_results = OrderedDict()
-        if self.format_only:
-            logger.info('results are saved in '
-                        f'{osp.dirname(outfile_prefix)}')
-            return eval_results
-
-        for metric in self.metrics:
-            logger.info(f'Evaluating {metric}...')
-
-            # TODO: May refactor fast_eval_recall to an independent metric?
-            # fast eval recall
-            if metric == 'proposal_fast':
-                ar = self.fast_eval_recall(
-                    preds, self.proposal_nums, self.iou_thrs, logger=logger)
-                log_msg = []
-                for i, num in enumerate(self.proposal_nums):
-                    eval_results[f'AR@{num}'] = ar[i]
-                    log_msg.append(f'\nAR@{num}\t{ar[i]:.4f}')
-                log_msg = ''.join(log_msg)
-                logger.info(log_msg)
-                continue
-
-            # evaluate proposal, bbox and segm
-            iou_type = 'bbox' if metric == 'proposal' else metric
-            if metric not in result_files:
-                raise KeyError(f'{metric} is not in results')
-            try:
-                predictions = load(result_files[metric])
-                if iou_type == 'segm':
-                    # Refer to https://github.com/cocodataset/cocoapi/blob/master/PythonAPI/pycocotools/coco.py#L331  # noqa
-                    # When evaluating mask AP, if the results contain bbox,
-                    # cocoapi will use the box area instead of the mask area
-                    # for calculating the instance area. Though the overall AP
-                    # is not affected, this leads to different
-                    # small/medium/large mask AP results.
-                    for x in predictions:
-                        x.pop('bbox')
-                coco_dt = self._coco_api.loadRes(predictions)
-
-            except IndexError:
-                logger.error(
-                    'The testing results of the whole dataset is empty.')
-                break
-
-            kaistEval = KAISTPedEval(self._coco_api, coco_dt, iou_type)
-
-            kaistEval.params.catIds = [0]
-
-            eval_result = {
-                'all': copy.deepcopy(kaistEval),
-                'day': copy.deepcopy(kaistEval),
-                'night': copy.deepcopy(kaistEval),
-            }
-            imgIds = sorted(self.img_ids)  # imgIds
-            eval_result['all'].params.imgIds = imgIds
-            eval_result['all'].evaluate(0)
-            eval_result['all'].accumulate()
-            MR_all = eval_result['all'].summarize(0)
-
-            eval_result['day'].params.imgIds = imgIds
-            eval_result['day'].evaluate(0)
-            eval_result['day'].accumulate()
-            MR_day = eval_result['day'].summarize(0)
-
-            eval_result['night'].params.imgIds = imgIds
-            eval_result['night'].evaluate(0)
-            eval_result['night'].accumulate()
-            MR_night = eval_result['night'].summarize(0)
-
-            recall_all = 1 - eval_result['all'].eval['yy'][0][-1]
-            recall_day = 1 - eval_result['day'].eval['yy'][0][-1]
-            recall_night = 1 - eval_result['night'].eval['yy'][0][-1]
-
-            eval_results['all'] = MR_all
-            eval_results['day'] = MR_day
-            eval_results['night'] = MR_night
-            eval_results['recall_all'] = recall_all
-            eval_results['recall_day'] = recall_day
-            eval_results['recall_night'] = recall_night
-
-            msg = f'miss_rate: ' \
-                + f' MR_all: {MR_all * 100:.3f} ' \
-                + f' MR_day: {MR_day * 100:.3f} ' \
-                + f' MR_night: {MR_night * 100:.3f} ' \
-                + f' recall_all: {recall_all * 100:.3f} ' \
-                + f' recall_day: {recall_day * 100:.3f} ' \
-                + f' recall_night: {recall_night * 100:.3f} ' \
-                + '\n'
-            logger.info(msg)
-
-        if tmp_dir is not None:
-            tmp_dir.cleanup()
-        return eval_results
+    use_bbox_height: bool = True
+    default_subsets: dict = OrderedDict(all=None, day=None, night=None)
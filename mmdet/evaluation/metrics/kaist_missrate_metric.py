@@ -2,24 +2,25 @@
 import datetime
 import itertools
 import os.path as osp
-import tempfile
 from collections import OrderedDict
 from typing import Dict, List, Optional, Sequence, Union
 from collections import defaultdict
 import numpy as np
 import torch
 from mmengine.evaluator import BaseMetric
-from mmengine.fileio import dump, get_local_path, load
+from mmengine.fileio import dump, get_local_path
 from mmengine.logging import MMLogger
 from terminaltables import AsciiTable
 from mmdet.datasets.api_wrappers import COCO, COCOeval, Params
 from mmdet.registry import METRICS
 from mmdet.structures.mask import encode_mask_results
-from ..functional import eval_recalls
+from ..functional import (DetResultBuffer, MissrateEval, eval_recalls,
+                          missrate_bbox_iou, missrate_greedy_match,
+                          missrate_gt_ignore)
 import matplotlib
 import matplotlib.pyplot as plt
 import copy
-import tempfile
+import re
 import traceback
 import sys
 import pdb
@@ -48,17 +49,21 @@ class KAISTParams(Params):
 
 class KAISTPedEval(COCOeval):
 
-    def __init__(self, kaistGt=None, kaistDt=None, iouType='segm', method='unknown'):
+    def __init__(self, kaistGt=None, kaistDt=None, iouType='segm', method='unknown',
+                 vectorized=True):
         '''
         Initialize CocoEval using coco APIs for gt and dt
         :param cocoGt: coco object with ground truth annotations
         :param cocoDt: coco object with detection results
+        :param vectorized: use the NumPy IoU and matching engine instead of
+            the reference Python loops, results are bit-identical
         :return: None
         '''
         super().__init__(kaistGt, kaistDt, iouType)
 
         self.params = KAISTParams(iouType=iouType)   # parameters
         self.method = method
+        self.vectorized = vectorized
 
     def _prepare(self, id_setup):
         '''
@@ -75,20 +80,12 @@ class KAISTPedEval(COCOeval):
             dts = self.cocoDt.loadAnns(self.cocoDt.getAnnIds(imgIds=p.imgIds))
 
         # set ignore flag
-        for gt in gts:
-            gt['ignore'] = gt['ignore'] if 'ignore' in gt else 0
-            gbox = gt['bbox']
-            gt['ignore'] = 1 \
-                if gt['height'] < self.params.HtRng[id_setup][0] \
-                or gt['height'] > self.params.HtRng[id_setup][1] \
-                or gt['occlusion'] not in self.params.OccRng[id_setup] \
-                or gbox[0] < self.params.bndRng[0] \
-                or gbox[1] < self.params.bndRng[1] \
-                or gbox[0] + gbox[2] > self.params.bndRng[2] \
-                or gbox[1] + gbox[3] > self.params.bndRng[3] \
-                else gt['ignore']
-            # OccRng [[0, 1], [0, 1],[2], [0, 1, 2]]
-            # bndRng: [5, 5, 635, 507]
+        gt_ignore = missrate_gt_ignore(
+            [gt['bbox'] for gt in gts], [gt.get('ignore', 0) for gt in gts],
+            [gt['height'] for gt in gts], [gt['occlusion'] for gt in gts],
+            p.HtRng[id_setup], p.OccRng[id_setup], p.bndRng)
+        for gt, ignore in zip(gts, gt_ignore):
+            gt['ignore'] = int(ignore)
         self._gts = defaultdict(list)       # gt for evaluation
         self._dts = defaultdict(list)       # dt for evaluation
         for gt in gts:
@@ -167,6 +164,8 @@ class KAISTPedEval(COCOeval):
         return ious
 
     def iou(self, dts, gts, pyiscrowd):
+        if self.vectorized:
+            return missrate_bbox_iou(dts, gts, pyiscrowd)
         dts = np.asarray(dts)
         gts = np.asarray(gts)
         pyiscrowd = np.asarray(pyiscrowd)
@@ -244,7 +243,11 @@ class KAISTPedEval(COCOeval):
             gtIg = np.array([g['_ignore'] for g in gt])
             dtIg = np.zeros((T, D))
 
-            if not len(ious) == 0:
+            if self.vectorized:
+                dtm, gtm, dtIg = missrate_greedy_match(
+                    ious, gtIg, [d['id'] for d in dt], [g['id'] for g in gt],
+                    p.iouThrs)
+            elif not len(ious) == 0:
                 for tind, t in enumerate(p.iouThrs):
                     for dind, d in enumerate(dt):
                         # information about best match so far (m=-1 -> unmatched)
@@ -316,10 +319,14 @@ class KAISTPedEval(COCOeval):
             'dtIgnore': dtIg,
         }
 
-    def accumulate(self, p=None):
+    def accumulate(self, p=None, imgIds=None):
         '''
         Accumulate per image evaluation results and store the result in self.eval
         :param p: input params for evaluation
+        :param imgIds: subset of the evaluated image ids to accumulate. The
+            per-image results of evaluate() are reused, so any number of
+            subsets can be accumulated from a single evaluation.
+            Defaults to all evaluated images.
         :return: None
         '''
         if not self.evalImgs:
@@ -339,15 +346,17 @@ class KAISTPedEval(COCOeval):
 
         # create dictionary for future indexing
         _pe = self._paramsEval
-        catIds = [1]                    # _pe.catIds if _pe.useCats else [-1]
+        catIds = _pe.catIds if _pe.useCats else [-1]
         setK = set(catIds)
         setM = set(_pe.maxDets)
-        setI = set(_pe.imgIds)
+        setI = set(_pe.imgIds) if imgIds is None else set(imgIds)
         # get inds to evaluate
         k_list = [n for n, k in enumerate(p.catIds) if k in setK] # 1
         m_list = [m for n, m in enumerate(p.maxDets) if m in setM] # 1000
         i_list = [n for n, i in enumerate(p.imgIds) if i in setI] # 0,..,2255
         I0 = len(_pe.imgIds)
+        # number of images used to normalize the false positives per image
+        numImgs = I0 if imgIds is None else len(i_list)
 
         # retrieve E at each category, area range, and max number of detections
         for k, k0 in enumerate(k_list):
@@ -382,7 +391,7 @@ class KAISTPedEval(COCOeval):
 
                 for t, (tp, fp) in enumerate(zip(tp_sum, fp_sum)):
                     tp = np.array(tp)
-                    fppi = np.array(fp) / I0
+                    fppi = np.array(fp) / numImgs
                     nd = len(tp)
                     recall = tp / npig
                     q = np.zeros((R,))
@@ -498,6 +507,136 @@ class KAISTPedEval(COCOeval):
 
         return _summarize(iouThr=.5, maxDets=1000)
 
+# prepared miss-rate evaluators shared by the metrics of a dataset, keyed by
+# annotation file, category and evaluation setup
+_MISSRATE_EVAL_CACHE = dict()
+
+# image info keys that hold the KAIST sequence name, e.g. 'set06/V000/I00019'
+_IMG_NAME_KEYS = ('im_name', 'file_name')
+
+
+def _in_subset(img_info: dict, rule: Optional[dict]) -> bool:
+    """Check whether an image belongs to a subset.
+
+    Args:
+        img_info (dict): Image info from the ground truth COCO api.
+        rule (dict, optional): ``None`` selects every image. Otherwise the
+            dict holds a ``key`` (or a sequence of keys, the first one present
+            in ``img_info`` is used) and either ``value``, which must be equal
+            to the image info field, or ``pattern``, a regular expression
+            searched in it.
+
+    Returns:
+        bool: Whether the image is in the subset.
+    """
+    if rule is None:
+        return True
+    keys = rule['key']
+    keys = [keys] if isinstance(keys, str) else keys
+    for key in keys:
+        if key in img_info:
+            break
+    else:
+        raise KeyError(f'None of {keys} is in the image info of image '
+                       f'{img_info.get("id")}, please set `subsets` '
+                       'according to the annotation file.')
+    if 'pattern' in rule:
+        return re.search(rule['pattern'], str(img_info[key])) is not None
+    return img_info[key] == rule['value']
+
+
+def _subset_recall_key(name: str) -> str:
+    """Name of the recall result of a subset, e.g. 'day' -> 'recall_day' and
+    'glare_day' -> 'glare_recall_day'."""
+    prefix, _, suffix = name.rpartition('_')
+    return f'{prefix}_recall_{suffix}' if prefix else f'recall_{suffix}'
+
+
+def _coco_to_missrate_gts(coco: COCO,
+                          img_ids: Sequence[int],
+                          cat_id: int,
+                          bbox_height: bool = False) -> tuple:
+    """Collect the ground truths of a COCO api as per-image arrays for
+    :meth:`MissrateEval.prepare_gts`.
+
+    Args:
+        coco (COCO): Ground truth COCO api.
+        img_ids (Sequence[int]): Image ids to collect.
+        cat_id (int): Category id to evaluate.
+        bbox_height (bool): Use the box height and occlusion level 0 instead
+            of the ``height`` and ``occlusion`` fields of the annotations.
+            Defaults to False.
+
+    Returns:
+        tuple[list]: Boxes in ``xywh`` order, annotation ids, ignore flags,
+        heights and occlusion levels of each image.
+    """
+    bboxes, ids, ignore, heights, occlusions = [], [], [], [], []
+    for img_id in img_ids:
+        anns = [
+            ann for ann in coco.imgToAnns[img_id]
+            if ann['category_id'] == cat_id
+        ]
+        img_bboxes = np.array([ann['bbox'] for ann in anns],
+                              dtype=np.float64).reshape(-1, 4)
+        bboxes.append(img_bboxes)
+        ids.append(np.array([ann['id'] for ann in anns], dtype=np.int64))
+        ignore.append(
+            np.array([bool(ann.get('ignore', 0)) for ann in anns],
+                     dtype=bool))
+        if bbox_height:
+            heights.append(img_bboxes[:, 3])
+            occlusions.append(np.zeros(len(anns), dtype=np.int64))
+        else:
+            # converted annotations have neither height nor occlusion
+            heights.append(
+                np.array([ann.get('height', ann['bbox'][3]) for ann in anns],
+                         dtype=np.float64))
+            occlusions.append(
+                np.array([ann.get('occlusion', 0) for ann in anns],
+                         dtype=np.int64))
+    return bboxes, ids, ignore, heights, occlusions
+
+
+def _results_to_missrate_dts(results, cat_ids: Sequence[int],
+                             cat_id: int) -> dict:
+    """Group the predictions of one category by image.
+
+    Args:
+        results (Sequence[dict] | :obj:`DetResultBuffer`): Predictions
+            collected by ``process``.
+        cat_ids (Sequence[int]): Category id of each label.
+        cat_id (int): Category id to evaluate.
+
+    Returns:
+        dict: Mapping from image id to the boxes in ``xywh`` order, shape
+        (D, 4), and the scores, shape (D, ), of its detections.
+    """
+    results = DetResultBuffer.from_results(results)
+    img_ids = results.get_img_ids()
+    if not results.det_fields:
+        return {}
+    # the category is selected on the flat arrays of all the images
+    labels = results.get_dets('labels').astype(np.int64)
+    keep = np.asarray(cat_ids)[labels] == cat_id
+    bboxes = results.get_dets('bboxes').astype(np.float64).reshape(-1,
+                                                                   4)[keep]
+    bboxes[:, 2:] -= bboxes[:, :2]
+    scores = results.get_dets('scores').astype(np.float64)[keep]
+    img_inds = np.repeat(np.arange(len(results)), results.num_dets)[keep]
+    split_inds = np.cumsum(np.bincount(img_inds,
+                                       minlength=len(results)))[:-1]
+    img_dts = dict()
+    for img_id, img_bboxes, img_scores in zip(img_ids,
+                                              np.split(bboxes, split_inds),
+                                              np.split(scores, split_inds)):
+        if img_id in img_dts:
+            img_bboxes = np.concatenate([img_dts[img_id][0], img_bboxes])
+            img_scores = np.concatenate([img_dts[img_id][1], img_scores])
+        img_dts[img_id] = (img_bboxes, img_scores)
+    return img_dts
+
+
 @METRICS.register_module()
 class KAISTMissrateMetric(BaseMetric):
     """Missrate evaluation metric.
@@ -528,7 +667,8 @@ class KAISTMissrateMetric(BaseMetric):
             Defaults to False.
         outfile_prefix (str, optional): The prefix of json files. It includes
             the file path and the prefix of filename, e.g., "a/b/prefix".
-            If not specified, a temp file will be created. Defaults to None.
+            If not specified, no json file is written and the evaluation
+            runs on the collected arrays in memory. Defaults to None.
         file_client_args (dict, optional): Arguments to instantiate the
             corresponding backend in mmdet <= 3.0.0rc6. Defaults to None.
         backend_args (dict, optional): Arguments to instantiate the
@@ -542,8 +682,29 @@ class KAISTMissrateMetric(BaseMetric):
             will be used instead. Defaults to None.
         sort_categories (bool): Whether sort categories in annotations. Only
             used for `Objects365V1Dataset`. Defaults to False.
+        subsets (dict, optional): Image subsets to report the miss rate on,
+            mapping the result name to a rule on the image info of the ground
+            truth annotation file, see :func:`_in_subset`. The per-image
+            matching is computed once and shared by all subsets. Defaults to
+            None, which uses ``default_subsets``, i.e. all, day (set06-set08)
+            and night (set09-set11) images.
+        height_range (Sequence[float]): Ground truths out of this height
+            range are ignored. Defaults to (55, 1e10), i.e. the
+            ``Reasonable`` setup.
+        occ_range (Sequence[int]): Occlusion levels that are not ignored.
+            Defaults to (0, 1).
+        bnd_range (Sequence[float]): Ground truths crossing this
+            ``(x1, y1, x2, y2)`` border are ignored.
+            Defaults to (5, 5, 635, 507).
     """
     default_prefix: Optional[str] = 'coco'
+    # whether the ground truths lack the height and occlusion fields, whose
+    # height is then taken from the box and occlusion level set to 0
+    use_bbox_height: bool = False
+    default_subsets: dict = OrderedDict(
+        all=None,
+        day=dict(key=_IMG_NAME_KEYS, pattern=r'set0[6-8][/_]'),
+        night=dict(key=_IMG_NAME_KEYS, pattern=r'set(09|1[01])[/_]'))
 
     def __init__(self,
                  ann_file: Optional[str] = None,
@@ -558,7 +719,11 @@ class KAISTMissrateMetric(BaseMetric):
                  backend_args: dict = None,
                  collect_device: str = 'cpu',
                  prefix: Optional[str] = None,
-                 sort_categories: bool = False) -> None:
+                 sort_categories: bool = False,
+                 subsets: Optional[dict] = None,
+                 height_range: Sequence[float] = (55, 1e5**2),
+                 occ_range: Sequence[int] = (0, 1),
+                 bnd_range: Sequence[float] = (5, 5, 635, 507)) -> None:
         super().__init__(collect_device=collect_device, prefix=prefix)
         # coco evaluation metrics
         self.metrics = metric if isinstance(metric, list) else [metric]
@@ -617,502 +782,85 @@ class KAISTMissrateMetric(BaseMetric):
         else:
             self._coco_api = None
 
+        self.subsets = OrderedDict(
+            self.default_subsets if subsets is None else subsets)
+
+        # with an annotation file the ground truths are known on every rank,
+        # so images are matched in `process` and only compact per-image
+        # records are gathered for the global accumulation
+        self.match_on_rank = ann_file is not None
+        # predictions are still gathered to be dumped or to compute recall
+        self.gather_preds = not self.match_on_rank or \
+            outfile_prefix is not None or 'proposal_fast' in self.metrics
+        self.ann_file = ann_file
+        self.missrate_setup = dict(
+            height_range=tuple(height_range),
+            occ_range=tuple(occ_range),
+            bnd_range=tuple(bnd_range))
+        self._missrate_eval = None
+
         # handle dataset lazy init
         self.cat_ids = None
         self.img_ids = None
 
-    def fast_eval_recall(self,
-                         results: List[dict],
-                         proposal_nums: Sequence[int],
-                         iou_thrs: Sequence[float],
-                         logger: Optional[MMLogger] = None) -> np.ndarray:
-        """Evaluate proposal recall with COCO's fast_eval_recall.
-
-        Args:
-            results (List[dict]): Results of the dataset.
-            proposal_nums (Sequence[int]): Proposal numbers used for
-                evaluation.
-            iou_thrs (Sequence[float]): IoU thresholds used for evaluation.
-            logger (MMLogger, optional): Logger used for logging the recall
-                summary.
-        Returns:
-            np.ndarray: Averaged recall results.
-        """
-        gt_bboxes = []
-        pred_bboxes = [result['bboxes'] for result in results]
-        for i in range(len(self.img_ids)):
-            ann_ids = self._coco_api.get_ann_ids(img_ids=self.img_ids[i])
-            ann_info = self._coco_api.load_anns(ann_ids)
-            if len(ann_info) == 0:
-                gt_bboxes.append(np.zeros((0, 4)))
-                continue
-            bboxes = []
-            for ann in ann_info:
-                if ann.get('ignore', False) or ann['iscrowd']:
-                    continue
-                x1, y1, w, h = ann['bbox']
-                bboxes.append([x1, y1, x1 + w, y1 + h])
-            bboxes = np.array(bboxes, dtype=np.float32)
-            if bboxes.shape[0] == 0:
-                bboxes = np.zeros((0, 4))
-            gt_bboxes.append(bboxes)
-
-        recalls = eval_recalls(
-            gt_bboxes, pred_bboxes, proposal_nums, iou_thrs, logger=logger)
-        ar = recalls.mean(axis=1)
-        return ar
-
-    def xyxy2xywh(self, bbox: np.ndarray) -> list:
-        """Convert ``xyxy`` style bounding boxes to ``xywh`` style for COCO
-        evaluation.
-
-        Args:
-            bbox (numpy.ndarray): The bounding boxes, shape (4, ), in
-                ``xyxy`` order.
-
-        Returns:
-            list[float]: The converted bounding boxes, in ``xywh`` order.
-        """
-
-        _bbox: List = bbox.tolist()
-        return [
-            _bbox[0],
-            _bbox[1],
-            _bbox[2] - _bbox[0],
-            _bbox[3] - _bbox[1],
-        ]
-
-    def results2json(self, results: Sequence[dict],
-                     outfile_prefix: str) -> dict:
-        """Dump the detection results to a COCO style json file.
-
-        There are 3 types of results: proposals, bbox predictions, mask
-        predictions, and they have different data types. This method will
-        automatically recognize the type, and dump them to json files.
-
-        Args:
-            results (Sequence[dict]): Testing results of the
-                dataset.
-            outfile_prefix (str): The filename prefix of the json files. If the
-                prefix is "somepath/xxx", the json files will be named
-                "somepath/xxx.bbox.json", "somepath/xxx.segm.json",
-                "somepath/xxx.proposal.json".
-
-        Returns:
-            dict: Possible keys are "bbox", "segm", "proposal", and
-            values are corresponding filenames.
-        """
-        bbox_json_results = []
-        segm_json_results = [] if 'masks' in results[0] else None
-        for idx, result in enumerate(results):
-            image_id = result.get('img_id', idx)
-            labels = result['labels']
-            bboxes = result['bboxes']
-            scores = result['scores']
-            # bbox results
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(scores[i])
-                data['category_id'] = self.cat_ids[label]
-                bbox_json_results.append(data)
-
-            if segm_json_results is None:
-                continue
-
-            # segm results
-            masks = result['masks']
-            mask_scores = result.get('mask_scores', scores)
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(mask_scores[i])
-                data['category_id'] = self.cat_ids[label]
-                if isinstance(masks[i]['counts'], bytes):
-                    masks[i]['counts'] = masks[i]['counts'].decode()
-                data['segmentation'] = masks[i]
-                segm_json_results.append(data)
-
-        result_files = dict()
-        result_files['bbox'] = f'{outfile_prefix}.bbox.json'
-        result_files['proposal'] = f'{outfile_prefix}.bbox.json'
-        dump(bbox_json_results, result_files['bbox'])
-
-        if segm_json_results is not None:
-            result_files['segm'] = f'{outfile_prefix}.segm.json'
-            dump(segm_json_results, result_files['segm'])
-
-        return result_files
-
-    def gt_to_coco_json(self, gt_dicts: Sequence[dict],
-                        outfile_prefix: str) -> str:
-        """Convert ground truth to coco format json file.
-
-        Args:
-            gt_dicts (Sequence[dict]): Ground truth of the dataset.
-            outfile_prefix (str): The filename prefix of the json files. If the
-                prefix is "somepath/xxx", the json file will be named
-                "somepath/xxx.gt.json".
-        Returns:
-            str: The filename of the json file.
-        """
-        categories = [
-            dict(id=id, name=name)
-            for id, name in enumerate(self.dataset_meta['classes'])
-        ]
-        image_infos = []
-        annotations = []
-
-        for idx, gt_dict in enumerate(gt_dicts):
-            img_id = gt_dict.get('img_id', idx)
-            image_info = dict(
-                id=img_id,
-                width=gt_dict['width'],
-                height=gt_dict['height'],
-                file_name='')
-            image_infos.append(image_info)
-            for ann in gt_dict['anns']:
-                label = ann['bbox_label']
-                bbox = ann['bbox']
-                coco_bbox = [
-                    bbox[0],
-                    bbox[1],
-                    bbox[2] - bbox[0],
-                    bbox[3] - bbox[1],
-                ]
-
-                annotation = dict(
-                    id=len(annotations) +
-                    1,  # coco api requires id starts with 1
-                    image_id=img_id,
-                    bbox=coco_bbox,
-                    iscrowd=ann.get('ignore_flag', 0),
-                    category_id=int(label),
-                    area=coco_bbox[2] * coco_bbox[3])
-                if ann.get('mask', None):
-                    mask = ann['mask']
-                    # area = mask_util.area(mask)
-                    if isinstance(mask, dict) and isinstance(
-                            mask['counts'], bytes):
-                        mask['counts'] = mask['counts'].decode()
-                    annotation['segmentation'] = mask
-                    # annotation['area'] = float(area)
-                annotations.append(annotation)
-
-        info = dict(
-            date_created=str(datetime.datetime.now()),
-            description='Coco json file converted by mmdet CocoMetric.')
-        coco_json = dict(
-            info=info,
-            images=image_infos,
-            categories=categories,
-            licenses=None,
-        )
-        if len(annotations) > 0:
-            coco_json['annotations'] = annotations
-        converted_json_path = f'{outfile_prefix}.gt.json'
-        dump(coco_json, converted_json_path)
-        return converted_json_path
-
-    # TODO: data_batch is no longer needed, consider adjusting the
-    #  parameter position
-    def process(self, data_batch: dict, data_samples: Sequence[dict]) -> None:
-        """Process one batch of data samples and predictions. The processed
-        results should be stored in ``self.results``, which will be used to
-        compute the metrics when all batches have been processed.
-
-        Args:
-            data_batch (dict): A batch of data from the dataloader.
-            data_samples (Sequence[dict]): A batch of data samples that
-                contain annotations and predictions.
-        """
-        for data_sample in data_samples:
-            result = dict()
-            pred = data_sample['pred_instances']
-            result['img_id'] = data_sample['img_id']
-            result['bboxes'] = pred['bboxes'].cpu().numpy()
-            result['scores'] = pred['scores'].cpu().numpy()
-            result['labels'] = pred['labels'].cpu().numpy()
-            # encode mask to RLE
-            if 'masks' in pred:
-                result['masks'] = encode_mask_results(
-                    pred['masks'].detach().cpu().numpy()) if isinstance(
-                        pred['masks'], torch.Tensor) else pred['masks']
-            # some detectors use different scores for bbox and mask
-            if 'mask_scores' in pred:
-                result['mask_scores'] = pred['mask_scores'].cpu().numpy()
-
-            # parse gt
-            gt = dict()
-            gt['width'] = data_sample['ori_shape'][1]
-            gt['height'] = data_sample['ori_shape'][0]
-            gt['img_id'] = data_sample['img_id']
-            if self._coco_api is None:
-                # TODO: Need to refactor to support LoadAnnotations
-                assert 'instances' in data_sample, \
-                    'ground truth is required for evaluation when ' \
-                    '`ann_file` is not provided'
-                gt['anns'] = data_sample['instances']
-            # add converted result to the results list
-            self.results.append((gt, result))
-
-    def compute_metrics(self, results: list) -> Dict[str, float]:
-        """Compute the metrics from processed results.
+    def get_missrate_eval(self) -> MissrateEval:
+        """Get the miss-rate evaluator with the prepared ground truth index.
 
-        Args:
-            results (list): The processed results of each batch.
+        The ground truths are indexed on the first call. With an annotation
+        file, the evaluator is cached per annotation file, category and
+        setup, so the index is shared by the metrics of the same dataset and
+        built once per run instead of once per evaluation.
 
         Returns:
-            Dict[str, float]: The computed metrics. The keys are the names of
-            the metrics, and the values are corresponding results.
+            MissrateEval: The evaluator.
         """
-        logger: MMLogger = MMLogger.get_current_instance()
-
-        # split gt and prediction list
-        gts, preds = zip(*results)
-
-        tmp_dir = None
-        if self.outfile_prefix is None:
-            tmp_dir = tempfile.TemporaryDirectory()
-            outfile_prefix = osp.join(tmp_dir.name, 'results')
-        else:
-            outfile_prefix = self.outfile_prefix
-
-        if self._coco_api is None:
-            # use converted gt json file to initialize coco api
-            logger.info('Converting ground truth to coco format...')
-            coco_json_path = self.gt_to_coco_json(
-                gt_dicts=gts, outfile_prefix=outfile_prefix)
-            self._coco_api = COCO(coco_json_path)
-
+        if self._missrate_eval is not None:
+            return self._missrate_eval
         # handle lazy init
         if self.cat_ids is None:
             self.cat_ids = self._coco_api.get_cat_ids(
                 cat_names=self.dataset_meta['classes'])
         if self.img_ids is None:
             self.img_ids = self._coco_api.get_img_ids()
+        # pedestrians are the first class, i.e. category 1 of KAIST
+        cat_id = self.cat_ids[0]
+        cache_key = (self.ann_file, cat_id, self.use_bbox_height,
+                     *self.missrate_setup.values())
+        if self.ann_file is not None and cache_key in _MISSRATE_EVAL_CACHE:
+            self._missrate_eval = _MISSRATE_EVAL_CACHE[cache_key]
+            return self._missrate_eval
+
+        img_ids = sorted(self.img_ids)
+        missrate_eval = MissrateEval(**self.missrate_setup)
+        missrate_eval.prepare_gts(
+            img_ids,
+            *_coco_to_missrate_gts(
+                self._coco_api,
+                img_ids,
+                cat_id,
+                bbox_height=self.use_bbox_height))
+        if self.ann_file is not None:
+            _MISSRATE_EVAL_CACHE[cache_key] = missrate_eval
+        self._missrate_eval = missrate_eval
+        return missrate_eval
+
+    def get_subset_img_ids(self, img_ids: Sequence[int]) -> OrderedDict:
+        """Split the evaluated images into the configured subsets.
 
-        # convert predictions to coco format and dump to json file
-        result_files = self.results2json(preds, outfile_prefix)
-
-        eval_results = OrderedDict()
-        if self.format_only:
-            logger.info('results are saved in '
-                        f'{osp.dirname(outfile_prefix)}')
-            return eval_results
-
-        for metric in self.metrics:
-            logger.info(f'Evaluating {metric}...')
-
-            # TODO: May refactor fast_eval_recall to an independent metric?
-            # fast eval recall
-            if metric == 'proposal_fast':
-                ar = self.fast_eval_recall(
-                    preds, self.proposal_nums, self.iou_thrs, logger=logger)
-                log_msg = []
-                for i, num in enumerate(self.proposal_nums):
-                    eval_results[f'AR@{num}'] = ar[i]
-                    log_msg.append(f'\nAR@{num}\t{ar[i]:.4f}')
-                log_msg = ''.join(log_msg)
-                logger.info(log_msg)
-                continue
-
-            # evaluate proposal, bbox and segm
-            iou_type = 'bbox' if metric == 'proposal' else metric
-            if metric not in result_files:
-                raise KeyError(f'{metric} is not in results')
-            try:
-                predictions = load(result_files[metric])
-                if iou_type == 'segm':
-                    # Refer to https://github.com/cocodataset/cocoapi/blob/master/PythonAPI/pycocotools/coco.py#L331  # noqa
-                    # When evaluating mask AP, if the results contain bbox,
-                    # cocoapi will use the box area instead of the mask area
-                    # for calculating the instance area. Though the overall AP
-                    # is not affected, this leads to different
-                    # small/medium/large mask AP results.
-                    for x in predictions:
-                        x.pop('bbox')
-                coco_dt = self._coco_api.loadRes(predictions)
-
-            except IndexError:
-                logger.error(
-                    'The testing results of the whole dataset is empty.')
-                break
-
-            kaistEval = KAISTPedEval(self._coco_api, coco_dt, iou_type)
-
-            kaistEval.params.catIds = [1]
-
-            eval_result = {
-                'all': copy.deepcopy(kaistEval),
-                'day': copy.deepcopy(kaistEval),
-                'night': copy.deepcopy(kaistEval),
-            }
-            imgIds = sorted(self.img_ids)  # imgIds
-            eval_result['all'].params.imgIds = imgIds
-            eval_result['all'].evaluate(0)
-            eval_result['all'].accumulate()
-            MR_all = eval_result['all'].summarize(0)
-
-            eval_result['day'].params.imgIds = imgIds[:1455]
-            eval_result['day'].evaluate(0)
-            eval_result['day'].accumulate()
-            MR_day = eval_result['day'].summarize(0)
-
-            eval_result['night'].params.imgIds = imgIds[1455:]
-            eval_result['night'].evaluate(0)
-            eval_result['night'].accumulate()
-            MR_night = eval_result['night'].summarize(0)
-
-            recall_all = 1 - eval_result['all'].eval['yy'][0][-1]
-            recall_day = 1 - eval_result['day'].eval['yy'][0][-1]
-            recall_night = 1 - eval_result['night'].eval['yy'][0][-1]
-
-            eval_results['all'] = MR_all
-            eval_results['day'] = MR_day
-            eval_results['night'] = MR_night
-            eval_results['recall_all'] = recall_all
-            eval_results['recall_day'] = recall_day
-            eval_results['recall_night'] = recall_night
-
-            msg = f'miss_rate: ' \
-                + f' MR_all: {MR_all * 100:.3f} ' \
-                + f' MR_day: {MR_day * 100:.3f} ' \
-                + f' MR_night: {MR_night * 100:.3f} ' \
-                + f' recall_all: {recall_all * 100:.3f} ' \
-                + f' recall_day: {recall_day * 100:.3f} ' \
-                + f' recall_night: {recall_night * 100:.3f} ' \
-                + '\n'
-            logger.info(msg)
-
-        if tmp_dir is not None:
-            tmp_dir.cleanup()
-        return eval_results
-
-@METRICS.register_module()
-class GlareKAISTMissrateMetric(BaseMetric):
-    """Missrate evaluation metric.
-
-    Evaluate AR, AP, and mAP for detection tasks including proposal/box
-    detection and instance segmentation. Please refer to
-    https://cocodataset.org/#detection-eval for more details.
-
-    Args:
-        ann_file (str, optional): Path to the coco format annotation file.
-            If not specified, ground truth annotations from the dataset will
-            be converted to coco format. Defaults to None.
-        metric (str | List[str]): Metrics to be evaluated. Valid metrics
-            include 'bbox', 'segm', 'proposal', and 'proposal_fast'.
-            Defaults to 'bbox'.
-        classwise (bool): Whether to evaluate the metric class-wise.
-            Defaults to False.
-        proposal_nums (Sequence[int]): Numbers of proposals to be evaluated.
-            Defaults to (100, 300, 1000).
-        iou_thrs (float | List[float], optional): IoU threshold to compute AP
-            and AR. If not specified, IoUs from 0.5 to 0.95 will be used.
-            Defaults to None.
-        metric_items (List[str], optional): Metric result names to be
-            recorded in the evaluation result. Defaults to None.
-        format_only (bool): Format the output results without perform
-            evaluation. It is useful when you want to format the result
-            to a specific format and submit it to the test server.
-            Defaults to False.
-        outfile_prefix (str, optional): The prefix of json files. It includes
-            the file path and the prefix of filename, e.g., "a/b/prefix".
-            If not specified, a temp file will be created. Defaults to None.
-        file_client_args (dict, optional): Arguments to instantiate the
-            corresponding backend in mmdet <= 3.0.0rc6. Defaults to None.
-        backend_args (dict, optional): Arguments to instantiate the
-            corresponding backend. Defaults to None.
-        collect_device (str): Device name used for collecting results from
-            different ranks during distributed training. Must be 'cpu' or
-            'gpu'. Defaults to 'cpu'.
-        prefix (str, optional): The prefix that will be added in the metric
-            names to disambiguate homonymous metrics of different evaluators.
-            If prefix is not provided in the argument, self.default_prefix
-            will be used instead. Defaults to None.
-        sort_categories (bool): Whether sort categories in annotations. Only
-            used for `Objects365V1Dataset`. Defaults to False.
-    """
-    default_prefix: Optional[str] = 'Glare'
-
-    def __init__(self,
-                 ann_file: Optional[str] = None,
-                 metric: Union[str, List[str]] = 'bbox',
-                 classwise: bool = False,
-                 proposal_nums: Sequence[int] = (100, 300, 1000),
-                 iou_thrs: Optional[Union[float, Sequence[float]]] = None,
-                 metric_items: Optional[Sequence[str]] = None,
-                 format_only: bool = False,
-                 outfile_prefix: Optional[str] = None,
-                 file_client_args: dict = None,
-                 backend_args: dict = None,
-                 collect_device: str = 'cpu',
-                 prefix: Optional[str] = None,
-                 sort_categories: bool = False) -> None:
-        super().__init__(collect_device=collect_device, prefix=prefix)
-        # coco evaluation metrics
-        self.metrics = metric if isinstance(metric, list) else [metric]
-        allowed_metrics = ['bbox', 'segm', 'proposal', 'proposal_fast']
-        for metric in self.metrics:
-            if metric not in allowed_metrics:
-                raise KeyError(
-                    "metric should be one of 'bbox', 'segm', 'proposal', "
-                    f"'proposal_fast', but got {metric}.")
-
-        # do class wise evaluation, default False
-        self.classwise = classwise
-
-        # proposal_nums used to compute recall or precision.
-        self.proposal_nums = list(proposal_nums)
-
-        # iou_thrs used to compute recall or precision.
-        if iou_thrs is None:
-            iou_thrs = np.linspace(
-                .5, 0.95, int(np.round((0.95 - .5) / .05)) + 1, endpoint=True)
-        self.iou_thrs = iou_thrs
-        self.metric_items = metric_items
-        self.format_only = format_only
-        if self.format_only:
-            assert outfile_prefix is not None, 'outfile_prefix must be not'
-            'None when format_only is True, otherwise the result files will'
-            'be saved to a temp directory which will be cleaned up at the end.'
-
-        self.outfile_prefix = outfile_prefix
-
-        self.backend_args = backend_args
-        if file_client_args is not None:
-            raise RuntimeError(
-                'The `file_client_args` is deprecated, '
-                'please use `backend_args` instead, please refer to'
-                'https://github.com/open-mmlab/mmdetection/blob/main/configs/_base_/datasets/coco_detection.py'  # noqa: E501
-            )
-
-        # if ann_file is not specified,
-        # initialize coco api with the converted dataset
-        if ann_file is not None:
-            with get_local_path(
-                    ann_file, backend_args=self.backend_args) as local_path:
-                self._coco_api = COCO(local_path)
-                if sort_categories:
-                    # 'categories' list in objects365_train.json and
-                    # objects365_val.json is inconsistent, need sort
-                    # list(or dict) before get cat_ids.
-                    cats = self._coco_api.cats
-                    sorted_cats = {i: cats[i] for i in sorted(cats)}
-                    self._coco_api.cats = sorted_cats
-                    categories = self._coco_api.dataset['categories']
-                    sorted_categories = sorted(
-                        categories, key=lambda i: i['id'])
-                    self._coco_api.dataset['categories'] = sorted_categories
-        else:
-            self._coco_api = None
+        Args:
+            img_ids (Sequence[int]): Ids of the evaluated images.
 
-        # handle dataset lazy init
-        self.cat_ids = None
-        self.img_ids = None
+        Returns:
+            OrderedDict: Mapping from subset name to its image ids, in the
+            order of ``img_ids``.
+        """
+        subset_img_ids = OrderedDict()
+        for name, rule in self.subsets.items():
+            subset_img_ids[name] = [
+                img_id for img_id in img_ids
+                if _in_subset(self._coco_api.imgs[img_id], rule)
+            ]
+        return subset_img_ids
 
     def fast_eval_recall(self,
                          results: List[dict],
@@ -1184,8 +932,8 @@ class GlareKAISTMissrateMetric(BaseMetric):
         automatically recognize the type, and dump them to json files.
 
         Args:
-            results (Sequence[dict]): Testing results of the
-                dataset.
+            results (Sequence[dict] | :obj:`DetResultBuffer`): Testing
+                results of the dataset.
             outfile_prefix (str): The filename prefix of the json files. If the
                 prefix is "somepath/xxx", the json files will be named
                 "somepath/xxx.bbox.json", "somepath/xxx.segm.json",
@@ -1195,38 +943,9 @@ class GlareKAISTMissrateMetric(BaseMetric):
             dict: Possible keys are "bbox", "segm", "proposal", and
             values are corresponding filenames.
         """
-        bbox_json_results = []
-        segm_json_results = [] if 'masks' in results[0] else None
-        for idx, result in enumerate(results):
-            image_id = result.get('img_id', idx)
-            labels = result['labels']
-            bboxes = result['bboxes']
-            scores = result['scores']
-            # bbox results
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(scores[i])
-                data['category_id'] = self.cat_ids[label]
-                bbox_json_results.append(data)
-
-            if segm_json_results is None:
-                continue
-
-            # segm results
-            masks = result['masks']
-            mask_scores = result.get('mask_scores', scores)
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(mask_scores[i])
-                data['category_id'] = self.cat_ids[label]
-                if isinstance(masks[i]['counts'], bytes):
-                    masks[i]['counts'] = masks[i]['counts'].decode()
-                data['segmentation'] = masks[i]
-                segm_json_results.append(data)
+        results = DetResultBuffer.from_results(results)
+        bbox_json_results, segm_json_results = results.to_coco_dicts(
+            self.cat_ids)
 
         result_files = dict()
         result_files['bbox'] = f'{outfile_prefix}.bbox.json'
@@ -1239,17 +958,14 @@ class GlareKAISTMissrateMetric(BaseMetric):
 
         return result_files
 
-    def gt_to_coco_json(self, gt_dicts: Sequence[dict],
-                        outfile_prefix: str) -> str:
-        """Convert ground truth to coco format json file.
+    def gt_to_coco_dict(self, gt_dicts: Sequence[dict]) -> dict:
+        """Convert ground truth to a coco format dict.
 
         Args:
             gt_dicts (Sequence[dict]): Ground truth of the dataset.
-            outfile_prefix (str): The filename prefix of the json files. If the
-                prefix is "somepath/xxx", the json file will be named
-                "somepath/xxx.gt.json".
+
         Returns:
-            str: The filename of the json file.
+            dict: The coco format annotations.
         """
         categories = [
             dict(id=id, name=name)
@@ -1305,8 +1021,22 @@ class GlareKAISTMissrateMetric(BaseMetric):
         )
         if len(annotations) > 0:
             coco_json['annotations'] = annotations
+        return coco_json
+
+    def gt_to_coco_json(self, gt_dicts: Sequence[dict],
+                        outfile_prefix: str) -> str:
+        """Convert ground truth to coco format json file.
+
+        Args:
+            gt_dicts (Sequence[dict]): Ground truth of the dataset.
+            outfile_prefix (str): The filename prefix of the json files. If the
+                prefix is "somepath/xxx", the json file will be named
+                "somepath/xxx.gt.json".
+        Returns:
+            str: The filename of the json file.
+        """
         converted_json_path = f'{outfile_prefix}.gt.json'
-        dump(coco_json, converted_json_path)
+        dump(self.gt_to_coco_dict(gt_dicts), converted_json_path)
         return converted_json_path
 
     # TODO: data_batch is no longer needed, consider adjusting the
@@ -1321,39 +1051,57 @@ class GlareKAISTMissrateMetric(BaseMetric):
             data_samples (Sequence[dict]): A batch of data samples that
                 contain annotations and predictions.
         """
+        # the results of the rank are appended to one columnar buffer
+        if not self.results:
+            self.results.append(DetResultBuffer())
+        buffer = self.results[0]
         for data_sample in data_samples:
-            result = dict()
             pred = data_sample['pred_instances']
-            result['img_id'] = data_sample['img_id']
-            result['bboxes'] = pred['bboxes'].cpu().numpy()
-            result['scores'] = pred['scores'].cpu().numpy()
-            result['labels'] = pred['labels'].cpu().numpy()
+            dets = dict(
+                bboxes=pred['bboxes'].cpu().numpy(),
+                scores=pred['scores'].cpu().numpy(),
+                labels=pred['labels'].cpu().numpy())
+            # some detectors use different scores for bbox and mask
+            if 'mask_scores' in pred:
+                dets['mask_scores'] = pred['mask_scores'].cpu().numpy()
+            img_id = data_sample['img_id']
+            img_fields = dict(
+                img_id=img_id,
+                width=data_sample['ori_shape'][1],
+                height=data_sample['ori_shape'][0])
             # encode mask to RLE
             if 'masks' in pred:
-                result['masks'] = encode_mask_results(
+                img_fields['masks'] = encode_mask_results(
                     pred['masks'].detach().cpu().numpy()) if isinstance(
                         pred['masks'], torch.Tensor) else pred['masks']
-            # some detectors use different scores for bbox and mask
-            if 'mask_scores' in pred:
-                result['mask_scores'] = pred['mask_scores'].cpu().numpy()
+            if self.match_on_rank:
+                # IoU and matching run on the rank of the predictions
+                missrate_eval = self.get_missrate_eval()
+                img_dts = _results_to_missrate_dts(
+                    [dict(img_id=img_id, **dets)], self.cat_ids,
+                    self.cat_ids[0])
+                img_fields['missrate_record'] = missrate_eval.evaluate_img(
+                    img_id, *img_dts[img_id])
+                if not self.gather_preds:
+                    # only the compact record is gathered across ranks
+                    dets = dict()
+                    img_fields.pop('masks', None)
 
             # parse gt
-            gt = dict()
-            gt['width'] = data_sample['ori_shape'][1]
-            gt['height'] = data_sample['ori_shape'][0]
-            gt['img_id'] = data_sample['img_id']
             if self._coco_api is None:
                 # TODO: Need to refactor to support LoadAnnotations
                 assert 'instances' in data_sample, \
                     'ground truth is required for evaluation when ' \
                     '`ann_file` is not provided'
-                gt['anns'] = data_sample['instances']
-            # add converted result to the results list
-            self.results.append((gt, result))
+                img_fields['anns'] = data_sample['instances']
+            buffer.append(dets, **img_fields)
 
     def compute_metrics(self, results: list) -> Dict[str, float]:
         """Compute the metrics from processed results.
 
+        The miss rate is computed in memory from the collected arrays. Json
+        files are only written when ``outfile_prefix`` is set.
+
         Args:
             results (list): The processed results of each batch.
 
@@ -1363,22 +1111,20 @@ class GlareKAISTMissrateMetric(BaseMetric):
         """
         logger: MMLogger = MMLogger.get_current_instance()
 
-        # split gt and prediction list
-        gts, preds = zip(*results)
-
-        tmp_dir = None
-        if self.outfile_prefix is None:
-            tmp_dir = tempfile.TemporaryDirectory()
-            outfile_prefix = osp.join(tmp_dir.name, 'results')
-        else:
-            outfile_prefix = self.outfile_prefix
+        # the buffers gathered from the ranks hold both the gt and the
+        # predictions of every image
+        gts = preds = DetResultBuffer.from_results(results)
+        outfile_prefix = self.outfile_prefix
 
         if self._coco_api is None:
-            # use converted gt json file to initialize coco api
+            # build the coco api from the converted gt without a json file
             logger.info('Converting ground truth to coco format...')
-            coco_json_path = self.gt_to_coco_json(
-                gt_dicts=gts, outfile_prefix=outfile_prefix)
-            self._coco_api = COCO(coco_json_path)
+            coco_json = self.gt_to_coco_dict(gt_dicts=gts)
+            if outfile_prefix is not None:
+                dump(coco_json, f'{outfile_prefix}.gt.json')
+            self._coco_api = COCO()
+            self._coco_api.dataset = coco_json
+            self._coco_api.createIndex()
 
         # handle lazy init
         if self.cat_ids is None:
@@ -1387,8 +1133,9 @@ class GlareKAISTMissrateMetric(BaseMetric):
         if self.img_ids is None:
             self.img_ids = self._coco_api.get_img_ids()
 
-        # convert predictions to coco format and dump to json file
-        result_files = self.results2json(preds, outfile_prefix)
+        if outfile_prefix is not None:
+            # convert predictions to coco format and dump to json file
+            self.results2json(preds, outfile_prefix)
 
         eval_results = OrderedDict()
         if self.format_only:
@@ -1412,112 +1159,74 @@ class GlareKAISTMissrateMetric(BaseMetric):
                 logger.info(log_msg)
                 continue
 
-            # evaluate proposal, bbox and segm
-            iou_type = 'bbox' if metric == 'proposal' else metric
-            if metric not in result_files:
-                raise KeyError(f'{metric} is not in results')
-            try:
-                predictions = load(result_files[metric])
-                if iou_type == 'segm':
-                    # Refer to https://github.com/cocodataset/cocoapi/blob/master/PythonAPI/pycocotools/coco.py#L331  # noqa
-                    # When evaluating mask AP, if the results contain bbox,
-                    # cocoapi will use the box area instead of the mask area
-                    # for calculating the instance area. Though the overall AP
-                    # is not affected, this leads to different
-                    # small/medium/large mask AP results.
-                    for x in predictions:
-                        x.pop('bbox')
-                coco_dt = self._coco_api.loadRes(predictions)
-
-            except IndexError:
+            if metric == 'segm':
+                logger.warning('The miss rate is only defined on boxes, '
+                               'skip segm.')
+                continue
+            # evaluate proposal and bbox
+            imgIds = sorted(self.img_ids)  # imgIds
+            missrate_eval = self.get_missrate_eval()
+            if self.match_on_rank:
+                # images were matched by the ranks in `process`, only the
+                # records are accumulated here
+                records = dict(
+                    zip(preds.get_img_ids(),
+                        preds.get_field('missrate_record')))
+            else:
+                img_dts = _results_to_missrate_dts(preds, self.cat_ids,
+                                                   self.cat_ids[0])
+                empty_dts = (np.zeros((0, 4)), np.zeros((0, )))
+                # IoU and matching are computed once and every subset is
+                # accumulated from the compact per-image records
+                records = {
+                    img_id: missrate_eval.evaluate_img(
+                        img_id, *img_dts.get(img_id, empty_dts))
+                    for img_id in imgIds
+                }
+            if all(record is None for record in records.values()):
                 logger.error(
                     'The testing results of the whole dataset is empty.')
                 break
 
-            kaistEval = KAISTPedEval(self._coco_api, coco_dt, iou_type)
-
-            kaistEval.params.catIds = [1]
-
-            eval_result = {
-                'all': copy.deepcopy(kaistEval),
-                'day': copy.deepcopy(kaistEval),
-                'night': copy.deepcopy(kaistEval),
-            }
-            imgIds = sorted(self.img_ids)  # imgIds
-            # for normal scenario
-            eval_result['all'].params.imgIds = imgIds[:2252]
-            eval_result['all'].evaluate(0)
-            eval_result['all'].accumulate()
-            MR_all = eval_result['all'].summarize(0)
-
-            eval_result['day'].params.imgIds = imgIds[:1455]
-            eval_result['day'].evaluate(0)
-            eval_result['day'].accumulate()
-            MR_day = eval_result['day'].summarize(0)
-
-            eval_result['night'].params.imgIds = imgIds[1455:2252]
-            eval_result['night'].evaluate(0)
-            eval_result['night'].accumulate()
-            MR_night = eval_result['night'].summarize(0)
-
-            recall_all = 1 - eval_result['all'].eval['yy'][0][-1]
-            recall_day = 1 - eval_result['day'].eval['yy'][0][-1]
-            recall_night = 1 - eval_result['night'].eval['yy'][0][-1]
-
-            eval_results['normal_all'] = MR_all
-            eval_results['normal_day'] = MR_day
-            eval_results['normal_night'] = MR_night
-            eval_results['normal_recall_all'] = recall_all
-            eval_results['normal_recall_day'] = recall_day
-            eval_results['normal_recall_night'] = recall_night
-
-            msg = f'normal_miss_rate: ' \
-                + f' normal_MR_all: {MR_all * 100:.3f} ' \
-                + f' normal_MR_day: {MR_day * 100:.3f} ' \
-                + f' normal_MR_night: {MR_night * 100:.3f} ' \
-                + f' normal_recall_all: {recall_all * 100:.3f} ' \
-                + f' normal_recall_day: {recall_day * 100:.3f} ' \
-                + f' normal_recall_night: {recall_night * 100:.3f} ' \
-                + '\n'
-            logger.info(msg)
-
-            # for glare scenario 
-            eval_result['all'].params.imgIds = imgIds[2252:4504]
-            eval_result['all'].evaluate(0)
-            eval_result['all'].accumulate()
-            MR_all = eval_result['all'].summarize(0)
-
-            eval_result['day'].params.imgIds = imgIds[2252:3707]
-            eval_result['day'].evaluate(0)
-            eval_result['day'].accumulate()
-            MR_day = eval_result['day'].summarize(0)
-
-            eval_result['night'].params.imgIds = imgIds[3707:4504]
-            eval_result['night'].evaluate(0)
-            eval_result['night'].accumulate()
-            MR_night = eval_result['night'].summarize(0)
-
-            recall_all = 1 - eval_result['all'].eval['yy'][0][-1]
-            recall_day = 1 - eval_result['day'].eval['yy'][0][-1]
-            recall_night = 1 - eval_result['night'].eval['yy'][0][-1]
-
-            eval_results['glare_all'] = MR_all
-            eval_results['glare_day'] = MR_day
-            eval_results['glare_night'] = MR_night
-            eval_results['glare_recall_all'] = recall_all
-            eval_results['glare_recall_day'] = recall_day
-            eval_results['glare_recall_night'] = recall_night
-
-            msg = f'glare_miss_rate: ' \
-                + f' glare_MR_all: {MR_all * 100:.3f} ' \
-                + f' glare_MR_day: {MR_day * 100:.3f} ' \
-                + f' glare_MR_night: {MR_night * 100:.3f} ' \
-                + f' glare_recall_all: {recall_all * 100:.3f} ' \
-                + f' glare_recall_day: {recall_day * 100:.3f} ' \
-                + f' glare_recall_night: {recall_night * 100:.3f} ' \
-                + '\n'
+            mr_msg, recall_msg = [], []
+            for name, subset_ids in self.get_subset_img_ids(imgIds).items():
+                if len(subset_ids) == 0:
+                    logger.warning(f'No image belongs to subset {name}, '
+                                   'skip it.')
+                    continue
+                subset_eval = missrate_eval.accumulate(
+                    [records.get(img_id) for img_id in subset_ids],
+                    len(subset_ids))
+                miss_rate = missrate_eval.summarize(subset_eval)
+                recall = 1 - subset_eval['yy'][0][-1]
+                recall_key = _subset_recall_key(name)
+                eval_results[name] = miss_rate
+                eval_results[recall_key] = recall
+                mr_msg.append(f' MR_{name}: {miss_rate * 100:.3f} ')
+                recall_msg.append(f' {recall_key}: {recall * 100:.3f} ')
+
+            msg = 'miss_rate: ' + ''.join(mr_msg) + ''.join(recall_msg) + '\n'
             logger.info(msg)
 
-        if tmp_dir is not None:
-            tmp_dir.cleanup()
         return eval_results
+
+@METRICS.register_module()
+class GlareKAISTMissrateMetric(KAISTMissrateMetric):
+    """Missrate evaluation metric for KAIST with the synthetic glare split.
+
+    The test set holds the normal KAIST test images followed by their copies
+    with simulated complex lighting, whose ``im_name`` is prefixed with
+    ``complex_light_new/``. Miss rates are reported for the day, night and
+    all subsets of both parts, e.g. ``normal_day`` and ``glare_recall_day``.
+    See :class:`KAISTMissrateMetric` for the arguments.
+    """
+    default_prefix: Optional[str] = 'Glare'
+    default_subsets: dict = OrderedDict(
+        normal_all=dict(key='im_name', pattern=r'^(?!complex_light_new/)'),
+        normal_day=dict(key='im_name', pattern=r'^set0[6-8]/'),
+        normal_night=dict(key='im_name', pattern=r'^set(09|1[01])/'),
+        glare_all=dict(key='im_name', pattern=r'^complex_light_new/'),
+        glare_day=dict(
+            key='im_name', pattern=r'^complex_light_new/set0[6-8]/'),
+        glare_night=dict(
+            key='im_name', pattern=r'^complex_light_new/set(09|1[01])/'))
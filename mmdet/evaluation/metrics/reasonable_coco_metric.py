@@ -2,14 +2,13 @@
 import datetime
 import itertools
 import os.path as osp
-import tempfile
 from collections import OrderedDict
 from typing import Dict, List, Optional, Sequence, Union
 
 import numpy as np
 import torch
 from mmengine.evaluator import BaseMetric
-from mmengine.fileio import dump, get_local_path, load
+from mmengine.fileio import dump, get_local_path
 from mmengine.logging import MMLogger
 from terminaltables import AsciiTable
 from collections import defaultdict
@@ -17,10 +16,30 @@ from collections import defaultdict
 from mmdet.datasets.api_wrappers import COCO, COCOeval
 from mmdet.registry import METRICS
 from mmdet.structures.mask import encode_mask_results
-from ..functional import eval_recalls
+from ..functional import DetResultBuffer, eval_recalls, missrate_gt_ignore
 
 
 class ReasonableCOCOEval(COCOeval):
+    """COCO evaluation that ignores the ground truths out of a miss-rate
+    setup, ``Reasonable`` by default.
+
+    Args:
+        cocoGt (COCO, optional): Ground truth COCO api.
+        cocoDt (COCO, optional): Detection COCO api.
+        iouType (str): IoU type. Defaults to 'segm'.
+        missrate_setup (dict, optional): ``height_range``, ``occ_range``
+            and ``bnd_range`` passed to :func:`missrate_gt_ignore`.
+            Defaults to None.
+    """
+
+    def __init__(self,
+                 cocoGt=None,
+                 cocoDt=None,
+                 iouType='segm',
+                 missrate_setup: Optional[dict] = None):
+        super().__init__(cocoGt, cocoDt, iouType)
+        self.missrate_setup = missrate_setup or dict()
+
     def _prepare(self):
         '''
         Prepare ._gts and ._dts for evaluation based on params
@@ -54,18 +73,13 @@ class ReasonableCOCOEval(COCOeval):
             gt['segmentation'] = []
             if p.iouType == 'keypoints':
                 gt['ignore'] = (gt['num_keypoints'] == 0) or gt['ignore']
-            gbox = gt['bbox']
-            gt['ignore'] = 1 \
-                if gt['height'] < 55 \
-                or gt['height'] > 1e5 ** 2 \
-                or gt['occlusion'] not in [0, 1] \
-                or gbox[0] < 5 \
-                or gbox[1] < 5 \
-                or gbox[0] + gbox[2] > 635 \
-                or gbox[1] + gbox[3] > 507 \
-                else gt['ignore']
-            # OccRng [[0, 1], [0, 1],[2], [0, 1, 2]]
-            # bndRng: [5, 5, 635, 507]
+        # apply the miss-rate setup shared with the KAIST metrics
+        gt_ignore = missrate_gt_ignore(
+            [gt['bbox'] for gt in gts], [gt['ignore'] for gt in gts],
+            [gt['height'] for gt in gts], [gt['occlusion'] for gt in gts],
+            **self.missrate_setup)
+        for gt, ignore in zip(gts, gt_ignore):
+            gt['ignore'] = int(ignore)
         self._gts = defaultdict(list)       # gt for evaluation
         self._dts = defaultdict(list)       # dt for evaluation
         for gt in gts:
@@ -107,7 +121,8 @@ class ReasonableCocoMetric(BaseMetric):
             Defaults to False.
         outfile_prefix (str, optional): The prefix of json files. It includes
             the file path and the prefix of filename, e.g., "a/b/prefix".
-            If not specified, a temp file will be created. Defaults to None.
+            If not specified, no json file is written and the evaluation
+            runs on the collected arrays in memory. Defaults to None.
         file_client_args (dict, optional): Arguments to instantiate the
             corresponding backend in mmdet <= 3.0.0rc6. Defaults to None.
         backend_args (dict, optional): Arguments to instantiate the
@@ -121,6 +136,14 @@ class ReasonableCocoMetric(BaseMetric):
             will be used instead. Defaults to None.
         sort_categories (bool): Whether sort categories in annotations. Only
             used for `Objects365V1Dataset`. Defaults to False.
+        height_range (Sequence[float]): Ground truths out of this height
+            range are ignored. Defaults to (55, 1e10), i.e. the
+            ``Reasonable`` setup.
+        occ_range (Sequence[int]): Occlusion levels that are not ignored.
+            Defaults to (0, 1).
+        bnd_range (Sequence[float]): Ground truths crossing this
+            ``(x1, y1, x2, y2)`` border are ignored.
+            Defaults to (5, 5, 635, 507).
     """
     default_prefix: Optional[str] = 'reasonable_coco'
 
@@ -137,7 +160,10 @@ class ReasonableCocoMetric(BaseMetric):
                  backend_args: dict = None,
                  collect_device: str = 'cpu',
                  prefix: Optional[str] = None,
-                 sort_categories: bool = False) -> None:
+                 sort_categories: bool = False,
+                 height_range: Sequence[float] = (55, 1e5**2),
+                 occ_range: Sequence[int] = (0, 1),
+                 bnd_range: Sequence[float] = (5, 5, 635, 507)) -> None:
         super().__init__(collect_device=collect_device, prefix=prefix)
         # coco evaluation metrics
         self.metrics = metric if isinstance(metric, list) else [metric]
@@ -167,6 +193,10 @@ class ReasonableCocoMetric(BaseMetric):
             'be saved to a temp directory which will be cleaned up at the end.'
 
         self.outfile_prefix = outfile_prefix
+        self.missrate_setup = dict(
+            height_range=tuple(height_range),
+            occ_range=tuple(occ_range),
+            bnd_range=tuple(bnd_range))
 
         self.backend_args = backend_args
         if file_client_args is not None:
@@ -261,6 +291,52 @@ class ReasonableCocoMetric(BaseMetric):
             _bbox[3] - _bbox[1],
         ]
 
+    def results2array(self, results: Sequence[dict]) -> np.ndarray:
+        """Convert the bbox results to the array accepted by
+        ``COCO.loadRes``.
+
+        Args:
+            results (Sequence[dict] | :obj:`DetResultBuffer`): Testing
+                results of the dataset.
+
+        Returns:
+            np.ndarray: Detections of shape (N, 7), each row is
+            ``[image_id, x, y, w, h, score, category_id]``.
+        """
+        results = DetResultBuffer.from_results(results)
+        if not results.det_fields:
+            return np.zeros((0, 7))
+        # the flat arrays of all the images are converted at once
+        bboxes = results.get_dets('bboxes').astype(np.float64).reshape(-1, 4)
+        array = np.empty((len(bboxes), 7))
+        array[:, 0] = np.repeat(results.get_img_ids(), results.num_dets)
+        array[:, 1:5] = bboxes
+        array[:, 3:5] -= bboxes[:, :2]
+        array[:, 5] = results.get_dets('scores')
+        array[:, 6] = np.asarray(
+            self.cat_ids,
+            dtype=np.float64)[results.get_dets('labels').astype(np.int64)]
+        return array
+
+    def results2dicts(self, results: Sequence[dict]) -> dict:
+        """Convert the detection results to COCO style dicts.
+
+        Args:
+            results (Sequence[dict] | :obj:`DetResultBuffer`): Testing
+                results of the dataset.
+
+        Returns:
+            dict: Possible keys are "bbox", "segm", "proposal", and
+            values are corresponding lists of COCO style results.
+        """
+        results = DetResultBuffer.from_results(results)
+        bbox_json_results, segm_json_results = results.to_coco_dicts(
+            self.cat_ids)
+        result_dicts = dict(bbox=bbox_json_results, proposal=bbox_json_results)
+        if segm_json_results is not None:
+            result_dicts['segm'] = segm_json_results
+        return result_dicts
+
     def results2json(self, results: Sequence[dict],
                      outfile_prefix: str) -> dict:
         """Dump the detection results to a COCO style json file.
@@ -270,8 +346,8 @@ class ReasonableCocoMetric(BaseMetric):
         automatically recognize the type, and dump them to json files.
 
         Args:
-            results (Sequence[dict]): Testing results of the
-                dataset.
+            results (Sequence[dict] | :obj:`DetResultBuffer`): Testing
+                results of the dataset.
             outfile_prefix (str): The filename prefix of the json files. If the
                 prefix is "somepath/xxx", the json files will be named
                 "somepath/xxx.bbox.json", "somepath/xxx.segm.json",
@@ -281,61 +357,26 @@ class ReasonableCocoMetric(BaseMetric):
             dict: Possible keys are "bbox", "segm", "proposal", and
             values are corresponding filenames.
         """
-        bbox_json_results = []
-        segm_json_results = [] if 'masks' in results[0] else None
-        for idx, result in enumerate(results):
-            image_id = result.get('img_id', idx)
-            labels = result['labels']
-            bboxes = result['bboxes']
-            scores = result['scores']
-            # bbox results
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(scores[i])
-                data['category_id'] = self.cat_ids[label]
-                bbox_json_results.append(data)
-
-            if segm_json_results is None:
-                continue
-
-            # segm results
-            masks = result['masks']
-            mask_scores = result.get('mask_scores', scores)
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(mask_scores[i])
-                data['category_id'] = self.cat_ids[label]
-                if isinstance(masks[i]['counts'], bytes):
-                    masks[i]['counts'] = masks[i]['counts'].decode()
-                data['segmentation'] = masks[i]
-                segm_json_results.append(data)
-
+        result_dicts = self.results2dicts(results)
         result_files = dict()
         result_files['bbox'] = f'{outfile_prefix}.bbox.json'
         result_files['proposal'] = f'{outfile_prefix}.bbox.json'
-        dump(bbox_json_results, result_files['bbox'])
+        dump(result_dicts['bbox'], result_files['bbox'])
 
-        if segm_json_results is not None:
+        if 'segm' in result_dicts:
             result_files['segm'] = f'{outfile_prefix}.segm.json'
-            dump(segm_json_results, result_files['segm'])
+            dump(result_dicts['segm'], result_files['segm'])
 
         return result_files
 
-    def gt_to_coco_json(self, gt_dicts: Sequence[dict],
-                        outfile_prefix: str) -> str:
-        """Convert ground truth to coco format json file.
+    def gt_to_coco_dict(self, gt_dicts: Sequence[dict]) -> dict:
+        """Convert ground truth to a coco format dict.
 
         Args:
             gt_dicts (Sequence[dict]): Ground truth of the dataset.
-            outfile_prefix (str): The filename prefix of the json files. If the
-                prefix is "somepath/xxx", the json file will be named
-                "somepath/xxx.gt.json".
+
         Returns:
-            str: The filename of the json file.
+            dict: The coco format annotations.
         """
         categories = [
             dict(id=id, name=name)
@@ -391,8 +432,22 @@ class ReasonableCocoMetric(BaseMetric):
         )
         if len(annotations) > 0:
             coco_json['annotations'] = annotations
+        return coco_json
+
+    def gt_to_coco_json(self, gt_dicts: Sequence[dict],
+                        outfile_prefix: str) -> str:
+        """Convert ground truth to coco format json file.
+
+        Args:
+            gt_dicts (Sequence[dict]): Ground truth of the dataset.
+            outfile_prefix (str): The filename prefix of the json files. If the
+                prefix is "somepath/xxx", the json file will be named
+                "somepath/xxx.gt.json".
+        Returns:
+            str: The filename of the json file.
+        """
         converted_json_path = f'{outfile_prefix}.gt.json'
-        dump(coco_json, converted_json_path)
+        dump(self.gt_to_coco_dict(gt_dicts), converted_json_path)
         return converted_json_path
 
     # TODO: data_batch is no longer needed, consider adjusting the
@@ -407,35 +462,37 @@ class ReasonableCocoMetric(BaseMetric):
             data_samples (Sequence[dict]): A batch of data samples that
                 contain annotations and predictions.
         """
+        # the results of the rank are appended to one columnar buffer
+        if not self.results:
+            self.results.append(DetResultBuffer())
+        buffer = self.results[0]
         for data_sample in data_samples:
-            result = dict()
             pred = data_sample['pred_instances']
-            result['img_id'] = data_sample['img_id']
-            result['bboxes'] = pred['bboxes'].cpu().numpy()
-            result['scores'] = pred['scores'].cpu().numpy()
-            result['labels'] = pred['labels'].cpu().numpy()
+            dets = dict(
+                bboxes=pred['bboxes'].cpu().numpy(),
+                scores=pred['scores'].cpu().numpy(),
+                labels=pred['labels'].cpu().numpy())
+            # some detectors use different scores for bbox and mask
+            if 'mask_scores' in pred:
+                dets['mask_scores'] = pred['mask_scores'].cpu().numpy()
+            img_fields = dict(
+                img_id=data_sample['img_id'],
+                width=data_sample['ori_shape'][1],
+                height=data_sample['ori_shape'][0])
             # encode mask to RLE
             if 'masks' in pred:
-                result['masks'] = encode_mask_results(
+                img_fields['masks'] = encode_mask_results(
                     pred['masks'].detach().cpu().numpy()) if isinstance(
                         pred['masks'], torch.Tensor) else pred['masks']
-            # some detectors use different scores for bbox and mask
-            if 'mask_scores' in pred:
-                result['mask_scores'] = pred['mask_scores'].cpu().numpy()
 
             # parse gt
-            gt = dict()
-            gt['width'] = data_sample['ori_shape'][1]
-            gt['height'] = data_sample['ori_shape'][0]
-            gt['img_id'] = data_sample['img_id']
             if self._coco_api is None:
                 # TODO: Need to refactor to support LoadAnnotations
                 assert 'instances' in data_sample, \
                     'ground truth is required for evaluation when ' \
                     '`ann_file` is not provided'
-                gt['anns'] = data_sample['instances']
-            # add converted result to the results list
-            self.results.append((gt, result))
+                img_fields['anns'] = data_sample['instances']
+            buffer.append(dets, **img_fields)
 
     def compute_metrics(self, results: list) -> Dict[str, float]:
         """Compute the metrics from processed results.
@@ -449,22 +506,20 @@ class ReasonableCocoMetric(BaseMetric):
         """
         logger: MMLogger = MMLogger.get_current_instance()
 
-        # split gt and prediction list
-        gts, preds = zip(*results)
-
-        tmp_dir = None
-        if self.outfile_prefix is None:
-            tmp_dir = tempfile.TemporaryDirectory()
-            outfile_prefix = osp.join(tmp_dir.name, 'results')
-        else:
-            outfile_prefix = self.outfile_prefix
+        # the buffers gathered from the ranks hold both the gt and the
+        # predictions of every image
+        gts = preds = DetResultBuffer.from_results(results)
+        outfile_prefix = self.outfile_prefix
 
         if self._coco_api is None:
-            # use converted gt json file to initialize coco api
+            # build the coco api from the converted gt without a json file
             logger.info('Converting ground truth to coco format...')
-            coco_json_path = self.gt_to_coco_json(
-                gt_dicts=gts, outfile_prefix=outfile_prefix)
-            self._coco_api = COCO(coco_json_path)
+            coco_json = self.gt_to_coco_dict(gt_dicts=gts)
+            if outfile_prefix is not None:
+                dump(coco_json, f'{outfile_prefix}.gt.json')
+            self._coco_api = COCO()
+            self._coco_api.dataset = coco_json
+            self._coco_api.createIndex()
 
         # handle lazy init
         if self.cat_ids is None:
@@ -473,8 +528,9 @@ class ReasonableCocoMetric(BaseMetric):
         if self.img_ids is None:
             self.img_ids = self._coco_api.get_img_ids()
 
-        # convert predictions to coco format and dump to json file
-        result_files = self.results2json(preds, outfile_prefix)
+        if outfile_prefix is not None:
+            # convert predictions to coco format and dump to json file
+            self.results2json(preds, outfile_prefix)
 
         eval_results = OrderedDict()
         if self.format_only:
@@ -500,11 +556,11 @@ class ReasonableCocoMetric(BaseMetric):
 
             # evaluate proposal, bbox and segm
             iou_type = 'bbox' if metric == 'proposal' else metric
-            if metric not in result_files:
+            if metric == 'segm' and 'masks' not in preds.img_fields:
                 raise KeyError(f'{metric} is not in results')
             try:
-                predictions = load(result_files[metric])
                 if iou_type == 'segm':
+                    predictions = self.results2dicts(preds)['segm']
                     # Refer to https://github.com/cocodataset/cocoapi/blob/master/PythonAPI/pycocotools/coco.py#L331  # noqa
                     # When evaluating mask AP, if the results contain bbox,
                     # cocoapi will use the box area instead of the mask area
@@ -513,6 +569,9 @@ class ReasonableCocoMetric(BaseMetric):
                     # small/medium/large mask AP results.
                     for x in predictions:
                         x.pop('bbox')
+                else:
+                    # boxes are indexed from an array, without json files
+                    predictions = self.results2array(preds)
                 coco_dt = self._coco_api.loadRes(predictions)
 
             except IndexError:
@@ -520,7 +579,11 @@ class ReasonableCocoMetric(BaseMetric):
                     'The testing results of the whole dataset is empty.')
                 break
 
-            coco_eval = ReasonableCOCOEval(self._coco_api, coco_dt, iou_type)
+            coco_eval = ReasonableCOCOEval(
+                self._coco_api,
+                coco_dt,
+                iou_type,
+                missrate_setup=self.missrate_setup)
 
             coco_eval.params.catIds = self.cat_ids
             coco_eval.params.imgIds = self.img_ids
@@ -648,6 +711,4 @@ class ReasonableCocoMetric(BaseMetric):
                             f'{ap[10]:.3f} {ap[11]:.3f}'
                             )
 
-        if tmp_dir is not None:
-            tmp_dir.cleanup()
         return eval_results
@@ -11,6 +11,7 @@ from mmdet.registry import MODELS, TASK_UTILS
 from mmdet.structures.bbox import BaseBoxes, cat_boxes, get_box_tensor
 from mmdet.utils import (ConfigType, InstanceList, OptConfigType,
                          OptInstanceList, OptMultiConfig)
+from ..task_modules.assigners import AssignResult
 from ..task_modules.prior_generators import (AnchorGenerator,
                                              anchor_inside_flags)
 from ..task_modules.samplers import PseudoSampler
@@ -198,13 +199,15 @@ class AnchorHead(BaseDenseHead):
 
         return anchor_list, valid_flag_list
 
-    def _get_targets_single(self,
-                            flat_anchors: Union[Tensor, BaseBoxes],
-                            valid_flags: Tensor,
-                            gt_instances: InstanceData,
-                            img_meta: dict,
-                            gt_instances_ignore: Optional[InstanceData] = None,
-                            unmap_outputs: bool = True) -> tuple:
+    def _get_targets_single(
+            self,
+            flat_anchors: Union[Tensor, BaseBoxes],
+            valid_flags: Tensor,
+            gt_instances: InstanceData,
+            img_meta: dict,
+            gt_instances_ignore: Optional[InstanceData] = None,
+            unmap_outputs: bool = True,
+            assign_result: Optional[AssignResult] = None) -> tuple:
         """Compute regression and classification targets for anchors in a
         single image.
 
@@ -225,6 +228,10 @@ class AnchorHead(BaseDenseHead):
                 Defaults to None.
             unmap_outputs (bool): Whether to map outputs back to the original
                 set of anchors.  Defaults to True.
+            assign_result (:obj:`AssignResult`, optional): The assign result
+                of the anchors inside the image, computed for the whole batch
+                by :meth:`batch_assign_anchors`. The anchors are assigned here
+                if it is None. Defaults to None.
 
         Returns:
             tuple:
@@ -249,8 +256,9 @@ class AnchorHead(BaseDenseHead):
         anchors = flat_anchors[inside_flags]
 
         pred_instances = InstanceData(priors=anchors)
-        assign_result = self.assigner.assign(pred_instances, gt_instances,
-                                             gt_instances_ignore)
+        if assign_result is None:
+            assign_result = self.assigner.assign(pred_instances, gt_instances,
+                                                 gt_instances_ignore)
         # No sampling is required except for RPN and
         # Guided Anchoring algorithms
         sampling_result = self.sampler.sample(assign_result, pred_instances,
@@ -305,6 +313,43 @@ class AnchorHead(BaseDenseHead):
         return (labels, label_weights, bbox_targets, bbox_weights, pos_inds,
                 neg_inds, sampling_result)
 
+    def batch_assign_anchors(
+            self, anchor_list: List[Union[Tensor, BaseBoxes]],
+            valid_flag_list: List[Tensor], batch_gt_instances: InstanceList,
+            batch_img_metas: List[dict],
+            batch_gt_instances_ignore: OptInstanceList) -> List[AssignResult]:
+        """Assign the anchors inside the images of a batch at once.
+
+        Args:
+            anchor_list (list[Tensor or :obj:`BaseBoxes`]): The concatenated
+                multi-level anchors of each image.
+            valid_flag_list (list[Tensor]): The concatenated multi-level
+                valid flags of each image.
+            batch_gt_instances (list[:obj:`InstanceData`]): Batch of
+                gt_instance. It usually includes ``bboxes`` and ``labels``
+                attributes.
+            batch_img_metas (list[dict]): Meta information of each image, e.g.,
+                image size, scaling factor, etc.
+            batch_gt_instances_ignore (list[:obj:`InstanceData`]): Batch of
+                gt_instances_ignore, None for the images without them.
+
+        Returns:
+            list[:obj:`AssignResult`]: The assign result of the anchors inside
+            each image.
+        """
+        batch_pred_instances = []
+        for flat_anchors, valid_flags, img_meta in zip(anchor_list,
+                                                       valid_flag_list,
+                                                       batch_img_metas):
+            inside_flags = anchor_inside_flags(
+                flat_anchors, valid_flags, img_meta['img_shape'][:2],
+                self.train_cfg['allowed_border'])
+            batch_pred_instances.append(
+                InstanceData(priors=flat_anchors[inside_flags]))
+        return self.assigner.batch_assign(batch_pred_instances,
+                                          batch_gt_instances,
+                                          batch_gt_instances_ignore)
+
     def get_targets(self,
                     anchor_list: List[List[Tensor]],
                     valid_flag_list: List[List[Tensor]],
@@ -357,6 +402,12 @@ class AnchorHead(BaseDenseHead):
                 `self._get_targets_single`. These returns are currently refined
                 to properties at each feature map (i.e. having HxW dimension).
                 The results will be concatenated after the end
+
+        Note:
+            If ``batch_assign`` is True in ``train_cfg``, the anchors of all
+            the images are assigned at once by :meth:`batch_assign_anchors`
+            instead of image by image, which is faster for the assigners
+            implementing ``batch_assign`` with batched tensor ops.
         """
         num_imgs = len(batch_img_metas)
         assert len(anchor_list) == len(valid_flag_list) == num_imgs
@@ -375,14 +426,23 @@ class AnchorHead(BaseDenseHead):
             concat_valid_flag_list.append(torch.cat(valid_flag_list[i]))
 
         # compute targets for each image
-        results = multi_apply(
-            self._get_targets_single,
-            concat_anchor_list,
-            concat_valid_flag_list,
-            batch_gt_instances,
-            batch_img_metas,
-            batch_gt_instances_ignore,
-            unmap_outputs=unmap_outputs)
+        if self.train_cfg.get('batch_assign', False):
+            assign_results = self.batch_assign_anchors(
+                concat_anchor_list, concat_valid_flag_list, batch_gt_instances,
+                batch_img_metas, batch_gt_instances_ignore)
+            results = multi_apply(self._get_targets_single, concat_anchor_list,
+                                  concat_valid_flag_list, batch_gt_instances,
+                                  batch_img_metas, batch_gt_instances_ignore,
+                                  [unmap_outputs] * num_imgs, assign_results)
+        else:
+            results = multi_apply(
+                self._get_targets_single,
+                concat_anchor_list,
+                concat_valid_flag_list,
+                batch_gt_instances,
+                batch_img_metas,
+                batch_gt_instances_ignore,
+                unmap_outputs=unmap_outputs)
         (all_labels, all_label_weights, all_bbox_targets, all_bbox_weights,
          pos_inds_list, neg_inds_list, sampling_results_list) = results[:7]
         rest_results = list(results[7:])  # user-added return values
@@ -10,6 +10,7 @@ from torch import Tensor
 from mmdet.registry import MODELS
 from mmdet.utils import (ConfigType, InstanceList, MultiConfig, OptConfigType,
                          OptInstanceList, reduce_mean)
+from ..task_modules.assigners import AssignResult
 from ..task_modules.prior_generators import anchor_inside_flags
 from ..utils import images_to_levels, multi_apply, unmap
 from .anchor_head import AnchorHead
@@ -358,7 +359,9 @@ class ATSSHead(AnchorHead):
 
         This method is almost the same as `AnchorHead.get_targets()`. Besides
         returning the targets as the parent method does, it also returns the
-        anchors as the first element of the returned tuple.
+        anchors as the first element of the returned tuple. The anchors of all
+        the images are assigned at once if ``batch_assign`` is True in
+        ``train_cfg``.
         """
         num_imgs = len(batch_img_metas)
         assert len(anchor_list) == len(valid_flag_list) == num_imgs
@@ -376,17 +379,28 @@ class ATSSHead(AnchorHead):
         # compute targets for each image
         if batch_gt_instances_ignore is None:
             batch_gt_instances_ignore = [None] * num_imgs
+        if self.train_cfg.get('batch_assign', False):
+            assign_results = self.batch_assign_anchors(
+                anchor_list, valid_flag_list, num_level_anchors_list,
+                batch_gt_instances, batch_img_metas, batch_gt_instances_ignore)
+            results = multi_apply(self._get_targets_single, anchor_list,
+                                  valid_flag_list, num_level_anchors_list,
+                                  batch_gt_instances, batch_img_metas,
+                                  batch_gt_instances_ignore,
+                                  [unmap_outputs] * num_imgs, assign_results)
+        else:
+            results = multi_apply(
+                self._get_targets_single,
+                anchor_list,
+                valid_flag_list,
+                num_level_anchors_list,
+                batch_gt_instances,
+                batch_img_metas,
+                batch_gt_instances_ignore,
+                unmap_outputs=unmap_outputs)
         (all_anchors, all_labels, all_label_weights, all_bbox_targets,
          all_bbox_weights, pos_inds_list, neg_inds_list,
-         sampling_results_list) = multi_apply(
-             self._get_targets_single,
-             anchor_list,
-             valid_flag_list,
-             num_level_anchors_list,
-             batch_gt_instances,
-             batch_img_metas,
-             batch_gt_instances_ignore,
-             unmap_outputs=unmap_outputs)
+         sampling_results_list) = results
         # Get `avg_factor` of all images, which calculate in `SamplingResult`.
         # When using sampling method, avg_factor is usually the sum of
         # positive and negative priors. When using `PseudoSampler`,
@@ -405,14 +419,16 @@ class ATSSHead(AnchorHead):
         return (anchors_list, labels_list, label_weights_list,
                 bbox_targets_list, bbox_weights_list, avg_factor)
 
-    def _get_targets_single(self,
-                            flat_anchors: Tensor,
-                            valid_flags: Tensor,
-                            num_level_anchors: List[int],
-                            gt_instances: InstanceData,
-                            img_meta: dict,
-                            gt_instances_ignore: Optional[InstanceData] = None,
-                            unmap_outputs: bool = True) -> tuple:
+    def _get_targets_single(
+            self,
+            flat_anchors: Tensor,
+            valid_flags: Tensor,
+            num_level_anchors: List[int],
+            gt_instances: InstanceData,
+            img_meta: dict,
+            gt_instances_ignore: Optional[InstanceData] = None,
+            unmap_outputs: bool = True,
+            assign_result: Optional[AssignResult] = None) -> tuple:
         """Compute regression, classification targets for anchors in a single
         image.
 
@@ -434,6 +450,10 @@ class ATSSHead(AnchorHead):
                 Defaults to None.
             unmap_outputs (bool): Whether to map outputs back to the original
                 set of anchors.
+            assign_result (:obj:`AssignResult`, optional): The assign result
+                of the anchors inside the image, computed for the whole batch
+                by :meth:`batch_assign_anchors`. The anchors are assigned here
+                if it is None. Defaults to None.
 
         Returns:
             tuple: N is the number of total anchors in the image.
@@ -462,12 +482,14 @@ class ATSSHead(AnchorHead):
         # assign gt and sample anchors
         anchors = flat_anchors[inside_flags, :]
 
-        num_level_anchors_inside = self.get_num_level_anchors_inside(
-            num_level_anchors, inside_flags)
         pred_instances = InstanceData(priors=anchors)
-        assign_result = self.assigner.assign(pred_instances,
-                                             num_level_anchors_inside,
-                                             gt_instances, gt_instances_ignore)
+        if assign_result is None:
+            num_level_anchors_inside = self.get_num_level_anchors_inside(
+                num_level_anchors, inside_flags)
+            assign_result = self.assigner.assign(pred_instances,
+                                                 num_level_anchors_inside,
+                                                 gt_instances,
+                                                 gt_instances_ignore)
 
         sampling_result = self.sampler.sample(assign_result, pred_instances,
                                               gt_instances)
@@ -514,6 +536,49 @@ class ATSSHead(AnchorHead):
         return (anchors, labels, label_weights, bbox_targets, bbox_weights,
                 pos_inds, neg_inds, sampling_result)
 
+    def batch_assign_anchors(
+            self, anchor_list: List[Tensor], valid_flag_list: List[Tensor],
+            num_level_anchors_list: List[List[int]],
+            batch_gt_instances: InstanceList, batch_img_metas: List[dict],
+            batch_gt_instances_ignore: OptInstanceList) -> List[AssignResult]:
+        """Assign the anchors inside the images of a batch at once.
+
+        Args:
+            anchor_list (list[Tensor]): The concatenated multi-level anchors
+                of each image.
+            valid_flag_list (list[Tensor]): The concatenated multi-level
+                valid flags of each image.
+            num_level_anchors_list (list[list[int]]): Number of anchors of
+                each scale level of each image.
+            batch_gt_instances (list[:obj:`InstanceData`]): Batch of
+                gt_instance. It usually includes ``bboxes`` and ``labels``
+                attributes.
+            batch_img_metas (list[dict]): Meta information of each image, e.g.,
+                image size, scaling factor, etc.
+            batch_gt_instances_ignore (list[:obj:`InstanceData`]): Batch of
+                gt_instances_ignore, None for the images without them.
+
+        Returns:
+            list[:obj:`AssignResult`]: The assign result of the anchors inside
+            each image.
+        """
+        batch_pred_instances, batch_num_level_anchors_inside = [], []
+        for flat_anchors, valid_flags, num_level_anchors, img_meta in zip(
+                anchor_list, valid_flag_list, num_level_anchors_list,
+                batch_img_metas):
+            inside_flags = anchor_inside_flags(
+                flat_anchors, valid_flags, img_meta['img_shape'][:2],
+                self.train_cfg['allowed_border'])
+            batch_pred_instances.append(
+                InstanceData(priors=flat_anchors[inside_flags, :]))
+            batch_num_level_anchors_inside.append(
+                self.get_num_level_anchors_inside(num_level_anchors,
+                                                  inside_flags))
+        return self.assigner.batch_assign(batch_pred_instances,
+                                          batch_num_level_anchors_inside,
+                                          batch_gt_instances,
+                                          batch_gt_instances_ignore)
+
     def get_num_level_anchors_inside(self, num_level_anchors, inside_flags):
         """Get the number of valid anchors in every level."""
 
@@ -12,7 +12,7 @@ from mmdet.registry import MODELS, TASK_UTILS
 from mmdet.structures.bbox import distance2bbox
 from mmdet.utils import ConfigType, InstanceList, OptInstanceList, reduce_mean
 from ..layers.transformer import inverse_sigmoid
-from ..task_modules import anchor_inside_flags
+from ..task_modules import AssignResult, anchor_inside_flags
 from ..utils import (images_to_levels, multi_apply, sigmoid_geometric_mean,
                      unmap)
 from .atss_head import ATSSHead
@@ -325,6 +325,10 @@ class RTMDetHead(ATSSHead):
             unmap_outputs (bool): Whether to map outputs back to the original
                 set of anchors. Defaults to True.
 
+        Note:
+            If ``batch_assign`` is True in ``train_cfg``, the anchors of all
+            the images are assigned at once.
+
         Returns:
             tuple: a tuple containing learning targets.
 
@@ -352,17 +356,42 @@ class RTMDetHead(ATSSHead):
         if batch_gt_instances_ignore is None:
             batch_gt_instances_ignore = [None] * num_imgs
         # anchor_list: list(b * [-1, 4])
+        cls_scores = cls_scores.detach()
+        bbox_preds = bbox_preds.detach()
+        if self.train_cfg.get('batch_assign', False):
+            batch_pred_instances = []
+            for img_cls_scores, img_bbox_preds, flat_anchors, valid_flags, \
+                    img_meta in zip(cls_scores, bbox_preds, anchor_list,
+                                    valid_flag_list, batch_img_metas):
+                inside_flags = anchor_inside_flags(
+                    flat_anchors, valid_flags, img_meta['img_shape'][:2],
+                    self.train_cfg['allowed_border'])
+                batch_pred_instances.append(
+                    InstanceData(
+                        scores=img_cls_scores[inside_flags, :],
+                        bboxes=img_bbox_preds[inside_flags, :],
+                        priors=flat_anchors[inside_flags, :]))
+            assign_results = self.assigner.batch_assign(
+                batch_pred_instances, batch_gt_instances,
+                batch_gt_instances_ignore)
+            results = multi_apply(self._get_targets_single, cls_scores,
+                                  bbox_preds, anchor_list, valid_flag_list,
+                                  batch_gt_instances, batch_img_metas,
+                                  batch_gt_instances_ignore,
+                                  [unmap_outputs] * num_imgs, assign_results)
+        else:
+            results = multi_apply(
+                self._get_targets_single,
+                cls_scores,
+                bbox_preds,
+                anchor_list,
+                valid_flag_list,
+                batch_gt_instances,
+                batch_img_metas,
+                batch_gt_instances_ignore,
+                unmap_outputs=unmap_outputs)
         (all_anchors, all_labels, all_label_weights, all_bbox_targets,
-         all_assign_metrics, sampling_results_list) = multi_apply(
-             self._get_targets_single,
-             cls_scores.detach(),
-             bbox_preds.detach(),
-             anchor_list,
-             valid_flag_list,
-             batch_gt_instances,
-             batch_img_metas,
-             batch_gt_instances_ignore,
-             unmap_outputs=unmap_outputs)
+         all_assign_metrics, sampling_results_list) = results
         # no valid anchors
         if any([labels is None for labels in all_labels]):
             return None
@@ -388,7 +417,8 @@ class RTMDetHead(ATSSHead):
                             gt_instances: InstanceData,
                             img_meta: dict,
                             gt_instances_ignore: Optional[InstanceData] = None,
-                            unmap_outputs=True):
+                            unmap_outputs=True,
+                            assign_result: Optional[AssignResult] = None):
         """Compute regression, classification targets for anchors in a single
         image.
 
@@ -410,6 +440,10 @@ class RTMDetHead(ATSSHead):
                 Defaults to None.
             unmap_outputs (bool): Whether to map outputs back to the original
                 set of anchors. Defaults to True.
+            assign_result (:obj:`AssignResult`, optional): The assign result
+                of the anchors inside the image, computed for the whole batch
+                by :meth:`get_targets`. The anchors are assigned here if it is
+                None. Defaults to None.
 
         Returns:
             tuple: N is the number of total anchors in the image.
@@ -437,8 +471,9 @@ class RTMDetHead(ATSSHead):
             bboxes=bbox_preds[inside_flags, :],
             priors=anchors)
 
-        assign_result = self.assigner.assign(pred_instances, gt_instances,
-                                             gt_instances_ignore)
+        if assign_result is None:
+            assign_result = self.assigner.assign(pred_instances, gt_instances,
+                                                 gt_instances_ignore)
 
         sampling_result = self.sampler.sample(assign_result, pred_instances,
                                               gt_instances)
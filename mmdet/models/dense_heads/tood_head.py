@@ -16,6 +16,7 @@ from mmdet.registry import MODELS, TASK_UTILS
 from mmdet.structures.bbox import distance2bbox
 from mmdet.utils import (ConfigType, InstanceList, OptConfigType,
                          OptInstanceList, reduce_mean)
+from ..task_modules.assigners import AssignResult
 from ..task_modules.prior_generators import anchor_inside_flags
 from ..utils import (filter_scores_and_topk, images_to_levels, multi_apply,
                      sigmoid_geometric_mean, unmap)
@@ -614,6 +615,11 @@ class TOODHead(ATSSHead):
             unmap_outputs (bool): Whether to map outputs back to the original
                 set of anchors.
 
+        Note:
+            If ``batch_assign`` is True in ``train_cfg``, the anchors of all
+            the images are assigned at once, by the initial assigner or by
+            the alignment assigner.
+
         Returns:
             tuple: a tuple containing learning targets.
 
@@ -647,33 +653,72 @@ class TOODHead(ATSSHead):
         message_hub = MessageHub.get_current_instance()
         self.epoch = message_hub.get_info('epoch')
 
+        batch_assign = self.train_cfg.get('batch_assign', False)
         if self.epoch < self.initial_epoch:
+            if batch_assign:
+                assign_results = self.batch_assign_anchors(
+                    anchor_list, valid_flag_list, num_level_anchors_list,
+                    batch_gt_instances, batch_img_metas,
+                    batch_gt_instances_ignore)
+                results = multi_apply(super()._get_targets_single, anchor_list,
+                                      valid_flag_list, num_level_anchors_list,
+                                      batch_gt_instances, batch_img_metas,
+                                      batch_gt_instances_ignore,
+                                      [unmap_outputs] * num_imgs,
+                                      assign_results)
+            else:
+                results = multi_apply(
+                    super()._get_targets_single,
+                    anchor_list,
+                    valid_flag_list,
+                    num_level_anchors_list,
+                    batch_gt_instances,
+                    batch_img_metas,
+                    batch_gt_instances_ignore,
+                    unmap_outputs=unmap_outputs)
             (all_anchors, all_labels, all_label_weights, all_bbox_targets,
              all_bbox_weights, pos_inds_list, neg_inds_list,
-             sampling_result) = multi_apply(
-                 super()._get_targets_single,
-                 anchor_list,
-                 valid_flag_list,
-                 num_level_anchors_list,
-                 batch_gt_instances,
-                 batch_img_metas,
-                 batch_gt_instances_ignore,
-                 unmap_outputs=unmap_outputs)
+             sampling_result) = results
             all_assign_metrics = [
                 weight[..., 0] for weight in all_bbox_weights
             ]
         else:
+            if batch_assign:
+                batch_pred_instances = []
+                for img_cls_scores, img_bbox_preds, flat_anchors, \
+                        valid_flags, img_meta in zip(
+                            cls_scores, bbox_preds, anchor_list,
+                            valid_flag_list, batch_img_metas):
+                    inside_flags = anchor_inside_flags(
+                        flat_anchors, valid_flags, img_meta['img_shape'][:2],
+                        self.train_cfg['allowed_border'])
+                    batch_pred_instances.append(
+                        InstanceData(
+                            priors=flat_anchors[inside_flags, :],
+                            scores=img_cls_scores[inside_flags, :],
+                            bboxes=img_bbox_preds[inside_flags, :]))
+                assign_results = self.alignment_assigner.batch_assign(
+                    batch_pred_instances, batch_gt_instances,
+                    batch_gt_instances_ignore, self.alpha, self.beta)
+                results = multi_apply(self._get_targets_single, cls_scores,
+                                      bbox_preds, anchor_list, valid_flag_list,
+                                      batch_gt_instances, batch_img_metas,
+                                      batch_gt_instances_ignore,
+                                      [unmap_outputs] * num_imgs,
+                                      assign_results)
+            else:
+                results = multi_apply(
+                    self._get_targets_single,
+                    cls_scores,
+                    bbox_preds,
+                    anchor_list,
+                    valid_flag_list,
+                    batch_gt_instances,
+                    batch_img_metas,
+                    batch_gt_instances_ignore,
+                    unmap_outputs=unmap_outputs)
             (all_anchors, all_labels, all_label_weights, all_bbox_targets,
-             all_assign_metrics) = multi_apply(
-                 self._get_targets_single,
-                 cls_scores,
-                 bbox_preds,
-                 anchor_list,
-                 valid_flag_list,
-                 batch_gt_instances,
-                 batch_img_metas,
-                 batch_gt_instances_ignore,
-                 unmap_outputs=unmap_outputs)
+             all_assign_metrics) = results
 
         # split targets to a list w.r.t. multiple levels
         anchors_list = images_to_levels(all_anchors, num_level_anchors)
@@ -688,15 +733,17 @@ class TOODHead(ATSSHead):
         return (anchors_list, labels_list, label_weights_list,
                 bbox_targets_list, norm_alignment_metrics_list)
 
-    def _get_targets_single(self,
-                            cls_scores: Tensor,
-                            bbox_preds: Tensor,
-                            flat_anchors: Tensor,
-                            valid_flags: Tensor,
-                            gt_instances: InstanceData,
-                            img_meta: dict,
-                            gt_instances_ignore: Optional[InstanceData] = None,
-                            unmap_outputs: bool = True) -> tuple:
+    def _get_targets_single(
+            self,
+            cls_scores: Tensor,
+            bbox_preds: Tensor,
+            flat_anchors: Tensor,
+            valid_flags: Tensor,
+            gt_instances: InstanceData,
+            img_meta: dict,
+            gt_instances_ignore: Optional[InstanceData] = None,
+            unmap_outputs: bool = True,
+            assign_result: Optional[AssignResult] = None) -> tuple:
         """Compute regression, classification targets for anchors in a single
         image.
 
@@ -718,6 +765,10 @@ class TOODHead(ATSSHead):
                 Defaults to None.
             unmap_outputs (bool): Whether to map outputs back to the original
                 set of anchors.
+            assign_result (:obj:`AssignResult`, optional): The assign result
+                of the anchors inside the image, computed for the whole batch
+                by the alignment assigner. The anchors are assigned here if it
+                is None. Defaults to None.
 
         Returns:
             tuple: N is the number of total anchors in the image.
@@ -745,10 +796,10 @@ class TOODHead(ATSSHead):
             priors=anchors,
             scores=cls_scores[inside_flags, :],
             bboxes=bbox_preds[inside_flags, :])
-        assign_result = self.alignment_assigner.assign(pred_instances,
-                                                       gt_instances,
-                                                       gt_instances_ignore,
-                                                       self.alpha, self.beta)
+        if assign_result is None:
+            assign_result = self.alignment_assigner.assign(
+                pred_instances, gt_instances, gt_instances_ignore, self.alpha,
+                self.beta)
         assign_ious = assign_result.max_overlaps
         assign_metrics = assign_result.assign_metrics
 
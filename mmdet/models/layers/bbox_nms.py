@@ -105,6 +105,121 @@ def multiclass_nms(
         return dets, labels[keep]
 
 
+def batched_multiclass_nms(
+    multi_bboxes: Tensor,
+    multi_scores: Tensor,
+    score_thr: float,
+    nms_cfg: ConfigType,
+    max_num: int = -1,
+    score_factors: Optional[Tensor] = None,
+    nms_pre: int = -1,
+    valid_mask: Optional[Tensor] = None,
+    return_inds: bool = False,
+    box_dim: int = 4
+) -> Union[Tuple[Tensor, Tensor, Tensor], Tuple[Tensor, Tensor, Tensor,
+                                                Tensor]]:
+    """NMS for multi-class bboxes of a batch of images at once.
+
+    The inputs are padded to the same number of boxes per image. The boxes
+    of each class are first reduced to their top ``nms_pre`` scores, then
+    suppressed by a greedy NMS computed with tensor operations on the
+    IoU matrices of all the images and classes. The outputs are padded too,
+    so there is no host synchronization and no data-dependent shape.
+
+    With ``nms_pre=-1`` the results are the ones of :func:`multiclass_nms`
+    on every image, up to the order of boxes with equal scores.
+
+    Args:
+        multi_bboxes (Tensor): shape (B, n, #class*4) or (B, n, 4).
+        multi_scores (Tensor): shape (B, n, #class), where the last column
+            contains scores of the background class, but this will be ignored.
+        score_thr (float): bbox threshold, bboxes with scores lower than it
+            will not be considered.
+        nms_cfg (Union[:obj:`ConfigDict`, dict]): a dict that contains
+            the arguments of nms operations, only ``type='nms'`` is
+            supported.
+        max_num (int, optional): if there are more than max_num bboxes after
+            NMS, only top max_num will be kept. Default to -1.
+        score_factors (Tensor, optional): The factors of shape (B, n)
+            multiplied to scores before applying NMS. Default to None.
+        nms_pre (int): Number of boxes of each class with the highest scores
+            kept before NMS, -1 to keep all of them. The NMS builds a
+            (B, #class, nms_pre, nms_pre) IoU tensor and runs ``nms_pre``
+            rounds of suppression, so keeping all the boxes is only suited
+            to small n. Default to -1.
+        valid_mask (Tensor, optional): Boolean mask of shape (B, n) of the
+            boxes that are not padding. Default to None.
+        return_inds (bool, optional): Whether return the indices of kept
+            bboxes. Default to False.
+        box_dim (int): The dimension of boxes, only 4 is supported.
+            Defaults to 4.
+
+    Returns:
+        Union[Tuple[Tensor, Tensor, Tensor], Tuple[Tensor, Tensor, Tensor,
+        Tensor]]: (dets, labels, valid, indices (optional)), tensors of
+            shape (B, k, 5), (B, k), (B, k) and (B, k). Dets are boxes with
+            scores sorted by decreasing score, labels are 0-based, valid
+            marks the kept detections and indices are the ones of
+            :func:`multiclass_nms`, i.e. ``box_index * #class + label``.
+            Padded detections are zeros with label -1.
+    """
+    nms_type = nms_cfg.get('type', 'nms')
+    assert nms_type == 'nms', \
+        f'batched_multiclass_nms only supports nms, but got {nms_type}'
+    assert box_dim == 4, 'batched_multiclass_nms only supports 4-dim boxes'
+    iou_threshold = nms_cfg.get('iou_threshold', nms_cfg.get('iou_thr'))
+    batch_size, num_boxes = multi_scores.shape[:2]
+    num_classes = multi_scores.size(2) - 1
+    if multi_bboxes.size(-1) > box_dim:
+        bboxes = multi_bboxes.view(batch_size, num_boxes, num_classes, box_dim)
+    else:
+        bboxes = multi_bboxes[:, :, None].expand(batch_size, num_boxes,
+                                                 num_classes, box_dim)
+
+    scores = multi_scores[..., :-1]
+    candidates = scores > score_thr
+    if valid_mask is not None:
+        candidates = candidates & valid_mask[..., None]
+    # multiply score_factor after threshold like multiclass_nms
+    if score_factors is not None:
+        scores = scores * score_factors[..., None]
+    scores = scores.masked_fill(~candidates, float('-inf'))
+
+    # per-class top-k before NMS, sorted by decreasing score
+    num_pre = num_boxes if nms_pre <= 0 else min(nms_pre, num_boxes)
+    scores, topk_inds = scores.transpose(1, 2).topk(num_pre, dim=2)
+    bboxes = bboxes.transpose(1, 2).gather(
+        2, topk_inds[..., None].expand(-1, -1, -1, box_dim))
+
+    # greedy NMS: a box is kept if no kept box with a higher score
+    # overlaps it more than the threshold
+    keep = torch.isfinite(scores)
+    suppress = (bbox_overlaps(bboxes, bboxes) > iou_threshold).triu_(1)
+    for i in range(num_pre):
+        keep = keep & ~(suppress[..., i, :] & keep[..., i:i + 1])
+
+    labels = torch.arange(num_classes, dtype=torch.long, device=scores.device)
+    labels = labels.view(1, -1, 1).expand_as(topk_inds)
+    scores = scores.masked_fill(~keep, float('-inf')).flatten(1)
+    num_dets = scores.size(1) if max_num <= 0 else min(max_num, scores.size(1))
+    scores, order = scores.topk(num_dets, dim=1)
+    valid = torch.isfinite(scores)
+    bbox_order = order[..., None].expand(-1, -1, box_dim)
+    bboxes = bboxes.flatten(1, 2).gather(1, bbox_order)
+    labels = labels.flatten(1).gather(1, order)
+
+    dets = torch.cat([bboxes, scores[..., None]], -1)
+    dets = dets.masked_fill(~valid[..., None], 0)
+    labels = labels.masked_fill(~valid, -1)
+    if return_inds:
+        inds = topk_inds * num_classes + torch.arange(
+            num_classes, device=scores.device).view(1, -1, 1)
+        inds = inds.flatten(1).gather(1, order).masked_fill(~valid, -1)
+        return dets, labels, valid, inds
+    else:
+        return dets, labels, valid
+
+
 def fast_nms(
     multi_bboxes: Tensor,
     multi_scores: Tensor,
@@ -10,7 +10,7 @@ from mmengine.structures import InstanceData
 from torch import Tensor
 from torch.nn.modules.utils import _pair
 
-from mmdet.models.layers import multiclass_nms
+from mmdet.models.layers import batched_multiclass_nms, multiclass_nms
 from mmdet.models.losses import accuracy
 from mmdet.models.task_modules.samplers import SamplingResult
 from mmdet.models.utils import empty_instances, multi_apply
@@ -459,6 +459,15 @@ class BBoxHead(BaseModule):
                   the last dimension 4 arrange as (x1, y1, x2, y2).
         """
         assert len(cls_scores) == len(bbox_preds)
+        if rcnn_test_cfg is not None and rcnn_test_cfg.get(
+                'batched_nms', False):
+            return self._predict_by_feat_batched(
+                rois=rois,
+                cls_scores=cls_scores,
+                bbox_preds=bbox_preds,
+                batch_img_metas=batch_img_metas,
+                rcnn_test_cfg=rcnn_test_cfg,
+                rescale=rescale)
         result_list = []
         for img_id in range(len(batch_img_metas)):
             img_meta = batch_img_metas[img_id]
@@ -519,6 +528,58 @@ class BBoxHead(BaseModule):
                                    num_classes=self.num_classes,
                                    score_per_cls=rcnn_test_cfg is None)[0]
 
+        bboxes, scores = self._decode_by_feat_single(
+            roi=roi,
+            cls_score=cls_score,
+            bbox_pred=bbox_pred,
+            img_meta=img_meta,
+            rescale=rescale)
+        class_agnostic = self.reg_class_agnostic or bbox_pred is None
+        num_reg_classes = 1 if class_agnostic else self.num_classes
+        box_dim = bboxes.size(-1) // num_reg_classes
+
+        if rcnn_test_cfg is None:
+            # This means that it is aug test.
+            # It needs to return the raw results without nms.
+            results.bboxes = bboxes
+            results.scores = scores
+        else:
+            det_bboxes, det_labels = multiclass_nms(
+                bboxes,
+                scores,
+                rcnn_test_cfg.score_thr,
+                rcnn_test_cfg.nms,
+                rcnn_test_cfg.max_per_img,
+                box_dim=box_dim)
+            results.bboxes = det_bboxes[:, :-1]
+            results.scores = det_bboxes[:, -1]
+            results.labels = det_labels
+        return results
+
+    def _decode_by_feat_single(self,
+                               roi: Tensor,
+                               cls_score: Tensor,
+                               bbox_pred: Tensor,
+                               img_meta: dict,
+                               rescale: bool = False) -> Tuple[Tensor, Tensor]:
+        """Decode the boxes and scores of a single image before NMS.
+
+        Args:
+            roi (Tensor): Boxes to be transformed. Has shape (num_boxes, 5).
+                last dimension 5 arrange as (batch_index, x1, y1, x2, y2).
+            cls_score (Tensor): Box scores, has shape
+                (num_boxes, num_classes + 1).
+            bbox_pred (Tensor): Box energies / deltas.
+                has shape (num_boxes, num_classes * 4).
+            img_meta (dict): image information.
+            rescale (bool): If True, return boxes in original image space.
+                Defaults to False.
+
+        Returns:
+            tuple[Tensor, Tensor]: Boxes of shape (num_boxes, num_classes *
+            box_dim) or (num_boxes, box_dim) and scores of shape
+            (num_boxes, num_classes + 1).
+        """
         # some loss (Seesaw loss..) may have custom activation
         if self.custom_cls_channels:
             scores = self.loss_cls.get_activation(cls_score)
@@ -549,26 +610,91 @@ class BBoxHead(BaseModule):
 
         # Get the inside tensor when `bboxes` is a box type
         bboxes = get_box_tensor(bboxes)
-        box_dim = bboxes.size(-1)
         bboxes = bboxes.view(num_rois, -1)
+        return bboxes, scores
+
+    def _predict_by_feat_batched(self,
+                                 rois: Tuple[Tensor],
+                                 cls_scores: Tuple[Tensor],
+                                 bbox_preds: Tuple[Tensor],
+                                 batch_img_metas: List[dict],
+                                 rcnn_test_cfg: ConfigDict,
+                                 rescale: bool = False) -> InstanceList:
+        """Transform a batch of output features into bbox results with a
+        single NMS for the whole batch.
+
+        Used when ``rcnn_test_cfg.batched_nms`` is True. The decoded boxes of
+        the images are padded to the same number, then
+        :func:`batched_multiclass_nms` keeps the top ``rcnn_test_cfg.nms_pre``
+        boxes of each class and runs the NMS of all the images at once.
+
+        The NMS builds a (B, #class, nms_pre, nms_pre) IoU tensor and runs
+        ``nms_pre`` rounds of suppression, so ``nms_pre`` must be positive.
+        It defaults to ``rcnn_test_cfg.max_per_img``. The results match
+        :func:`multiclass_nms` as long as no class has more than
+        ``nms_pre`` boxes above ``score_thr``.
 
-        if rcnn_test_cfg is None:
-            # This means that it is aug test.
-            # It needs to return the raw results without nms.
-            results.bboxes = bboxes
-            results.scores = scores
-        else:
-            det_bboxes, det_labels = multiclass_nms(
-                bboxes,
-                scores,
-                rcnn_test_cfg.score_thr,
-                rcnn_test_cfg.nms,
-                rcnn_test_cfg.max_per_img,
-                box_dim=box_dim)
-            results.bboxes = det_bboxes[:, :-1]
-            results.scores = det_bboxes[:, -1]
-            results.labels = det_labels
-        return results
+        Args:
+            rois (tuple[Tensor]): Tuple of boxes to be transformed.
+            cls_scores (tuple[Tensor]): Tuple of box scores.
+            bbox_preds (tuple[Tensor]): Tuple of box energies / deltas.
+            batch_img_metas (list[dict]): List of image information.
+            rcnn_test_cfg (obj:`ConfigDict`): `test_cfg` of R-CNN.
+            rescale (bool): If True, return boxes in original image space.
+                Defaults to False.
+
+        Returns:
+            list[:obj:`InstanceData`]: Detection results of each image.
+        """
+        nms_pre = rcnn_test_cfg.get('nms_pre', rcnn_test_cfg.max_per_img)
+        assert nms_pre > 0, \
+            'batched_nms requires a positive nms_pre (or max_per_img) ' \
+            f'to bound the IoU tensor of each class, but got {nms_pre}'
+        num_imgs = len(batch_img_metas)
+        num_rois = [roi.size(0) for roi in rois]
+        max_rois = max(num_rois)
+        num_classes = self.num_classes
+        box_dim = self.bbox_coder.encode_size
+        reg_dim = box_dim if self.reg_class_agnostic or bbox_preds[
+            0] is None else num_classes * box_dim
+        device = rois[0].device
+        batch_bboxes = rois[0].new_zeros((num_imgs, max_rois, reg_dim))
+        batch_scores = rois[0].new_zeros((num_imgs, max_rois, num_classes + 1))
+        valid_mask = torch.zeros((num_imgs, max_rois),
+                                 dtype=torch.bool,
+                                 device=device)
+        for img_id, img_meta in enumerate(batch_img_metas):
+            if num_rois[img_id] == 0:
+                continue
+            bboxes, scores = self._decode_by_feat_single(
+                roi=rois[img_id],
+                cls_score=cls_scores[img_id],
+                bbox_pred=bbox_preds[img_id],
+                img_meta=img_meta,
+                rescale=rescale)
+            batch_bboxes[img_id, :num_rois[img_id]] = bboxes
+            batch_scores[img_id, :num_rois[img_id]] = scores
+            valid_mask[img_id, :num_rois[img_id]] = True
+
+        dets, labels, valid = batched_multiclass_nms(
+            batch_bboxes,
+            batch_scores,
+            rcnn_test_cfg.score_thr,
+            rcnn_test_cfg.nms,
+            rcnn_test_cfg.max_per_img,
+            nms_pre=nms_pre,
+            valid_mask=valid_mask,
+            box_dim=box_dim)
+        # the detections are sorted, a single sync gives their numbers
+        num_dets = valid.sum(dim=1).tolist()
+        result_list = []
+        for img_id in range(num_imgs):
+            results = InstanceData()
+            results.bboxes = dets[img_id, :num_dets[img_id], :-1]
+            results.scores = dets[img_id, :num_dets[img_id], -1]
+            results.labels = labels[img_id, :num_dets[img_id]]
+            result_list.append(results)
+        return result_list
 
     def refine_bboxes(self, sampling_results: Union[List[SamplingResult],
                                                     InstanceList],
@@ -7,7 +7,8 @@ from mmengine.structures import InstanceData
 from torch import Tensor
 
 from mmdet.registry import TASK_UTILS
-from mmdet.utils import ConfigType
+from mmdet.structures.bbox import get_box_tensor
+from mmdet.utils import ConfigType, InstanceList, OptInstanceList
 from .assign_result import AssignResult
 from .base_assigner import BaseAssigner
 
@@ -252,3 +253,169 @@ class ATSSAssigner(BaseAssigner):
                                                   1]
         return AssignResult(
             num_gt, assigned_gt_inds, max_overlaps, labels=assigned_labels)
+
+    def batch_assign(
+        self,
+        batch_pred_instances: InstanceList,
+        batch_num_level_priors: List[List[int]],
+        batch_gt_instances: InstanceList,
+        batch_gt_instances_ignore: OptInstanceList = None
+    ) -> List[AssignResult]:
+        """Assign gt to the priors of a batch of images.
+
+        The priors and gts of the images are padded and assigned at once,
+        with the same steps as :meth:`assign`. The priors of each level are
+        padded to the largest number of priors of the level in the batch, so
+        that the candidates are still selected level by level, the padded
+        priors being the farthest ones. The results are the same as
+        assigning the images one by one, up to the ties of the center
+        distances.
+
+        The dynamic cost ATSSAssigner, i.e. ``alpha`` is not None, assigns
+        the images one by one.
+
+        Args:
+            batch_pred_instances (list[:obj:`InstanceData`]): Instances of
+                model predictions of each image. It includes ``priors``.
+            batch_num_level_priors (list[list[int]]): Number of priors in
+                each level of each image.
+            batch_gt_instances (list[:obj:`InstanceData`]): Ground truth of
+                instance annotations of each image. It usually includes
+                ``bboxes`` and ``labels``.
+            batch_gt_instances_ignore (list[:obj:`InstanceData`], optional):
+                Instances to be ignored during training of each image. It
+                includes ``bboxes``. Defaults to None.
+
+        Returns:
+            list[:obj:`AssignResult`]: The assign result of each image.
+        """
+        num_imgs = len(batch_gt_instances)
+        if batch_gt_instances_ignore is None:
+            batch_gt_instances_ignore = [None] * num_imgs
+        num_gts = [len(gt_instances) for gt_instances in batch_gt_instances]
+        if self.alpha is not None or max(num_gts) == 0 or any(
+                'scores' in pred_instances or 'bboxes' in pred_instances
+                for pred_instances in batch_pred_instances):
+            return [
+                self.assign(*args)
+                for args in zip(batch_pred_instances, batch_num_level_priors,
+                                batch_gt_instances, batch_gt_instances_ignore)
+            ]
+
+        INF = 100000000
+        gt_bboxes, gt_valid_mask = self.pad_batch([
+            get_box_tensor(gt_instances.bboxes)
+            for gt_instances in batch_gt_instances
+        ])
+        gt_labels, _ = self.pad_batch(
+            [gt_instances.labels for gt_instances in batch_gt_instances], -1)
+        device = gt_bboxes.device
+
+        # pad the priors of each level to the largest number of priors of
+        # the level in the batch
+        level_sizes = torch.tensor(batch_num_level_priors, device=device)
+        max_level_sizes = level_sizes.max(dim=0)[0].tolist()
+        level_starts = [0]
+        for max_level_size in max_level_sizes:
+            level_starts.append(level_starts[-1] + max_level_size)
+        num_priors = level_starts[-1]
+        priors = gt_bboxes.new_zeros((num_imgs, num_priors, 4))
+        prior_valid_mask = priors.new_zeros((num_imgs, num_priors),
+                                            dtype=torch.bool)
+        for img_id, (pred_instances, num_level_priors) in enumerate(
+                zip(batch_pred_instances, batch_num_level_priors)):
+            prior_inds = torch.cat([
+                torch.arange(level_size, device=device) + start
+                for level_size, start in zip(num_level_priors, level_starts)
+            ])
+            priors[img_id,
+                   prior_inds] = get_box_tensor(pred_instances.priors)[:, :4]
+            prior_valid_mask[img_id, prior_inds] = True
+
+        # compute iou and center distance between all prior and gt
+        overlaps = self.iou_calculator(priors, gt_bboxes)
+        priors_points = (priors[..., :2] + priors[..., 2:]) / 2.0
+        gt_points = (gt_bboxes[..., :2] + gt_bboxes[..., 2:]) / 2.0
+        distances = (priors_points[:, :, None] -
+                     gt_points[:, None]).pow(2).sum(-1).sqrt()
+
+        # assign 0 by default
+        assigned_gt_inds = priors.new_zeros((num_imgs, num_priors),
+                                            dtype=torch.long)
+        if self.ignore_iof_thr > 0 and any(
+                gt_instances_ignore is not None
+                and len(gt_instances_ignore) > 0
+                for gt_instances_ignore in batch_gt_instances_ignore):
+            gt_bboxes_ignore, _ = self.pad_batch([
+                gt_bboxes.new_zeros((0, 4)) if gt_instances_ignore is None else
+                get_box_tensor(gt_instances_ignore.bboxes)
+                for gt_instances_ignore in batch_gt_instances_ignore
+            ])
+            ignore_overlaps = self.iou_calculator(
+                priors, gt_bboxes_ignore, mode='iof')
+            ignore_idxs = ignore_overlaps.max(dim=-1)[0] > self.ignore_iof_thr
+            distances[ignore_idxs] = INF
+            assigned_gt_inds[ignore_idxs] = -1
+        # the padded priors are never candidates of the real ones
+        distances[~prior_valid_mask] = float('inf')
+
+        # Selecting candidates based on the center distance
+        candidate_idxs, candidate_valid_mask = [], []
+        for level, max_level_size in enumerate(max_level_sizes):
+            start_idx = level_starts[level]
+            end_idx = start_idx + max_level_size
+            selectable_k = min(self.topk, max_level_size)
+            _, topk_idxs_per_level = distances[:, start_idx:end_idx].topk(
+                selectable_k, dim=1, largest=False)
+            candidate_idxs.append(topk_idxs_per_level + start_idx)
+            # the images with fewer priors in the level select padded ones
+            candidate_valid_mask.append(
+                torch.arange(selectable_k, device=device) < level_sizes[:,
+                                                                        level,
+                                                                        None])
+        candidate_idxs = torch.cat(candidate_idxs, dim=1)
+        candidate_valid_mask = torch.cat(
+            candidate_valid_mask, dim=1)[..., None]
+
+        # compute the mean and std of the iou of the valid candidates, set
+        # mean + std as the iou threshold
+        candidate_overlaps = overlaps.gather(1, candidate_idxs)
+        num_candidates = candidate_valid_mask.sum(dim=1)
+        overlaps_mean_per_gt = (candidate_overlaps * candidate_valid_mask).sum(
+            dim=1) / num_candidates
+        overlaps_std_per_gt = (
+            (candidate_overlaps - overlaps_mean_per_gt[:, None]).pow(2) *
+            candidate_valid_mask).sum(dim=1).div(num_candidates - 1).sqrt()
+        overlaps_thr_per_gt = overlaps_mean_per_gt + overlaps_std_per_gt
+        is_pos = candidate_overlaps >= overlaps_thr_per_gt[:, None]
+        is_pos &= candidate_valid_mask & gt_valid_mask[:, None]
+
+        # limit the positive sample's center in gt
+        candidate_points = priors_points.gather(
+            1,
+            candidate_idxs.flatten(1)[..., None].expand(-1, -1, 2)).view(
+                *candidate_idxs.shape, 2)
+        lt_ = candidate_points - gt_bboxes[:, None, :, :2]
+        rb_ = gt_bboxes[:, None, :, 2:] - candidate_points
+        is_in_gts = torch.cat([lt_, rb_], dim=-1).min(dim=-1)[0] > 0.01
+        is_pos &= is_in_gts
+
+        # if an anchor box is assigned to multiple gts,
+        # the one with the highest IoU will be selected.
+        overlaps_inf = torch.full_like(overlaps, -INF).scatter_(
+            1, candidate_idxs, candidate_overlaps.masked_fill(~is_pos, -INF))
+        max_overlaps, argmax_overlaps = overlaps_inf.max(dim=2)
+        assigned_gt_inds = torch.where(max_overlaps != -INF,
+                                       argmax_overlaps + 1, assigned_gt_inds)
+
+        # images without any gt are background
+        no_gts = ~gt_valid_mask.any(dim=1)
+        assigned_gt_inds[no_gts] = 0
+        max_overlaps[no_gts] = 0
+
+        assigned_labels = torch.where(
+            assigned_gt_inds > 0,
+            gt_labels.gather(1, (assigned_gt_inds - 1).clamp(min=0)),
+            assigned_gt_inds.new_tensor(-1))
+        return self.split_batch(num_gts, prior_valid_mask, assigned_gt_inds,
+                                max_overlaps, assigned_labels)
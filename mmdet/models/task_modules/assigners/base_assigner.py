@@ -1,8 +1,14 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from abc import ABCMeta, abstractmethod
-from typing import Optional
+from typing import List, Optional, Sequence, Tuple
 
+import torch
 from mmengine.structures import InstanceData
+from torch import Tensor
+from torch.nn.utils.rnn import pad_sequence
+
+from mmdet.utils import InstanceList, OptInstanceList
+from .assign_result import AssignResult
 
 
 class BaseAssigner(metaclass=ABCMeta):
@@ -15,3 +21,100 @@ class BaseAssigner(metaclass=ABCMeta):
                gt_instances_ignore: Optional[InstanceData] = None,
                **kwargs):
         """Assign boxes to either a ground truth boxes or a negative boxes."""
+
+    def batch_assign(self,
+                     batch_pred_instances: InstanceList,
+                     batch_gt_instances: InstanceList,
+                     batch_gt_instances_ignore: OptInstanceList = None,
+                     **kwargs) -> List[AssignResult]:
+        """Assign the boxes of a batch of images.
+
+        The images are assigned one by one with :meth:`assign` by default.
+        The assigners which can assign the padded boxes of all the images
+        with the same tensor ops override it.
+
+        Args:
+            batch_pred_instances (list[:obj:`InstanceData`]): Instances of
+                model predictions of each image.
+            batch_gt_instances (list[:obj:`InstanceData`]): Ground truth of
+                instance annotations of each image.
+            batch_gt_instances_ignore (list[:obj:`InstanceData`], optional):
+                Instances to be ignored during training of each image.
+                Defaults to None.
+
+        Returns:
+            list[:obj:`AssignResult`]: The assign result of each image.
+        """
+        if batch_gt_instances_ignore is None:
+            batch_gt_instances_ignore = [None] * len(batch_gt_instances)
+        return [
+            self.assign(pred_instances, gt_instances, gt_instances_ignore,
+                        **kwargs)
+            for pred_instances, gt_instances, gt_instances_ignore in zip(
+                batch_pred_instances, batch_gt_instances,
+                batch_gt_instances_ignore)
+        ]
+
+    @staticmethod
+    def pad_batch(tensors: Sequence[Tensor],
+                  padding_value: float = 0) -> Tuple[Tensor, Tensor]:
+        """Stack the tensors of the images, padded to the longest one.
+
+        Args:
+            tensors (Sequence[Tensor]): The tensor of each image, of shape
+                (n_i, ...).
+            padding_value (float): The value of the padding. Defaults to 0.
+
+        Returns:
+            tuple[Tensor, Tensor]: The padded tensor of shape (B, n, ...),
+            and the mask of the elements which are not padding, of shape
+            (B, n).
+        """
+        padded = pad_sequence(
+            list(tensors), batch_first=True, padding_value=padding_value)
+        lengths = padded.new_tensor([len(tensor) for tensor in tensors],
+                                    dtype=torch.long)
+        valid_mask = torch.arange(
+            padded.size(1), device=padded.device) < lengths[:, None]
+        return padded, valid_mask
+
+    @staticmethod
+    def split_batch(num_gts: Sequence[int], prior_valid_mask: Tensor,
+                    gt_inds: Tensor, max_overlaps: Tensor, labels: Tensor,
+                    **properties) -> List[AssignResult]:
+        """Split the padded assignment of a batch into the results of the
+        images.
+
+        Args:
+            num_gts (Sequence[int]): The number of gts of each image.
+            prior_valid_mask (Tensor): The mask of the priors which are not
+                padding, of shape (B, n). The priors of an image keep their
+                order in the padded priors.
+            gt_inds (Tensor): The assigned gt indices, of shape (B, n).
+            max_overlaps (Tensor): The max overlaps, of shape (B, n).
+            labels (Tensor): The assigned labels, of shape (B, n).
+            **properties: Other assigned values of shape (B, n), set as
+                properties of the results, e.g. ``assign_metrics``.
+
+        Returns:
+            list[:obj:`AssignResult`]: The assign result of each image.
+        """
+        num_priors = prior_valid_mask.sum(dim=1).tolist()
+        fields = dict(
+            gt_inds=gt_inds, max_overlaps=max_overlaps, labels=labels)
+        fields.update(properties)
+        fields = {
+            name: value[prior_valid_mask].split(num_priors)
+            for name, value in fields.items()
+        }
+        assign_results = []
+        for i, num_gt in enumerate(num_gts):
+            assign_result = AssignResult(
+                num_gt,
+                fields['gt_inds'][i],
+                fields['max_overlaps'][i],
+                labels=fields['labels'][i])
+            for name in properties:
+                setattr(assign_result, name, fields[name][i])
+            assign_results.append(assign_result)
+        return assign_results
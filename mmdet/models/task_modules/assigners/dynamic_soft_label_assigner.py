@@ -1,5 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import torch
 import torch.nn.functional as F
@@ -8,7 +8,7 @@ from torch import Tensor
 
 from mmdet.registry import TASK_UTILS
 from mmdet.structures.bbox import BaseBoxes
-from mmdet.utils import ConfigType
+from mmdet.utils import ConfigType, InstanceList, OptInstanceList
 from .assign_result import AssignResult
 from .base_assigner import BaseAssigner
 
@@ -183,6 +183,180 @@ class DynamicSoftLabelAssigner(BaseAssigner):
         return AssignResult(
             num_gt, assigned_gt_inds, max_overlaps, labels=assigned_labels)
 
+    def batch_assign(self,
+                     batch_pred_instances: InstanceList,
+                     batch_gt_instances: InstanceList,
+                     batch_gt_instances_ignore: OptInstanceList = None,
+                     **kwargs) -> List[AssignResult]:
+        """Assign gt to the priors of a batch of images.
+
+        The priors inside the gts of each image are gathered and padded to
+        the largest number of such priors in the batch, and assigned at once
+        with the same steps as :meth:`assign`, the padded priors and gts
+        having an infinite cost. The results are the same as assigning the
+        images one by one, up to the ties of the costs.
+
+        The gts with ``masks``, or with bboxes of :obj:`BaseBoxes`, are
+        assigned image by image.
+
+        Args:
+            batch_pred_instances (list[:obj:`InstanceData`]): Instances of
+                model predictions of each image. It includes ``priors``,
+                ``bboxes`` and ``scores``.
+            batch_gt_instances (list[:obj:`InstanceData`]): Ground truth of
+                instance annotations of each image. It usually includes
+                ``bboxes`` and ``labels``.
+            batch_gt_instances_ignore (list[:obj:`InstanceData`], optional):
+                Instances to be ignored during training of each image.
+                Defaults to None.
+
+        Returns:
+            list[:obj:`AssignResult`]: The assign result of each image.
+        """
+        num_gts = [len(gt_instances) for gt_instances in batch_gt_instances]
+        if max(num_gts) == 0 or any(
+                hasattr(gt_instances, 'masks')
+                or isinstance(gt_instances.bboxes, BaseBoxes)
+                for gt_instances in batch_gt_instances):
+            return super().batch_assign(batch_pred_instances,
+                                        batch_gt_instances,
+                                        batch_gt_instances_ignore)
+
+        priors, prior_valid_mask = self.pad_batch(
+            [pred_instances.priors for pred_instances in batch_pred_instances])
+        decoded_bboxes, _ = self.pad_batch(
+            [pred_instances.bboxes for pred_instances in batch_pred_instances])
+        pred_scores, _ = self.pad_batch(
+            [pred_instances.scores for pred_instances in batch_pred_instances])
+        gt_bboxes, gt_valid_mask = self.pad_batch(
+            [gt_instances.bboxes for gt_instances in batch_gt_instances])
+        gt_labels, _ = self.pad_batch(
+            [gt_instances.labels for gt_instances in batch_gt_instances], -1)
+        num_imgs, num_bboxes = priors.shape[:2]
+        num_gt = gt_bboxes.size(1)
+
+        prior_center = priors[..., :2]
+        lt_ = prior_center[:, :, None] - gt_bboxes[:, None, :, :2]
+        rb_ = gt_bboxes[:, None, :, 2:] - prior_center[:, :, None]
+        deltas = torch.cat([lt_, rb_], dim=-1)
+        is_in_gts = (deltas.min(dim=-1).values > 0) & gt_valid_mask[:, None]
+        valid_mask = is_in_gts.any(dim=2) & prior_valid_mask
+
+        # gather the valid priors of each image in front, in their order
+        num_valid = valid_mask.sum(dim=1)
+        max_num_valid = int(num_valid.max())
+        assigned_gt_inds = priors.new_zeros((num_imgs, num_bboxes),
+                                            dtype=torch.long)
+        assigned_labels = torch.full_like(assigned_gt_inds, -1)
+        max_overlaps = priors.new_full((num_imgs, num_bboxes),
+                                       -INF,
+                                       dtype=torch.float32)
+        # the images without valid priors have no assignment
+        max_overlaps[num_valid == 0] = 0
+        if max_num_valid == 0:
+            return self.split_batch(num_gts, prior_valid_mask,
+                                    assigned_gt_inds, max_overlaps,
+                                    assigned_labels)
+        valid_inds = torch.sort(
+            (~valid_mask).byte(), dim=1, stable=True)[1][:, :max_num_valid]
+        valid_slot_mask = torch.arange(
+            max_num_valid, device=priors.device) < num_valid[:, None]
+        valid_pair_mask = valid_slot_mask[..., None] & gt_valid_mask[:, None]
+
+        def gather_valid(tensor: Tensor) -> Tensor:
+            return tensor.gather(
+                1, valid_inds[..., None].expand(-1, -1, tensor.size(-1)))
+
+        valid_prior = gather_valid(priors)
+        valid_decoded_bbox = gather_valid(decoded_bboxes)
+        valid_pred_scores = gather_valid(pred_scores)
+
+        gt_center = (gt_bboxes[..., :2] + gt_bboxes[..., 2:]) / 2.0
+        strides = valid_prior[..., 2]
+        distance = (valid_prior[:, :, None, :2] - gt_center[:, None]
+                    ).pow(2).sum(-1).sqrt() / strides[..., None]
+        soft_center_prior = torch.pow(10, distance - self.soft_center_radius)
+
+        pairwise_ious = self.iou_calculator(valid_decoded_bbox, gt_bboxes)
+        pairwise_ious = pairwise_ious.masked_fill(~valid_pair_mask, 0)
+        iou_cost = -torch.log(pairwise_ious + EPS) * self.iou_weight
+
+        gt_onehot_label = F.one_hot(
+            gt_labels.clamp(min=0).to(torch.int64),
+            pred_scores.shape[-1]).float()[:, None].expand(
+                -1, max_num_valid, -1, -1)
+        valid_pred_scores = valid_pred_scores[:, :,
+                                              None].expand(-1, -1, num_gt, -1)
+
+        soft_label = gt_onehot_label * pairwise_ious[..., None]
+        scale_factor = soft_label - valid_pred_scores.sigmoid()
+        soft_cls_cost = F.binary_cross_entropy_with_logits(
+            valid_pred_scores, soft_label,
+            reduction='none') * scale_factor.abs().pow(2.0)
+        soft_cls_cost = soft_cls_cost.sum(dim=-1)
+
+        cost_matrix = soft_cls_cost + iou_cost + soft_center_prior
+        cost_matrix = cost_matrix.masked_fill(~valid_pair_mask, float('inf'))
+
+        matching_matrix = self.batch_dynamic_k_matching(
+            cost_matrix, pairwise_ious, valid_pair_mask)
+
+        # convert to AssignResult format
+        fg_mask = matching_matrix.sum(dim=2) > 0
+        matched_gt_inds = matching_matrix.argmax(dim=2)
+        matched_pred_ious = (matching_matrix * pairwise_ious).sum(dim=2)
+        img_inds, valid_idxs = fg_mask.nonzero(as_tuple=True)
+        prior_inds = valid_inds[img_inds, valid_idxs]
+        matched_gt_inds = matched_gt_inds[img_inds, valid_idxs]
+        assigned_gt_inds[img_inds, prior_inds] = matched_gt_inds + 1
+        assigned_labels[img_inds,
+                        prior_inds] = gt_labels[img_inds,
+                                                matched_gt_inds].long()
+        max_overlaps[img_inds, prior_inds] = matched_pred_ious[img_inds,
+                                                               valid_idxs]
+        return self.split_batch(num_gts, prior_valid_mask, assigned_gt_inds,
+                                max_overlaps, assigned_labels)
+
+    def batch_dynamic_k_matching(self, cost: Tensor, pairwise_ious: Tensor,
+                                 valid_pair_mask: Tensor) -> Tensor:
+        """Batched :meth:`dynamic_k_matching` of the padded priors and gts.
+
+        Args:
+            cost (Tensor): Cost matrix, of shape (B, n, k). The padded pairs
+                have an infinite cost.
+            pairwise_ious (Tensor): Pairwise iou matrix, of shape (B, n, k).
+                The padded pairs have a zero iou.
+            valid_pair_mask (Tensor): The mask of the pairs of priors and gts
+                which are not padding, of shape (B, n, k).
+
+        Returns:
+            Tensor: The matching matrix of shape (B, n, k), with at most one
+            matched gt for each prior.
+        """
+        matching_matrix = torch.zeros_like(cost, dtype=torch.uint8)
+        # select candidate topk ious for dynamic-k calculation
+        candidate_topk = min(self.topk, pairwise_ious.size(1))
+        topk_ious, _ = torch.topk(pairwise_ious, candidate_topk, dim=1)
+        # calculate dynamic k for each gt, the padded gts and the gts of the
+        # images without valid priors match no prior
+        dynamic_ks = torch.clamp(topk_ious.sum(1).int(), min=1)
+        dynamic_ks = dynamic_ks.masked_fill(~valid_pair_mask.any(dim=1), 0)
+        max_k = int(dynamic_ks.max())
+        _, pos_idx = torch.topk(cost, k=max_k, dim=1, largest=False)
+        is_matched = torch.arange(
+            max_k, device=cost.device)[:, None] < dynamic_ks[:, None]
+        matching_matrix.scatter_(1, pos_idx, is_matched.to(torch.uint8))
+        matching_matrix &= valid_pair_mask
+
+        # the priors matched by several gts keep the gt of the lowest cost
+        prior_match_gt_mask = matching_matrix.sum(2) > 1
+        cost_argmin = cost.argmin(dim=2)
+        matching_matrix = torch.where(
+            prior_match_gt_mask[..., None],
+            F.one_hot(cost_argmin, cost.size(2)).to(torch.uint8),
+            matching_matrix)
+        return matching_matrix
+
     def dynamic_k_matching(self, cost: Tensor, pairwise_ious: Tensor,
                            num_gt: int,
                            valid_mask: Tensor) -> Tuple[Tensor, Tensor]:
@@ -1,11 +1,13 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import Optional, Union
+from typing import Iterator, List, Optional, Tuple, Union
 
 import torch
 from mmengine.structures import InstanceData
 from torch import Tensor
 
 from mmdet.registry import TASK_UTILS
+from mmdet.structures.bbox import get_box_tensor
+from mmdet.utils import InstanceList, OptInstanceList
 from .assign_result import AssignResult
 from .base_assigner import BaseAssigner
 
@@ -45,6 +47,12 @@ class MaxIoUAssigner(BaseAssigner):
             assign. When the number of gt is above this threshold, will assign
             on CPU device. Negative values mean not assign on CPU.
         iou_calculator (dict): Config of overlaps Calculator.
+        chunk_size (int): The number of priors whose overlaps with the gts
+            are computed at once. Only the running maximum overlaps of the
+            priors and of the gts are kept, so the overlaps of all the priors
+            are never materialized, e.g. for crowded images with many gts.
+            Negative values mean computing all the overlaps at once.
+            Defaults to -1.
     """
 
     def __init__(self,
@@ -56,7 +64,8 @@ class MaxIoUAssigner(BaseAssigner):
                  ignore_wrt_candidates: bool = True,
                  match_low_quality: bool = True,
                  gpu_assign_thr: float = -1,
-                 iou_calculator: dict = dict(type='BboxOverlaps2D')):
+                 iou_calculator: dict = dict(type='BboxOverlaps2D'),
+                 chunk_size: int = -1):
         self.pos_iou_thr = pos_iou_thr
         self.neg_iou_thr = neg_iou_thr
         self.min_pos_iou = min_pos_iou
@@ -66,6 +75,7 @@ class MaxIoUAssigner(BaseAssigner):
         self.gpu_assign_thr = gpu_assign_thr
         self.match_low_quality = match_low_quality
         self.iou_calculator = TASK_UTILS.build(iou_calculator)
+        self.chunk_size = chunk_size
 
     def assign(self,
                pred_instances: InstanceData,
@@ -137,21 +147,20 @@ class MaxIoUAssigner(BaseAssigner):
             if gt_bboxes_ignore is not None:
                 gt_bboxes_ignore = gt_bboxes_ignore.cpu()
 
-        overlaps = self.iou_calculator(gt_bboxes, priors)
-
-        if (self.ignore_iof_thr > 0 and gt_bboxes_ignore is not None
-                and gt_bboxes_ignore.numel() > 0 and priors.numel() > 0):
-            if self.ignore_wrt_candidates:
-                ignore_overlaps = self.iou_calculator(
-                    priors, gt_bboxes_ignore, mode='iof')
-                ignore_max_overlaps, _ = ignore_overlaps.max(dim=1)
-            else:
-                ignore_overlaps = self.iou_calculator(
-                    gt_bboxes_ignore, priors, mode='iof')
-                ignore_max_overlaps, _ = ignore_overlaps.max(dim=0)
-            overlaps[:, ignore_max_overlaps > self.ignore_iof_thr] = -1
-
-        assign_result = self.assign_wrt_overlaps(overlaps, gt_labels)
+        if 0 < self.chunk_size < priors.size(0):
+            gt_inds, max_overlaps, labels = self.assign_wrt_chunks(
+                gt_bboxes, priors, gt_labels, gt_bboxes_ignore)
+            assign_result = AssignResult(
+                num_gts=gt_bboxes.size(0),
+                gt_inds=gt_inds,
+                max_overlaps=max_overlaps,
+                labels=labels)
+        else:
+            overlaps = self.iou_calculator(gt_bboxes, priors)
+            ignore_mask = self.get_ignore_mask(priors, gt_bboxes_ignore)
+            if ignore_mask is not None:
+                overlaps[:, ignore_mask] = -1
+            assign_result = self.assign_wrt_overlaps(overlaps, gt_labels)
         if assign_on_cpu:
             assign_result.gt_inds = assign_result.gt_inds.to(device)
             assign_result.max_overlaps = assign_result.max_overlaps.to(device)
@@ -159,6 +168,66 @@ class MaxIoUAssigner(BaseAssigner):
                 assign_result.labels = assign_result.labels.to(device)
         return assign_result
 
+    def batch_assign(self,
+                     batch_pred_instances: InstanceList,
+                     batch_gt_instances: InstanceList,
+                     batch_gt_instances_ignore: OptInstanceList = None,
+                     **kwargs) -> List[AssignResult]:
+        """Assign gt to the bboxes of a batch of images.
+
+        The priors, gts and ignored gts of the images are padded and assigned
+        at once by :meth:`assign_wrt_chunks`, with the same results as
+        assigning the images one by one with :meth:`assign`. The images are
+        assigned one by one if one of them has more than ``gpu_assign_thr``
+        gts.
+
+        Args:
+            batch_pred_instances (list[:obj:`InstanceData`]): Instances of
+                model predictions of each image. It includes ``priors``.
+            batch_gt_instances (list[:obj:`InstanceData`]): Ground truth of
+                instance annotations of each image. It usually includes
+                ``bboxes`` and ``labels``.
+            batch_gt_instances_ignore (list[:obj:`InstanceData`], optional):
+                Instances to be ignored during training of each image. It
+                includes ``bboxes``. Defaults to None.
+
+        Returns:
+            list[:obj:`AssignResult`]: The assign result of each image.
+        """
+        num_gts = [len(gt_instances) for gt_instances in batch_gt_instances]
+        if self.gpu_assign_thr > 0 and max(num_gts) > self.gpu_assign_thr:
+            return super().batch_assign(batch_pred_instances,
+                                        batch_gt_instances,
+                                        batch_gt_instances_ignore)
+
+        priors, prior_valid_mask = self.pad_batch([
+            get_box_tensor(pred_instances.priors)
+            for pred_instances in batch_pred_instances
+        ])
+        gt_bboxes, gt_valid_mask = self.pad_batch([
+            get_box_tensor(gt_instances.bboxes)
+            for gt_instances in batch_gt_instances
+        ])
+        gt_labels, _ = self.pad_batch(
+            [gt_instances.labels for gt_instances in batch_gt_instances], -1)
+        gt_bboxes_ignore = None
+        if batch_gt_instances_ignore is not None and any(
+                gt_instances_ignore is not None
+                for gt_instances_ignore in batch_gt_instances_ignore):
+            # the images without ignored gts are padded with all zeros boxes
+            gt_bboxes_ignore, _ = self.pad_batch([
+                gt_bboxes.new_zeros(
+                    (0, gt_bboxes.size(-1))) if gt_instances_ignore is None
+                else get_box_tensor(gt_instances_ignore.bboxes)
+                for gt_instances_ignore in batch_gt_instances_ignore
+            ])
+
+        gt_inds, max_overlaps, labels = self.assign_wrt_chunks(
+            gt_bboxes, priors, gt_labels, gt_bboxes_ignore, gt_valid_mask,
+            prior_valid_mask)
+        return self.split_batch(num_gts, prior_valid_mask, gt_inds,
+                                max_overlaps, labels)
+
     def assign_wrt_overlaps(self, overlaps: Tensor,
                             gt_labels: Tensor) -> AssignResult:
         """Assign w.r.t. the overlaps of priors with gts.
@@ -223,13 +292,21 @@ class MaxIoUAssigner(BaseAssigner):
             # However, if GT bbox 2's gt_argmax_overlaps = A, bbox A's
             # assigned_gt_inds will be overwritten to be bbox 2.
             # This might be the reason that it is not used in ROI Heads.
-            for i in range(num_gts):
-                if gt_max_overlaps[i] >= self.min_pos_iou:
-                    if self.gt_max_assign_all:
-                        max_iou_inds = overlaps[i, :] == gt_max_overlaps[i]
-                        assigned_gt_inds[max_iou_inds] = i + 1
-                    else:
-                        assigned_gt_inds[gt_argmax_overlaps[i]] = i + 1
+            if self.gt_max_assign_all:
+                gt_inds, prior_inds = (
+                    (overlaps == gt_max_overlaps[:, None])
+                    & (gt_max_overlaps >= self.min_pos_iou)[:, None]).nonzero(
+                        as_tuple=True)
+            else:
+                gt_inds = torch.nonzero(
+                    gt_max_overlaps >= self.min_pos_iou).flatten()
+                prior_inds = gt_argmax_overlaps[gt_inds]
+            # the gts are matched in turn, a prior gets the last one
+            low_quality_inds = self._scatter_last_gt(
+                torch.zeros_like(gt_inds), gt_inds, prior_inds,
+                assigned_gt_inds[None])[0]
+            assigned_gt_inds = torch.where(low_quality_inds > 0,
+                                           low_quality_inds, assigned_gt_inds)
 
         assigned_labels = assigned_gt_inds.new_full((num_bboxes, ), -1)
         pos_inds = torch.nonzero(
@@ -243,3 +320,279 @@ class MaxIoUAssigner(BaseAssigner):
             gt_inds=assigned_gt_inds,
             max_overlaps=max_overlaps,
             labels=assigned_labels)
+
+    def get_ignore_mask(
+            self,
+            priors: Tensor,
+            gt_bboxes_ignore: Optional[Tensor] = None) -> Optional[Tensor]:
+        """Get the mask of the priors overlapping the ignored gts.
+
+        Args:
+            priors (Tensor): The priors, of shape (..., n, 4).
+            gt_bboxes_ignore (Tensor, optional): The ignored gts, of shape
+                (..., m, 4). Padded ignored gts should be all zeros.
+
+        Returns:
+            Tensor | None: The mask of shape (..., n), or None if no prior
+            is ignored.
+        """
+        if (self.ignore_iof_thr <= 0 or gt_bboxes_ignore is None
+                or gt_bboxes_ignore.numel() == 0 or priors.numel() == 0):
+            return None
+        if self.ignore_wrt_candidates:
+            ignore_overlaps = self.iou_calculator(
+                priors, gt_bboxes_ignore, mode='iof')
+            ignore_max_overlaps, _ = ignore_overlaps.max(dim=-1)
+        else:
+            ignore_overlaps = self.iou_calculator(
+                gt_bboxes_ignore, priors, mode='iof')
+            ignore_max_overlaps, _ = ignore_overlaps.max(dim=-2)
+        return ignore_max_overlaps > self.ignore_iof_thr
+
+    def _iter_overlaps(
+        self,
+        gt_bboxes: Tensor,
+        priors: Tensor,
+        gt_bboxes_ignore: Optional[Tensor] = None,
+        gt_valid_mask: Optional[Tensor] = None,
+        prior_valid_mask: Optional[Tensor] = None
+    ) -> Iterator[Tuple[int, Tensor]]:
+        """Compute the overlaps of the gts and the chunks of priors.
+
+        The ignored priors have the overlap -1, and the padded gts and priors
+        the overlap ``-inf``.
+
+        Yields:
+            tuple[int, Tensor]: The index of the first prior of the chunk, and
+            its overlaps of shape (B, k, chunk_size).
+        """
+        num_priors = priors.size(-2)
+        chunk_size = self.chunk_size if self.chunk_size > 0 else num_priors
+        for start in range(0, num_priors, chunk_size):
+            chunk = priors[:, start:start + chunk_size]
+            overlaps = self.iou_calculator(gt_bboxes, chunk)
+            ignore_mask = self.get_ignore_mask(chunk, gt_bboxes_ignore)
+            if ignore_mask is not None:
+                overlaps = overlaps.masked_fill(ignore_mask[:, None], -1)
+            if gt_valid_mask is not None:
+                overlaps = overlaps.masked_fill(~gt_valid_mask[..., None],
+                                                -float('inf'))
+            if prior_valid_mask is not None:
+                chunk_valid_mask = prior_valid_mask[:,
+                                                    start:start + chunk_size]
+                overlaps = overlaps.masked_fill(~chunk_valid_mask[:, None],
+                                                -float('inf'))
+            yield start, overlaps
+
+    def assign_wrt_chunks(
+        self,
+        gt_bboxes: Tensor,
+        priors: Tensor,
+        gt_labels: Tensor,
+        gt_bboxes_ignore: Optional[Tensor] = None,
+        gt_valid_mask: Optional[Tensor] = None,
+        prior_valid_mask: Optional[Tensor] = None
+    ) -> Tuple[Tensor, Tensor, Tensor]:
+        """Assign gt to bboxes by chunks of ``chunk_size`` priors.
+
+        The result is the same as :meth:`assign_wrt_overlaps`, but the
+        overlaps of all the priors are never materialized: only the running
+        maximum overlaps of the priors and of the gts, and the priors
+        reaching the positive running maximum overlap of a gt for the
+        low-quality matching, are kept between the chunks. The gts without
+        positive overlap, which match all the priors with their maximum
+        overlap, are matched by a second pass over the chunks.
+
+        The gts and priors may have leading batch dimensions, e.g. (B, k, 4)
+        and (B, n, 4) for B images, where the images with fewer gts or priors
+        are padded and masked by ``gt_valid_mask`` or ``prior_valid_mask``.
+        The priors of shape (n, 4) are shared by all the images. The padded
+        priors are assigned -1.
+
+        Args:
+            gt_bboxes (Tensor): The gts, of shape (..., k, 4).
+            priors (Tensor): The priors, of shape (..., n, 4) or (n, 4).
+            gt_labels (Tensor): The labels of the gts, of shape (..., k).
+            gt_bboxes_ignore (Tensor, optional): The ignored gts, of shape
+                (..., m, 4), padded with all zeros boxes. Defaults to None.
+            gt_valid_mask (Tensor, optional): The mask of the gts which are
+                not padding, of shape (..., k). Defaults to None.
+            prior_valid_mask (Tensor, optional): The mask of the priors which
+                are not padding, of shape (..., n). Defaults to None.
+
+        Returns:
+            tuple[Tensor, Tensor, Tensor]: The assigned gt indices, the max
+            overlaps and the assigned labels of the priors, of shape
+            (..., n), with the conventions of :obj:`AssignResult`.
+        """
+        gt_bboxes = get_box_tensor(gt_bboxes)
+        priors = get_box_tensor(priors)
+        batch_shape = gt_bboxes.shape[:-2]
+        num_gts, num_priors = gt_bboxes.size(-2), priors.size(-2)
+        # flatten the batch dimensions
+        batch_size = batch_shape.numel()
+        gt_bboxes = gt_bboxes.reshape(batch_size, num_gts, gt_bboxes.size(-1))
+        priors = priors.expand(*batch_shape, *priors.shape[-2:]).reshape(
+            batch_size, num_priors, priors.size(-1))
+        gt_labels = gt_labels.reshape(batch_size, num_gts)
+        if gt_bboxes_ignore is not None:
+            gt_bboxes_ignore = get_box_tensor(gt_bboxes_ignore)
+            gt_bboxes_ignore = gt_bboxes_ignore.reshape(
+                batch_size, *gt_bboxes_ignore.shape[-2:])
+        if gt_valid_mask is not None:
+            gt_valid_mask = gt_valid_mask.reshape(batch_size, num_gts)
+        if prior_valid_mask is not None:
+            prior_valid_mask = prior_valid_mask.reshape(batch_size, num_priors)
+
+        assigned_gt_inds = priors.new_full((batch_size, num_priors),
+                                           -1,
+                                           dtype=torch.long)
+        max_overlaps = priors.new_zeros((batch_size, num_priors))
+        assigned_labels = torch.full_like(assigned_gt_inds, -1)
+        if num_gts == 0:
+            assigned_gt_inds.fill_(0)
+        if num_gts == 0 or num_priors == 0:
+            return (assigned_gt_inds.view(*batch_shape, num_priors),
+                    max_overlaps.view(*batch_shape, num_priors),
+                    assigned_labels.view(*batch_shape, num_priors))
+
+        argmax_overlaps = torch.zeros_like(assigned_gt_inds)
+        gt_max_overlaps = priors.new_full((batch_size, num_gts), -float('inf'))
+        gt_argmax_overlaps = gt_labels.new_zeros((batch_size, num_gts),
+                                                 dtype=torch.long)
+        # the (image, gt, prior) triplets reaching the positive running
+        # maximum overlap of their gt
+        candidates = gt_argmax_overlaps.new_zeros((3, 0))
+        for start, overlaps in self._iter_overlaps(gt_bboxes, priors,
+                                                   gt_bboxes_ignore,
+                                                   gt_valid_mask,
+                                                   prior_valid_mask):
+            end = start + overlaps.size(-1)
+            prior_max, prior_argmax = overlaps.max(dim=1)
+            max_overlaps[:, start:end] = prior_max
+            argmax_overlaps[:, start:end] = prior_argmax
+            chunk_max, chunk_argmax = overlaps.max(dim=2)
+            # the first chunk holding the maximum is kept on ties
+            better = chunk_max > gt_max_overlaps
+            gt_max_overlaps = torch.where(better, chunk_max, gt_max_overlaps)
+            gt_argmax_overlaps = torch.where(better, chunk_argmax + start,
+                                             gt_argmax_overlaps)
+            if self.match_low_quality and self.gt_max_assign_all:
+                candidates = self._update_candidates(candidates, overlaps,
+                                                     start, better,
+                                                     gt_max_overlaps)
+
+        # 2. assign negative, 3. assign positive
+        if isinstance(self.neg_iou_thr, float):
+            neg_inds = (max_overlaps >= 0) & (max_overlaps < self.neg_iou_thr)
+        else:
+            assert len(self.neg_iou_thr) == 2
+            neg_inds = (max_overlaps >= self.neg_iou_thr[0]) & (
+                max_overlaps < self.neg_iou_thr[1])
+        assigned_gt_inds[neg_inds] = 0
+        pos_inds = max_overlaps >= self.pos_iou_thr
+        assigned_gt_inds[pos_inds] = argmax_overlaps[pos_inds] + 1
+
+        # 4. low-quality matching, see assign_wrt_overlaps
+        if self.match_low_quality:
+            if self.gt_max_assign_all:
+                img_inds, gt_inds, prior_inds = candidates
+                matched = gt_max_overlaps[img_inds,
+                                          gt_inds] >= self.min_pos_iou
+                low_quality_inds = self._scatter_last_gt(
+                    img_inds[matched], gt_inds[matched], prior_inds[matched],
+                    assigned_gt_inds)
+                # the gts without positive overlap are rare, e.g. outside of
+                # the image, but match most of the priors
+                non_pos_gts = (gt_max_overlaps <= 0) & (
+                    gt_max_overlaps >= self.min_pos_iou)
+                if non_pos_gts.any():
+                    gt_ranks = torch.arange(
+                        1, num_gts + 1, device=priors.device)[:, None]
+                    for start, overlaps in self._iter_overlaps(
+                            gt_bboxes, priors, gt_bboxes_ignore, gt_valid_mask,
+                            prior_valid_mask):
+                        end = start + overlaps.size(-1)
+                        reached = (overlaps == gt_max_overlaps[..., None]) & \
+                            non_pos_gts[..., None]
+                        last_gt = torch.where(reached, gt_ranks, 0).amax(dim=1)
+                        low_quality_inds[:, start:end] = torch.maximum(
+                            low_quality_inds[:, start:end], last_gt)
+            else:
+                img_inds = torch.arange(
+                    batch_size,
+                    device=priors.device)[:,
+                                          None].expand_as(gt_argmax_overlaps)
+                gt_inds = torch.arange(
+                    num_gts, device=priors.device).expand_as(img_inds)
+                matched = gt_max_overlaps >= self.min_pos_iou
+                low_quality_inds = self._scatter_last_gt(
+                    img_inds[matched], gt_inds[matched],
+                    gt_argmax_overlaps[matched], assigned_gt_inds)
+            assigned_gt_inds = torch.where(low_quality_inds > 0,
+                                           low_quality_inds, assigned_gt_inds)
+
+        # images without any valid gt are background
+        if gt_valid_mask is not None:
+            no_gts = ~gt_valid_mask.any(dim=1)
+            assigned_gt_inds[no_gts] = 0
+            max_overlaps[no_gts] = 0
+
+        assigned_labels = torch.where(
+            assigned_gt_inds > 0,
+            gt_labels.gather(1, (assigned_gt_inds - 1).clamp(min=0)),
+            assigned_labels)
+        return (assigned_gt_inds.view(*batch_shape, num_priors),
+                max_overlaps.view(*batch_shape, num_priors),
+                assigned_labels.view(*batch_shape, num_priors))
+
+    @staticmethod
+    def _update_candidates(candidates: Tensor, overlaps: Tensor, start: int,
+                           improved: Tensor,
+                           gt_max_overlaps: Tensor) -> Tensor:
+        """Update the priors reaching the positive running maximum overlap
+        of their gt with a chunk.
+
+        Args:
+            candidates (Tensor): The (image, gt, prior) index triplets of the
+                previous chunks, of shape (3, m).
+            overlaps (Tensor): The overlaps of the chunk, of shape
+                (B, k, chunk_size).
+            start (int): The index of the first prior of the chunk.
+            improved (Tensor): The mask of the gts whose maximum overlap is
+                higher in the chunk than in the previous ones, of shape
+                (B, k).
+            gt_max_overlaps (Tensor): The running maximum overlaps of the gts,
+                including the chunk, of shape (B, k).
+
+        Returns:
+            Tensor: The triplets of the previous chunks whose gt is not
+            improved, and the ones of the chunk.
+        """
+        kept = ~improved[candidates[0], candidates[1]]
+        img_inds, gt_inds, prior_inds = (
+            (overlaps == gt_max_overlaps[..., None])
+            & (gt_max_overlaps > 0)[..., None]).nonzero(as_tuple=True)
+        new_candidates = torch.stack([img_inds, gt_inds, prior_inds + start])
+        return torch.cat([candidates[:, kept], new_candidates], dim=1)
+
+    @staticmethod
+    def _scatter_last_gt(img_inds: Tensor, gt_inds: Tensor, prior_inds: Tensor,
+                         assigned_gt_inds: Tensor) -> Tensor:
+        """Match the priors with gts, like matching the gts in turn.
+
+        Args:
+            img_inds (Tensor): The image index of the matched pairs.
+            gt_inds (Tensor): The gt index of the matched pairs.
+            prior_inds (Tensor): The prior index of the matched pairs.
+            assigned_gt_inds (Tensor): The assigned gt indices, of shape
+                (B, n).
+
+        Returns:
+            Tensor: The index (1-based) of the last gt matched with each
+            prior, 0 for the priors without match, of shape (B, n).
+        """
+        num_priors = assigned_gt_inds.size(-1)
+        return torch.zeros_like(assigned_gt_inds).flatten().scatter_reduce(
+            0, img_inds * num_priors + prior_inds, gt_inds + 1,
+            'amax').view_as(assigned_gt_inds)
@@ -1,11 +1,12 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import Optional
+from typing import List, Optional
 
 import torch
 from mmengine.structures import InstanceData
 
 from mmdet.registry import TASK_UTILS
-from mmdet.utils import ConfigType
+from mmdet.structures.bbox import get_box_tensor
+from mmdet.utils import ConfigType, InstanceList, OptInstanceList
 from .assign_result import AssignResult
 from .base_assigner import BaseAssigner
 
@@ -156,3 +157,121 @@ class TaskAlignedAssigner(BaseAssigner):
             num_gt, assigned_gt_inds, max_overlaps, labels=assigned_labels)
         assign_result.assign_metrics = assign_metrics
         return assign_result
+
+    def batch_assign(self,
+                     batch_pred_instances: InstanceList,
+                     batch_gt_instances: InstanceList,
+                     batch_gt_instances_ignore: OptInstanceList = None,
+                     alpha: int = 1,
+                     beta: int = 6) -> List[AssignResult]:
+        """Assign gt to the bboxes of a batch of images.
+
+        The priors, predictions and gts of the images are padded and assigned
+        at once, with the same steps as :meth:`assign`. The padded bboxes
+        have a negative alignment metric, so they are never positive. The
+        results are the same as assigning the images one by one, up to the
+        ties of the alignment metrics.
+
+        Args:
+            batch_pred_instances (list[:obj:`InstanceData`]): Instances of
+                model predictions of each image. It includes ``priors``,
+                ``bboxes`` and ``scores``.
+            batch_gt_instances (list[:obj:`InstanceData`]): Ground truth of
+                instance annotations of each image. It usually includes
+                ``bboxes`` and ``labels``.
+            batch_gt_instances_ignore (list[:obj:`InstanceData`], optional):
+                Instances to be ignored during training of each image.
+                Defaults to None.
+            alpha (int): Hyper-parameters related to alignment_metrics.
+                Defaults to 1.
+            beta (int): Hyper-parameters related to alignment_metrics.
+                Defaults to 6.
+
+        Returns:
+            list[:obj:`AssignResult`]: The assign result of each image, with
+            the ``assign_metrics`` property.
+        """
+        num_gts = [len(gt_instances) for gt_instances in batch_gt_instances]
+        if max(num_gts) == 0:
+            return super().batch_assign(
+                batch_pred_instances,
+                batch_gt_instances,
+                batch_gt_instances_ignore,
+                alpha=alpha,
+                beta=beta)
+
+        priors, prior_valid_mask = self.pad_batch([
+            get_box_tensor(pred_instances.priors)[:, :4]
+            for pred_instances in batch_pred_instances
+        ])
+        decode_bboxes, _ = self.pad_batch([
+            get_box_tensor(pred_instances.bboxes)
+            for pred_instances in batch_pred_instances
+        ])
+        pred_scores, _ = self.pad_batch(
+            [pred_instances.scores for pred_instances in batch_pred_instances])
+        gt_bboxes, gt_valid_mask = self.pad_batch([
+            get_box_tensor(gt_instances.bboxes)
+            for gt_instances in batch_gt_instances
+        ])
+        gt_labels, _ = self.pad_batch(
+            [gt_instances.labels for gt_instances in batch_gt_instances], -1)
+        num_bboxes = priors.size(1)
+
+        # compute alignment metric between all bbox and gt
+        overlaps = self.iou_calculator(decode_bboxes, gt_bboxes).detach()
+        bbox_scores = pred_scores.gather(
+            2,
+            gt_labels.clamp(min=0)[:, None].expand(-1, num_bboxes,
+                                                   -1)).detach()
+        alignment_metrics = bbox_scores**alpha * overlaps**beta
+        # the padded bboxes are selected after all the real ones
+        alignment_metrics = alignment_metrics.masked_fill(
+            ~prior_valid_mask[..., None], -1)
+
+        # select top-k bboxes as candidates for each gt
+        topk = min(self.topk, num_bboxes)
+        candidate_metrics, candidate_idxs = alignment_metrics.topk(
+            topk, dim=1, largest=True)
+        is_pos = (candidate_metrics > 0) & gt_valid_mask[:, None]
+
+        # limit the positive sample's center in gt
+        priors_points = (priors[..., :2] + priors[..., 2:]) / 2.0
+        candidate_points = priors_points.gather(
+            1,
+            candidate_idxs.flatten(1)[..., None].expand(-1, -1, 2)).view(
+                *candidate_idxs.shape, 2)
+        lt_ = candidate_points - gt_bboxes[:, None, :, :2]
+        rb_ = gt_bboxes[:, None, :, 2:] - candidate_points
+        is_in_gts = torch.cat([lt_, rb_], dim=-1).min(dim=-1)[0] > 0.01
+        is_pos &= is_in_gts
+
+        # if an anchor box is assigned to multiple gts,
+        # the one with the highest iou will be selected.
+        overlaps_inf = torch.full_like(overlaps, -INF).scatter_(
+            1, candidate_idxs,
+            overlaps.gather(1, candidate_idxs).masked_fill(~is_pos, -INF))
+        max_overlaps, argmax_overlaps = overlaps_inf.max(dim=2)
+        is_assigned = max_overlaps != -INF
+        assigned_gt_inds = torch.where(is_assigned, argmax_overlaps + 1,
+                                       argmax_overlaps.new_tensor(0))
+        assign_metrics = torch.where(
+            is_assigned,
+            alignment_metrics.gather(2, argmax_overlaps[..., None])[..., 0],
+            alignment_metrics.new_tensor(0))
+
+        # images without any gt are background
+        no_gts = ~gt_valid_mask.any(dim=1)
+        max_overlaps[no_gts] = 0
+
+        assigned_labels = torch.where(
+            assigned_gt_inds > 0,
+            gt_labels.gather(1, (assigned_gt_inds - 1).clamp(min=0)),
+            assigned_gt_inds.new_tensor(-1))
+        return self.split_batch(
+            num_gts,
+            prior_valid_mask,
+            assigned_gt_inds,
+            max_overlaps,
+            assigned_labels,
+            assign_metrics=assign_metrics)
@@ -3,9 +3,13 @@ from .aflink import AppearanceFreeLink
 from .camera_motion_compensation import CameraMotionCompensation
 from .interpolation import InterpolateTracklets
 from .kalman_filter import KalmanFilter
+from .linear_assignment import (AuctionAssignment, BaseLinearAssignment,
+                                LapJVAssignment)
 from .similarity import embed_similarity
+from .track_store import TrackStore
 
 __all__ = [
     'KalmanFilter', 'InterpolateTracklets', 'embed_similarity',
-    'AppearanceFreeLink', 'CameraMotionCompensation'
+    'AppearanceFreeLink', 'CameraMotionCompensation', 'TrackStore',
+    'BaseLinearAssignment', 'LapJVAssignment', 'AuctionAssignment'
 ]
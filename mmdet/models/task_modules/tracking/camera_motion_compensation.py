@@ -6,6 +6,7 @@ from torch import Tensor
 
 from mmdet.registry import TASK_UTILS
 from mmdet.structures.bbox import bbox_cxcyah_to_xyxy, bbox_xyxy_to_cxcyah
+from .track_store import TrackStore
 
 
 @TASK_UTILS.register_module()
@@ -62,9 +63,13 @@ class CameraMotionCompensation:
         means[:, :4] = warped_cxcyah
         return means
 
-    def track(self, img: Tensor, ref_img: Tensor, tracks: dict,
-              num_samples: int, frame_id: int, metainfo: dict) -> dict:
-        """Tracking forward."""
+    def track(self, img: Tensor, ref_img: Tensor, tracks: TrackStore,
+              num_samples: int, frame_id: int, metainfo: dict) -> TrackStore:
+        """Tracking forward.
+
+        The last ``num_samples`` bboxes and the mean of all the tracks are
+        warped in one batch.
+        """
         img = img.squeeze(0).cpu().numpy().transpose((1, 2, 0))
         ref_img = ref_img.squeeze(0).cpu().numpy().transpose((1, 2, 0))
         warp_matrix = self.get_warp_matrix(img, ref_img)
@@ -74,31 +79,20 @@ class CameraMotionCompensation:
         warp_matrix[0, 2] = warp_matrix[0, 2] / scale_factor_w
         warp_matrix[1, 2] = warp_matrix[1, 2] / scale_factor_h
 
-        bboxes = []
-        num_bboxes = []
-        means = []
-        for k, v in tracks.items():
-            if int(v['frame_ids'][-1]) < frame_id - 1:
-                _num = 1
-            else:
-                _num = min(num_samples, len(v.bboxes))
-            num_bboxes.append(_num)
-            bboxes.extend(v.bboxes[-_num:])
-            if len(v.mean) > 0:
-                means.append(v.mean)
-        bboxes = torch.cat(bboxes, dim=0)
-        warped_bboxes = self.warp_bboxes(bboxes, warp_matrix.to(bboxes.device))
-
-        warped_bboxes = torch.split(warped_bboxes, num_bboxes)
-        for b, (k, v) in zip(warped_bboxes, tracks.items()):
-            _num = b.shape[0]
-            b = torch.split(b, [1] * _num)
-            tracks[k].bboxes[-_num:] = b
-
-        if means:
-            means = np.asarray(means)
-            warped_means = self.warp_means(means, warp_matrix)
-            for m, (k, v) in zip(warped_means, tracks.items()):
-                tracks[k].mean = m
+        if len(tracks) == 0:
+            return tracks
+        # only the last bbox of the lost tracks is warped
+        lost = tracks.last('frame_ids').cpu().numpy() < frame_id - 1
+        slot_inds, pos_inds, valid = tracks.window(
+            num_samples=np.where(lost, 1, num_samples))
+        history = tracks.history['bboxes']
+        index = (torch.from_numpy(slot_inds[valid]).to(history.device),
+                 torch.from_numpy(pos_inds[valid]).to(history.device))
+        history[index] = self.warp_bboxes(history[index],
+                                          warp_matrix.to(history.device))
 
+        if 'mean' in tracks.columns:
+            tracks.set_column(
+                'mean',
+                self.warp_means(tracks.get_column('mean'), warp_matrix))
         return tracks
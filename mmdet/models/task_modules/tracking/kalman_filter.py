@@ -1,5 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import Tuple
+from typing import Optional, Tuple, Union
 
 import numpy as np
 import torch
@@ -11,6 +11,7 @@ except ImportError:
     HAS_SCIPY = False
 
 from mmdet.registry import TASK_UTILS
+from .track_store import TrackStore
 
 
 @TASK_UTILS.register_module()
@@ -241,27 +242,177 @@ class KalmanFilter:
         squared_maha = np.sum(z * z, axis=0)
         return squared_maha
 
-    def track(self, tracks: dict,
-              bboxes: torch.Tensor) -> Tuple[dict, np.array]:
+    def _multi_std(self, heights: np.ndarray,
+                   weights: Tuple[float, ...]) -> np.ndarray:
+        """Standard deviations of a batch of states, the i-th one being
+        ``weights[i] * height`` or ``-weights[i]`` if it is negative."""
+        weights = np.asarray(weights, dtype=np.float64)
+        return np.where(weights > 0, weights * heights[:, None], -weights)
+
+    def multi_initiate(
+            self, measurements: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched version of :meth:`initiate`.
+
+        Args:
+            measurements (ndarray): Bounding boxes of shape (N, 4), each in
+                format (x, y, a, h).
+
+        Returns:
+            (ndarray, ndarray): The means of shape (N, 8) and the
+            covariances of shape (N, 8, 8) of the new tracks.
+        """
+        measurements = np.asarray(measurements, dtype=np.float64)
+        means = np.concatenate(
+            [measurements, np.zeros_like(measurements)], axis=1)
+        pos, vel = self._std_weight_position, self._std_weight_velocity
+        std = self._multi_std(measurements[:, 3],
+                              (2 * pos, 2 * pos, -1e-2, 2 * pos, 10 * vel,
+                               10 * vel, -1e-5, 10 * vel))
+        covariances = np.zeros((len(means), 8, 8))
+        covariances[:, np.arange(8), np.arange(8)] = np.square(std)
+        return means, covariances
+
+    def multi_predict(
+            self, means: np.ndarray,
+            covariances: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched version of :meth:`predict`.
+
+        Args:
+            means (ndarray): The means of shape (N, 8).
+            covariances (ndarray): The covariances of shape (N, 8, 8).
+
+        Returns:
+            (ndarray, ndarray): The predicted means and covariances.
+        """
+        pos, vel = self._std_weight_position, self._std_weight_velocity
+        std = self._multi_std(means[:, 3],
+                              (pos, pos, -1e-2, pos, vel, vel, -1e-5, vel))
+        means = means @ self._motion_mat.T
+        covariances = self._motion_mat @ covariances @ self._motion_mat.T
+        covariances[:, np.arange(8), np.arange(8)] += np.square(std)
+        return means, covariances
+
+    def multi_project(
+        self,
+        means: np.ndarray,
+        covariances: np.ndarray,
+        bbox_scores: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched version of :meth:`project`.
+
+        Args:
+            means (ndarray): The means of shape (N, 8).
+            covariances (ndarray): The covariances of shape (N, 8, 8).
+            bbox_scores (ndarray, optional): The confidence scores of shape
+                (N, ) of the bboxes. Defaults to None.
+
+        Returns:
+            (ndarray, ndarray): The projected means of shape (N, 4) and
+            covariances of shape (N, 4, 4).
+        """
+        pos = self._std_weight_position
+        std = self._multi_std(means[:, 3], (pos, pos, -1e-1, pos))
+        if self.use_nsa and bbox_scores is not None:
+            std = (1 - np.asarray(bbox_scores))[:, None] * std
+        means = means @ self._update_mat.T
+        covariances = self._update_mat @ covariances @ self._update_mat.T
+        covariances[:, np.arange(4), np.arange(4)] += np.square(std)
+        return means, covariances
+
+    def multi_update(
+        self,
+        means: np.ndarray,
+        covariances: np.ndarray,
+        measurements: np.ndarray,
+        bbox_scores: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched version of :meth:`update`.
+
+        Args:
+            means (ndarray): The predicted means of shape (N, 8).
+            covariances (ndarray): The covariances of shape (N, 8, 8).
+            measurements (ndarray): The measurements of shape (N, 4), each
+                in format (x, y, a, h).
+            bbox_scores (ndarray, optional): The confidence scores of shape
+                (N, ) of the bboxes. Defaults to None.
+
+        Returns:
+            (ndarray, ndarray): The measurement-corrected means and
+            covariances.
+        """
+        projected_means, projected_covs = self.multi_project(
+            means, covariances, bbox_scores)
+        # the gain is P H^T S^-1, S being symmetric positive definite
+        kalman_gains = np.linalg.solve(
+            projected_covs,
+            self._update_mat @ np.swapaxes(covariances, 1, 2)).swapaxes(1, 2)
+        innovations = measurements - projected_means
+        new_means = means + (kalman_gains @ innovations[..., None])[..., 0]
+        new_covariances = covariances - (
+            kalman_gains @ projected_covs @ kalman_gains.swapaxes(1, 2))
+        return new_means, new_covariances
+
+    def multi_gating_distance(self,
+                              means: np.ndarray,
+                              covariances: np.ndarray,
+                              measurements: np.ndarray,
+                              only_position: bool = False) -> np.ndarray:
+        """Batched version of :meth:`gating_distance`.
+
+        Args:
+            means (ndarray): The means of shape (N, 8).
+            covariances (ndarray): The covariances of shape (N, 8, 8).
+            measurements (ndarray): The measurements of shape (M, 4), each
+                in format (x, y, a, h).
+            only_position (bool, optional): If True, distance computation is
+                done with respect to the bounding box center position only.
+                Defaults to False.
+
+        Returns:
+            ndarray: The squared Mahalanobis distances of shape (N, M).
+        """
+        means, covariances = self.multi_project(means, covariances)
+        if only_position:
+            means, covariances = means[:, :2], covariances[:, :2, :2]
+            measurements = measurements[:, :2]
+        cholesky_factors = np.linalg.cholesky(covariances)
+        d = measurements[None] - means[:, None]
+        z = np.linalg.solve(cholesky_factors, d.swapaxes(1, 2))
+        return np.sum(z * z, axis=1)
+
+    def track(
+            self, tracks: Union[TrackStore, dict],
+            bboxes: torch.Tensor) -> Tuple[Union[TrackStore, dict], np.array]:
         """Track forward.
 
+        The states of all the tracks are predicted and gated in one batch.
+
         Args:
-            tracks (dict[int:dict]): Track buffer.
+            tracks (:obj:`TrackStore` | dict[int:dict]): Track buffer.
             bboxes (Tensor): Detected bounding boxes.
 
         Returns:
-            (dict[int:dict], ndarray): Updated tracks and bboxes.
+            (:obj:`TrackStore` | dict[int:dict], ndarray): Updated tracks and
+            the gating distances of shape (num_tracks, num_bboxes).
         """
-        costs = []
-        for id, track in tracks.items():
-            track.mean, track.covariance = self.predict(
-                track.mean, track.covariance)
-            gating_distance = self.gating_distance(track.mean,
-                                                   track.covariance,
-                                                   bboxes.cpu().numpy(),
-                                                   self.center_only)
-            costs.append(gating_distance)
-
-        costs = np.stack(costs, 0)
+        if isinstance(tracks, TrackStore):
+            means = tracks.get_column('mean')
+            covariances = tracks.get_column('covariance')
+        else:
+            means = np.stack([track.mean for track in tracks.values()])
+            covariances = np.stack(
+                [track.covariance for track in tracks.values()])
+        means, covariances = self.multi_predict(means, covariances)
+        if isinstance(tracks, TrackStore):
+            tracks.set_column('mean', means)
+            tracks.set_column('covariance', covariances)
+        else:
+            for track, mean, covariance in zip(tracks.values(), means,
+                                               covariances):
+                track.mean, track.covariance = mean, covariance
+
+        costs = self.multi_gating_distance(means, covariances,
+                                           bboxes.cpu().numpy(),
+                                           self.center_only)
         costs[costs > self.gating_threshold] = np.nan
         return tracks, costs
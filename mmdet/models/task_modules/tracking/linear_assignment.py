@@ -0,0 +1,382 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from typing import Optional, Sequence, Tuple, Union
+
+try:
+    import lap
+except ImportError:
+    lap = None
+import numpy as np
+import torch
+from torch import Tensor
+
+from mmdet.registry import TASK_UTILS
+
+
+class BaseLinearAssignment:
+    """Base class of the linear assignment solvers of the trackers.
+
+    A solver matches the rows of cost matrices, e.g. the tracks, to their
+    columns, e.g. the detections, with the minimum total cost. NaN and
+    infinite costs mark the pairs that can not be matched. Two problems are
+    supported:
+
+    - with a ``cost_limit``, a pair is only matched if its cost does not
+      exceed the limit, like ``lap.lapjv(cost, extend_cost=True,
+      cost_limit=cost_limit)``.
+    - without ``cost_limit``, as many pairs as possible are matched, like
+      ``scipy.optimize.linear_sum_assignment``.
+
+    The solvers take one matrix of shape (N, M), or several ones, e.g. of
+    several classes or streams, at once.
+    """
+
+    def __call__(self,
+                 cost: Union[Tensor, np.ndarray],
+                 cost_limit: Optional[float] = None) -> Tuple[Tensor, Tensor]:
+        """Solve one assignment problem.
+
+        Args:
+            cost (Tensor | np.ndarray): The cost matrix of shape (N, M).
+            cost_limit (float, optional): The maximum cost of a matched pair.
+                Defaults to None.
+
+        Returns:
+            tuple[Tensor, Tensor]: The column matched to each row, of shape
+            (N, ), and the row matched to each column, of shape (M, ), -1
+            meaning unmatched, on the device of ``cost``.
+        """
+        rows, cols = self.solve_batch(
+            torch.as_tensor(cost)[None], cost_limit=cost_limit)
+        return rows[0], cols[0]
+
+    def solve_batch(
+            self,
+            costs: Union[Tensor, Sequence[Tensor]],
+            cost_limit: Optional[float] = None) -> Tuple[Tensor, Tensor]:
+        """Solve several assignment problems.
+
+        Args:
+            costs (Tensor | Sequence[Tensor]): The cost matrices, of shape
+                (B, N, M), or a sequence of matrices of different shapes,
+                padded with infinite costs to the largest one.
+            cost_limit (float, optional): The maximum cost of a matched pair.
+                Defaults to None.
+
+        Returns:
+            tuple[Tensor, Tensor]: The column matched to each row, of shape
+            (B, N), and the row matched to each column, of shape (B, M), -1
+            meaning unmatched.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def stack_costs(costs: Union[Tensor, Sequence[Tensor]]) -> Tensor:
+        """Stack cost matrices of different shapes, padded with infinite
+        costs."""
+        if isinstance(costs, Tensor):
+            assert costs.dim() == 3, 'costs must be of shape (B, N, M)'
+            return costs
+        costs = [torch.as_tensor(cost) for cost in costs]
+        num_rows = max([cost.size(0) for cost in costs], default=0)
+        num_cols = max([cost.size(1) for cost in costs], default=0)
+        if not costs:
+            return torch.zeros((0, num_rows, num_cols))
+        stacked = costs[0].new_full((len(costs), num_rows, num_cols),
+                                    float('inf'))
+        for i, cost in enumerate(costs):
+            stacked[i, :cost.size(0), :cost.size(1)] = cost
+        return stacked
+
+
+@TASK_UTILS.register_module()
+class LapJVAssignment(BaseLinearAssignment):
+    """Exact linear assignment with the Jonker-Volgenant algorithm of
+    ``lap.lapjv``.
+
+    The matrices are solved one by one on the CPU, and the results are
+    moved back to the device of the costs.
+    """
+
+    def __init__(self) -> None:
+        if lap is None:
+            raise RuntimeError('lap is not installed,\
+                 please install it by: pip install lap')
+
+    def solve_batch(
+            self,
+            costs: Union[Tensor, Sequence[Tensor]],
+            cost_limit: Optional[float] = None) -> Tuple[Tensor, Tensor]:
+        """Solve several assignment problems, see
+        :meth:`BaseLinearAssignment.solve_batch`."""
+        costs = self.stack_costs(costs)
+        batch_size, num_rows, num_cols = costs.shape
+        rows = np.full((batch_size, num_rows), -1, dtype=np.int64)
+        cols = np.full((batch_size, num_cols), -1, dtype=np.int64)
+        if costs.numel() > 0:
+            for i, cost in enumerate(costs.cpu().numpy()):
+                rows[i], cols[i] = self.lapjv(cost, cost_limit)
+        device = costs.device
+        return torch.from_numpy(rows).to(device), torch.from_numpy(cols).to(
+            device)
+
+    @staticmethod
+    def lapjv(
+            cost: np.ndarray,
+            cost_limit: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Solve one assignment problem on the CPU."""
+        cost = cost.astype(np.float64)
+        valid = np.isfinite(cost)
+        if not valid.any():
+            return np.full(cost.shape[0], -1), np.full(cost.shape[1], -1)
+        if not valid.all():
+            # replace the missing pairs by a cost so large that a matching
+            # with one of them is worse than any matching without it
+            # (same as motmetrics)
+            c = np.abs(cost[valid]).max() + 1
+            if cost_limit is not None:
+                c = max(c, abs(cost_limit) + 1)
+            cost = np.where(valid, cost, 2 * min(cost.shape) * c + 1)
+        if cost_limit is not None:
+            _, row, col = lap.lapjv(
+                cost, extend_cost=True, cost_limit=cost_limit)
+        else:
+            _, row, col = lap.lapjv(cost, extend_cost=True)
+        row, col = row.astype(np.int64), col.astype(np.int64)
+        # exclude the missing pairs matched by a problem without solution
+        matched = row > -1
+        missing = matched & ~valid[np.arange(len(row)), row.clip(min=0)]
+        col[row[missing]] = -1
+        row[missing] = -1
+        return row, col
+
+
+@TASK_UTILS.register_module()
+class AuctionAssignment(BaseLinearAssignment):
+    """Linear assignment with the auction algorithm, in pure PyTorch.
+
+    The rows bid for their best column, raising its price by the margin to
+    their second best option plus ``eps``, until every row holds a column or
+    prefers staying unmatched. All the rows of all the matrices bid at the
+    same time with tensor ops, so the matrices are solved in one batch and
+    on the device of the costs, without copying them to the host.
+
+    The prices start from 0, which ends quickly when the rows have distinct
+    best options, e.g. IoU costs. The rows with close options may however
+    raise the prices by ``eps`` at each round for a long time. The matrices
+    still bidding after ``direct_iters`` rounds are thus solved again, like
+    ``lap.lapjv(cost, extend_cost=True)``, as square problems of size
+    N + M, where each row and each column has a private dummy partner
+    standing for staying unmatched. As all their rows are matched, several
+    auctions can be run with a decreasing ``eps``, keeping the prices.
+
+    The total cost is within ``(N + M) * eps`` of the optimal one, and
+    :class:`LapJVAssignment` is the exact reference.
+
+    Args:
+        eps (float): The bidding increment of the last auction, i.e. the
+            tolerance on the costs. Defaults to 1e-4.
+        eps_scaling (float): The factor dividing ``eps`` between two
+            auctions of the square problems, starting from the range of the
+            costs. Defaults to 5.
+        direct_iters (int): The maximum number of bidding rounds from the
+            prices 0. Defaults to 200.
+        max_iters (int): The maximum number of bidding rounds per auction of
+            the square problems, the rows still bidding then stay unmatched.
+            Defaults to 10000.
+        check_interval (int): Number of bidding rounds between two checks
+            for the end of an auction, each check synchronizing with the
+            device. Defaults to 8.
+    """
+
+    def __init__(self,
+                 eps: float = 1e-4,
+                 eps_scaling: float = 5.,
+                 direct_iters: int = 200,
+                 max_iters: int = 10000,
+                 check_interval: int = 8) -> None:
+        assert eps > 0, 'eps must be positive'
+        assert eps_scaling > 1, 'eps_scaling must be larger than 1'
+        self.eps = eps
+        self.eps_scaling = eps_scaling
+        self.direct_iters = direct_iters
+        self.max_iters = max_iters
+        self.check_interval = check_interval
+
+    def solve_batch(
+            self,
+            costs: Union[Tensor, Sequence[Tensor]],
+            cost_limit: Optional[float] = None) -> Tuple[Tensor, Tensor]:
+        """Solve several assignment problems, see
+        :meth:`BaseLinearAssignment.solve_batch`."""
+        costs = self.stack_costs(costs)
+        batch_size, num_rows, num_cols = costs.shape
+        device = costs.device
+        if costs.numel() == 0:
+            return (torch.full((batch_size, num_rows),
+                               -1,
+                               dtype=torch.long,
+                               device=device),
+                    torch.full((batch_size, num_cols),
+                               -1,
+                               dtype=torch.long,
+                               device=device))
+        # double precision keeps the small increments of large benefits
+        costs = costs.double()
+
+        # the rows maximize the benefits of the pairs, staying unmatched
+        # being worth 0
+        valid = torch.isfinite(costs)
+        if cost_limit is not None:
+            valid &= costs <= cost_limit
+            benefits = cost_limit - costs
+        else:
+            # a pair is worth more than any difference of costs, so that as
+            # many pairs as possible are matched
+            max_cost = torch.where(valid, costs.abs(), costs.new_zeros(
+                ())).flatten(1).amax(1)
+            offsets = 2 * min(num_rows, num_cols) * (max_cost + 1) + 1
+            benefits = offsets[:, None, None] - costs
+        benefits = torch.where(valid, benefits,
+                               benefits.new_full((), -float('inf')))
+
+        prices = benefits.new_zeros((batch_size, num_cols))
+        rows, cols, bidding = self._auction(benefits, prices, self.eps,
+                                            self.direct_iters)
+        pending = bidding.any(dim=1)
+        if pending.any():
+            rows[pending], cols[pending] = self._solve_square(
+                benefits[pending])
+        return rows, cols
+
+    def _solve_square(self, benefits: Tensor) -> Tuple[Tensor, Tensor]:
+        """Solve the problems extended to square ones with scaled ``eps``."""
+        batch_size, num_rows, num_cols = benefits.shape
+        device = benefits.device
+        # the dummy column ``num_cols + i`` of row i, the dummy row
+        # ``num_rows + j`` of column j, and the dummy rows and columns
+        # matched together for free
+        size = num_rows + num_cols
+        extended = benefits.new_full((batch_size, size, size), -float('inf'))
+        extended[:, :num_rows, :num_cols] = benefits
+        row_inds = torch.arange(num_rows, device=device)
+        col_inds = torch.arange(num_cols, device=device)
+        extended[:, row_inds, num_cols + row_inds] = 0
+        extended[:, num_rows + col_inds, col_inds] = 0
+        # the dummy rows prefer different dummy columns by less than ``eps``
+        # in total, otherwise they all bid for the same one at each round
+        shifts = (row_inds[None, :] - col_inds[:, None]) % max(num_rows, 1)
+        extended[:, num_rows:, num_cols:] = -shifts * (
+            self.eps / max(num_rows, 1))
+
+        finite = extended[torch.isfinite(extended)]
+        value_range = float(finite.max() - finite.min()) + 1
+        prices = extended.new_zeros((batch_size, size))
+        eps = value_range
+        while True:
+            eps /= self.eps_scaling
+            if eps < self.eps * self.eps_scaling:
+                eps = self.eps
+            rows, cols, _ = self._auction(extended, prices, eps,
+                                          self.max_iters, value_range)
+            if eps == self.eps:
+                break
+
+        rows = rows[:, :num_rows]
+        rows = torch.where(rows < num_cols, rows, torch.full_like(rows, -1))
+        cols = cols[:, :num_cols]
+        cols = torch.where(cols < num_rows, cols, torch.full_like(cols, -1))
+        return rows, cols
+
+    def _auction(
+            self,
+            benefits: Tensor,
+            prices: Tensor,
+            eps: float,
+            max_iters: int,
+            value_range: Optional[float] = None
+    ) -> Tuple[Tensor, Tensor, Tensor]:
+        """Run an auction, updating ``prices`` in place.
+
+        Without ``value_range``, staying unmatched is worth 0 for the rows.
+        Otherwise the problems are square ones, where every row is matched
+        and the rows with a single option raise its price by
+        ``value_range``, which no other row can bid over.
+
+        Returns:
+            tuple[Tensor, Tensor, Tensor]: The column matched to each row, the
+            row matched to each column, and the mask of the rows still
+            bidding.
+        """
+        batch_size, num_rows, num_cols = benefits.shape
+        device = benefits.device
+        num_slots = batch_size * num_rows
+        # global indices of the rows, and of the first column of their matrix
+        row_ids = torch.arange(
+            num_slots, device=device).view(batch_size, num_rows)
+        col_offsets = torch.arange(
+            batch_size, device=device)[:, None] * num_cols
+        rows = torch.full_like(row_ids, -1)
+        cols = torch.full((batch_size, num_cols),
+                          -1,
+                          dtype=torch.long,
+                          device=device)
+        unmatched = torch.zeros_like(row_ids, dtype=torch.bool)
+        neg_inf = benefits.new_full((), -float('inf'))
+
+        for i in range(max_iters):
+            bidding = (rows < 0) & ~unmatched
+            if i % self.check_interval == 0 and not bidding.any():
+                break
+            values = benefits - prices[:, None, :]
+            if num_cols > 1:
+                top_values, top_inds = values.topk(2, dim=2)
+                best, second = top_values.unbind(dim=2)
+                best_cols = top_inds[..., 0]
+            else:
+                best = values[..., 0]
+                second = torch.full_like(best, -float('inf'))
+                best_cols = torch.zeros_like(rows)
+            if value_range is None:
+                # staying unmatched is worth 0 and never becomes more
+                # expensive
+                unmatched |= bidding & (best <= 0)
+                bidding &= best > 0
+                increments = best - second.clamp(min=0)
+            else:
+                increments = (best - second).clamp(max=value_range)
+            bids = prices.gather(1, best_cols) + increments + eps
+            bids = torch.where(bidding, bids, neg_inf)
+
+            # each column goes to its highest bidder, the lowest row on ties
+            targets = (col_offsets + best_cols).flatten()
+            max_bids = prices.new_full(
+                (batch_size * num_cols, ),
+                -float('inf')).scatter_reduce(0, targets, bids.flatten(),
+                                              'amax')
+            top_bidders = bidding.flatten() & (
+                bids.flatten() >= max_bids[targets])
+            winners = torch.full_like(max_bids, num_slots, dtype=torch.long)
+            winners = winners.scatter_reduce(
+                0, targets,
+                torch.where(top_bidders, row_ids.flatten(),
+                            torch.full_like(targets, num_slots)), 'amin')
+            sold = winners < num_slots
+
+            # the former holders of the sold columns bid again
+            held = (col_offsets + rows.clamp(min=0)).flatten()
+            outbid = (rows.flatten() >= 0) & sold[held] & (
+                winners[held] != row_ids.flatten())
+            won = bidding.flatten() & (winners[targets] == row_ids.flatten())
+            rows = torch.where(
+                won, best_cols.flatten(),
+                torch.where(outbid, torch.full_like(held, -1),
+                            rows.flatten())).view(batch_size, num_rows)
+            cols = torch.where(
+                sold.view(batch_size, num_cols),
+                (winners % num_rows).view(batch_size, num_cols), cols)
+            prices.copy_(
+                torch.where(
+                    sold.view(batch_size, num_cols),
+                    max_bids.view(batch_size, num_cols), prices))
+        return rows, cols, (rows < 0) & ~unmatched
@@ -0,0 +1,379 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
+from torch import Tensor
+
+
+class TrackHistory:
+    """Read-only list-like view of the history of an item of a track.
+
+    The entries are ordered from the oldest to the latest one, each of shape
+    (1, ...) like the entries of the track lists of the former trackers.
+
+    Args:
+        store (:obj:`TrackStore`): The store of the track.
+        name (str): Name of the item.
+        slot (int): Slot of the track.
+    """
+
+    def __init__(self, store: 'TrackStore', name: str, slot: int) -> None:
+        self.store = store
+        self.name = name
+        self.slot = slot
+
+    def __len__(self) -> int:
+        return min(
+            int(self.store.num_updates[self.slot]), self.store.num_history)
+
+    def _get(self, idx: int) -> Tensor:
+        length = len(self)
+        if idx < 0:
+            idx += length
+        if not 0 <= idx < length:
+            raise IndexError(f'index {idx} is out of range')
+        entry = int(self.store.num_updates[self.slot]) - length + idx
+        pos = entry % self.store.num_history
+        return self.store.history[self.name][self.slot, pos][None]
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[Tensor, list]:
+        if isinstance(idx, slice):
+            return [self._get(i) for i in range(*idx.indices(len(self)))]
+        return self._get(idx)
+
+    def __iter__(self) -> Iterator[Tensor]:
+        for idx in range(len(self)):
+            yield self._get(idx)
+
+
+class Track:
+    """View of a track of a :obj:`TrackStore`.
+
+    The attributes of the view read and write the arrays of the store:
+
+    - the memorized items, e.g. ``track.bboxes``, are :obj:`TrackHistory`
+      views, or tensors of shape (1, ...) for the items updated with a
+      momentum.
+    - the columns of the store, e.g. ``track.mean``, are rows of the column
+      arrays, and assigning them writes the arrays.
+    - other attributes, e.g. the observations of OC-SORT, are kept in a dict
+      per track.
+
+    Args:
+        store (:obj:`TrackStore`): The store of the track.
+        slot (int): Slot of the track.
+    """
+    __slots__ = ('_store', '_slot')
+
+    def __init__(self, store: 'TrackStore', slot: int) -> None:
+        object.__setattr__(self, '_store', store)
+        object.__setattr__(self, '_slot', slot)
+
+    def __getattr__(self, name: str):
+        store, slot = self._store, self._slot
+        if name in store.history:
+            return TrackHistory(store, name, slot)
+        if name in store.momentum_items:
+            return store.momentum_items[name][slot][None]
+        if name in store.columns:
+            return store.columns[name][slot]
+        if name in store.extras[slot]:
+            return store.extras[slot][name]
+        raise AttributeError(f'the track has no attribute {name}')
+
+    def __setattr__(self, name: str, value) -> None:
+        store, slot = self._store, self._slot
+        if name in store.history or name in store.momentum_items:
+            raise AttributeError(f'{name} is memorized by the tracker, '
+                                 'update it with `TrackStore.append`')
+        if name in store.columns:
+            store.columns[name][slot] = value
+        else:
+            store.extras[slot][name] = value
+
+    __getitem__ = __getattr__
+    __setitem__ = __setattr__
+
+    def __contains__(self, name: str) -> bool:
+        store = self._store
+        return (name in store.history or name in store.momentum_items
+                or name in store.columns or name in store.extras[self._slot])
+
+
+class TrackStore:
+    """Struct-of-arrays storage of the tracks of a tracker.
+
+    Each track occupies a slot of preallocated arrays, which grow by doubling
+    when the slots run out:
+
+    - the memorized items, e.g. ``bboxes`` and ``frame_ids``, are kept in
+      ring buffers of shape (capacity, num_history, ...) holding the last
+      ``num_history`` frames of each track, or in arrays of shape
+      (capacity, ...) for the items updated with a momentum.
+    - the per-track states, e.g. the Kalman ``mean`` and ``covariance``, are
+      numpy columns of shape (capacity, ...).
+    - the memorized items that are not tensors, e.g. ``BitmapMasks``, are
+      kept in a list of the last ``num_history`` values per track.
+
+    The trackers read and write the tracks in batches, e.g. all the means of
+    the confirmed tracks for one Kalman prediction, instead of looping over
+    the tracks. The store is also a mapping from the track ids, in the order
+    the tracks were added, to :obj:`Track` views.
+
+    Args:
+        num_history (int): Number of frames memorized per track.
+            Defaults to 30.
+        momentums (dict[str, float], optional): Momentums of the items that
+            are updated with a momentum instead of memorized frame by frame.
+            Defaults to None.
+        capacity (int): Initial number of slots. Defaults to 64.
+    """
+
+    def __init__(self,
+                 num_history: int = 30,
+                 momentums: Optional[dict] = None,
+                 capacity: int = 64) -> None:
+        assert num_history > 0, 'num_history must be positive'
+        self.num_history = num_history
+        self.momentums = momentums if momentums is not None else dict()
+        self.capacity = capacity
+        self.id_to_slot: Dict[int, int] = dict()
+        self.slot_ids = np.full(capacity, -1, dtype=np.int64)
+        self.num_updates = np.zeros(capacity, dtype=np.int64)
+        self.history: Dict[str, Tensor] = dict()
+        self.momentum_items: Dict[str, Tensor] = dict()
+        self.columns: Dict[str, np.ndarray] = dict()
+        self.extras: List[dict] = [dict() for _ in range(capacity)]
+        # free slots, the lowest ones are used first
+        self._free_slots = list(range(capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self.id_to_slot)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self.id_to_slot
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.id_to_slot)
+
+    def __getitem__(self, id: int) -> Track:
+        return Track(self, self.id_to_slot[id])
+
+    def keys(self) -> List[int]:
+        return list(self.id_to_slot)
+
+    def values(self) -> List[Track]:
+        return [Track(self, slot) for slot in self.id_to_slot.values()]
+
+    def items(self) -> List[Tuple[int, Track]]:
+        return [(id, Track(self, slot))
+                for id, slot in self.id_to_slot.items()]
+
+    def pop(self, id: int) -> None:
+        """Remove a track."""
+        self.remove([id])
+
+    @property
+    def ids(self) -> List[int]:
+        """list[int]: Ids of the tracks."""
+        return list(self.id_to_slot)
+
+    def slots(self, ids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Get the slots of some tracks, all the tracks if ``ids`` is None."""
+        if ids is None:
+            return np.fromiter(
+                self.id_to_slot.values(), dtype=np.int64, count=len(self))
+        return np.array([self.id_to_slot[int(id)] for id in ids],
+                        dtype=np.int64)
+
+    def _grow(self, capacity: int) -> None:
+        """Reallocate the arrays with more slots."""
+        num_new = capacity - self.capacity
+
+        def pad(array):
+            if isinstance(array, Tensor):
+                return torch.cat(
+                    [array,
+                     array.new_zeros((num_new, ) + array.shape[1:])])
+            return np.concatenate(
+                [array,
+                 np.zeros((num_new, ) + array.shape[1:], array.dtype)])
+
+        self.slot_ids = np.concatenate(
+            [self.slot_ids,
+             np.full(num_new, -1, dtype=np.int64)])
+        self.num_updates = pad(self.num_updates)
+        for items in (self.history, self.momentum_items, self.columns):
+            for name, array in items.items():
+                items[name] = pad(array)
+        self.extras.extend(dict() for _ in range(num_new))
+        self._free_slots = list(range(capacity - 1, self.capacity - 1,
+                                      -1)) + self._free_slots
+        self.capacity = capacity
+
+    def add(self, ids: Sequence[int], items: Dict[str, Tensor]) -> np.ndarray:
+        """Add new tracks with the items of their first frame.
+
+        Args:
+            ids (Sequence[int]): Ids of the new tracks.
+            items (dict[str, Tensor]): Items of the tracks, of shape (N, ...).
+
+        Returns:
+            np.ndarray: Slots of the tracks.
+        """
+        num_tracks = len(ids)
+        if num_tracks > len(self._free_slots):
+            self._grow(
+                max(2 * self.capacity,
+                    self.capacity + num_tracks - len(self._free_slots)))
+        slots = np.array([self._free_slots.pop() for _ in range(num_tracks)],
+                         dtype=np.int64)
+        for id, slot in zip(ids, slots.tolist()):
+            self.id_to_slot[int(id)] = slot
+            self.extras[slot] = dict()
+        self.slot_ids[slots] = ids
+        self.num_updates[slots] = 0
+        for column in self.columns.values():
+            column[slots] = 0
+        self._write(slots, items)
+        return slots
+
+    def append(self, ids: Sequence[int], items: Dict[str,
+                                                     Tensor]) -> np.ndarray:
+        """Append the items of a new frame to existing tracks.
+
+        Args:
+            ids (Sequence[int]): Ids of the tracks.
+            items (dict[str, Tensor]): Items of the tracks, of shape (N, ...).
+
+        Returns:
+            np.ndarray: Slots of the tracks.
+        """
+        slots = self.slots(ids)
+        self._write(slots, items)
+        return slots
+
+    def _write(self, slots: np.ndarray, items: Dict[str, Tensor]) -> None:
+        """Write the items of a frame of some tracks."""
+        is_new = self.num_updates[slots] == 0
+        positions = self.num_updates[slots] % self.num_history
+        for name, value in items.items():
+            if name in self.momentums:
+                if name not in self.momentum_items:
+                    self.momentum_items[name] = value.new_zeros(
+                        (self.capacity, ) + value.shape[1:])
+                buffer = self.momentum_items[name]
+                index = torch.from_numpy(slots).to(buffer.device)
+                new = torch.from_numpy(is_new).to(buffer.device)
+                m = self.momentums[name]
+                value = value.to(buffer)
+                buffer[index] = torch.where(
+                    new.view((-1, ) + (1, ) * (value.dim() - 1)), value,
+                    (1 - m) * buffer[index] + m * value)
+            elif not isinstance(value, Tensor):
+                # items that are not tensors, e.g. `BitmapMasks`, are kept in
+                # a list per track
+                for i, slot in enumerate(slots.tolist()):
+                    entries = self.extras[slot].setdefault(name, [])
+                    entries.append(value[i])
+                    del entries[:-self.num_history]
+            else:
+                if name not in self.history:
+                    self.history[name] = value.new_zeros((self.capacity,
+                                                          self.num_history) +
+                                                         value.shape[1:])
+                buffer = self.history[name]
+                buffer[torch.from_numpy(slots).to(buffer.device),
+                       torch.from_numpy(positions).to(buffer.device)] = \
+                    value.to(buffer)
+        self.num_updates[slots] += 1
+
+    def remove(self, ids: Sequence[int]) -> None:
+        """Remove some tracks and free their slots."""
+        for id in ids:
+            slot = self.id_to_slot.pop(int(id))
+            self.slot_ids[slot] = -1
+            self.extras[slot] = dict()
+            self._free_slots.append(slot)
+        # keep using the lowest slots first
+        self._free_slots.sort(reverse=True)
+
+    def get_num_updates(self,
+                        ids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Get the number of frames memorized by the tracks, including the
+        frames dropped from the ring buffers."""
+        return self.num_updates[self.slots(ids)]
+
+    def last(self, name: str, ids: Optional[Sequence[int]] = None) -> Tensor:
+        """Get the latest value of an item of some tracks.
+
+        Args:
+            name (str): Name of the item.
+            ids (Sequence[int], optional): Ids of the tracks, all the tracks
+                if None. Defaults to None.
+
+        Returns:
+            Tensor: The values, of shape (N, ...).
+        """
+        slots = self.slots(ids)
+        if name in self.momentum_items:
+            buffer = self.momentum_items[name]
+            return buffer[torch.from_numpy(slots).to(buffer.device)]
+        buffer = self.history[name]
+        positions = (self.num_updates[slots] - 1) % self.num_history
+        return buffer[torch.from_numpy(slots).to(buffer.device),
+                      torch.from_numpy(positions).to(buffer.device)]
+
+    def window(
+        self,
+        ids: Optional[Sequence[int]] = None,
+        num_samples: Union[int, np.ndarray, None] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get the ring buffer indices of the last frames of some tracks.
+
+        Args:
+            ids (Sequence[int], optional): Ids of the tracks, all the tracks
+                if None. Defaults to None.
+            num_samples (int | np.ndarray, optional): Number of frames, for
+                all the tracks or per track. Defaults to ``num_history``.
+
+        Returns:
+            tuple[np.ndarray]: The slots and the positions in the ring
+            buffers, both of shape (N, K), from the oldest frame to the
+            latest one, and the mask of shape (N, K) of the frames the
+            tracks have, where K is the largest number of frames.
+        """
+        slots = self.slots(ids)
+        if num_samples is None:
+            num_samples = self.num_history
+        num_samples = np.minimum(num_samples, self.num_history)
+        num_updates = self.num_updates[slots]
+        counts = np.minimum(num_samples, num_updates)
+        max_count = int(counts.max()) if counts.size > 0 else 0
+        offsets = np.arange(max_count) - max_count
+        # entries of the frames, aligned on the latest one
+        entries = num_updates[:, None] + offsets[None, :]
+        valid = offsets[None, :] >= -counts[:, None]
+        positions = np.where(valid, entries, 0) % self.num_history
+        slot_inds = np.repeat(slots[:, None], max_count, axis=1)
+        return slot_inds, positions, valid
+
+    def get_column(self,
+                   name: str,
+                   ids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Get a copy of the rows of a column for some tracks, all the tracks
+        if ``ids`` is None."""
+        return self.columns[name][self.slots(ids)]
+
+    def set_column(self,
+                   name: str,
+                   values: np.ndarray,
+                   ids: Optional[Sequence[int]] = None) -> None:
+        """Set the rows of a column for some tracks, all the tracks if
+        ``ids`` is None. The column is created at the first call."""
+        values = np.asarray(values)
+        if name not in self.columns:
+            self.columns[name] = np.zeros(
+                (self.capacity, ) + values.shape[1:], dtype=values.dtype)
+        self.columns[name][self.slots(ids)] = values
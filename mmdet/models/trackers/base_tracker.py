@@ -2,10 +2,13 @@
 from abc import ABCMeta, abstractmethod
 from typing import List, Optional, Tuple
 
+import numpy as np
 import torch
 import torch.nn.functional as F
 from addict import Dict
 
+from mmdet.models.task_modules.tracking import TrackStore
+
 
 class BaseTracker(metaclass=ABCMeta):
     """Base tracker model.
@@ -17,23 +20,28 @@ class BaseTracker(metaclass=ABCMeta):
         num_frames_retain (int, optional). If a track is disappeared more than
             `num_frames_retain` frames, it will be deleted in the memo.
              Defaults to 10.
+        num_history (int, optional): Number of frames memorized per track,
+            older frames are dropped from the ring buffers of the
+            :obj:`TrackStore`. Defaults to 30.
     """
 
     def __init__(self,
                  momentums: Optional[dict] = None,
-                 num_frames_retain: int = 10) -> None:
+                 num_frames_retain: int = 10,
+                 num_history: int = 30) -> None:
         super().__init__()
         if momentums is not None:
             assert isinstance(momentums, dict), 'momentums must be a dict'
         self.momentums = momentums
         self.num_frames_retain = num_frames_retain
+        self.num_history = num_history
 
         self.reset()
 
     def reset(self) -> None:
         """Reset the buffer of the tracker."""
         self.num_tracks = 0
-        self.tracks = dict()
+        self.tracks = TrackStore(self.num_history, self.momentums)
 
     @property
     def empty(self) -> bool:
@@ -41,9 +49,9 @@ class BaseTracker(metaclass=ABCMeta):
         return False if self.tracks else True
 
     @property
-    def ids(self) -> List[dict]:
+    def ids(self) -> List[int]:
         """All ids in the tracker."""
-        return list(self.tracks.keys())
+        return self.tracks.ids
 
     @property
     def with_reid(self) -> bool:
@@ -69,7 +77,6 @@ class BaseTracker(metaclass=ABCMeta):
 
         assert 'ids' in memo_items
         num_objs = len(kwargs['ids'])
-        id_indice = memo_items.index('ids')
         assert 'frame_ids' in memo_items
         frame_id = int(kwargs['frame_ids'])
         if isinstance(kwargs['frame_ids'], int):
@@ -80,64 +87,72 @@ class BaseTracker(metaclass=ABCMeta):
             if len(v) != num_objs:
                 raise ValueError('kwargs value must both equal')
 
-        for obj in zip(*kwargs.values()):
-            id = int(obj[id_indice])
-            if id in self.tracks:
-                self.update_track(id, obj)
+        ids = [int(id) for id in kwargs['ids']]
+        is_new = np.array([id not in self.tracks for id in ids], dtype=bool)
+        for new in (False, True):
+            inds = np.flatnonzero(is_new == new)
+            if inds.size == 0:
+                continue
+            objs = {
+                k: v[torch.from_numpy(inds).to(v.device)] if isinstance(
+                    v, torch.Tensor) else v[inds]
+                for k, v in kwargs.items()
+            }
+            if new:
+                self.init_tracks([ids[i] for i in inds], objs)
             else:
-                self.init_track(id, obj)
+                self.update_tracks([ids[i] for i in inds], objs)
 
         self.pop_invalid_tracks(frame_id)
 
     def pop_invalid_tracks(self, frame_id: int) -> None:
         """Pop out invalid tracks."""
-        invalid_ids = []
-        for k, v in self.tracks.items():
-            if frame_id - v['frame_ids'][-1] >= self.num_frames_retain:
-                invalid_ids.append(k)
-        for invalid_id in invalid_ids:
-            self.tracks.pop(invalid_id)
+        if self.empty:
+            return
+        last_frames = self.tracks.last('frame_ids').cpu().numpy()
+        invalid = frame_id - last_frames >= self.num_frames_retain
+        self.tracks.remove(np.asarray(self.ids)[invalid])
+
+    def update_tracks(self, ids: List[int], objs: dict) -> np.ndarray:
+        """Update some tracks.
+
+        Args:
+            ids (list[int]): Ids of the tracks.
+            objs (dict[str, Tensor]): The memorized items of the objects
+                matched to the tracks.
+
+        Returns:
+            np.ndarray: Slots of the tracks in the :obj:`TrackStore`.
+        """
+        return self.tracks.append(ids, objs)
+
+    def init_tracks(self, ids: List[int], objs: dict) -> np.ndarray:
+        """Initialize some tracks.
+
+        Args:
+            ids (list[int]): Ids of the tracks.
+            objs (dict[str, Tensor]): The memorized items of the objects
+                starting the tracks.
+
+        Returns:
+            np.ndarray: Slots of the tracks in the :obj:`TrackStore`.
+        """
+        return self.tracks.add(ids, objs)
 
     def update_track(self, id: int, obj: Tuple[torch.Tensor]):
         """Update a track."""
-        for k, v in zip(self.memo_items, obj):
-            v = v[None]
-            if self.momentums is not None and k in self.momentums:
-                m = self.momentums[k]
-                self.tracks[id][k] = (1 - m) * self.tracks[id][k] + m * v
-            else:
-                self.tracks[id][k].append(v)
+        objs = {k: v[None] for k, v in zip(self.memo_items, obj)}
+        self.update_tracks([id], objs)
 
     def init_track(self, id: int, obj: Tuple[torch.Tensor]):
         """Initialize a track."""
-        self.tracks[id] = Dict()
-        for k, v in zip(self.memo_items, obj):
-            v = v[None]
-            if self.momentums is not None and k in self.momentums:
-                self.tracks[id][k] = v
-            else:
-                self.tracks[id][k] = [v]
+        objs = {k: v[None] for k, v in zip(self.memo_items, obj)}
+        self.init_tracks([id], objs)
 
     @property
     def memo(self) -> dict:
         """Return all buffers in the tracker."""
-        outs = Dict()
-        for k in self.memo_items:
-            outs[k] = []
-
-        for id, objs in self.tracks.items():
-            for k, v in objs.items():
-                if k not in outs:
-                    continue
-                if self.momentums is not None and k in self.momentums:
-                    v = v
-                else:
-                    v = v[-1]
-                outs[k].append(v)
-
-        for k, v in outs.items():
-            outs[k] = torch.cat(v, dim=0)
-        return outs
+        return Dict({k: self.tracks.last(k) for k in self.memo_items})
 
     def get(self,
             item: str,
@@ -160,23 +175,25 @@ class BaseTracker(metaclass=ABCMeta):
         if ids is None:
             ids = self.ids
 
-        outs = []
-        for id in ids:
-            out = self.tracks[id][item]
-            if isinstance(out, list):
-                if num_samples is not None:
-                    out = out[-num_samples:]
-                    out = torch.cat(out, dim=0)
-                    if behavior == 'mean':
-                        out = out.mean(dim=0, keepdim=True)
-                    elif behavior is None:
-                        out = out[None]
-                    else:
-                        raise NotImplementedError()
-                else:
-                    out = out[-1]
-            outs.append(out)
-        return torch.cat(outs, dim=0)
+        if num_samples is None or item not in self.tracks.history:
+            return self.tracks.last(item, ids)
+        slot_inds, pos_inds, valid = self.tracks.window(ids, num_samples)
+        buffer = self.tracks.history[item]
+        outs = buffer[torch.from_numpy(slot_inds).to(buffer.device),
+                      torch.from_numpy(pos_inds).to(buffer.device)]
+        if behavior == 'mean':
+            if valid.all():
+                return outs.mean(dim=1)
+            weights = torch.from_numpy(valid).to(outs)
+            weights = weights.view(weights.shape + (1, ) * (outs.dim() - 2))
+            return (outs * weights).sum(dim=1) / weights.sum(dim=1)
+        elif behavior is None:
+            if not valid.all():
+                raise ValueError('the tracks have different numbers of '
+                                 'samples')
+            return outs
+        else:
+            raise NotImplementedError()
 
     @abstractmethod
     def track(self, *args, **kwargs):
@@ -1,10 +1,6 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from typing import List, Optional, Tuple
 
-try:
-    import lap
-except ImportError:
-    lap = None
 import numpy as np
 import torch
 from mmengine.structures import InstanceData
@@ -37,6 +33,9 @@ class ByteTracker(BaseTracker):
                 tracklets. Defaults to 0.3.
         num_tentatives (int, optional): Number of continuous frames to confirm
             a track. Defaults to 3.
+        linear_assignment (dict): Configuration of the linear assignment
+            solver matching the tracks and the detections. Defaults to
+            ``dict(type='LapJVAssignment')``.
     """
 
     def __init__(self,
@@ -46,14 +45,13 @@ class ByteTracker(BaseTracker):
                  weight_iou_with_det_scores: bool = True,
                  match_iou_thrs: dict = dict(high=0.1, low=0.5, tentative=0.3),
                  num_tentatives: int = 3,
+                 linear_assignment: dict = dict(type='LapJVAssignment'),
                  **kwargs):
         super().__init__(**kwargs)
 
-        if lap is None:
-            raise RuntimeError('lap is not installed,\
-                 please install it by: pip install lap')
         if motion is not None:
             self.motion = TASK_UTILS.build(motion)
+        self.linear_assignment = TASK_UTILS.build(linear_assignment)
 
         self.obj_score_thrs = obj_score_thrs
         self.init_track_thr = init_track_thr
@@ -66,66 +64,64 @@ class ByteTracker(BaseTracker):
     @property
     def confirmed_ids(self) -> List:
         """Confirmed ids in the tracker."""
-        ids = [id for id, track in self.tracks.items() if not track.tentative]
-        return ids
+        if self.empty:
+            return []
+        tentative = self.tracks.get_column('tentative')
+        return np.asarray(self.ids)[~tentative].tolist()
 
     @property
     def unconfirmed_ids(self) -> List:
         """Unconfirmed ids in the tracker."""
-        ids = [id for id, track in self.tracks.items() if track.tentative]
-        return ids
-
-    def init_track(self, id: int, obj: Tuple[torch.Tensor]) -> None:
-        """Initialize a track."""
-        super().init_track(id, obj)
-        if self.tracks[id].frame_ids[-1] == 0:
-            self.tracks[id].tentative = False
-        else:
-            self.tracks[id].tentative = True
-        bbox = bbox_xyxy_to_cxcyah(self.tracks[id].bboxes[-1])  # size = (1, 4)
-        assert bbox.ndim == 2 and bbox.shape[0] == 1
-        bbox = bbox.squeeze(0).cpu().numpy()
-        self.tracks[id].mean, self.tracks[id].covariance = self.kf.initiate(
-            bbox)
-
-    def update_track(self, id: int, obj: Tuple[torch.Tensor]) -> None:
-        """Update a track."""
-        super().update_track(id, obj)
-        if self.tracks[id].tentative:
-            if len(self.tracks[id]['bboxes']) >= self.num_tentatives:
-                self.tracks[id].tentative = False
-        bbox = bbox_xyxy_to_cxcyah(self.tracks[id].bboxes[-1])  # size = (1, 4)
-        assert bbox.ndim == 2 and bbox.shape[0] == 1
-        bbox = bbox.squeeze(0).cpu().numpy()
-        track_label = self.tracks[id]['labels'][-1]
-        label_idx = self.memo_items.index('labels')
-        obj_label = obj[label_idx]
-        assert obj_label == track_label
-        self.tracks[id].mean, self.tracks[id].covariance = self.kf.update(
-            self.tracks[id].mean, self.tracks[id].covariance, bbox)
+        if self.empty:
+            return []
+        tentative = self.tracks.get_column('tentative')
+        return np.asarray(self.ids)[tentative].tolist()
+
+    def init_tracks(self, ids: List[int], objs: dict) -> np.ndarray:
+        """Initialize some tracks."""
+        slots = super().init_tracks(ids, objs)
+        self.tracks.set_column('tentative',
+                               objs['frame_ids'].cpu().numpy() != 0, ids)
+        bboxes = bbox_xyxy_to_cxcyah(objs['bboxes']).cpu().numpy()
+        means, covariances = self.kf.multi_initiate(bboxes)
+        self.tracks.set_column('mean', means, ids)
+        self.tracks.set_column('covariance', covariances, ids)
+        return slots
+
+    def update_tracks(self, ids: List[int], objs: dict) -> np.ndarray:
+        """Update some tracks."""
+        slots = super().update_tracks(ids, objs)
+        tentative = self.tracks.get_column('tentative', ids) & (
+            self.tracks.get_num_updates(ids) < self.num_tentatives)
+        self.tracks.set_column('tentative', tentative, ids)
+        bboxes = bbox_xyxy_to_cxcyah(objs['bboxes']).cpu().numpy()
+        means, covariances = self.kf.multi_update(
+            self.tracks.get_column('mean', ids),
+            self.tracks.get_column('covariance', ids), bboxes)
+        self.tracks.set_column('mean', means, ids)
+        self.tracks.set_column('covariance', covariances, ids)
+        return slots
 
     def pop_invalid_tracks(self, frame_id: int) -> None:
         """Pop out invalid tracks."""
-        invalid_ids = []
-        for k, v in self.tracks.items():
-            # case1: disappeared frames >= self.num_frames_retrain
-            case1 = frame_id - v['frame_ids'][-1] >= self.num_frames_retain
-            # case2: tentative tracks but not matched in this frame
-            case2 = v.tentative and v['frame_ids'][-1] != frame_id
-            if case1 or case2:
-                invalid_ids.append(k)
-        for invalid_id in invalid_ids:
-            self.tracks.pop(invalid_id)
+        if self.empty:
+            return
+        last_frames = self.tracks.last('frame_ids').cpu().numpy()
+        # case1: disappeared frames >= self.num_frames_retrain
+        case1 = frame_id - last_frames >= self.num_frames_retain
+        # case2: tentative tracks but not matched in this frame
+        case2 = self.tracks.get_column('tentative') & (last_frames != frame_id)
+        self.tracks.remove(np.asarray(self.ids)[case1 | case2])
 
     def assign_ids(
-            self,
-            ids: List[int],
-            det_bboxes: torch.Tensor,
-            det_labels: torch.Tensor,
-            det_scores: torch.Tensor,
-            weight_iou_with_det_scores: Optional[bool] = False,
-            match_iou_thr: Optional[float] = 0.5
-    ) -> Tuple[np.ndarray, np.ndarray]:
+        self,
+        ids: List[int],
+        det_bboxes: torch.Tensor,
+        det_labels: torch.Tensor,
+        det_scores: torch.Tensor,
+        weight_iou_with_det_scores: Optional[bool] = False,
+        match_iou_thr: Optional[float] = 0.5
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
         """Assign ids.
 
         Args:
@@ -140,13 +136,10 @@ class ByteTracker(BaseTracker):
                 Defaults to 0.5.
 
         Returns:
-            tuple(np.ndarray, np.ndarray): The assigning ids.
+            tuple(Tensor, Tensor): The assigning ids.
         """
         # get track_bboxes
-        track_bboxes = np.zeros((0, 4))
-        for id in ids:
-            track_bboxes = np.concatenate(
-                (track_bboxes, self.tracks[id].mean[:4][None]), axis=0)
+        track_bboxes = self.tracks.get_column('mean', ids)[:, :4]
         track_bboxes = torch.from_numpy(track_bboxes).to(det_bboxes)
         track_bboxes = bbox_cxcyah_to_xyxy(track_bboxes)
 
@@ -155,23 +148,16 @@ class ByteTracker(BaseTracker):
         if weight_iou_with_det_scores:
             ious *= det_scores
         # support multi-class association
-        track_labels = torch.tensor([
-            self.tracks[id]['labels'][-1] for id in ids
-        ]).to(det_bboxes.device)
+        track_labels = self.tracks.last('labels', ids).to(det_bboxes.device)
 
         cate_match = det_labels[None, :] == track_labels[:, None]
         # to avoid det and track of different categories are matched
         cate_cost = (1 - cate_match.int()) * 1e6
 
-        dists = (1 - ious + cate_cost).cpu().numpy()
+        dists = 1 - ious + cate_cost
 
         # bipartite match
-        if dists.size > 0:
-            cost, row, col = lap.lapjv(
-                dists, extend_cost=True, cost_limit=1 - match_iou_thr)
-        else:
-            row = np.zeros(len(ids)).astype(np.int32) - 1
-            col = np.zeros(len(det_bboxes)).astype(np.int32) - 1
+        row, col = self.linear_assignment(dists, cost_limit=1 - match_iou_thr)
         return row, col
 
     def track(self, data_sample: DetDataSample, **kwargs) -> InstanceData:
@@ -230,24 +216,27 @@ class ByteTracker(BaseTracker):
             second_det_ids = ids[second_det_inds]
 
             # 1. use Kalman Filter to predict current location
-            for id in self.confirmed_ids:
-                # track is lost in previous frame
-                if self.tracks[id].frame_ids[-1] != frame_id - 1:
-                    self.tracks[id].mean[7] = 0
-                (self.tracks[id].mean,
-                 self.tracks[id].covariance) = self.kf.predict(
-                     self.tracks[id].mean, self.tracks[id].covariance)
+            confirmed_ids = self.confirmed_ids
+            # track is lost in previous frame
+            lost = self.tracks.last(
+                'frame_ids', confirmed_ids).cpu().numpy() != frame_id - 1
+            means = self.tracks.get_column('mean', confirmed_ids)
+            means[lost, 7] = 0
+            means, covariances = self.kf.multi_predict(
+                means, self.tracks.get_column('covariance', confirmed_ids))
+            self.tracks.set_column('mean', means, confirmed_ids)
+            self.tracks.set_column('covariance', covariances, confirmed_ids)
 
             # 2. first match
             first_match_track_inds, first_match_det_inds = self.assign_ids(
-                self.confirmed_ids, first_det_bboxes, first_det_labels,
+                confirmed_ids, first_det_bboxes, first_det_labels,
                 first_det_scores, self.weight_iou_with_det_scores,
                 self.match_iou_thrs['high'])
             # '-1' mean a detection box is not matched with tracklets in
             # previous frame
             valid = first_match_det_inds > -1
-            first_det_ids[valid] = torch.tensor(
-                self.confirmed_ids)[first_match_det_inds[valid]].to(labels)
+            first_det_ids[valid] = labels.new_tensor(confirmed_ids)[
+                first_match_det_inds[valid]]
 
             first_match_det_bboxes = first_det_bboxes[valid]
             first_match_det_labels = first_det_labels[valid]
@@ -270,25 +259,23 @@ class ByteTracker(BaseTracker):
                  self.weight_iou_with_det_scores,
                  self.match_iou_thrs['tentative'])
             valid = tentative_match_det_inds > -1
-            first_unmatch_det_ids[valid] = torch.tensor(self.unconfirmed_ids)[
-                tentative_match_det_inds[valid]].to(labels)
+            first_unmatch_det_ids[valid] = labels.new_tensor(
+                self.unconfirmed_ids)[tentative_match_det_inds[valid]]
 
             # 4. second match for unmatched tracks from the first match
-            first_unmatch_track_ids = []
-            for i, id in enumerate(self.confirmed_ids):
-                # tracklet is not matched in the first match
-                case_1 = first_match_track_inds[i] == -1
-                # tracklet is not lost in the previous frame
-                case_2 = self.tracks[id].frame_ids[-1] == frame_id - 1
-                if case_1 and case_2:
-                    first_unmatch_track_ids.append(id)
+            # tracklet is not matched in the first match
+            case_1 = (first_match_track_inds == -1).cpu().numpy()
+            # tracklet is not lost in the previous frame
+            case_2 = ~lost
+            first_unmatch_track_ids = np.asarray(
+                confirmed_ids, dtype=np.int64)[case_1 & case_2].tolist()
 
             second_match_track_inds, second_match_det_inds = self.assign_ids(
                 first_unmatch_track_ids, second_det_bboxes, second_det_labels,
                 second_det_scores, False, self.match_iou_thrs['low'])
             valid = second_match_det_inds > -1
-            second_det_ids[valid] = torch.tensor(first_unmatch_track_ids)[
-                second_match_det_inds[valid]].to(ids)
+            second_det_ids[valid] = ids.new_tensor(first_unmatch_track_ids)[
+                second_match_det_inds[valid]]
 
             # 5. gather all matched detection bboxes from step 2-4
             # we only keep matched detection bboxes in second match, which
@@ -1,10 +1,6 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import List, Optional, Tuple
+from typing import List, Optional
 
-try:
-    import lap
-except ImportError:
-    lap = None
 import numpy as np
 import torch
 from addict import Dict
@@ -37,6 +33,9 @@ class OCSORTTracker(SORTTracker):
             association (OCM term in the paper).
         vel_delta_t (int): The difference of time step for calculating of the
             velocity direction of tracklets.
+        linear_assignment (dict): Configuration of the linear assignment
+            solver matching the tracks and the detections. Defaults to
+            ``dict(type='LapJVAssignment')``.
         init_cfg (dict or list[dict], optional): Initialization config dict.
             Defaults to None.
     """
@@ -50,11 +49,10 @@ class OCSORTTracker(SORTTracker):
                  num_tentatives: int = 3,
                  vel_consist_weight: float = 0.2,
                  vel_delta_t: int = 3,
+                 linear_assignment: dict = dict(type='LapJVAssignment'),
                  **kwargs):
-        if lap is None:
-            raise RuntimeError('lap is not installed,\
-                 please install it by: pip install lap')
-        super().__init__(motion=motion, **kwargs)
+        super().__init__(
+            motion=motion, linear_assignment=linear_assignment, **kwargs)
         self.obj_score_thr = obj_score_thr
         self.init_track_thr = init_track_thr
 
@@ -68,51 +66,51 @@ class OCSORTTracker(SORTTracker):
     @property
     def unconfirmed_ids(self):
         """Unconfirmed ids in the tracker."""
-        ids = [id for id, track in self.tracks.items() if track.tentative]
-        return ids
-
-    def init_track(self, id: int, obj: Tuple[torch.Tensor]):
-        """Initialize a track."""
-        super().init_track(id, obj)
-        if self.tracks[id].frame_ids[-1] == 0:
-            self.tracks[id].tentative = False
-        else:
-            self.tracks[id].tentative = True
-        bbox = bbox_xyxy_to_cxcyah(self.tracks[id].bboxes[-1])  # size = (1, 4)
-        assert bbox.ndim == 2 and bbox.shape[0] == 1
-        bbox = bbox.squeeze(0).cpu().numpy()
-        self.tracks[id].mean, self.tracks[id].covariance = self.kf.initiate(
-            bbox)
-        # track.obs maintains the history associated detections to this track
-        self.tracks[id].obs = []
-        bbox_id = self.memo_items.index('bboxes')
-        self.tracks[id].obs.append(obj[bbox_id])
+        if self.empty:
+            return []
+        tentative = self.tracks.get_column('tentative')
+        return np.asarray(self.ids)[tentative].tolist()
+
+    def init_tracks(self, ids: List[int], objs: dict) -> np.ndarray:
+        """Initialize some tracks."""
+        slots = super().init_tracks(ids, objs)
+        self.tracks.set_column('tentative',
+                               objs['frame_ids'].cpu().numpy() != 0, ids)
+        for id, bbox in zip(ids, objs['bboxes']):
+            # track.obs maintains the history associated detections to this
+            # track
+            self.tracks[id].obs = [bbox]
         # a placefolder to save mean/covariance before losing tracking it
-        # parameters to save: mean, covariance, measurement
-        self.tracks[id].tracked = True
-        self.tracks[id].saved_attr = Dict()
-        self.tracks[id].velocity = torch.tensor(
-            (-1, -1)).to(obj[bbox_id].device)  # placeholder
-
-    def update_track(self, id: int, obj: Tuple[torch.Tensor]):
-        """Update a track."""
-        super().update_track(id, obj)
-        if self.tracks[id].tentative:
-            if len(self.tracks[id]['bboxes']) >= self.num_tentatives:
-                self.tracks[id].tentative = False
-        bbox = bbox_xyxy_to_cxcyah(self.tracks[id].bboxes[-1])  # size = (1, 4)
-        assert bbox.ndim == 2 and bbox.shape[0] == 1
-        bbox = bbox.squeeze(0).cpu().numpy()
-        self.tracks[id].mean, self.tracks[id].covariance = self.kf.update(
-            self.tracks[id].mean, self.tracks[id].covariance, bbox)
-        self.tracks[id].tracked = True
-        bbox_id = self.memo_items.index('bboxes')
-        self.tracks[id].obs.append(obj[bbox_id])
-
-        bbox1 = self.k_step_observation(self.tracks[id])
-        bbox2 = obj[bbox_id]
-        self.tracks[id].velocity = self.vel_direction(bbox1, bbox2).to(
-            obj[bbox_id].device)
+        self.tracks.set_column('tracked', np.ones(len(ids), dtype=bool), ids)
+        self.tracks.set_column('saved_mean',
+                               self.tracks.get_column('mean', ids), ids)
+        self.tracks.set_column('saved_covariance',
+                               self.tracks.get_column('covariance', ids), ids)
+        self.tracks.set_column('velocity',
+                               np.full((len(ids), 2), -1, dtype=np.float32),
+                               ids)  # placeholder
+        return slots
+
+    def update_tracks(self, ids: List[int], objs: dict) -> np.ndarray:
+        """Update some tracks."""
+        slots = super().update_tracks(ids, objs)
+        bboxes = bbox_xyxy_to_cxcyah(objs['bboxes']).cpu().numpy()
+        means, covariances = self.kf.multi_update(
+            self.tracks.get_column('mean', ids),
+            self.tracks.get_column('covariance', ids), bboxes)
+        self.tracks.set_column('mean', means, ids)
+        self.tracks.set_column('covariance', covariances, ids)
+        self.tracks.set_column('tracked', np.ones(len(ids), dtype=bool), ids)
+
+        bboxes1 = []
+        for id, bbox in zip(ids, objs['bboxes']):
+            self.tracks[id].obs.append(bbox)
+            bboxes1.append(self.k_step_observation(self.tracks[id]))
+        if len(ids) > 0:
+            velocities = self.vel_direction_pairs(
+                torch.stack(bboxes1), objs['bboxes'])
+            self.tracks.set_column('velocity', velocities.cpu().numpy(), ids)
+        return slots
 
     def vel_direction(self, bbox1: torch.Tensor, bbox2: torch.Tensor):
         """Estimate the direction vector between two boxes."""
@@ -124,6 +122,21 @@ class OCSORTTracker(SORTTracker):
         norm = torch.sqrt((speed[0])**2 + (speed[1])**2) + 1e-6
         return speed / norm
 
+    def vel_direction_pairs(self, bboxes1: torch.Tensor,
+                            bboxes2: torch.Tensor) -> torch.Tensor:
+        """Batched version of :meth:`vel_direction`, estimating the direction
+        vector between each pair of boxes of ``bboxes1`` and ``bboxes2``."""
+        cx1 = (bboxes1[:, 0] + bboxes1[:, 2]) / 2.0
+        cy1 = (bboxes1[:, 1] + bboxes1[:, 3]) / 2.0
+        cx2 = (bboxes2[:, 0] + bboxes2[:, 2]) / 2.0
+        cy2 = (bboxes2[:, 1] + bboxes2[:, 3]) / 2.0
+        speed = torch.stack([cy2 - cy1, cx2 - cx1], dim=1)
+        norm = torch.sqrt((speed[:, 0])**2 + (speed[:, 1])**2) + 1e-6
+        speed = speed / norm[:, None]
+        invalid = (bboxes1.sum(dim=1) < 0) | (bboxes2.sum(dim=1) < 0)
+        speed[invalid] = -1
+        return speed
+
     def vel_direction_batch(self, bboxes1: torch.Tensor,
                             bboxes2: torch.Tensor):
         """Estimate the direction vector given two batches of boxes."""
@@ -179,15 +192,12 @@ class OCSORTTracker(SORTTracker):
                 Defaults to 0.5.
 
         Returns:
-            tuple(int): The assigning ids.
+            tuple(Tensor): The assigning ids.
 
         OC-SORT uses velocity consistency besides IoU for association
         """
         # get track_bboxes
-        track_bboxes = np.zeros((0, 4))
-        for id in ids:
-            track_bboxes = np.concatenate(
-                (track_bboxes, self.tracks[id].mean[:4][None]), axis=0)
+        track_bboxes = self.tracks.get_column('mean', ids)[:, :4]
         track_bboxes = torch.from_numpy(track_bboxes).to(det_bboxes)
         track_bboxes = bbox_cxcyah_to_xyxy(track_bboxes)
 
@@ -197,18 +207,16 @@ class OCSORTTracker(SORTTracker):
             ious *= det_scores
 
         # support multi-class association
-        track_labels = torch.tensor([
-            self.tracks[id]['labels'][-1] for id in ids
-        ]).to(det_bboxes.device)
+        track_labels = self.tracks.last('labels', ids).to(det_bboxes.device)
         cate_match = det_labels[None, :] == track_labels[:, None]
         # to avoid det and track of different categories are matched
         cate_cost = (1 - cate_match.int()) * 1e6
 
-        dists = (1 - ious + cate_cost).cpu().numpy()
+        dists = 1 - ious + cate_cost
 
         if len(ids) > 0 and len(det_bboxes) > 0:
-            track_velocities = torch.stack(
-                [self.tracks[id].velocity for id in ids]).to(det_bboxes.device)
+            track_velocities = torch.from_numpy(
+                self.tracks.get_column('velocity', ids)).to(det_bboxes.device)
             k_step_observations = torch.stack([
                 self.k_step_observation(self.tracks[id]) for id in ids
             ]).to(det_bboxes.device)
@@ -231,15 +239,10 @@ class OCSORTTracker(SORTTracker):
             # set non-valid entries 0
             valid_norm_angle = norm_angle * valid_matrix
 
-            dists += valid_norm_angle.cpu().numpy() * self.vel_consist_weight
+            dists += valid_norm_angle * self.vel_consist_weight
 
         # bipartite match
-        if dists.size > 0:
-            cost, row, col = lap.lapjv(
-                dists, extend_cost=True, cost_limit=1 - match_iou_thr)
-        else:
-            row = np.zeros(len(ids)).astype(np.int32) - 1
-            col = np.zeros(len(det_bboxes)).astype(np.int32) - 1
+        row, col = self.linear_assignment(dists, cost_limit=1 - match_iou_thr)
         return row, col
 
     def last_obs(self, track: Dict):
@@ -274,7 +277,7 @@ class OCSORTTracker(SORTTracker):
                 Defaults to 0.5.
 
         Returns:
-            tuple(int): The assigning ids.
+            tuple(Tensor): The assigning ids.
         """
         # compute distance
         ious = bbox_overlaps(track_obs, det_bboxes)
@@ -286,15 +289,10 @@ class OCSORTTracker(SORTTracker):
         # to avoid det and track of different categories are matched
         cate_cost = (1 - cate_match.int()) * 1e6
 
-        dists = (1 - ious + cate_cost).cpu().numpy()
+        dists = 1 - ious + cate_cost
 
         # bipartite match
-        if dists.size > 0:
-            cost, row, col = lap.lapjv(
-                dists, extend_cost=True, cost_limit=1 - match_iou_thr)
-        else:
-            row = np.zeros(len(track_obs)).astype(np.int32) - 1
-            col = np.zeros(len(det_bboxes)).astype(np.int32) - 1
+        row, col = self.linear_assignment(dists, cost_limit=1 - match_iou_thr)
         return row, col
 
     def online_smooth(self, track: Dict, obj: torch.Tensor):
@@ -314,8 +312,8 @@ class OCSORTTracker(SORTTracker):
                 break
         bbox_shift_per_step = (new_match_bbox - last_match_bbox) / (
             unmatch_len + 1)
-        track.mean = track.saved_attr.mean
-        track.covariance = track.saved_attr.covariance
+        track.mean = track.saved_mean
+        track.covariance = track.saved_covariance
         for i in range(unmatch_len):
             virtual_bbox = last_match_bbox + (i + 1) * bbox_shift_per_step
             virtual_bbox = bbox_xyxy_to_cxcyah(virtual_bbox[None, :])
@@ -373,27 +371,31 @@ class OCSORTTracker(SORTTracker):
             det_ids = ids[det_inds]
 
             # 1. predict by Kalman Filter
-            for id in self.confirmed_ids:
-                # track is lost in previous frame
-                if self.tracks[id].frame_ids[-1] != frame_id - 1:
-                    self.tracks[id].mean[7] = 0
-                if self.tracks[id].tracked:
-                    self.tracks[id].saved_attr.mean = self.tracks[id].mean
-                    self.tracks[id].saved_attr.covariance = self.tracks[
-                        id].covariance
-                (self.tracks[id].mean,
-                 self.tracks[id].covariance) = self.kf.predict(
-                     self.tracks[id].mean, self.tracks[id].covariance)
+            confirmed_ids = self.confirmed_ids
+            means = self.tracks.get_column('mean', confirmed_ids)
+            covariances = self.tracks.get_column('covariance', confirmed_ids)
+            # track is lost in previous frame
+            lost = self.tracks.last(
+                'frame_ids', confirmed_ids).cpu().numpy() != frame_id - 1
+            means[lost, 7] = 0
+            tracked = self.tracks.get_column('tracked', confirmed_ids)
+            tracked_ids = np.asarray(confirmed_ids)[tracked]
+            self.tracks.set_column('saved_mean', means[tracked], tracked_ids)
+            self.tracks.set_column('saved_covariance', covariances[tracked],
+                                   tracked_ids)
+            means, covariances = self.kf.multi_predict(means, covariances)
+            self.tracks.set_column('mean', means, confirmed_ids)
+            self.tracks.set_column('covariance', covariances, confirmed_ids)
 
             # 2. match detections and tracks' predicted locations
             match_track_inds, raw_match_det_inds = self.ocm_assign_ids(
-                self.confirmed_ids, det_bboxes, det_labels, det_scores,
+                confirmed_ids, det_bboxes, det_labels, det_scores,
                 self.weight_iou_with_det_scores, self.match_iou_thr)
             # '-1' mean a detection box is not matched with tracklets in
             # previous frame
             valid = raw_match_det_inds > -1
-            det_ids[valid] = torch.tensor(
-                self.confirmed_ids)[raw_match_det_inds[valid]].to(labels)
+            det_ids[valid] = labels.new_tensor(confirmed_ids)[
+                raw_match_det_inds[valid]]
 
             match_det_bboxes = det_bboxes[valid]
             match_det_labels = det_labels[valid]
@@ -435,9 +437,9 @@ class OCSORTTracker(SORTTracker):
             unmatch_det_ids = unmatch_det_ids[~valid]
             assert (unmatch_det_ids == -1).all()
 
-            all_track_ids = [id for id, _ in self.tracks.items()]
-            unmatched_track_inds = torch.tensor(
-                [ind for ind in all_track_ids if ind not in match_det_ids])
+            all_track_ids = np.asarray(self.ids)
+            unmatched = ~np.isin(all_track_ids, match_det_ids.cpu().numpy())
+            unmatched_track_inds = torch.from_numpy(all_track_ids[unmatched])
 
             if len(unmatched_track_inds) > 0:
                 # 4. still some tracks not associated yet, perform OCR
@@ -446,10 +448,8 @@ class OCSORTTracker(SORTTracker):
                     last_box = self.last_obs(self.tracks[id.item()])
                     last_observations.append(last_box)
                 last_observations = torch.stack(last_observations)
-                last_track_labels = torch.tensor([
-                    self.tracks[id.item()]['labels'][-1]
-                    for id in unmatched_track_inds
-                ]).to(det_bboxes.device)
+                last_track_labels = self.tracks.last(
+                    'labels', unmatched_track_inds).to(det_bboxes.device)
 
                 remain_det_ids = torch.full((unmatch_det_bboxes.size(0), ),
                                             -1,
@@ -462,8 +462,8 @@ class OCSORTTracker(SORTTracker):
                     self.weight_iou_with_det_scores, self.match_iou_thr)
 
                 valid = ocr_match_det_inds > -1
-                remain_det_ids[valid] = unmatched_track_inds.clone()[
-                    ocr_match_det_inds[valid]].to(labels)
+                remain_det_ids[valid] = unmatched_track_inds.to(labels)[
+                    ocr_match_det_inds[valid]]
 
                 ocr_match_det_bboxes = unmatch_det_bboxes[valid]
                 ocr_match_det_labels = unmatch_det_labels[valid]
@@ -498,10 +498,14 @@ class OCSORTTracker(SORTTracker):
                     # the track is lost before this step
                     self.online_smooth(self.tracks[track_id], det_bbox)
 
-            for track_id in all_track_ids:
-                if track_id not in match_det_ids:
-                    self.tracks[track_id].tracked = False
-                    self.tracks[track_id].obs.append(None)
+            unmatched_track_ids = all_track_ids[
+                ~np.isin(all_track_ids,
+                         match_det_ids.cpu().numpy())]
+            self.tracks.set_column(
+                'tracked', np.zeros(len(unmatched_track_ids), dtype=bool),
+                unmatched_track_ids)
+            for track_id in unmatched_track_ids.tolist():
+                self.tracks[track_id].obs.append(None)
 
             bboxes = torch.cat((match_det_bboxes, unmatch_det_bboxes), dim=0)
             labels = torch.cat((match_det_labels, unmatch_det_labels), dim=0)
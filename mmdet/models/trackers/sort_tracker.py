@@ -1,5 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Union
 
 import numpy as np
 import torch
@@ -41,6 +41,10 @@ class SORTTracker(BaseTracker):
             Defaults to 0.7.
         num_tentatives (int, optional): Number of continuous frames to confirm
             a track. Defaults to 3.
+        linear_assignment (dict, optional): Configuration of the linear
+            assignment solver matching the tracks and the detections, e.g.
+            ``dict(type='AuctionAssignment')``. Defaults to None, i.e. the
+            ``linear_sum_assignment`` of motmetrics.
     """
 
     def __init__(self,
@@ -53,8 +57,9 @@ class SORTTracker(BaseTracker):
                      match_score_thr=2.0),
                  match_iou_thr: float = 0.7,
                  num_tentatives: int = 3,
+                 linear_assignment: Optional[dict] = None,
                  **kwargs):
-        if motmetrics is None:
+        if motmetrics is None and linear_assignment is None:
             raise RuntimeError('motmetrics is not installed,\
                  please install it by: pip install motmetrics')
         super().__init__(**kwargs)
@@ -65,47 +70,73 @@ class SORTTracker(BaseTracker):
         self.reid = reid
         self.match_iou_thr = match_iou_thr
         self.num_tentatives = num_tentatives
+        self.linear_assignment = TASK_UTILS.build(
+            linear_assignment) if linear_assignment is not None else None
 
     @property
     def confirmed_ids(self) -> List:
         """Confirmed ids in the tracker."""
-        ids = [id for id, track in self.tracks.items() if not track.tentative]
-        return ids
-
-    def init_track(self, id: int, obj: Tuple[Tensor]) -> None:
-        """Initialize a track."""
-        super().init_track(id, obj)
-        self.tracks[id].tentative = True
-        bbox = bbox_xyxy_to_cxcyah(self.tracks[id].bboxes[-1])  # size = (1, 4)
-        assert bbox.ndim == 2 and bbox.shape[0] == 1
-        bbox = bbox.squeeze(0).cpu().numpy()
-        self.tracks[id].mean, self.tracks[id].covariance = self.kf.initiate(
-            bbox)
-
-    def update_track(self, id: int, obj: Tuple[Tensor]) -> None:
-        """Update a track."""
-        super().update_track(id, obj)
-        if self.tracks[id].tentative:
-            if len(self.tracks[id]['bboxes']) >= self.num_tentatives:
-                self.tracks[id].tentative = False
-        bbox = bbox_xyxy_to_cxcyah(self.tracks[id].bboxes[-1])  # size = (1, 4)
-        assert bbox.ndim == 2 and bbox.shape[0] == 1
-        bbox = bbox.squeeze(0).cpu().numpy()
-        self.tracks[id].mean, self.tracks[id].covariance = self.kf.update(
-            self.tracks[id].mean, self.tracks[id].covariance, bbox)
+        if self.empty:
+            return []
+        tentative = self.tracks.get_column('tentative')
+        return np.asarray(self.ids)[~tentative].tolist()
+
+    def init_tracks(self, ids: List[int], objs: dict) -> np.ndarray:
+        """Initialize some tracks."""
+        slots = super().init_tracks(ids, objs)
+        self.tracks.set_column('tentative', np.ones(len(ids), dtype=bool), ids)
+        bboxes = bbox_xyxy_to_cxcyah(objs['bboxes']).cpu().numpy()
+        means, covariances = self.kf.multi_initiate(bboxes)
+        self.tracks.set_column('mean', means, ids)
+        self.tracks.set_column('covariance', covariances, ids)
+        return slots
+
+    def update_tracks(self, ids: List[int], objs: dict) -> np.ndarray:
+        """Update some tracks."""
+        slots = super().update_tracks(ids, objs)
+        tentative = self.tracks.get_column('tentative', ids) & (
+            self.tracks.get_num_updates(ids) < self.num_tentatives)
+        self.tracks.set_column('tentative', tentative, ids)
+        bboxes = bbox_xyxy_to_cxcyah(objs['bboxes']).cpu().numpy()
+        means, covariances = self.kf.multi_update(
+            self.tracks.get_column('mean', ids),
+            self.tracks.get_column('covariance', ids), bboxes)
+        self.tracks.set_column('mean', means, ids)
+        self.tracks.set_column('covariance', covariances, ids)
+        return slots
+
+    def solve_assignment(
+            self, dists: Union[Tensor,
+                               np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Match the tracks and the detections with the minimum total
+        distance, NaN and infinite distances marking the pairs that can not be
+        matched.
+
+        Args:
+            dists (Tensor | np.ndarray): Distances between the tracks and the
+                detections, of shape (N, M).
+
+        Returns:
+            tuple(np.ndarray, np.ndarray): The indices of the tracks and of
+            the detections of the matched pairs.
+        """
+        if self.linear_assignment is None:
+            return linear_sum_assignment(dists)
+        row, _ = self.linear_assignment(dists)
+        row = row.cpu().numpy()
+        matched = row > -1
+        return np.flatnonzero(matched), row[matched]
 
     def pop_invalid_tracks(self, frame_id: int) -> None:
         """Pop out invalid tracks."""
-        invalid_ids = []
-        for k, v in self.tracks.items():
-            # case1: disappeared frames >= self.num_frames_retrain
-            case1 = frame_id - v['frame_ids'][-1] >= self.num_frames_retain
-            # case2: tentative tracks but not matched in this frame
-            case2 = v.tentative and v['frame_ids'][-1] != frame_id
-            if case1 or case2:
-                invalid_ids.append(k)
-        for invalid_id in invalid_ids:
-            self.tracks.pop(invalid_id)
+        if self.empty:
+            return
+        last_frames = self.tracks.last('frame_ids').cpu().numpy()
+        # case1: disappeared frames >= self.num_frames_retrain
+        case1 = frame_id - last_frames >= self.num_frames_retain
+        # case2: tentative tracks but not matched in this frame
+        case2 = self.tracks.get_column('tentative') & (last_frames != frame_id)
+        self.tracks.remove(np.asarray(self.ids)[case1 | case2])
 
     def track(self,
               model: torch.nn.Module,
@@ -201,17 +232,16 @@ class SORTTracker(BaseTracker):
                     reid_dists = torch.cdist(track_embeds, embeds)
 
                     # support multi-class association
-                    track_labels = torch.tensor([
-                        self.tracks[id]['labels'][-1] for id in active_ids
-                    ]).to(bboxes.device)
+                    track_labels = self.tracks.last('labels', active_ids).to(
+                        bboxes.device)
                     cate_match = labels[None, :] == track_labels[:, None]
                     cate_cost = (1 - cate_match.int()) * 1e6
                     reid_dists = (reid_dists + cate_cost).cpu().numpy()
 
-                    valid_inds = [list(self.ids).index(_) for _ in active_ids]
+                    valid_inds = np.isin(self.ids, active_ids)
                     reid_dists[~np.isfinite(costs[valid_inds, :])] = np.nan
 
-                    row, col = linear_sum_assignment(reid_dists)
+                    row, col = self.solve_assignment(reid_dists)
                     for r, c in zip(row, col):
                         dist = reid_dists[r, c]
                         if not np.isfinite(dist):
@@ -219,25 +249,25 @@ class SORTTracker(BaseTracker):
                         if dist <= self.reid['match_score_thr']:
                             ids[c] = active_ids[r]
 
-            active_ids = [
-                id for id in self.ids if id not in ids
-                and self.tracks[id].frame_ids[-1] == frame_id - 1
-            ]
+            track_ids = np.asarray(self.ids)
+            last_frames = self.tracks.last('frame_ids').cpu().numpy()
+            active_ids = track_ids[~np.isin(track_ids,
+                                            ids.cpu().numpy())
+                                   & (last_frames == frame_id - 1)].tolist()
             if len(active_ids) > 0:
                 active_dets = torch.nonzero(ids == -1).squeeze(1)
                 track_bboxes = self.get('bboxes', active_ids)
                 ious = bbox_overlaps(track_bboxes, bboxes[active_dets])
 
                 # support multi-class association
-                track_labels = torch.tensor([
-                    self.tracks[id]['labels'][-1] for id in active_ids
-                ]).to(bboxes.device)
+                track_labels = self.tracks.last('labels',
+                                                active_ids).to(bboxes.device)
                 cate_match = labels[None, active_dets] == track_labels[:, None]
                 cate_cost = (1 - cate_match.int()) * 1e6
 
                 dists = (1 - ious + cate_cost).cpu().numpy()
 
-                row, col = linear_sum_assignment(dists)
+                row, col = self.solve_assignment(dists)
                 for r, c in zip(row, col):
                     dist = dists[r, c]
                     if dist < 1 - self.match_iou_thr:
@@ -1,15 +1,9 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import Optional, Tuple
+from typing import List, Optional
 
 import numpy as np
 import torch
 from mmengine.structures import InstanceData
-
-try:
-    import motmetrics
-    from motmetrics.lap import linear_sum_assignment
-except ImportError:
-    motmetrics = None
 from torch import Tensor
 
 from mmdet.models.utils import imrenormalize
@@ -17,6 +11,7 @@ from mmdet.registry import MODELS
 from mmdet.structures import TrackDataSample
 from mmdet.structures.bbox import bbox_overlaps, bbox_xyxy_to_cxcyah
 from mmdet.utils import OptConfigType
+from .base_tracker import BaseTracker
 from .sort_tracker import SORTTracker
 
 
@@ -75,31 +70,23 @@ class StrongSORTTracker(SORTTracker):
                  match_iou_thr: float = 0.7,
                  num_tentatives: int = 2,
                  **kwargs):
-        if motmetrics is None:
-            raise RuntimeError('motmetrics is not installed,\
-                 please install it by: pip install motmetrics')
         super().__init__(motion, obj_score_thr, reid, match_iou_thr,
                          num_tentatives, **kwargs)
 
-    def update_track(self, id: int, obj: Tuple[Tensor]) -> None:
-        """Update a track."""
-        for k, v in zip(self.memo_items, obj):
-            v = v[None]
-            if self.momentums is not None and k in self.momentums:
-                m = self.momentums[k]
-                self.tracks[id][k] = (1 - m) * self.tracks[id][k] + m * v
-            else:
-                self.tracks[id][k].append(v)
-
-        if self.tracks[id].tentative:
-            if len(self.tracks[id]['bboxes']) >= self.num_tentatives:
-                self.tracks[id].tentative = False
-        bbox = bbox_xyxy_to_cxcyah(self.tracks[id].bboxes[-1])  # size = (1, 4)
-        assert bbox.ndim == 2 and bbox.shape[0] == 1
-        bbox = bbox.squeeze(0).cpu().numpy()
-        score = float(self.tracks[id].scores[-1].cpu())
-        self.tracks[id].mean, self.tracks[id].covariance = self.kf.update(
-            self.tracks[id].mean, self.tracks[id].covariance, bbox, score)
+    def update_tracks(self, ids: List[int], objs: dict) -> np.ndarray:
+        """Update some tracks."""
+        slots = BaseTracker.update_tracks(self, ids, objs)
+        tentative = self.tracks.get_column('tentative', ids) & (
+            self.tracks.get_num_updates(ids) < self.num_tentatives)
+        self.tracks.set_column('tentative', tentative, ids)
+        bboxes = bbox_xyxy_to_cxcyah(objs['bboxes']).cpu().numpy()
+        scores = objs['scores'].float().cpu().numpy()
+        means, covariances = self.kf.multi_update(
+            self.tracks.get_column('mean', ids),
+            self.tracks.get_column('covariance', ids), bboxes, scores)
+        self.tracks.set_column('mean', means, ids)
+        self.tracks.set_column('covariance', covariances, ids)
+        return slots
 
     def track(self,
               model: torch.nn.Module,
@@ -199,7 +186,7 @@ class StrongSORTTracker(SORTTracker):
                         self.reid.get('num_samples', None),
                         behavior='mean')
                     reid_dists = cosine_distance(track_embeds, embeds)
-                    valid_inds = [list(self.ids).index(_) for _ in active_ids]
+                    valid_inds = np.isin(self.ids, active_ids)
                     reid_dists[~np.isfinite(motion_dists[
                         valid_inds, :])] = np.nan
 
@@ -208,14 +195,13 @@ class StrongSORTTracker(SORTTracker):
                         weight_motion * motion_dists[valid_inds]
 
                     # support multi-class association
-                    track_labels = torch.tensor([
-                        self.tracks[id]['labels'][-1] for id in active_ids
-                    ]).to(bboxes.device)
+                    track_labels = self.tracks.last('labels', active_ids).to(
+                        bboxes.device)
                     cate_match = labels[None, :] == track_labels[:, None]
                     cate_cost = ((1 - cate_match.int()) * 1e6).cpu().numpy()
                     match_dists = match_dists + cate_cost
 
-                    row, col = linear_sum_assignment(match_dists)
+                    row, col = self.solve_assignment(match_dists)
                     for r, c in zip(row, col):
                         dist = match_dists[r, c]
                         if not np.isfinite(dist):
@@ -223,25 +209,25 @@ class StrongSORTTracker(SORTTracker):
                         if dist <= self.reid['match_score_thr']:
                             ids[c] = active_ids[r]
 
-            active_ids = [
-                id for id in self.ids if id not in ids
-                and self.tracks[id].frame_ids[-1] == frame_id - 1
-            ]
+            track_ids = np.asarray(self.ids)
+            last_frames = self.tracks.last('frame_ids').cpu().numpy()
+            active_ids = track_ids[~np.isin(track_ids,
+                                            ids.cpu().numpy())
+                                   & (last_frames == frame_id - 1)].tolist()
             if len(active_ids) > 0:
                 active_dets = torch.nonzero(ids == -1).squeeze(1)
                 track_bboxes = self.get('bboxes', active_ids)
                 ious = bbox_overlaps(track_bboxes, bboxes[active_dets])
 
                 # support multi-class association
-                track_labels = torch.tensor([
-                    self.tracks[id]['labels'][-1] for id in active_ids
-                ]).to(bboxes.device)
+                track_labels = self.tracks.last('labels',
+                                                active_ids).to(bboxes.device)
                 cate_match = labels[None, active_dets] == track_labels[:, None]
                 cate_cost = (1 - cate_match.int()) * 1e6
 
                 dists = (1 - ious + cate_cost).cpu().numpy()
 
-                row, col = linear_sum_assignment(dists)
+                row, col = self.solve_assignment(dists)
                 for r, c in zip(row, col):
                     dist = dists[r, c]
                     if dist < 1 - self.match_iou_thr:
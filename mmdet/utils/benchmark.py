@@ -1,8 +1,10 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import copy
+import sys
 import time
-from functools import partial
-from typing import List, Optional, Union
+from collections import defaultdict
+from functools import partial, wraps
+from typing import Callable, Dict, List, Optional, Union
 
 import numpy as np
 import torch
@@ -14,6 +16,7 @@ from mmengine import MMLogger
 from mmengine.config import Config
 from mmengine.device import get_max_cuda_memory
 from mmengine.dist import get_world_size
+from mmengine.fileio import dump
 from mmengine.runner import Runner, load_checkpoint
 from mmengine.utils.dl_utils import set_multi_processing
 from torch.nn.parallel import DistributedDataParallel
@@ -44,7 +47,7 @@ def print_log(msg: str, logger: Optional[MMLogger] = None) -> None:
         logger.info(msg)
 
 
-def print_process_memory(p: psutil.Process,
+def print_process_memory(p: 'psutil.Process',
                          logger: Optional[MMLogger] = None) -> None:
     """print process memory info."""
     mem_used = gb_round(psutil.virtual_memory().used)
@@ -68,6 +71,196 @@ def print_process_memory(p: psutil.Process,
     print_log(log_msg, logger)
 
 
+class StageTimer:
+    """Accumulate the wall time spent in the stages of a detector.
+
+    A stage is timed by wrapping callables: the ``forward`` and ``predict``
+    methods of the modules of the stage, the transforms of a pipeline or
+    functions imported by the model modules such as ``multiclass_nms``.
+    Nested calls of the same stage are only timed once, and repeated calls
+    within an iteration are summed, so a layer shared by the two branches of
+    a multispectral backbone is timed for both of them.
+
+    Args:
+        synchronize (bool): Whether to synchronize CUDA before reading the
+            clock, required to time the stages of a model on GPU.
+            Defaults to False.
+    """
+
+    def __init__(self, synchronize: bool = False):
+        self.synchronize = synchronize
+        self.record = True
+        self.times: Dict[str, float] = defaultdict(float)
+        self._depth: Dict[str, int] = defaultdict(int)
+        self._patches: List[tuple] = []
+
+    def timed(self, stage: str, func: Callable) -> Callable:
+        """Wrap a callable to add its duration to a stage."""
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.record or self._depth[stage] > 0:
+                return func(*args, **kwargs)
+            if self.synchronize:
+                torch.cuda.synchronize()
+            self._depth[stage] += 1
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if self.synchronize:
+                    torch.cuda.synchronize()
+                self.times[stage] += time.perf_counter() - start_time
+                self._depth[stage] -= 1
+
+        return wrapper
+
+    def add(self, stage: str, elapsed: float) -> None:
+        """Add a duration measured outside the timer to a stage."""
+        if self.record:
+            self.times[stage] += elapsed
+
+    def patch(self, stage: str, obj: object, name: Union[str, int]) -> None:
+        """Time the attribute ``name`` of ``obj``, or its item for a list,
+        until :meth:`remove`."""
+        if isinstance(obj, list):
+            original, had_attr = obj[name], True
+            obj[name] = self.timed(stage, original)
+        else:
+            had_attr = name in vars(obj)
+            original = getattr(obj, name)
+            setattr(obj, name, self.timed(stage, original))
+        self._patches.append((obj, name, original, had_attr))
+
+    def time_module(self, stage: str, module: nn.Module) -> None:
+        """Time the ``forward`` and ``predict`` methods of a module."""
+        for name in ('forward', 'predict'):
+            if callable(getattr(module, name, None)):
+                self.patch(stage, module, name)
+
+    def time_pipeline(self, pipeline) -> None:
+        """Time the transforms of a pipeline, image loading as ``decode``
+        and the other transforms as ``transform``."""
+        transforms = getattr(pipeline, 'transforms', None)
+        if transforms is None:
+            return
+        for i, transform in enumerate(transforms):
+            type_name = type(transform).__name__
+            # LoadImageFromFile, LoadBGR3TFromKAIST, ...
+            is_decode = type_name.startswith('Load') and (
+                'Image' in type_name or 'BGR3T' in type_name)
+            self.patch('decode' if is_decode else 'transform', transforms, i)
+
+    def time_functions(self, stage: str, names: List[str],
+                       module_prefixes: List[str]) -> None:
+        """Time functions imported by name in the loaded modules whose name
+        starts with one of ``module_prefixes``."""
+        for module_name, module in list(sys.modules.items()):
+            if module is None or not module_name.startswith(
+                    tuple(module_prefixes)):
+                continue
+            for name in names:
+                if callable(vars(module).get(name)):
+                    self.patch(stage, module, name)
+
+    def remove(self) -> None:
+        """Restore all the patched attributes."""
+        for obj, name, original, had_attr in reversed(self._patches):
+            if isinstance(obj, list):
+                obj[name] = original
+            elif had_attr:
+                setattr(obj, name, original)
+            else:
+                delattr(obj, name)
+        self._patches = []
+
+    def reset(self) -> None:
+        """Clear the accumulated durations."""
+        self.times.clear()
+
+    def summary(self, num_iters: int) -> Dict[str, float]:
+        """Average duration of every stage per iteration in ms."""
+        return {
+            stage: round(elapsed * 1000 / max(num_iters, 1), 3)
+            for stage, elapsed in self.times.items()
+        }
+
+
+def get_stage_modules(
+        model: nn.Module) -> Dict[str, Union[nn.Module, List[nn.Module]]]:
+    """Find the modules of the stages of a detector.
+
+    The stages are the data preprocessor, the top-level backbones, necks,
+    heads and fusion modules, e.g. ``backbone`` and ``backbone_ir`` of a
+    two-backbone multispectral detector, the fusion modules nested in a
+    backbone and, for a backbone holding both branches, the thermal layers
+    named ``<name>_ir`` and their visible counterparts ``<name>``.
+
+    Args:
+        model (nn.Module): The detector.
+
+    Returns:
+        dict[str, nn.Module | list[nn.Module]]: Modules of each stage.
+    """
+    stages: Dict[str, Union[nn.Module, List[nn.Module]]] = dict()
+    data_preprocessor = getattr(model, 'data_preprocessor', None)
+    if isinstance(data_preprocessor, nn.Module):
+        stages['preprocess'] = data_preprocessor
+    for name, child in model.named_children():
+        # teachers of distillation detectors do not run at test time
+        if child is None or name.startswith('teacher') or \
+                name == 'data_preprocessor':
+            continue
+        if name.startswith(('backbone', 'neck')) or 'head' in name or \
+                'fusion' in name:
+            stages[name] = child
+        if not name.startswith('backbone'):
+            continue
+        children = dict(child.named_children())
+        rgb, ir = [], []
+        for child_name, grandchild in children.items():
+            if child_name.endswith('_ir') and \
+                    child_name[:-3] in children:
+                rgb.append(children[child_name[:-3]])
+                ir.append(grandchild)
+        if ir:
+            stages[f'{name}.rgb'] = rgb
+            stages[f'{name}.ir'] = ir
+        for module_name, module in child.named_modules():
+            if module_name and 'fusion' in module_name.split('.')[-1] and \
+                    not isinstance(module, nn.ModuleList):
+                stages[f'{name}.{module_name}'] = module
+    return stages
+
+
+def average_stage_times(results: List[dict]) -> Dict[str, float]:
+    """Average the ``stage_times`` of the results of multiple runs."""
+    stage_times = defaultdict(float)
+    for result in results:
+        for stage, elapsed in result['stage_times'].items():
+            stage_times[stage] += elapsed / len(results)
+    return {stage: round(elapsed, 3) for stage, elapsed in stage_times.items()}
+
+
+def dump_benchmark_results(results: dict, out_file: str, **meta) -> dict:
+    """Save the results of a benchmark to a json file, e.g. to compare them
+    across commits.
+
+    Args:
+        results (dict): Results returned by the ``run`` method of a
+            benchmark.
+        out_file (str): Path of the json file.
+        **meta: Information about the run saved before the results, e.g. the
+            config, the commit and the device.
+
+    Returns:
+        dict: The saved results.
+    """
+    results = dict(**meta, **results)
+    dump(results, out_file, indent=4)
+    return results
+
+
 class BaseBenchmark:
     """The benchmark base class.
 
@@ -122,6 +315,13 @@ class InferenceBenchmark(BaseBenchmark):
     """The inference benchmark class. It will be statistical inference FPS,
     CUDA memory and CPU memory information.
 
+    With ``stage_timings=True``, the time per image of every stage is also
+    reported: ``data`` (data loading), ``decode`` and ``transform`` (the
+    pipeline transforms), ``preprocess`` (data preprocessor), the backbones
+    with their visible and thermal branches and fusion modules, the necks,
+    the heads and ``nms``. See :func:`get_stage_modules`. The stages
+    overlap, e.g. ``backbone.rgb`` is part of ``backbone``.
+
     Args:
         cfg (mmengine.Config): config.
         checkpoint (str): Accept local filepath, URL, ``torchvision://xxx``,
@@ -133,6 +333,11 @@ class InferenceBenchmark(BaseBenchmark):
         log_interval (int): interval of logging. Defaults to 50.
         num_warmup (int): Number of Warmup. Defaults to 5.
         logger (MMLogger, optional): Formatted logger used to record messages.
+        device (str): Device to run the model on, ``'cuda'`` or ``'cpu'``.
+            Defaults to 'cuda'.
+        stage_timings (bool): Whether to report the time of every stage.
+            Timing the stages on GPU synchronizes CUDA around each of them,
+            which slightly lowers the FPS. Defaults to False.
     """
 
     def __init__(self,
@@ -143,7 +348,9 @@ class InferenceBenchmark(BaseBenchmark):
                  max_iter: int = 2000,
                  log_interval: int = 50,
                  num_warmup: int = 5,
-                 logger: Optional[MMLogger] = None):
+                 logger: Optional[MMLogger] = None,
+                 device: str = 'cuda',
+                 stage_timings: bool = False):
         super().__init__(max_iter, log_interval, num_warmup, logger)
 
         assert get_world_size(
@@ -151,6 +358,9 @@ class InferenceBenchmark(BaseBenchmark):
 
         self.cfg = copy.deepcopy(cfg)
         self.distributed = distributed
+        self.device = device
+        self.with_cuda = device.startswith('cuda')
+        self.stage_timings = stage_timings
 
         if psutil is None:
             raise ImportError('psutil is not installed, please install it by: '
@@ -178,9 +388,31 @@ class InferenceBenchmark(BaseBenchmark):
         dataloader_cfg['persistent_workers'] = False
         self.data_loader = Runner.build_dataloader(dataloader_cfg)
 
+        self.stage_timer = None
+        if self.stage_timings:
+            self.stage_timer = self._init_stage_timer()
+
         print_log('after build: ', self.logger)
         print_process_memory(self._process, self.logger)
 
+    def _init_stage_timer(self) -> StageTimer:
+        """Time the stages of the model and of the test pipeline."""
+        stage_timer = StageTimer(synchronize=self.with_cuda)
+        model = self.model
+        if isinstance(model, DistributedDataParallel):
+            model = model.module
+        for stage, modules in get_stage_modules(model).items():
+            if not isinstance(modules, list):
+                modules = [modules]
+            for module in modules:
+                stage_timer.time_module(stage, module)
+        stage_timer.time_pipeline(
+            getattr(self.data_loader.dataset, 'pipeline', None))
+        # the heads import the nms functions, projects may import them too
+        stage_timer.time_functions('nms', ['multiclass_nms', 'batched_nms'],
+                                   ['mmdet.models', 'projects'])
+        return stage_timer
+
     def _init_model(self, checkpoint: str, is_fuse_conv_bn: bool) -> nn.Module:
         """Initialize the model."""
         model = MODELS.build(self.cfg.model)
@@ -193,7 +425,7 @@ class InferenceBenchmark(BaseBenchmark):
         if is_fuse_conv_bn:
             model = fuse_conv_bn(model)
 
-        model = model.cuda()
+        model = model.to(self.device)
 
         if self.distributed:
             model = DistributedDataParallel(
@@ -209,26 +441,41 @@ class InferenceBenchmark(BaseBenchmark):
         """Executes the benchmark once."""
         pure_inf_time = 0
         fps = 0
-
+        num_iters = 0
+        peak_cpu_memory = 0
+        stage_timer = self.stage_timer
+        if stage_timer is not None:
+            stage_timer.reset()
+            stage_timer.record = self.num_warmup == 0
+
+        fetch_start_time = time.perf_counter()
         for i, data in enumerate(self.data_loader):
+            if stage_timer is not None:
+                stage_timer.add('data', time.perf_counter() - fetch_start_time)
 
             if (i + 1) % self.log_interval == 0:
                 print_log('==================================', self.logger)
 
-            torch.cuda.synchronize()
+            if self.with_cuda:
+                torch.cuda.synchronize()
             start_time = time.perf_counter()
 
             with torch.no_grad():
                 self.model.test_step(data)
 
-            torch.cuda.synchronize()
+            if self.with_cuda:
+                torch.cuda.synchronize()
             elapsed = time.perf_counter() - start_time
 
             if i >= self.num_warmup:
                 pure_inf_time += elapsed
+                num_iters += 1
+                peak_cpu_memory = max(peak_cpu_memory,
+                                      self._process.memory_info().rss)
                 if (i + 1) % self.log_interval == 0:
                     fps = (i + 1 - self.num_warmup) / pure_inf_time
-                    cuda_memory = get_max_cuda_memory()
+                    cuda_memory = get_max_cuda_memory() \
+                        if self.with_cuda else 0
 
                     print_log(
                         f'Done image [{i + 1:<3}/{self.max_iter}], '
@@ -241,7 +488,19 @@ class InferenceBenchmark(BaseBenchmark):
                 fps = (i + 1 - self.num_warmup) / pure_inf_time
                 break
 
-        return {'fps': fps}
+            if stage_timer is not None:
+                stage_timer.record = i + 1 >= self.num_warmup
+            fetch_start_time = time.perf_counter()
+
+        result = {
+            'fps': fps,
+            'peak_cpu_memory': custom_round(peak_cpu_memory, 1024**2)
+        }
+        if self.with_cuda:
+            result['peak_cuda_memory'] = get_max_cuda_memory()
+        if stage_timer is not None:
+            result['stage_times'] = stage_timer.summary(num_iters)
+        return result
 
     def average_multiple_runs(self, results: List[dict]) -> dict:
         """Average the results of multiple runs."""
@@ -269,9 +528,23 @@ class InferenceBenchmark(BaseBenchmark):
                 f'times per image: {1000 / fps_list_[0]:.1f} ms/img',
                 self.logger)
 
-        print_log(f'cuda memory: {get_max_cuda_memory()} MB', self.logger)
+        outputs['peak_cpu_memory'] = max(result['peak_cpu_memory']
+                                         for result in results)
+        if self.with_cuda:
+            outputs['peak_cuda_memory'] = max(result['peak_cuda_memory']
+                                              for result in results)
+            print_log(f'cuda memory: {outputs["peak_cuda_memory"]} MB',
+                      self.logger)
         print_process_memory(self._process, self.logger)
 
+        if self.stage_timer is not None:
+            outputs['stage_times'] = average_stage_times(results)
+            print_log(
+                'Stage times per image (ms): ' + ', '.join(
+                    f'{stage}: {elapsed:.2f}'
+                    for stage, elapsed in outputs['stage_times'].items()),
+                self.logger)
+
         return outputs
 
 
@@ -407,6 +680,11 @@ class DatasetBenchmark(BaseBenchmark):
     """The dataset benchmark class. It will be statistical inference FPS, FPS
     pre transform and CPU memory information.
 
+    The average time per image of ``get_data_info`` and of every transform
+    is also reported, together with their totals for image loading
+    (``decode``), e.g. ``LoadBGR3TFromKAIST`` for the visible/thermal pairs,
+    and for the other transforms (``transform``).
+
     Args:
         cfg (mmengine.Config): config.
         dataset_type (str): benchmark data type, only supports ``train``,
@@ -449,6 +727,7 @@ class DatasetBenchmark(BaseBenchmark):
         """Executes the benchmark once."""
         pure_inf_time = 0
         fps = 0
+        stage_times: Dict[str, float] = defaultdict(float)
 
         total_index = list(range(len(self.dataset)))
         np.random.shuffle(total_index)
@@ -466,12 +745,22 @@ class DatasetBenchmark(BaseBenchmark):
             if (i + 1) % self.log_interval == 0:
                 print_log(f'get_data_info - {get_data_info_elapsed * 1000} ms',
                           self.logger)
+            if i >= self.num_warmup:
+                stage_times['get_data_info'] += get_data_info_elapsed
 
             for t in self.dataset.pipeline.transforms:
                 transform_start_time = time.perf_counter()
                 data_info = t(data_info)
                 transform_elapsed = time.perf_counter() - transform_start_time
 
+                if i >= self.num_warmup:
+                    type_name = t.__class__.__name__
+                    stage_times[type_name] += transform_elapsed
+                    is_decode = type_name.startswith('Load') and (
+                        'Image' in type_name or 'BGR3T' in type_name)
+                    stage_times['decode' if is_decode else
+                                'transform'] += transform_elapsed
+
                 if (i + 1) % self.log_interval == 0:
                     print_log(
                         f'{t.__class__.__name__} - '
@@ -498,7 +787,15 @@ class DatasetBenchmark(BaseBenchmark):
 
             start_time = time.perf_counter()
 
-        return {'fps': fps}
+        num_imgs = max(
+            min(len(total_index), self.max_iter) - self.num_warmup, 1)
+        return {
+            'fps': fps,
+            'stage_times': {
+                stage: round(elapsed * 1000 / num_imgs, 3)
+                for stage, elapsed in stage_times.items()
+            }
+        }
 
     def average_multiple_runs(self, results: List[dict]) -> dict:
         """Average the results of multiple runs."""
@@ -526,4 +823,6 @@ class DatasetBenchmark(BaseBenchmark):
                 f'times per img: {1000 / fps_list_[0]:.1f} ms/img',
                 self.logger)
 
+        outputs['stage_times'] = average_stage_times(results)
+
         return outputs
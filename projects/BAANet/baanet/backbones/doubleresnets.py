@@ -2,6 +2,7 @@
 import warnings
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.utils.checkpoint as cp
 from mmcv.cnn import build_conv_layer, build_norm_layer, build_plugin_layer
 from mmengine.model import BaseModule
@@ -314,8 +315,131 @@ class Bottleneck(BaseModule):
         return out
 
 
+class _GroupedParams:
+    """Cache of the parameters of two branches concatenated along the
+    output channels.
+
+    The concatenation is reused as long as the parameters are not updated
+    in place nor moved, and is rebuilt on every call when it has to carry
+    gradients to the branches.
+    """
+
+    def __init__(self):
+        self.cache = dict()
+
+    def __call__(self, tensor, tensor_ir):
+        if tensor is None:
+            return None
+        if torch.is_grad_enabled() and (tensor.requires_grad
+                                        or tensor_ir.requires_grad):
+            return torch.cat([tensor, tensor_ir])
+        state = (tensor._version, tensor_ir._version, tensor.data_ptr(),
+                 tensor_ir.data_ptr())
+        cached = self.cache.get((id(tensor), id(tensor_ir)))
+        if cached is None or cached[0] != state:
+            cached = (state, torch.cat([tensor, tensor_ir]).detach())
+            self.cache[(id(tensor), id(tensor_ir))] = cached
+        return cached[1]
+
+
+def _can_group(module, module_ir):
+    """Whether two modules of the branches can run as one grouped op."""
+    if type(module) is nn.Conv2d:
+        return type(module_ir) is nn.Conv2d and \
+            module.padding_mode == 'zeros'
+    if isinstance(module, _BatchNorm):
+        # running statistics cannot be updated through a concatenation
+        return isinstance(module_ir, _BatchNorm) and \
+            not (module.training or module_ir.training) and \
+            module.track_running_stats
+    if isinstance(module, nn.Sequential):
+        return len(module) == len(module_ir) and all(
+            _can_group(m, m_ir) for m, m_ir in zip(module, module_ir))
+    # channel-wise modules such as pooling and activations
+    return isinstance(module, (nn.AvgPool2d, nn.MaxPool2d, nn.ReLU))
+
+
+def _grouped_forward(module, module_ir, x, params):
+    """Run a module of each branch on the channel-concatenated inputs of
+    the two branches, as a single grouped op."""
+    if type(module) is nn.Conv2d:
+        return F.conv2d(x, params(module.weight, module_ir.weight),
+                        params(module.bias, module_ir.bias), module.stride,
+                        module.padding, module.dilation, module.groups * 2)
+    if isinstance(module, _BatchNorm):
+        return F.batch_norm(x, params(module.running_mean,
+                                      module_ir.running_mean),
+                            params(module.running_var,
+                                   module_ir.running_var),
+                            params(module.weight, module_ir.weight),
+                            params(module.bias, module_ir.bias), False, 0.,
+                            module.eps)
+    if isinstance(module, nn.Sequential):
+        for m, m_ir in zip(module, module_ir):
+            x = _grouped_forward(m, m_ir, x, params)
+        return x
+    return module(x)
+
+
+def _block_layers(block):
+    """Layers of a residual block in forward order, None if the block has
+    plugins or checkpointing and must run as is."""
+    if getattr(block, 'with_plugins', False) or block.with_cp:
+        return None
+    layers = [block.conv1, block.norm1, block.relu, block.conv2, block.norm2]
+    if isinstance(block, Bottleneck):
+        layers += [block.relu, block.conv3, block.norm3]
+    return layers
+
+
+def _can_group_res_layer(res_layer, res_layer_ir):
+    for block, block_ir in zip(res_layer, res_layer_ir):
+        layers = _block_layers(block)
+        layers_ir = _block_layers(block_ir)
+        if layers is None or layers_ir is None:
+            return False
+        if (block.downsample is None) != (block_ir.downsample is None):
+            return False
+        if block.downsample is not None:
+            layers = layers + [block.downsample]
+            layers_ir = layers_ir + [block_ir.downsample]
+        if not all(_can_group(m, m_ir) for m, m_ir in zip(layers, layers_ir)):
+            return False
+    return True
+
+
+def _grouped_res_layer(res_layer, res_layer_ir, x, params):
+    """Run the same stage of the two branches as one grouped stage."""
+    for block, block_ir in zip(res_layer, res_layer_ir):
+        out = x
+        for m, m_ir in zip(_block_layers(block), _block_layers(block_ir)):
+            out = _grouped_forward(m, m_ir, out, params)
+        if block.downsample is not None:
+            identity = _grouped_forward(block.downsample,
+                                        block_ir.downsample, x, params)
+        else:
+            identity = x
+        out += identity
+        x = block.relu(out)
+    return x
+
+
 @MODELS.register_module()
 class MultiSpecResNets(BaseModule):
+    """ResNet backbone with a visible and a thermal branch.
+
+    Args:
+        branch_mode (str): How the two branches are executed. In
+            ``'sequential'`` mode each branch runs its own layers one after
+            the other. In ``'grouped'`` mode the branches are kept
+            concatenated along the channels and every pair of layers runs as
+            a single convolution or batch norm with two groups, which halves
+            the number of kernel launches. Stages whose batch norms are in
+            training mode, or with plugins, DCN or checkpointing, fall back
+            to the sequential execution. Both modes share the same
+            parameters and give the same results. Defaults to
+            'sequential'.
+    """
     arch_settings = {
         18: (BasicBlock, (2, 2, 2, 2)),
         34: (BasicBlock, (3, 4, 6, 3)),
@@ -351,8 +475,13 @@ class MultiSpecResNets(BaseModule):
                  fusion_block_1=None,
                  fusion_block_2=None,
                  fusion_block_3=None,
-                 fusion_block_4=None):
+                 fusion_block_4=None,
+                 branch_mode='sequential'):
         super().__init__()
+        assert branch_mode in ('sequential', 'grouped'), \
+            f'invalid branch_mode {branch_mode}'
+        self.branch_mode = branch_mode
+        self._grouped_params = _GroupedParams()
         self.zero_init_residual = zero_init_residual
         if depth not in self.arch_settings:
             raise KeyError(f'invalid depth {depth} for resnet')
@@ -428,6 +557,8 @@ class MultiSpecResNets(BaseModule):
                                            self.fusion_block_2,
                                            self.fusion_block_3,
                                            self.fusion_block_4])
+        # constant illumination weights of the fusion modules
+        self.register_buffer('fusion_weight', torch.ones(1), False)
         self.res_layers = []
         for i, num_blocks in enumerate(self.stage_blocks):
             stride = strides[i]
@@ -676,6 +807,8 @@ class MultiSpecResNets(BaseModule):
 
     def forward(self, x):
         """Forward function."""
+        if self.branch_mode == 'grouped':
+            return self.grouped_forward(x)
         x_rgb = x[:, :3, :, :]
         x_ir = x[:, 3:, :, :]
         if self.deep_stem:
@@ -699,9 +832,9 @@ class MultiSpecResNets(BaseModule):
             x_rgb = res_layer(x_rgb)
             x_ir = res_layer_ir(x_ir)
             if self.fusion_module[i] is not None:
-                w_rgb = torch.tensor([1.0]).to(x_ir.device)
-                w_ir = torch.tensor([1.0]).to(x_ir.device)
-                x_rgb, x_ir = self.fusion_module[i](x_rgb, x_ir, w_rgb, w_ir)
+                x_rgb, x_ir = self.fusion_module[i](x_rgb, x_ir,
+                                                    self.fusion_weight,
+                                                    self.fusion_weight)
             if i in self.out_indices:
                 outs_rgb.append(x_rgb)
             if i in self.out_indices:
@@ -716,6 +849,52 @@ class MultiSpecResNets(BaseModule):
             outs.append(tmp)
         return tuple(outs)
 
+    def grouped_forward(self, x):
+        """Forward function of the ``'grouped'`` branch mode.
+
+        The features of the two branches stay concatenated along the
+        channels, visible first, which is also the layout of the outputs.
+        """
+        params = self._grouped_params
+        if not self.deep_stem and _can_group(self.conv1, self.conv1_ir) \
+                and _can_group(self.norm1, self.norm1_ir):
+            x = _grouped_forward(self.conv1, self.conv1_ir, x, params)
+            x = _grouped_forward(self.norm1, self.norm1_ir, x, params)
+            x = self.relu(x)
+        else:
+            x_rgb, x_ir = x[:, :3, :, :], x[:, 3:, :, :]
+            if self.deep_stem:
+                x_rgb, x_ir = self.stem(x_rgb), self.stem_ir(x_ir)
+            else:
+                x_rgb = self.relu(self.norm1(self.conv1(x_rgb)))
+                x_ir = self.relu_ir(self.norm1_ir(self.conv1_ir(x_ir)))
+            x = torch.cat([x_rgb, x_ir], dim=1)
+        x = self.maxpool(x)
+
+        outs = []
+        for i, (layer_name, layer_name_ir) in enumerate(
+                zip(self.res_layers, self.res_layers_ir)):
+            # same layers as the sequential mode
+            res_layer = getattr(self, layer_name)
+            res_layer_ir = getattr(self, layer_name_ir)
+            if _can_group_res_layer(res_layer, res_layer_ir):
+                x = _grouped_res_layer(res_layer, res_layer_ir, x, params)
+            else:
+                channels = x.shape[1] // 2
+                x_rgb = res_layer(x[:, :channels])
+                x_ir = res_layer_ir(x[:, channels:])
+                x = torch.cat([x_rgb, x_ir], dim=1)
+            if self.fusion_module[i] is not None:
+                channels = x.shape[1] // 2
+                x_rgb, x_ir = self.fusion_module[i](x[:, :channels],
+                                                    x[:, channels:],
+                                                    self.fusion_weight,
+                                                    self.fusion_weight)
+                x = torch.cat([x_rgb, x_ir], dim=1)
+            if i in self.out_indices:
+                outs.append(x)
+        return tuple(outs)
+
     def train(self, mode=True):
         """Convert the model into training mode while keep normalization layer
         freezed."""
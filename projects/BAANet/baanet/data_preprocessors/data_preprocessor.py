@@ -66,6 +66,23 @@ class BGR3TDataPreprocessor(BaseDataPreprocessor):
         non_blocking (bool): Whether block current process
             when transferring data to device. Defaults to False.
         batch_augments (list[dict], optional): Batch-level augmentations
+        fused (bool): Whether to normalize and pad the batch in one fused
+            step on the device. The uint8 images are copied into a padded
+            uint8 batch and converted to float32 with a single
+            multiply-add, so only uint8 data crosses the host-device link.
+            Together with ``pin_memory=True`` in the dataloader and
+            ``non_blocking=True``, the transfer is asynchronous. The output
+            matches the default mode up to float32 rounding, i.e. within
+            ``2.5e-7 * max(|output|, |mean / std|)`` per element, which is
+            about 7.6e-6 for outputs of magnitude 100. Defaults to False.
+        channel_order (Sequence[int], optional): Order of the 6 input
+            channels, e.g. ``[2, 1, 0, 5, 4, 3]`` to swap the BGR order of
+            both modalities. ``mean`` and ``std`` are given in the output
+            order. ``bgr_to_rgb`` and ``rgb_to_bgr`` are not applied to the
+            6-channel input. Defaults to None.
+        channels_last (bool): Whether to return the inputs in the
+            ``torch.channels_last`` memory format. Only used when ``fused``
+            is True. Defaults to False.
     """
 
     def __init__(self,
@@ -81,7 +98,10 @@ class BGR3TDataPreprocessor(BaseDataPreprocessor):
                  rgb_to_bgr: bool = False,
                  boxtype2tensor: bool = True,
                  non_blocking: Optional[bool] = False,
-                 batch_augments: Optional[List[dict]] = None):
+                 batch_augments: Optional[List[dict]] = None,
+                 fused: bool = False,
+                 channel_order: Optional[Sequence[int]] = None,
+                 channels_last: bool = False):
         super().__init__(non_blocking)
         
         self.pad_size_divisor=pad_size_divisor
@@ -99,12 +119,19 @@ class BGR3TDataPreprocessor(BaseDataPreprocessor):
         self.pad_seg = pad_seg
         self.seg_pad_value = seg_pad_value
         self.boxtype2tensor = boxtype2tensor
+        self.fused = fused
+        self.channel_order = list(
+            channel_order) if channel_order is not None else None
+        self.channels_last = channels_last
 
         if len(mean)==6 and len(std)==6:
             self.register_buffer('mean',
                                  torch.tensor(mean).view(-1, 1, 1), False)
             self.register_buffer('std',
                                  torch.tensor(std).view(-1, 1, 1), False)
+            # (x - mean) / std as a single multiply-add
+            self.register_buffer('scale', 1 / self.std, False)
+            self.register_buffer('bias', -self.mean / self.std, False)
 
     def forward(self, data: dict, training: bool = False) -> dict:
         """Perform normalization、padding and bgr2rgb conversion based on
@@ -263,8 +290,62 @@ class BGR3TDataPreprocessor(BaseDataPreprocessor):
 
 
 
+    def fused_pre_forward(self, data: dict) -> dict:
+        """Normalize and pad the uint8 inputs in one step on the device.
+
+        Args:
+            data (dict): Data sampled from dataloader.
+
+        Returns:
+            dict: Data with the normalized and padded batch as ``inputs``.
+        """
+        data = self.cast_data(data)  # type: ignore
+        _batch_inputs = data['inputs']
+        if isinstance(_batch_inputs, torch.Tensor):
+            assert _batch_inputs.dim() == 4, (
+                'The input of `ImgDataPreprocessor` should be a NCHW tensor '
+                'or a list of tensor, but got a tensor with shape: '
+                f'{_batch_inputs.shape}')
+        elif not is_seq_of(_batch_inputs, torch.Tensor):
+            raise TypeError('Output of `cast_data` should be a dict of '
+                            'list/tuple with inputs and data_samples, '
+                            f'but got {type(data)}： {data}')
+        heights = [_batch_input.shape[-2] for _batch_input in _batch_inputs]
+        widths = [_batch_input.shape[-1] for _batch_input in _batch_inputs]
+        target_h = math.ceil(
+            max(heights) / self.pad_size_divisor) * self.pad_size_divisor
+        target_w = math.ceil(
+            max(widths) / self.pad_size_divisor) * self.pad_size_divisor
+
+        # gather the images in a padded uint8 batch, reordering channels
+        first = _batch_inputs[0]
+        batch = first.new_zeros(
+            (len(_batch_inputs), first.shape[0], target_h, target_w))
+        for i, _batch_input in enumerate(_batch_inputs):
+            if self.channel_order is not None:
+                _batch_input = _batch_input[self.channel_order]
+            batch[i, :, :heights[i], :widths[i]] = _batch_input
+
+        batch_inputs = torch.addcmul(self.bias, batch, self.scale)
+        if min(heights) < target_h or min(widths) < target_w:
+            hs = batch.new_tensor(heights, dtype=torch.long)
+            ws = batch.new_tensor(widths, dtype=torch.long)
+            rows = torch.arange(target_h, device=batch.device)
+            cols = torch.arange(target_w, device=batch.device)
+            padded = (rows[None, :, None] >= hs[:, None, None]) | \
+                (cols[None, None, :] >= ws[:, None, None])
+            batch_inputs.masked_fill_(padded[:, None], self.pad_value)
+        if self.channels_last:
+            batch_inputs = batch_inputs.contiguous(
+                memory_format=torch.channels_last)
+        data['inputs'] = batch_inputs
+        data.setdefault('data_samples', None)
+        return data
+
     def my_pre_forward(self, data: dict, training: bool = False) -> dict:
 
+        if self.fused:
+            return self.fused_pre_forward(data)
         # transform bgrttt image according to mean and std (shape=6)
         data = self.cast_data(data)  # type: ignore
         _batch_inputs = data['inputs']
@@ -272,7 +353,8 @@ class BGR3TDataPreprocessor(BaseDataPreprocessor):
         if is_seq_of(_batch_inputs, torch.Tensor):
             batch_inputs = []
             for _batch_input in _batch_inputs:
-                
+                if self.channel_order is not None:
+                    _batch_input = _batch_input[self.channel_order]
                 _batch_input = _batch_input.float()
                 # Normalization.
                 # print(_batch_input,self.mean)
@@ -288,6 +370,8 @@ class BGR3TDataPreprocessor(BaseDataPreprocessor):
                 'The input of `ImgDataPreprocessor` should be a NCHW tensor '
                 'or a list of tensor, but got a tensor with shape: '
                 f'{_batch_inputs.shape}')
+            if self.channel_order is not None:
+                _batch_inputs = _batch_inputs[:, self.channel_order]
             _batch_inputs = _batch_inputs.float()
             _batch_inputs = (_batch_inputs - self.mean) / self.std
             h, w = _batch_inputs.shape[2:]
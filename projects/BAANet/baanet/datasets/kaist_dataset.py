@@ -2,17 +2,78 @@
 import copy
 import os.path as osp
 from typing import List, Union
-from typing import List, Optional
-from mmengine.fileio import get_local_path
+from typing import List, Optional, Tuple
+from mmengine.fileio import exists, get_local_path
 
 from mmdet.registry import DATASETS
 from mmdet.datasets.api_wrappers import COCO
 from mmdet.datasets.base_det_dataset import BaseDetDataset
 
 
+def get_kaist_pair_paths(img_path: str) -> Tuple[str, str]:
+    """Resolve the visible and thermal image paths of a KAIST image.
+
+    Training images are stored as ``.../visible/...`` and ``.../lwir/...``
+    pairs. Test image paths have no extension and are completed with
+    ``_visible.png`` and ``_lwir.png``; the visible images of the test set
+    are read from the ``*_complex_light_new`` folders, and paths prefixed
+    with ``complex_light_new_`` are the glare copies of the test images.
+
+    Args:
+        img_path (str): Image path of the data info, pointing to either
+            modality.
+
+    Returns:
+        tuple[str, str]: Paths of the visible and the thermal image.
+    """
+    if 'train' not in img_path and 'test' not in img_path:
+        raise ValueError(f'Cannot tell the split of KAIST image {img_path}, '
+                         "its path should contain 'train' or 'test'.")
+    if 'visible' in img_path:
+        filename_rgb = img_path
+        if 'train' in filename_rgb:
+            path_prefix = filename_rgb.split('visible')[0]
+            image_name = filename_rgb.split('visible')[1]
+            filename_ir = path_prefix + 'lwir' + image_name
+        if 'test' in filename_rgb:
+            filename_rgb = filename_rgb + '_visible.png'
+            filename_ir = filename_rgb.replace('visible', 'lwir')
+            filename_rgb = osp.dirname(filename_ir).replace(
+                'lwir', 'visible') + '_complex_light_new/' + \
+                osp.basename(filename_ir).replace('lwir', 'visible')
+    else:
+        filename_ir = img_path
+        if 'train' in filename_ir:
+            path_prefix = filename_ir.split('lwir')[0]
+            image_name = filename_ir.split('lwir')[1]
+            filename_rgb = path_prefix + 'visible' + image_name
+        if 'test' in filename_ir:
+            if 'complex' not in filename_ir:
+                filename_ir = filename_ir + '_lwir.png'
+                filename_rgb = filename_ir.replace('lwir', 'visible')
+            else:
+                filename_ir = filename_ir.replace('complex_light_new_',
+                                                  '') + '_lwir.png'
+                filename_rgb = osp.dirname(filename_ir).replace(
+                    'lwir', 'visible') + '_complex_light_new/' + \
+                    osp.basename(filename_ir).replace('lwir', 'visible')
+    return filename_rgb, filename_ir
+
+
 @DATASETS.register_module()
 class KAISTDataset(BaseDetDataset):
-    """Dataset for COCO."""
+    """Dataset for KAIST.
+
+    The paired visible and thermal image paths are resolved once when the
+    annotations are loaded and stored as ``img_path_rgb`` and
+    ``img_path_ir`` in the data infos.
+
+    Args:
+        check_pairs (bool): Whether to check that both images of every pair
+            exist when loading the annotations, so that a missing file fails
+            at start up instead of in the middle of an epoch.
+            Defaults to True.
+    """
     METAINFO = {
         'classes':
         ('person'),
@@ -24,6 +85,10 @@ class KAISTDataset(BaseDetDataset):
     # ann_id is unique in coco dataset.
     ANN_ID_UNIQUE = True
 
+    def __init__(self, *args, check_pairs: bool = True, **kwargs) -> None:
+        self.check_pairs = check_pairs
+        super().__init__(*args, **kwargs)
+
     def load_data_list(self) -> List[dict]:
         """Load annotations from an annotation file named as ``self.ann_file``
 
@@ -81,6 +146,18 @@ class KAISTDataset(BaseDetDataset):
 
         del self.coco
 
+        if self.check_pairs:
+            missing = [
+                path for data_info in data_list
+                for path in (data_info['img_path_rgb'],
+                             data_info['img_path_ir'])
+                if not exists(path, backend_args=self.backend_args)
+            ]
+            if len(missing) > 0:
+                raise FileNotFoundError(
+                    f'{len(missing)} paired images of {self.ann_file} do '
+                    f'not exist, e.g. {missing[:3]}')
+
         return data_list
 
     def parse_data_info(self, raw_data_info: dict) -> Union[dict, List[dict]]:
@@ -113,6 +190,8 @@ class KAISTDataset(BaseDetDataset):
         else:
             seg_map_path = None
         data_info['img_path'] = img_path
+        data_info['img_path_rgb'], data_info['img_path_ir'] = \
+            get_kaist_pair_paths(img_path)
         data_info['img_id'] = img_info['img_id']
         data_info['seg_map_path'] = seg_map_path
         data_info['height'] = img_info['height']
@@ -1,19 +1,44 @@
-import itertools
 import math
-from typing import Iterator, Optional, Sized
+from typing import Dict, Iterator, List, Optional, Sized
 
+import numpy as np
 import torch
 from torch.utils.data import Sampler
-import random
 from mmengine.dist import get_dist_info, sync_random_seed
 from mmengine.registry import DATA_SAMPLERS
 
+
 @DATA_SAMPLERS.register_module()
 class CustomKAISTSampler(Sampler):
+    """Sampler repeating the images of some subsets of the dataset.
+
+    An image whose path contains a key of ``oversample_subsets`` is sampled
+    as many times per epoch as the weight of that key, the largest one if it
+    matches several keys. The weights are looked up once in the data infos
+    already loaded by the dataset, and each epoch is a permutation of the
+    resulting index array.
+
+    Args:
+        dataset (Sized): Dataset used for sampling.
+        shuffle (bool): Whether shuffle the dataset or not. Defaults to True.
+        oversample_factor (int): Number of times the images of the default
+            subsets ``set00``, ``set01`` and ``set02`` are sampled, used when
+            ``oversample_subsets`` is None. Defaults to 2.
+        oversample_subsets (dict[str, int], optional): Number of times the
+            images whose path contains each key are sampled per epoch.
+            Defaults to None.
+        seed (int, optional): Random seed used to shuffle the sampler if
+            :attr:`shuffle=True`. This number should be identical across all
+            processes in the distributed group. Defaults to None.
+        round_up (bool): Whether to add extra samples to make the number of
+            samples evenly divisible by the world size. Defaults to True.
+    """
+
     def __init__(self,
                  dataset: Sized,
                  shuffle: bool = True,
-                 oversample_factor=2, 
+                 oversample_factor: int = 2,
+                 oversample_subsets: Optional[Dict[str, int]] = None,
                  seed: Optional[int] = None,
                  round_up: bool = True) -> None:
         rank, world_size = get_dist_info()
@@ -28,18 +53,25 @@ class CustomKAISTSampler(Sampler):
         self.epoch = 0
         self.round_up = round_up
 
-        # 获取所有样本的索引
-        self.indices = list(range(len(dataset)))
-
-        # 根据需要进行过采样的文件名和倍数生成过采样的样本索引
         self.oversample_factor = oversample_factor
-        self.oversample_inds = []
-        data_list = dataset.load_data_list()
-        for i in range(len(data_list)):
-            if any(substring in data_list[i]['img_path'] for substring in ['set00', 'set01', 'set02']):
-                self.oversample_inds.extend([i] *(oversample_factor - 1))
-        
-        self.indices = self.indices + self.oversample_inds
+        if oversample_subsets is None:
+            oversample_subsets = {
+                subset: oversample_factor
+                for subset in ('set00', 'set01', 'set02')
+            }
+        assert all(
+            isinstance(weight, int) and weight >= 1
+            for weight in oversample_subsets.values()), \
+            'oversample weights must be positive integers'
+        self.oversample_subsets = oversample_subsets
+
+        # repeat every index as many times as its weight
+        img_paths = np.array(self.get_img_paths(), dtype=str)
+        repeats = np.ones(len(img_paths), dtype=np.int64)
+        for subset, weight in oversample_subsets.items():
+            in_subset = np.char.find(img_paths, subset) >= 0
+            repeats[in_subset] = np.maximum(repeats[in_subset], weight)
+        self.indices = np.repeat(np.arange(len(img_paths)), repeats)
 
         if self.round_up:
             self.num_samples = math.ceil(len(self.indices) / world_size)
@@ -49,29 +81,45 @@ class CustomKAISTSampler(Sampler):
                 (len(self.indices) - rank) / world_size)
             self.total_size = len(self.indices)
 
+    def get_img_paths(self) -> List[str]:
+        """Get the image path of every sample of the dataset.
+
+        The data infos loaded by the dataset are read, the annotation file is
+        not parsed again.
+
+        Returns:
+            list[str]: Image paths in sample order.
+        """
+        if hasattr(self.dataset, 'full_init'):
+            self.dataset.full_init()
+        data_list = getattr(self.dataset, 'data_list', None)
+        if data_list is not None and len(data_list) == len(self.dataset):
+            return [data_info['img_path'] for data_info in data_list]
+        # serialized data list or dataset wrappers
+        return [
+            self.dataset.get_data_info(idx)['img_path']
+            for idx in range(len(self.dataset))
+        ]
+
     def __iter__(self) -> Iterator[int]:
         """Iterate the indices."""
         # deterministically shuffle based on epoch and seed
         if self.shuffle:
-            # g = torch.Generator()
-            # g.manual_seed(self.seed + self.epoch)
-            # indices = torch.randperm(len(self.dataset), generator=g).tolist()
-            random.seed(self.seed + self.epoch)
-            indices = random.sample(self.indices, len(self.indices))
-            
+            g = torch.Generator()
+            g.manual_seed(self.seed + self.epoch)
+            perm = torch.randperm(len(self.indices), generator=g).numpy()
+            indices = self.indices[perm]
         else:
-            indices = torch.arange(len(self.dataset)).tolist()
+            indices = self.indices
 
         # add extra samples to make it evenly divisible
         if self.round_up:
-            indices = (
-                indices *
-                int(self.total_size / len(indices) + 1))[:self.total_size]
+            indices = np.resize(indices, self.total_size)
 
         # subsample
         indices = indices[self.rank:self.total_size:self.world_size]
 
-        return iter(indices)
+        return iter(indices.tolist())
 
     def __len__(self) -> int:
         """The number of samples in this rank."""
@@ -87,4 +135,4 @@ class CustomKAISTSampler(Sampler):
         Args:
             epoch (int): Epoch number.
         """
-        self.epoch = epoch
\ No newline at end of file
+        self.epoch = epoch
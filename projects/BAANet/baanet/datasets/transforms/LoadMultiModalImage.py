@@ -2,6 +2,7 @@ from mmdet.registry import TRANSFORMS
 import warnings
 from typing import Optional
 from mmengine.registry import TRANSFORMS as MMCV_TRANSFORMS
+import mmengine
 import mmengine.fileio as fileio
 import numpy as np
 from mmcv.transforms import BaseTransform
@@ -18,7 +19,91 @@ import math
 from mmdet.registry import MODELS
 import torch.nn as nn
 import torch.nn.functional as F
-from projects.BAANet.baanet.datasets.kaist_dataset import KAISTDataset
+from projects.BAANet.baanet.datasets.kaist_dataset import (
+    KAISTDataset, get_kaist_pair_paths)
+from concurrent.futures import ThreadPoolExecutor
+
+# thread pool of the current process, rebuilt after a fork since the threads
+# of the parent process do not exist in the dataloader workers
+_DECODE_POOL = None
+_DECODE_POOL_PID = None
+# memory maps of the shards read by LoadBGR3TFromPacked
+_PACKED_SHARDS = dict()
+
+
+def _get_decode_pool() -> ThreadPoolExecutor:
+    """Get the thread pool decoding the second modality of a pair."""
+    global _DECODE_POOL, _DECODE_POOL_PID
+    if _DECODE_POOL is None or _DECODE_POOL_PID != os.getpid():
+        _DECODE_POOL = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='bgr3t_decode')
+        _DECODE_POOL_PID = os.getpid()
+    return _DECODE_POOL
+
+
+def _get_packed_shard(filename: str) -> np.ndarray:
+    """Get the read-only memory map of a shard of packed images.
+
+    The maps are cached per process and, being read-only file mappings,
+    stay valid in the dataloader workers forked from it.
+    """
+    shard = _PACKED_SHARDS.get(filename)
+    if shard is None:
+        shard = np.memmap(filename, dtype=np.uint8, mode='r')
+        _PACKED_SHARDS[filename] = shard
+    return shard
+
+
+def _fetch_and_decode(loader: BaseTransform, filename: str) -> np.ndarray:
+    """Fetch and decode one image with the file and decode settings of a
+    loading transform."""
+    if loader.file_client_args is not None:
+        file_client = fileio.FileClient.infer_client(
+            loader.file_client_args, filename)
+        img_bytes = file_client.get(filename)
+    else:
+        img_bytes = fileio.get(filename, backend_args=loader.backend_args)
+    return mmcv.imfrombytes(
+        img_bytes, flag=loader.color_type, backend=loader.imdecode_backend)
+
+
+def load_bgr3t(loader: BaseTransform,
+               filename_rgb: str,
+               filename_ir: str,
+               resize_rgb: bool = False) -> np.ndarray:
+    """Load a visible/thermal pair as a single 6-channel image.
+
+    The thermal image is fetched and decoded in a worker thread while the
+    visible one is decoded in the calling thread, since both file reading
+    and cv2 decoding release the GIL. The two images are then written into
+    the channel slices of one uninitialized HxWx6 buffer.
+
+    Args:
+        loader (BaseTransform): Loading transform providing
+            ``file_client_args``, ``backend_args``, ``color_type`` and
+            ``imdecode_backend``.
+        filename_rgb (str): Path of the visible image.
+        filename_ir (str): Path of the thermal image.
+        resize_rgb (bool): Resize the visible image to the thermal image
+            size, the output then has the thermal image size. Otherwise the
+            output has the visible image size. Defaults to False.
+
+    Returns:
+        np.ndarray: The image with the visible channels first, shape
+        (H, W, 6).
+    """
+    future_ir = _get_decode_pool().submit(_fetch_and_decode, loader,
+                                          filename_ir)
+    img_rgb = _fetch_and_decode(loader, filename_rgb)
+    img_ir = future_ir.result()
+    if resize_rgb:
+        img_rgb = mmcv.imresize(img_rgb, (img_ir.shape[1], img_ir.shape[0]))
+    height, width = img_rgb.shape[:2]
+    img = np.empty((height, width, 6), dtype=np.uint8)
+    img[:, :, :3] = img_rgb
+    img[:, :, 3:] = img_ir
+    return img
+
 
 @TRANSFORMS.register_module()
 class LoadBGR3TFromKAIST(BaseTransform):
@@ -98,58 +183,15 @@ class LoadBGR3TFromKAIST(BaseTransform):
         Returns:
             dict: The dict contains loaded image and meta information.
         """
-        if 'visible' in results['img_path']:
-            filename_rgb = results['img_path']
-            if 'train' in filename_rgb:
-                path_prefix=filename_rgb.split('visible')[0]
-                image_name = filename_rgb.split('visible')[1]
-                filename_ir=path_prefix+'lwir'+image_name
-            if 'test' in filename_rgb: 
-                filename_rgb = filename_rgb + '_visible.png'
-                # filename_ir = filename_rgb.replace('visible', 'lwir')
-                filename_rgb = os.path.dirname(filename_ir).replace('lwir', 'visible') + '_complex_light_new/' + \
-                    os.path.basename(filename_ir).replace('lwir', 'visible')
+        if 'img_path_rgb' in results and 'img_path_ir' in results:
+            # resolved by KAISTDataset when loading the annotations
+            filename_rgb = results['img_path_rgb']
+            filename_ir = results['img_path_ir']
         else:
-            filename_ir = results['img_path']
-            if 'train' in filename_ir:
-                path_prefix=filename_ir.split('lwir')[0]
-                image_name = filename_ir.split('lwir')[1]
-                filename_rgb=path_prefix+'visible'+image_name
-            if 'test' in filename_ir: 
-                if 'complex' not in filename_ir:
-                    filename_ir = filename_ir + '_lwir.png'
-                    filename_rgb = filename_ir.replace('lwir', 'visible')
-                else:
-                    filename_ir = filename_ir.replace("complex_light_new_", "") + '_lwir.png'
-                    filename_rgb = os.path.dirname(filename_ir).replace('lwir', 'visible') + '_complex_light_new/' + \
-                        os.path.basename(filename_ir).replace('lwir', 'visible')
+            filename_rgb, filename_ir = get_kaist_pair_paths(
+                results['img_path'])
         try:
-            if self.file_client_args is not None:
-                file_client_ir = fileio.FileClient.infer_client(
-                    self.file_client_args, filename_ir)
-                img_bytes_ir = file_client_ir.get(filename_ir)
-                file_client_rgb = fileio.FileClient.infer_client(
-                    self.file_client_args, filename_rgb)
-                img_bytes_rgb = file_client_rgb.get(filename_rgb)
-            else:
-                img_bytes_ir = fileio.get(
-                    filename_ir, backend_args=self.backend_args)
-                img_bytes_rgb = fileio.get(
-                    filename_rgb, backend_args=self.backend_args)
-            img_ir = mmcv.imfrombytes(
-                img_bytes_ir, flag=self.color_type, backend=self.imdecode_backend)
-            
-            # try_img=cv2.imread(filename_rgb)
-            img_rgb = mmcv.imfrombytes(
-                img_bytes_rgb, flag=self.color_type, backend=self.imdecode_backend)
-            
-            height, width, _ = img_rgb.shape # 512, 640
-            img = np.zeros((height, width, 6), dtype=np.uint8)
-            # print(try_img==img_rgb) 
-            img[:, :, :3] = img_rgb
-            img[:, :, 3:] = img_ir
-            # print(img.shape)
-
+            img = load_bgr3t(self, filename_rgb, filename_ir)
         except Exception as e:
             if self.ignore_empty:
                 return None
@@ -264,32 +306,8 @@ class LoadBGR3TFromFLIR(BaseTransform):
         filename_rgb=path_prefix+'RGB'+image_name+'jpg'
 
         try:
-            if self.file_client_args is not None:
-                file_client_ir = fileio.FileClient.infer_client(
-                    self.file_client_args, filename_ir)
-                img_bytes_ir = file_client_ir.get(filename_ir)
-                file_client_rgb = fileio.FileClient.infer_client(
-                    self.file_client_args, filename_rgb)
-                img_bytes_rgb = file_client_rgb.get(filename_rgb)
-            else:
-                img_bytes_ir = fileio.get(
-                    filename_ir, backend_args=self.backend_args)
-                img_bytes_rgb = fileio.get(
-                    filename_rgb, backend_args=self.backend_args)
-            img_ir = mmcv.imfrombytes(
-                img_bytes_ir, flag=self.color_type, backend=self.imdecode_backend)
-            
-            # try_img=cv2.imread(filename_rgb)
-            img_rgb = mmcv.imfrombytes(
-                img_bytes_rgb, flag=self.color_type, backend=self.imdecode_backend)
-            
-            height, width, _ = img_ir.shape
-            img = np.zeros((height, width, 6), dtype=np.uint8)
-            img_rgb = mmcv.imresize(img_rgb, (img_ir.shape[1], img_ir.shape[0]))
-
-            img[:, :, :3] = img_rgb
-            img[:, :, 3:] = img_ir
-
+            img = load_bgr3t(
+                self, filename_rgb, filename_ir, resize_rgb=True)
 
         except Exception as e:
             if self.ignore_empty:
@@ -404,31 +422,7 @@ class LoadBGR3TFromLLVIP(BaseTransform):
         filename_ir = filename_rgb.replace('visible', 'infrared')
 
         try:
-            if self.file_client_args is not None:
-                file_client_ir = fileio.FileClient.infer_client(
-                    self.file_client_args, filename_ir)
-                img_bytes_ir = file_client_ir.get(filename_ir)
-                file_client_rgb = fileio.FileClient.infer_client(
-                    self.file_client_args, filename_rgb)
-                img_bytes_rgb = file_client_rgb.get(filename_rgb)
-            else:
-                img_bytes_ir = fileio.get(
-                    filename_ir, backend_args=self.backend_args)
-                img_bytes_rgb = fileio.get(
-                    filename_rgb, backend_args=self.backend_args)
-            img_ir = mmcv.imfrombytes(
-                img_bytes_ir, flag=self.color_type, backend=self.imdecode_backend)
-            
-            # try_img=cv2.imread(filename_rgb)
-            img_rgb = mmcv.imfrombytes(
-                img_bytes_rgb, flag=self.color_type, backend=self.imdecode_backend)
-            
-            height, width, _ = img_rgb.shape
-            img = np.zeros((height, width, 6), dtype=np.uint8)
-            # print(try_img==img_rgb) 
-            img[:, :, :3] = img_rgb
-            img[:, :, 3:] = img_ir
-            # print(img.shape)
+            img = load_bgr3t(self, filename_rgb, filename_ir)
 
         except Exception as e:
             if self.ignore_empty:
@@ -461,6 +455,87 @@ class LoadBGR3TFromLLVIP(BaseTransform):
         return repr_str
 
 
+@TRANSFORMS.register_module()
+class LoadBGR3TFromPacked(BaseTransform):
+    """Load a visible/thermal pair from shards written by
+    ``tools/dataset_converters/pack_multispectral.py``.
+
+    The shards are memory-mapped read-only and the image is returned as a
+    HxWx6 view into the mapping, so nothing is decoded or copied while
+    loading and the pages are shared by all dataloader workers through the
+    page cache. Transforms modifying ``img`` in place need a copy first,
+    e.g. with ``to_float32=True``.
+
+    Required Keys:
+
+    - img_id
+
+    Modified Keys:
+
+    - img
+    - img_shape
+    - ori_shape
+
+    Args:
+        pack_dir (str): Directory of the packed split, it must be on a local
+            file system.
+        to_float32 (bool): Whether to convert the loaded image to a float32
+            numpy array. If set to False, the loaded image is an uint8 array.
+            Defaults to False.
+        ignore_empty (bool): Whether to allow images missing from the pack.
+            Defaults to False.
+    """
+
+    def __init__(self,
+                 pack_dir: str,
+                 to_float32: bool = False,
+                 ignore_empty: bool = False) -> None:
+        self.pack_dir = pack_dir
+        self.to_float32 = to_float32
+        self.ignore_empty = ignore_empty
+        index = mmengine.load(os.path.join(pack_dir, 'index.json'))
+        self.channels = index['channels']
+        self.shards = [
+            os.path.join(pack_dir, shard) for shard in index['shards']
+        ]
+        self.images = index['images']
+
+    def transform(self, results: dict) -> Optional[dict]:
+        """Functions to load image.
+
+        Args:
+            results (dict): Result dict from
+                :class:`mmengine.dataset.BaseDataset`.
+
+        Returns:
+            dict: The dict contains loaded image and meta information.
+        """
+        entry = self.images.get(str(results['img_id']))
+        if entry is None:
+            if self.ignore_empty:
+                return None
+            raise KeyError(f'image {results["img_id"]} is not in the pack '
+                           f'{self.pack_dir}')
+        shard, offset, height, width = entry
+        size = height * width * self.channels
+        img = _get_packed_shard(self.shards[shard])[offset:offset + size]
+        img = img.reshape(height, width, self.channels)
+        if self.to_float32:
+            img = img.astype(np.float32)
+
+        results['img'] = img
+        results['img_shape'] = img.shape[:2]
+        results['ori_shape'] = img.shape[:2]
+        return results
+
+    def __repr__(self):
+        repr_str = (f'{self.__class__.__name__}('
+                    f"pack_dir='{self.pack_dir}', "
+                    f'ignore_empty={self.ignore_empty}, '
+                    f'to_float32={self.to_float32})')
+        return repr_str
+
+
 @TRANSFORMS.register_module()
 @MMCV_TRANSFORMS.register_module()
 class Normalize_Pad(BaseTransform):
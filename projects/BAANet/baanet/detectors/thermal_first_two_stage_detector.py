@@ -8,19 +8,40 @@ from torch import Tensor
 from mmdet.structures.bbox import HorizontalBoxes
 from mmdet.registry import MODELS
 from mmdet.structures import SampleList
-from mmdet.utils import ConfigType, OptConfigType, OptMultiConfig
+from mmdet.utils import (ConfigType, InstanceList, OptConfigType,
+                         OptMultiConfig)
 from mmdet.models.detectors.base import BaseDetector
 from projects.BAANet.baanet.modules.baa_gate import DWConv
 from mmdet.models.layers import multiclass_nms
 from mmcv.ops import batched_nms
 from mmdet.structures.bbox import (cat_boxes, empty_box_as, get_box_tensor,
                                    get_box_wh, scale_boxes)
+from mmdet.models.utils import empty_instances
+from mmdet.structures.bbox import bbox2roi
 @MODELS.register_module()
 class ThermalFirstTwoStageDetector(BaseDetector):
     """Base class for two-stage detectors.
 
     Two-stage detectors typically consisting of a region proposal network and a
     task-specific regression head.
+
+    Inference supports a confidence-based early exit, enabled by
+    ``test_cfg.early_exit``. It is a dict with the following keys, all
+    optional:
+
+    - ``empty_score_thr`` (float): Images whose best thermal proposal scores
+      below it are confidently empty: the RGB branch, the fusion and the RoI
+      head are skipped for them and they get no detection. Defaults to 0.05.
+    - ``bg_score_thr`` (float): With a cascade RoI head, RoIs whose best
+      foreground score after a stage is below it are confidently
+      background. Defaults to 0.01.
+    - ``fg_score_thr`` (float): With a cascade RoI head, RoIs whose best
+      foreground score after a stage is above it are confidently resolved.
+      Defaults to 0.95.
+
+    Exited RoIs keep the boxes refined by their last stage and the scores
+    of their last stage for the later ones. ``early_exit_stats`` counts the
+    skipped images and RoIs, see :meth:`get_early_exit_rates`.
     """
 
     def __init__(self,
@@ -86,6 +107,7 @@ class ThermalFirstTwoStageDetector(BaseDetector):
 
         self.fusion_module = MODELS.build(fusion_module) 
         # 256, 200, 256; 256, 100, 128; 256, 50, 64; 256, 25, 32; 256, 13, 16
+        self.reset_early_exit_stats()
 
     def _load_from_state_dict(self, state_dict: dict, prefix: str,
                               local_metadata: dict, strict: bool,
@@ -371,6 +393,66 @@ class ThermalFirstTwoStageDetector(BaseDetector):
 
         return losses
 
+    def fuse_feat(self, x: Tuple[Tensor],
+                  x_ir: Tuple[Tensor]) -> List[Tensor]:
+        """Fuse the RGB and thermal features of every level."""
+        # 将特征图送入融合模块
+        fused_feature_maps = []
+        if self.if_patch_emb:
+            for i in [0, 1]:
+                fused_feature_maps.append(self.fusion_conv(torch.cat([x[i], x_ir[i]], dim=1)))
+            for i in [2, 3, 4]:
+                fused_feature_maps.append(self.fusion_module[i](x[i], x_ir[i]))
+        else:
+            for i in [0, 1, 2]:
+                fused_feature_maps.append(self.fusion_conv(torch.cat([x[i], x_ir[i]], dim=1)))
+
+            for i in [3, 4]:
+                fused_feature_maps.append(self.fusion_module[i](x[i], x_ir[i]))
+        return fused_feature_maps
+
+    def add_fusion_proposals(self, fused_feature_maps: List[Tensor],
+                             rpn_results_list: InstanceList,
+                             batch_data_samples: SampleList) -> InstanceList:
+        """Add the proposals of ``rpn_head_fusion`` to the thermal ones."""
+        # load RGB rois and loss
+        rpn_results_list_fusion = self.rpn_head_fusion.predict(
+            fused_feature_maps, batch_data_samples, rescale=False)
+        for i in range(len(rpn_results_list)):
+            rpn_results_list[i].bboxes = torch.cat([rpn_results_list[i].bboxes, 
+                                                    rpn_results_list_fusion[i].bboxes])# 2000, 4
+            rpn_results_list[i].level_ids = torch.cat([rpn_results_list[i].level_ids, 
+                                                    rpn_results_list_fusion[i].level_ids])# 2000
+            rpn_results_list[i].scores = torch.cat([rpn_results_list[i].scores, 
+                                                    rpn_results_list_fusion[i].scores])# 2000
+            if type(self.rpn_head_fusion).__name__ == "RPNHeadWoNMS":
+                proposal_cfg=dict(
+                    nms_pre=1000,
+                    max_per_img=1000,
+                    nms=dict(type='nms', iou_threshold=0.6),
+                    min_bbox_size=0)
+                if rpn_results_list[i].bboxes.numel() > 0:
+                    bboxes = get_box_tensor(rpn_results_list[i].bboxes)
+                    det_bboxes, keep_idxs = batched_nms(bboxes, rpn_results_list[i].scores,
+                                                        rpn_results_list[i].level_ids, proposal_cfg['nms'])
+                    rpn_results_list[i] = rpn_results_list[i][keep_idxs]
+                    # some nms would reweight the score, such as softnms
+                    rpn_results_list[i].scores = det_bboxes[:, -1]
+                    rpn_results_list[i] = rpn_results_list[i][:proposal_cfg['max_per_img']]
+                    # TODO: This would unreasonably show the 0th class label
+                    #  in visualization
+                    rpn_results_list[i].labels = rpn_results_list[i].scores.new_zeros(
+                        len(rpn_results_list[i].scores), dtype=torch.long)
+                    del rpn_results_list[i].level_ids
+                else:
+                    # To avoid some potential error
+                    results_ = InstanceData()
+                    results_.bboxes = empty_box_as(rpn_results_list[i].scores.bboxes)
+                    results_.scores = rpn_results_list[i].scores.scores.new_zeros(0)
+                    results_.labels = rpn_results_list[i].scores.scores.new_zeros(0)
+                    rpn_results_list[i].scores = results_
+        return rpn_results_list
+
     def predict(self,
                 batch_inputs: Tensor,
                 batch_data_samples: SampleList,
@@ -402,6 +484,12 @@ class ThermalFirstTwoStageDetector(BaseDetector):
         """
 
         assert self.with_bbox, 'Bbox head must be implemented.'
+        early_exit_cfg = self.test_cfg.get('early_exit', None) \
+            if self.test_cfg is not None else None
+        if early_exit_cfg is not None:
+            return self.predict_early_exit(batch_inputs, batch_data_samples,
+                                           early_exit_cfg, rescale)
+
         x, x_ir = self.extract_feat(batch_inputs)
 
         # If there are no pre-defined proposals, use RPN to get proposals
@@ -413,58 +501,11 @@ class ThermalFirstTwoStageDetector(BaseDetector):
                 data_sample.proposals for data_sample in batch_data_samples
             ]
 
-        # 将特征图送入融合模块
-        fused_feature_maps = []
-        # 将特征图送入融合模块
-        if self.if_patch_emb:
-            for i in [0, 1]:
-                fused_feature_maps.append(self.fusion_conv(torch.cat([x[i], x_ir[i]], dim=1)))
-            for i in [2, 3, 4]:
-                fused_feature_maps.append(self.fusion_module[i](x[i], x_ir[i]))
-        else:
-            for i in [0, 1, 2]:
-                fused_feature_maps.append(self.fusion_conv(torch.cat([x[i], x_ir[i]], dim=1)))
-
-            for i in [3, 4]:
-                fused_feature_maps.append(self.fusion_module[i](x[i], x_ir[i]))
+        fused_feature_maps = self.fuse_feat(x, x_ir)
 
         if self.if_fusion_roi:
-            # load RGB rois and loss
-            rpn_results_list_fusion = self.rpn_head_fusion.predict(
-                fused_feature_maps, batch_data_samples, rescale=False)
-            for i in range(len(rpn_results_list)):
-                rpn_results_list[i].bboxes = torch.cat([rpn_results_list[i].bboxes, 
-                                                        rpn_results_list_fusion[i].bboxes])# 2000, 4
-                rpn_results_list[i].level_ids = torch.cat([rpn_results_list[i].level_ids, 
-                                                        rpn_results_list_fusion[i].level_ids])# 2000
-                rpn_results_list[i].scores = torch.cat([rpn_results_list[i].scores, 
-                                                        rpn_results_list_fusion[i].scores])# 2000
-                if type(self.rpn_head_fusion).__name__ == "RPNHeadWoNMS":
-                    proposal_cfg=dict(
-                        nms_pre=1000,
-                        max_per_img=1000,
-                        nms=dict(type='nms', iou_threshold=0.6),
-                        min_bbox_size=0)
-                    if rpn_results_list[i].bboxes.numel() > 0:
-                        bboxes = get_box_tensor(rpn_results_list[i].bboxes)
-                        det_bboxes, keep_idxs = batched_nms(bboxes, rpn_results_list[i].scores,
-                                                            rpn_results_list[i].level_ids, proposal_cfg['nms'])
-                        rpn_results_list[i] = rpn_results_list[i][keep_idxs]
-                        # some nms would reweight the score, such as softnms
-                        rpn_results_list[i].scores = det_bboxes[:, -1]
-                        rpn_results_list[i] = rpn_results_list[i][:proposal_cfg['max_per_img']]
-                        # TODO: This would unreasonably show the 0th class label
-                        #  in visualization
-                        rpn_results_list[i].labels = rpn_results_list[i].scores.new_zeros(
-                            len(rpn_results_list[i].scores), dtype=torch.long)
-                        del rpn_results_list[i].level_ids
-                    else:
-                        # To avoid some potential error
-                        results_ = InstanceData()
-                        results_.bboxes = empty_box_as(rpn_results_list[i].scores.bboxes)
-                        results_.scores = rpn_results_list[i].scores.scores.new_zeros(0)
-                        results_.labels = rpn_results_list[i].scores.scores.new_zeros(0)
-                        rpn_results_list[i].scores = results_
+            rpn_results_list = self.add_fusion_proposals(
+                fused_feature_maps, rpn_results_list, batch_data_samples)
 
         results_list = self.roi_head.predict(
             fused_feature_maps, rpn_results_list, batch_data_samples, rescale=rescale)
@@ -472,3 +513,222 @@ class ThermalFirstTwoStageDetector(BaseDetector):
         batch_data_samples = self.add_pred_to_datasample(
             batch_data_samples, results_list)
         return batch_data_samples
+
+    def predict_early_exit(self,
+                           batch_inputs: Tensor,
+                           batch_data_samples: SampleList,
+                           early_exit_cfg: ConfigType,
+                           rescale: bool = True) -> SampleList:
+        """Predict with the thermal branch first and exit early on confident
+        images and RoIs.
+
+        Args:
+            batch_inputs (Tensor): Inputs with shape (N, C, H, W).
+            batch_data_samples (List[:obj:`DetDataSample`]): The Data
+                Samples.
+            early_exit_cfg (dict): Thresholds of the early exit, see the
+                class docstring.
+            rescale (bool): Whether to rescale the results.
+                Defaults to True.
+
+        Returns:
+            list[:obj:`DetDataSample`]: Detection results of the input
+            images, like :meth:`predict`.
+        """
+        empty_score_thr = early_exit_cfg.get('empty_score_thr', 0.05)
+        x_ir = self.backbone_ir(batch_inputs[:, 3:, :, :])
+        if self.with_neck:
+            x_ir = self.neck_ir(x_ir)
+
+        if batch_data_samples[0].get('proposals', None) is None:
+            rpn_results_list = self.rpn_head.predict(
+                x_ir, batch_data_samples, rescale=False)
+        else:
+            rpn_results_list = [
+                data_sample.proposals for data_sample in batch_data_samples
+            ]
+
+        # images without a confident thermal proposal are empty
+        keep = [
+            i for i, rpn_results in enumerate(rpn_results_list)
+            if len(rpn_results) > 0
+            and rpn_results.scores.max() >= empty_score_thr
+        ]
+        self.early_exit_stats['num_imgs'] += len(batch_data_samples)
+        self.early_exit_stats['num_skipped_imgs'] += \
+            len(batch_data_samples) - len(keep)
+
+        batch_img_metas = [
+            data_sample.metainfo for data_sample in batch_data_samples
+        ]
+        bbox_head = self.roi_head.bbox_head
+        if isinstance(bbox_head, torch.nn.ModuleList):
+            bbox_head = bbox_head[-1]
+        results_list = empty_instances(
+            batch_img_metas,
+            batch_inputs.device,
+            task_type='bbox',
+            box_type=bbox_head.predict_box_type)
+        if len(keep) > 0:
+            keep_inds = batch_inputs.new_tensor(keep, dtype=torch.long)
+            x = self.backbone(batch_inputs[keep_inds, :3, :, :])
+            if self.with_neck:
+                x = self.neck(x)
+            x_ir = [feat[keep_inds] for feat in x_ir]
+            keep_data_samples = [batch_data_samples[i] for i in keep]
+            keep_rpn_results = [rpn_results_list[i] for i in keep]
+
+            fused_feature_maps = self.fuse_feat(x, x_ir)
+            if self.if_fusion_roi:
+                keep_rpn_results = self.add_fusion_proposals(
+                    fused_feature_maps, keep_rpn_results, keep_data_samples)
+
+            if hasattr(self.roi_head, 'num_stages'):
+                keep_results = self.predict_cascade_early_exit(
+                    fused_feature_maps, keep_rpn_results, keep_data_samples,
+                    early_exit_cfg, rescale)
+            else:
+                keep_results = self.roi_head.predict(
+                    fused_feature_maps,
+                    keep_rpn_results,
+                    keep_data_samples,
+                    rescale=rescale)
+            for i, results in zip(keep, keep_results):
+                results_list[i] = results
+
+        batch_data_samples = self.add_pred_to_datasample(
+            batch_data_samples, results_list)
+        return batch_data_samples
+
+    def predict_cascade_early_exit(self, x: List[Tensor],
+                                   rpn_results_list: InstanceList,
+                                   batch_data_samples: SampleList,
+                                   early_exit_cfg: ConfigType,
+                                   rescale: bool) -> InstanceList:
+        """Cascade RoI head prediction where confident RoIs leave the cascade
+        after the stage that resolved them.
+
+        The scores averaged over the stages use the last scores of an exited
+        RoI for the stages it skipped, and its box is the one refined by its
+        last stage.
+
+        Args:
+            x (list[Tensor]): Fused features of all levels.
+            rpn_results_list (list[:obj:`InstanceData`]): Proposals of each
+                image.
+            batch_data_samples (List[:obj:`DetDataSample`]): The Data
+                Samples.
+            early_exit_cfg (dict): Thresholds of the early exit.
+            rescale (bool): Whether to rescale the results.
+
+        Returns:
+            list[:obj:`InstanceData`]: Detection results of each image.
+        """
+        roi_head = self.roi_head
+        bg_score_thr = early_exit_cfg.get('bg_score_thr', 0.01)
+        fg_score_thr = early_exit_cfg.get('fg_score_thr', 0.95)
+        batch_img_metas = [
+            data_sample.metainfo for data_sample in batch_data_samples
+        ]
+        rcnn_test_cfg = roi_head.test_cfg
+        proposals = [res.bboxes for res in rpn_results_list]
+        num_proposals_per_img = tuple(len(p) for p in proposals)
+        rois = bbox2roi(proposals)
+        if rois.shape[0] == 0:
+            return empty_instances(
+                batch_img_metas,
+                rois.device,
+                task_type='bbox',
+                box_type=roi_head.bbox_head[-1].predict_box_type,
+                num_classes=roi_head.bbox_head[-1].num_classes,
+                score_per_cls=rcnn_test_cfg is None)
+
+        num_rois = rois.shape[0]
+        active = rois.new_ones(num_rois, dtype=torch.bool)
+        score_sum = last_scores = bbox_preds = None
+        for stage in range(roi_head.num_stages):
+            active_inds = active.nonzero(as_tuple=True)[0]
+            if bbox_preds is not None:
+                # only the RoIs active at the last stage have deltas, the
+                # exited ones keep the boxes refined by their last stage
+                bbox_preds.zero_()
+            if len(active_inds) > 0:
+                bbox_results = roi_head._bbox_forward(
+                    stage=stage, x=x, rois=rois[active_inds])
+                cls_score = bbox_results['cls_score']
+                bbox_pred = bbox_results['bbox_pred']
+                if last_scores is None:
+                    last_scores = cls_score.new_zeros(
+                        (num_rois, cls_score.shape[1]))
+                    score_sum = torch.zeros_like(last_scores)
+                last_scores[active_inds] = cls_score
+                if bbox_pred is not None:
+                    if bbox_preds is None or \
+                            bbox_preds.shape[1] != bbox_pred.shape[1]:
+                        bbox_preds = bbox_pred.new_zeros(
+                            (num_rois, bbox_pred.shape[1]))
+                    bbox_preds[active_inds] = bbox_pred
+            score_sum += last_scores
+
+            if stage == roi_head.num_stages - 1 or len(active_inds) == 0:
+                continue
+            bbox_head = roi_head.bbox_head[stage]
+            if bbox_head.custom_activation:
+                probs = bbox_head.loss_cls.get_activation(cls_score)
+            else:
+                probs = cls_score.softmax(dim=-1)
+            if bbox_pred is not None:
+                bbox_label = probs[:, :-1].argmax(dim=1)
+                for i, img_meta in enumerate(batch_img_metas):
+                    img_mask = rois[active_inds, 0] == i
+                    if not img_mask.any():
+                        continue
+                    img_inds = active_inds[img_mask]
+                    refined_bboxes = bbox_head.regress_by_class(
+                        rois[img_inds, 1:], bbox_label[img_mask],
+                        bbox_pred[img_mask], img_meta)
+                    rois[img_inds, 1:] = get_box_tensor(refined_bboxes)
+            fg_scores = probs[:, :-1].max(dim=1)[0]
+            exited = (fg_scores < bg_score_thr) | (fg_scores > fg_score_thr)
+            active[active_inds[exited]] = False
+
+        num_exited = num_rois - int(active.sum())
+        self.early_exit_stats['num_rois'] += num_rois
+        self.early_exit_stats['num_exited_rois'] += num_exited
+
+        cls_scores = (score_sum / roi_head.num_stages).split(
+            num_proposals_per_img, 0)
+        if bbox_preds is not None:
+            bbox_preds = bbox_preds.split(num_proposals_per_img, 0)
+        else:
+            bbox_preds = (None, ) * len(batch_img_metas)
+        bbox_rescale = rescale if not roi_head.with_mask else False
+        results_list = roi_head.bbox_head[-1].predict_by_feat(
+            rois=rois.split(num_proposals_per_img, 0),
+            cls_scores=cls_scores,
+            bbox_preds=bbox_preds,
+            batch_img_metas=batch_img_metas,
+            rescale=bbox_rescale,
+            rcnn_test_cfg=rcnn_test_cfg)
+        if roi_head.with_mask:
+            results_list = roi_head.predict_mask(
+                x, batch_img_metas, results_list, rescale=rescale)
+        return results_list
+
+    def reset_early_exit_stats(self) -> None:
+        """Reset the counters of the early exit."""
+        self.early_exit_stats = dict(
+            num_imgs=0, num_skipped_imgs=0, num_rois=0, num_exited_rois=0)
+
+    def get_early_exit_rates(self) -> dict:
+        """Skip rates of the early exit since the last reset.
+
+        Returns:
+            dict: ``img_skip_rate``, the ratio of images whose RGB branch and
+            RoI head were skipped, and ``roi_exit_rate``, the ratio of RoIs
+            that left the cascade before its last stage.
+        """
+        stats = self.early_exit_stats
+        return dict(
+            img_skip_rate=stats['num_skipped_imgs'] / max(stats['num_imgs'], 1),
+            roi_exit_rate=stats['num_exited_rois'] / max(stats['num_rois'], 1))
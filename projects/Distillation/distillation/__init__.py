@@ -3,4 +3,5 @@ from .data_preprocessors import *  # noqa: F401,F403
 from .detectors import *  # noqa: F401,F403
 from .datasets import * # noqa: F401,F403
 from .necks import *
-from .losses import *
\ No newline at end of file
+from .losses import *
+from .utils import *  # noqa: F401,F403
@@ -21,6 +21,7 @@ class MultiSpecFGDCascadeRCNN(TwoStageFGDThermalFstDetector):
                  distill_cfg: OptConfigType = None,
                  teacher_cfg: OptConfigType = None,
                  teacher_pretrained: OptConfigType = None,
+                 teacher_exec_cfg: OptConfigType = None,
                  data_preprocessor: OptConfigType = None,
                  init_cfg: OptMultiConfig = None) -> None:
         super().__init__(
@@ -29,6 +30,7 @@ class MultiSpecFGDCascadeRCNN(TwoStageFGDThermalFstDetector):
             distill_cfg=distill_cfg,
             teacher_cfg = teacher_cfg,
             teacher_pretrained = teacher_pretrained,
+            teacher_exec_cfg=teacher_exec_cfg,
             rpn_head=rpn_head,
             roi_head=roi_head,
             train_cfg=train_cfg,
@@ -1,7 +1,7 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import copy
 import warnings
-from typing import List, Tuple, Union
+from typing import List, Optional, Tuple, Union
 
 import torch
 from torch import Tensor
@@ -16,6 +16,8 @@ from mmengine.runner import load_checkpoint
 from mmengine.model.utils import revert_sync_batchnorm
 from mmengine.config import Config
 
+from ..losses import get_fgd_masks
+from ..utils import TeacherFeatureStore, TeacherRunner
 
 
 @MODELS.register_module()
@@ -24,6 +26,25 @@ class TwoStageFGDDetector(BaseDetector):
 
     Two-stage detectors typically consisting of a region proposal network and a
     task-specific regression head.
+
+    For a frozen teacher, the teacher features can be precomputed with
+    ``projects/Distillation/tools/cache_teacher_features.py`` and read from
+    ``teacher_feat_store`` instead of running the teacher. Images missing
+    from the store fall back to the teacher if one is configured.
+
+    The teacher runs through a :class:`TeacherRunner`, without autograd and
+    optionally in mixed precision, and the features captured by the forward
+    hooks are kept in ``distill_feats`` as plain tensors, out of the
+    ``state_dict``.
+
+    Args:
+        teacher_feat_store (str, optional): Directory of a
+            :class:`TeacherFeatureStore` with the teacher features.
+            Defaults to None.
+        teacher_exec_cfg (dict, optional): Arguments of the
+            :class:`TeacherRunner` of the teacher, e.g.
+            ``dict(autocast_dtype='fp16', channels_last=True)``.
+            Defaults to None.
     """
 
     def __init__(self,
@@ -36,6 +57,8 @@ class TwoStageFGDDetector(BaseDetector):
                  test_cfg: OptConfigType = None,
                  teacher_cfg: OptConfigType = None,
                  teacher_pretrained: OptConfigType = None,
+                 teacher_feat_store: Optional[str] = None,
+                 teacher_exec_cfg: OptConfigType = None,
                  data_preprocessor: OptConfigType = None,
                  init_cfg: OptMultiConfig = None) -> None:
         super().__init__(
@@ -69,13 +92,20 @@ class TwoStageFGDDetector(BaseDetector):
             roi_head.update(test_cfg=test_cfg.rcnn)
             self.roi_head = MODELS.build(roi_head)
 
-        self.distill = True
-        if teacher_cfg == None and teacher_pretrained == None:
-            self.distill = False
-        
-        
+        self.with_teacher = not (teacher_cfg == None
+                                 and teacher_pretrained == None)
+        self.teacher_feat_store = TeacherFeatureStore(
+            teacher_feat_store) if teacher_feat_store is not None else None
+        self.distill = self.with_teacher or self.teacher_feat_store is not None
+        self.teacher_runner = TeacherRunner(**(teacher_exec_cfg or dict()))
+        # features captured by the distillation hooks
+        self.distill_feats = dict()
+
         if self.distill:
-            self.teacher_backbone , self.teacher_neck = self._load_distilled_weights(teacher_cfg,teacher_pretrained)
+            if self.with_teacher:
+                self.teacher_backbone , self.teacher_neck = self._load_distilled_weights(teacher_cfg,teacher_pretrained)
+                self.teacher_runner.prepare(
+                    [self.teacher_backbone, self.teacher_neck])
         
             self.distill_losses = nn.ModuleDict()
             self.distill_cfg = distill_cfg
@@ -96,23 +126,22 @@ class TwoStageFGDDetector(BaseDetector):
             def regitster_hooks(student_module,teacher_module):
                 def hook_teacher_forward(module, input, output):
 
-                        self.register_buffer(teacher_module,output)
+                        self.distill_feats[teacher_module] = output
                     
                 def hook_student_forward(module, input, output):
 
-                        self.register_buffer(student_module,output )
+                        self.distill_feats[student_module] = output
                 return hook_teacher_forward,hook_student_forward
         
             for item_loc in distill_cfg:
                 
                 student_module = 'student_' + item_loc.student_module.replace('.','_')
                 teacher_module = 'teacher_' + item_loc.teacher_module.replace('.','_')
-                self.register_buffer(student_module,None)
-                self.register_buffer(teacher_module,None)
 
                 hook_teacher_forward,hook_student_forward = regitster_hooks(student_module,teacher_module)
                 # print('teacher_'+item_loc.teacher_module,item_loc.student_module)
-                teacher_modules['teacher_'+item_loc.teacher_module].register_forward_hook(hook_teacher_forward)
+                if self.with_teacher:
+                    teacher_modules['teacher_'+item_loc.teacher_module].register_forward_hook(hook_teacher_forward)
                 # print(teacher_modules['teacher_'+item_loc.teacher_module])
                 student_modules[item_loc.student_module].register_forward_hook(hook_student_forward)
 
@@ -208,6 +237,57 @@ class TwoStageFGDDetector(BaseDetector):
             # print(buffer_dict.keys())
         return x_t
 
+    def run_teacher(self, batch_inputs: Tensor) -> Tuple[Tensor]:
+        """Run the teacher through the teacher runner.
+
+        The features captured by the teacher hooks are converted to plain
+        tensors like the returned ones.
+
+        Args:
+            batch_inputs (Tensor): Image tensor with shape (N, C, H ,W).
+
+        Returns:
+            tuple[Tensor]: Multi-level teacher features.
+        """
+        self.teacher_backbone.eval()
+        self.teacher_neck.eval()
+        x_t = self.teacher_runner(self.extract_teacher_feat, batch_inputs)
+        for item_loc in self.distill_cfg:
+            teacher_module = 'teacher_' + item_loc.teacher_module.replace('.','_')
+            self.distill_feats[teacher_module] = self.teacher_runner.to_plain(
+                self.distill_feats[teacher_module])
+        return x_t
+
+    def load_teacher_feat(self, batch_data_samples: SampleList) -> bool:
+        """Load the teacher features of a batch from the feature store.
+
+        The features are sized like the student features of the same
+        distillation item, so the student must have run on the batch.
+
+        Args:
+            batch_data_samples (List[:obj:`DetDataSample`]): The batch
+                data samples.
+
+        Returns:
+            bool: Whether the features of the whole batch were found.
+        """
+        teacher_feats = dict()
+        for item_loc in self.distill_cfg:
+            student_module = 'student_' + item_loc.student_module.replace('.','_')
+            teacher_module = 'teacher_' + item_loc.teacher_module.replace('.','_')
+            student_feat = self.distill_feats[student_module]
+            teacher_feat = self.teacher_feat_store.get_batch(
+                batch_data_samples, item_loc.teacher_module,
+                student_feat.shape[-2:], student_feat.device)
+            if teacher_feat is None:
+                if self.with_teacher:
+                    return False
+                raise KeyError('Teacher features of the batch are missing '
+                               'from the store and no teacher is set')
+            teacher_feats[teacher_module] = teacher_feat
+        self.distill_feats.update(teacher_feats)
+        return True
+
     def _forward(self, batch_inputs: Tensor,
                  batch_data_samples: SampleList) -> tuple:
         """Network forward process. Usually includes backbone, neck and head
@@ -225,8 +305,8 @@ class TwoStageFGDDetector(BaseDetector):
         """
         results = ()
         x = self.extract_feat(batch_inputs)
-        if self.distill:
-            x_t = self.extract_teacher_feat(batch_inputs)
+        if self.with_teacher:
+            x_t = self.run_teacher(batch_inputs)
         if self.with_rpn:
             rpn_results_list = self.rpn_head.predict(
                 x, batch_data_samples, rescale=False)
@@ -257,7 +337,9 @@ class TwoStageFGDDetector(BaseDetector):
         x = self.extract_feat(batch_inputs)
 
         if self.distill:
-            x_t = self.extract_teacher_feat(batch_inputs)
+            if self.teacher_feat_store is None or \
+                    not self.load_teacher_feat(batch_data_samples):
+                x_t = self.run_teacher(batch_inputs)
         
         
         losses = dict()
@@ -294,20 +376,28 @@ class TwoStageFGDDetector(BaseDetector):
         if self.distill:
             distill_losses = dict()
 
-            buffer_dict = dict(self.named_buffers())
-            # print([x for x in buffer_dict.keys() if x.startswith('teacher_neck')])
+            # print([x for x in self.distill_feats.keys() if x.startswith('teacher_neck')])
+            distill_inputs = []
             for item_loc in self.distill_cfg:
                 
                 student_module = 'student_' + item_loc.student_module.replace('.','_')
                 teacher_module = 'teacher_' + item_loc.teacher_module.replace('.','_')
                 
-                student_feat = buffer_dict[student_module]
-                teacher_feat = buffer_dict[teacher_module]
+                student_feat = self.distill_feats[student_module]
+                teacher_feat = self.distill_feats[teacher_module]
 
                 for item_loss in item_loc.methods:
-                    loss_name = item_loss.name
-                    
-                    distill_losses[loss_name] = self.distill_losses[loss_name](student_feat,teacher_feat,batch_data_samples)
+                    distill_inputs.append(
+                        (item_loss.name, student_feat, teacher_feat))
+
+            # the masks of all the levels are built at once
+            masks = get_fgd_masks(
+                batch_data_samples,
+                [feat.shape[-2:] for _, feat, _ in distill_inputs])
+            for (loss_name, student_feat, teacher_feat), mask in zip(
+                    distill_inputs, masks):
+                distill_losses[loss_name] = self.distill_losses[loss_name](
+                    student_feat, teacher_feat, batch_data_samples, masks=mask)
             losses.update(distill_losses)
         return losses
 
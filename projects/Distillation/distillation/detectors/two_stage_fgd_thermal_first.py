@@ -16,6 +16,9 @@ from mmengine.runner import load_checkpoint
 from mmengine.model.utils import revert_sync_batchnorm
 from mmengine.config import Config
 
+from ..losses import get_fgd_masks
+from ..utils import TeacherRunner
+
 
 
 @MODELS.register_module()
@@ -24,6 +27,16 @@ class TwoStageFGDThermalFstDetector(BaseDetector):
 
     Two-stage detectors typically consisting of a region proposal network and a
     task-specific regression head.
+
+    The teacher runs through a :class:`TeacherRunner`, without autograd and
+    optionally in mixed precision, and its features are handed to the
+    distillation losses as plain tensors.
+
+    Args:
+        teacher_exec_cfg (dict, optional): Arguments of the
+            :class:`TeacherRunner` of the teacher, e.g.
+            ``dict(autocast_dtype='fp16', channels_last=True)``.
+            Defaults to None.
     """
 
     def __init__(self,
@@ -36,6 +49,7 @@ class TwoStageFGDThermalFstDetector(BaseDetector):
                  test_cfg: OptConfigType = None,
                  teacher_cfg: OptConfigType = None,
                  teacher_pretrained: OptConfigType = None,
+                 teacher_exec_cfg: OptConfigType = None,
                  data_preprocessor: OptConfigType = None,
                  init_cfg: OptMultiConfig = None) -> None:
         super().__init__(
@@ -74,8 +88,10 @@ class TwoStageFGDThermalFstDetector(BaseDetector):
             self.distill = False
         
         self.teacher_pretrained = teacher_pretrained
+        self.teacher_runner = TeacherRunner(**(teacher_exec_cfg or dict()))
         if self.distill:
             self._load_distilled_weights(teacher_cfg,teacher_pretrained)
+            self.teacher_runner.prepare(self._teacher_modules())
             
             self.distill_losses = nn.ModuleDict()
             self.distill_cfg = distill_cfg
@@ -231,6 +247,26 @@ class TwoStageFGDThermalFstDetector(BaseDetector):
             fused_feature_maps.append(self.teacher_fusion_module[i](x_t[i], x_t_ir[i]))
         return fused_feature_maps
 
+    def run_teacher(self, batch_inputs: Tensor) -> Tuple[Tensor]:
+        """Run the teacher in eval mode through the teacher runner.
+
+        Args:
+            batch_inputs (Tensor): Image tensor with shape (N, C, H ,W).
+
+        Returns:
+            tuple: The teacher features as plain tensors.
+        """
+        for module in self._teacher_modules():
+            module.eval()
+        return self.teacher_runner(self.extract_teacher_feat, batch_inputs)
+
+    def _teacher_modules(self) -> List[nn.Module]:
+        return [
+            self.teacher_backbone, self.teacher_backbone_ir, self.teacher_neck,
+            self.teacher_neck_ir, self.teacher_fusion_conv,
+            self.teacher_fusion_module
+        ]
+
     def _forward(self, batch_inputs: Tensor,
                  batch_data_samples: SampleList) -> tuple:
         """Network forward process. Usually includes backbone, neck and head
@@ -280,7 +316,7 @@ class TwoStageFGDThermalFstDetector(BaseDetector):
         x = self.extract_feat(batch_inputs)
 
         if self.distill:
-            x_t = self.extract_teacher_feat(batch_inputs)
+            x_t = self.run_teacher(batch_inputs)
         import pdb 
         pdb.set_trace()
         checkpoint = torch.load(self.teacher_pretrained)
@@ -324,6 +360,7 @@ class TwoStageFGDThermalFstDetector(BaseDetector):
 
             # buffer_dict = dict(self.named_buffers())
             # print([x for x in buffer_dict.keys() if x.startswith('teacher_neck')])
+            distill_inputs = []
             for item_loc in self.distill_cfg:
                 
                 # student_module = 'student_' + item_loc.student_module.replace('.','_')
@@ -335,8 +372,17 @@ class TwoStageFGDThermalFstDetector(BaseDetector):
                 
                 for item_loss in item_loc.methods:
                     loss_name = item_loss.name
-                    
-                    distill_losses[loss_name] = self.distill_losses[loss_name](x[int(loss_name[-1])],x_t[int(loss_name[-1])],batch_data_samples)
+                    level = int(loss_name[-1])
+                    distill_inputs.append((loss_name, x[level], x_t[level]))
+
+            # the masks of all the levels are built at once
+            masks = get_fgd_masks(
+                batch_data_samples,
+                [feat.shape[-2:] for _, feat, _ in distill_inputs])
+            for (loss_name, student_feat, teacher_feat), mask in zip(
+                    distill_inputs, masks):
+                distill_losses[loss_name] = self.distill_losses[loss_name](
+                    student_feat, teacher_feat, batch_data_samples, masks=mask)
             losses.update(distill_losses)
         return losses
 
@@ -16,6 +16,9 @@ from mmengine.runner import load_checkpoint
 from mmengine.model.utils import revert_sync_batchnorm
 from mmengine.config import Config
 
+from ..losses import get_fgd_masks
+from ..utils import TeacherRunner
+
 
 
 @MODELS.register_module()
@@ -24,6 +27,16 @@ class TwoStageFGDThermalRPNFstDetector(BaseDetector):
 
     Two-stage detectors typically consisting of a region proposal network and a
     task-specific regression head.
+
+    The teacher runs through a :class:`TeacherRunner`, without autograd and
+    optionally in mixed precision, and its features are handed to the
+    distillation losses as plain tensors.
+
+    Args:
+        teacher_exec_cfg (dict, optional): Arguments of the
+            :class:`TeacherRunner` of the teacher, e.g.
+            ``dict(autocast_dtype='fp16', channels_last=True)``.
+            Defaults to None.
     """
 
     def __init__(self,
@@ -36,6 +49,7 @@ class TwoStageFGDThermalRPNFstDetector(BaseDetector):
                  test_cfg: OptConfigType = None,
                  teacher_cfg: OptConfigType = None,
                  teacher_pretrained: OptConfigType = None,
+                 teacher_exec_cfg: OptConfigType = None,
                  data_preprocessor: OptConfigType = None,
                  init_cfg: OptMultiConfig = None) -> None:
         super().__init__(
@@ -83,9 +97,11 @@ class TwoStageFGDThermalRPNFstDetector(BaseDetector):
         self.test_cfg = test_cfg
         self.__set_eval = False
         self.teacher_pretrained = teacher_pretrained
+        self.teacher_runner = TeacherRunner(**(teacher_exec_cfg or dict()))
         if self.distill:
             self.teacher_backbone, self.teacher_backbone_ir, self.teacher_neck, self.teacher_neck_ir, self.teacher_fusion_conv, self.teacher_fusion_module \
                 = self._load_distilled_weights(teacher_cfg,teacher_pretrained)
+            self.teacher_runner.prepare(self._teacher_modules())
             
             self.distill_losses = nn.ModuleDict()
             self.distill_cfg = distill_cfg
@@ -239,6 +255,25 @@ class TwoStageFGDThermalRPNFstDetector(BaseDetector):
         # return fused_feature_maps
         return x_t , x_t_ir
 
+    def run_teacher(self, batch_inputs: Tensor) -> Tuple[Tensor]:
+        """Run the teacher in eval mode through the teacher runner.
+
+        Args:
+            batch_inputs (Tensor): Image tensor with shape (N, C, H ,W).
+
+        Returns:
+            tuple: The teacher features as plain tensors.
+        """
+        self._set_distilled_module_eval()
+        return self.teacher_runner(self.extract_teacher_feat, batch_inputs)
+
+    def _teacher_modules(self) -> List[nn.Module]:
+        return [
+            self.teacher_backbone, self.teacher_backbone_ir, self.teacher_neck,
+            self.teacher_neck_ir, self.teacher_fusion_conv,
+            self.teacher_fusion_module
+        ]
+
     def _forward(self, batch_inputs: Tensor,
                  batch_data_samples: SampleList) -> tuple:
         """Network forward process. Usually includes backbone, neck and head
@@ -299,10 +334,7 @@ class TwoStageFGDThermalRPNFstDetector(BaseDetector):
         x,x_ir = self.extract_feat(batch_inputs)
         
         if self.distill:
-            with torch.no_grad():
-                if not self.__set_eval:
-                    self._set_distilled_module_eval()
-                    x_t, x_t_ir = self.extract_teacher_feat(batch_inputs)
+            x_t, x_t_ir = self.run_teacher(batch_inputs)
 
         # import pdb 
         # pdb.set_trace()
@@ -385,6 +417,7 @@ class TwoStageFGDThermalRPNFstDetector(BaseDetector):
 
             # buffer_dict = dict(self.named_buffers())
             # print([x for x in buffer_dict.keys() if x.startswith('teacher_neck')])
+            distill_inputs = []
             for item_loc in self.distill_cfg:
                 
                 # student_module = 'student_' + item_loc.student_module.replace('.','_')
@@ -396,10 +429,21 @@ class TwoStageFGDThermalRPNFstDetector(BaseDetector):
                 
                 for item_loss in item_loc.methods:
                     loss_name = item_loss.name
+                    level = int(loss_name[-1])
                     if 'ir' in loss_name:
-                        distill_losses[loss_name] = self.distill_losses[loss_name](x_ir[int(loss_name[-1])],x_t_ir[int(loss_name[-1])],batch_data_samples)
+                        distill_inputs.append(
+                            (loss_name, x_ir[level], x_t_ir[level]))
                     else:
-                        distill_losses[loss_name] = self.distill_losses[loss_name](x[int(loss_name[-1])],x_t[int(loss_name[-1])],batch_data_samples)
+                        distill_inputs.append((loss_name, x[level], x_t[level]))
+
+            # the masks of all the levels are built at once
+            masks = get_fgd_masks(
+                batch_data_samples,
+                [feat.shape[-2:] for _, feat, _ in distill_inputs])
+            for (loss_name, student_feat, teacher_feat), mask in zip(
+                    distill_inputs, masks):
+                distill_losses[loss_name] = self.distill_losses[loss_name](
+                    student_feat, teacher_feat, batch_data_samples, masks=mask)
             losses.update(distill_losses)
         return losses
 
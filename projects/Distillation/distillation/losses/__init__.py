@@ -1,5 +1,5 @@
-from .fpn_loss import FeatureLoss
+from .fpn_loss import FeatureLoss, get_fgd_masks
 
 __all__ = [
-    'FeatureLoss'
+    'FeatureLoss', 'get_fgd_masks'
 ]
\ No newline at end of file
@@ -4,6 +4,73 @@ import torch.nn.init as init
 import torch
 # from mmcv.init import constant_, kaiming_
 from mmdet.registry import MODELS
+from mmdet.structures.bbox import get_box_tensor
+
+
+def get_fgd_masks(batch_data_samples, featmap_sizes):
+    """Build the foreground and background masks of FGD for feature maps
+    of several sizes at once.
+
+    The ground truth boxes of all the images are rescaled together, and the
+    foreground masks of all the sizes are filled with a single scatter of
+    the box areas over the images, so the masks of all the FPN levels can
+    be shared by their losses.
+
+    Args:
+        batch_data_samples (list[:obj:`DetDataSample`]): The batch data
+            samples with the ground truth boxes.
+        featmap_sizes (list[tuple[int, int]]): Sizes (H, W) of the feature
+            maps.
+
+    Returns:
+        list[tuple[Tensor, Tensor]]: The foreground and background masks of
+        shape (N, H, W) of every size.
+    """
+    num_imgs = len(batch_data_samples)
+    bboxes, img_inds = [], []
+    for i, data_sample in enumerate(batch_data_samples):
+        # a single image is not padded to the batch shape
+        if num_imgs == 1:
+            img_h, img_w = data_sample.img_shape[:2]
+        else:
+            img_h, img_w = data_sample.batch_input_shape[:2]
+        img_bboxes = get_box_tensor(data_sample.gt_instances.bboxes)
+        bboxes.append(img_bboxes / img_bboxes.new_tensor(
+            [img_w, img_h, img_w, img_h]))
+        img_inds.append(img_bboxes.new_full((len(img_bboxes), ), i,
+                                            dtype=torch.long))
+    bboxes = torch.cat(bboxes)
+    img_inds = torch.cat(img_inds)
+
+    unique_sizes = list(dict.fromkeys(tuple(size) for size in featmap_sizes))
+    fg_values = []
+    for height, width in unique_sizes:
+        scaled = bboxes * bboxes.new_tensor([width, height, width, height])
+        wmin, hmin = scaled[:, 0].floor(), scaled[:, 1].floor()
+        wmax, hmax = scaled[:, 2].ceil(), scaled[:, 3].ceil()
+        area = 1.0 / (hmax + 1 - hmin) / (wmax + 1 - wmin)
+        ys = torch.arange(height, device=bboxes.device)
+        xs = torch.arange(width, device=bboxes.device)
+        in_rows = (ys >= hmin[:, None]) & (ys <= hmax[:, None])
+        in_cols = (xs >= wmin[:, None]) & (xs <= wmax[:, None])
+        in_boxes = in_rows[:, :, None] & in_cols[:, None, :]
+        fg_values.append((in_boxes * area[:, None, None]).flatten(1))
+    fg_values = torch.cat(fg_values, dim=1)
+    # the mask of overlapping boxes is the one of the smallest box
+    mask_fg = fg_values.new_zeros((num_imgs, fg_values.shape[1]))
+    mask_fg.scatter_reduce_(0, img_inds[:, None].expand_as(fg_values),
+                            fg_values, 'amax')
+    mask_bg = (mask_fg <= 0).to(mask_fg.dtype)
+
+    masks = dict()
+    for (height, width), fg, bg in zip(
+            unique_sizes, mask_fg.split([h * w for h, w in unique_sizes], 1),
+            mask_bg.split([h * w for h, w in unique_sizes], 1)):
+        bg = bg / bg.sum(dim=1, keepdim=True).clamp(min=1)
+        masks[(height, width)] = (fg.view(num_imgs, height, width),
+                                  bg.view(num_imgs, height, width))
+    return [masks[tuple(size)] for size in featmap_sizes]
+
 
 @MODELS.register_module()
 class FeatureLoss(nn.Module):
@@ -61,14 +128,18 @@ class FeatureLoss(nn.Module):
     def forward(self,
                 preds_S,
                 preds_T,
-                batch_data_samples):
+                batch_data_samples,
+                masks=None):
         """Forward function.
         Args:
             preds_S(Tensor): Bs*C*H*W, student's feature map
             preds_T(Tensor): Bs*C*H*W, teacher's feature map
-            gt_bboxes(tuple): Bs*[nt*4], pixel decimal: (tl_x, tl_y, br_x, br_y)
-            img_metas (list[dict]): Meta information of each image, e.g.,
-            image size, scaling factor, etc.
+            batch_data_samples (list[:obj:`DetDataSample`]): The batch data
+                samples with the ground truth boxes.
+            masks (tuple[Tensor, Tensor], optional): Foreground and
+                background masks of the feature map built by
+                :func:`get_fgd_masks`, built from ``batch_data_samples`` if
+                None. Defaults to None.
         """
         assert preds_S.shape[-2:] == preds_T.shape[-2:],'the output dim of teacher and student differ'
 
@@ -80,37 +151,9 @@ class FeatureLoss(nn.Module):
         S_attention_t, C_attention_t = self.get_attention(preds_T, self.temp)
         S_attention_s, C_attention_s = self.get_attention(preds_S, self.temp)
 
-        Mask_fg = torch.zeros_like(S_attention_t)
-        Mask_bg = torch.ones_like(S_attention_t)
-        wmin,wmax,hmin,hmax = [],[],[],[]
-        for i in range(N):
-            ori_bboxes = batch_data_samples[i].gt_instances.bboxes
-            new_boxxes = torch.ones_like(ori_bboxes)
-            if N == 1:
-                new_boxxes[:, 0] = ori_bboxes[:, 0]/batch_data_samples[i].img_shape[1]*W
-                new_boxxes[:, 2] = ori_bboxes[:, 2]/batch_data_samples[i].img_shape[1]*W
-                new_boxxes[:, 1] = ori_bboxes[:, 1]/batch_data_samples[i].img_shape[0]*H
-                new_boxxes[:, 3] = ori_bboxes[:, 3]/batch_data_samples[i].img_shape[0]*H
-            else:
-                new_boxxes[:, 0] = ori_bboxes[:, 0]/batch_data_samples[i].batch_input_shape[1]*W
-                new_boxxes[:, 2] = ori_bboxes[:, 2]/batch_data_samples[i].batch_input_shape[1]*W
-                new_boxxes[:, 1] = ori_bboxes[:, 1]/batch_data_samples[i].batch_input_shape[0]*H
-                new_boxxes[:, 3] = ori_bboxes[:, 3]/batch_data_samples[i].batch_input_shape[0]*H
-
-            wmin.append(torch.floor(new_boxxes[:, 0]).int())
-            wmax.append(torch.ceil(new_boxxes[:, 2]).int())
-            hmin.append(torch.floor(new_boxxes[:, 1]).int())
-            hmax.append(torch.ceil(new_boxxes[:, 3]).int())
-
-            area = 1.0/(hmax[i].view(1,-1)+1-hmin[i].view(1,-1))/(wmax[i].view(1,-1)+1-wmin[i].view(1,-1))
-
-            for j in range(len(ori_bboxes)):
-                Mask_fg[i][hmin[i][j]:hmax[i][j]+1, wmin[i][j]:wmax[i][j]+1] = \
-                        torch.maximum(Mask_fg[i][hmin[i][j]:hmax[i][j]+1, wmin[i][j]:wmax[i][j]+1], area[0][j])
-
-            Mask_bg[i] = torch.where(Mask_fg[i]>0, 0, 1)
-            if torch.sum(Mask_bg[i]):
-                Mask_bg[i] /= torch.sum(Mask_bg[i])
+        if masks is None:
+            masks = get_fgd_masks(batch_data_samples, [(H, W)])[0]
+        Mask_fg, Mask_bg = masks
 
         fg_loss, bg_loss = self.get_fea_loss(preds_S, preds_T, Mask_fg, Mask_bg, 
                            C_attention_s, C_attention_t, S_attention_s, S_attention_t)
@@ -141,28 +184,16 @@ class FeatureLoss(nn.Module):
 
 
     def get_fea_loss(self, preds_S, preds_T, Mask_fg, Mask_bg, C_s, C_t, S_s, S_t):
-        loss_mse = nn.MSELoss(reduction='sum')
-        
-        Mask_fg = Mask_fg.unsqueeze(dim=1)
-        Mask_bg = Mask_bg.unsqueeze(dim=1)
-
-        C_t = C_t.unsqueeze(dim=-1)
-        C_t = C_t.unsqueeze(dim=-1)
-
-        S_t = S_t.unsqueeze(dim=1)
-
-        fea_t= torch.mul(preds_T, torch.sqrt(S_t + 1e-10))
-        fea_t = torch.mul(fea_t, torch.sqrt(C_t + 1e-10))
-        fg_fea_t = torch.mul(fea_t, torch.sqrt(Mask_fg + 1e-10))
-        bg_fea_t = torch.mul(fea_t, torch.sqrt(Mask_bg + 1e-10))
-
-        fea_s = torch.mul(preds_S, torch.sqrt(S_t + 1e-10))
-        fea_s = torch.mul(fea_s, torch.sqrt(C_t + 1e-10))
-        fg_fea_s = torch.mul(fea_s, torch.sqrt(Mask_fg + 1e-10))
-        bg_fea_s = torch.mul(fea_s, torch.sqrt(Mask_bg + 1e-10))
-
-        fg_loss = loss_mse(fg_fea_s, fg_fea_t)/len(Mask_fg)
-        bg_loss = loss_mse(bg_fea_s, bg_fea_t)/len(Mask_bg)
+        # The student and teacher features are weighted by the same square
+        # roots of the attentions and masks, so the squared error of the
+        # weighted features is the weighted squared error of the features,
+        # reduced over the channels once for both masks.
+        sq_err = torch.einsum('nchw,nc->nhw', (preds_S - preds_T)**2,
+                              C_t + 1e-10)
+        sq_err = sq_err * (S_t + 1e-10)
+
+        fg_loss = torch.sum(sq_err * (Mask_fg + 1e-10))/len(Mask_fg)
+        bg_loss = torch.sum(sq_err * (Mask_bg + 1e-10))/len(Mask_bg)
 
         return fg_loss, bg_loss
 
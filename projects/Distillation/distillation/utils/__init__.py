@@ -0,0 +1,4 @@
+from .teacher_feature_store import TeacherFeatureStore, teacher_feat_key
+from .teacher_runner import TeacherRunner
+
+__all__ = ['TeacherFeatureStore', 'teacher_feat_key', 'TeacherRunner']
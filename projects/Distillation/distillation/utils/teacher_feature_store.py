@@ -0,0 +1,182 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os
+import os.path as osp
+from typing import Dict, Optional, Sequence
+
+import mmengine
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch import Tensor
+
+from mmdet.structures import DetDataSample
+
+
+def teacher_feat_key(data_sample: DetDataSample) -> str:
+    """Key of the teacher features of an augmented image.
+
+    The features depend on the image and on the augmentation applied to it,
+    so the key combines the image id with the resized shape and the flip
+    direction of the sample.
+
+    Args:
+        data_sample (:obj:`DetDataSample`): Data sample of the image.
+
+    Returns:
+        str: The key of the image in the store.
+    """
+    height, width = data_sample.img_shape[:2]
+    flip = data_sample.flip_direction if data_sample.get('flip',
+                                                         False) else 'none'
+    return f'{data_sample.img_id}_{height}x{width}_{flip}'
+
+
+class TeacherFeatureStore:
+    """Memory-mapped store of precomputed teacher features.
+
+    Features are saved in float16, optionally average pooled by ``pool``,
+    as raw arrays appended to shard files, and ``index.json`` records the
+    shard, the byte offset and the shape of every feature. Reading maps the
+    shards read-only, so the features are shared through the page cache
+    and only the requested ones are copied to the device.
+
+    Args:
+        store_dir (str): Directory of the store.
+        mode (str): ``'r'`` to read an existing store or ``'w'`` to write a
+            new one. Defaults to 'r'.
+        pool (int): Spatial pooling factor of the saved features, only used
+            when writing. Defaults to 1.
+        shard_size (int): Maximum size of a shard in MB, only used when
+            writing. Defaults to 1024.
+    """
+
+    def __init__(self,
+                 store_dir: str,
+                 mode: str = 'r',
+                 pool: int = 1,
+                 shard_size: int = 1024) -> None:
+        assert mode in ('r', 'w'), f'mode should be r or w, got {mode}'
+        self.store_dir = store_dir
+        self.mode = mode
+        if mode == 'r':
+            index = mmengine.load(osp.join(store_dir, 'index.json'))
+            self.pool = index['pool']
+            self.shards = index['shards']
+            self.features = index['features']
+        else:
+            os.makedirs(store_dir, exist_ok=True)
+            self.pool = pool
+            self.shards = []
+            self.features = dict()
+        self.shard_size = shard_size * 1024**2
+        self._shard_file = None
+        self._offset = 0
+        self._maps = dict()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.features
+
+    def add(self, key: str, feats: Dict[str, Tensor]) -> None:
+        """Save the features of one image.
+
+        Args:
+            key (str): Key of the image, see :func:`teacher_feat_key`.
+            feats (dict[str, Tensor]): Features of shape (C, H, W) of each
+                teacher module.
+        """
+        assert self.mode == 'w', 'the store is opened for reading'
+        entry = dict()
+        for name, feat in feats.items():
+            height, width = feat.shape[-2:]
+            if self.pool > 1:
+                feat = F.avg_pool2d(
+                    feat[None].float(), self.pool, ceil_mode=True)[0]
+            array = feat.detach().to('cpu', torch.float16).contiguous() \
+                .numpy()
+            if self._shard_file is None or \
+                    self._offset + array.nbytes > self.shard_size:
+                self._open_shard()
+            # the original size is kept to undo the pooling
+            entry[name] = [
+                len(self.shards) - 1, self._offset, *array.shape, height, width
+            ]
+            self._shard_file.write(array.tobytes())
+            self._offset += array.nbytes
+        self.features[key] = entry
+
+    def _open_shard(self) -> None:
+        if self._shard_file is not None:
+            self._shard_file.close()
+        self.shards.append(f'shard_{len(self.shards):05d}.bin')
+        self._shard_file = open(
+            osp.join(self.store_dir, self.shards[-1]), 'wb')
+        self._offset = 0
+
+    def close(self) -> None:
+        """Flush the shards and the index of a store opened for writing."""
+        if self.mode != 'w':
+            return
+        if self._shard_file is not None:
+            self._shard_file.close()
+            self._shard_file = None
+        mmengine.dump(
+            dict(pool=self.pool, shards=self.shards, features=self.features),
+            osp.join(self.store_dir, 'index.json'))
+
+    def get(self, key: str, name: str) -> Tensor:
+        """Load a feature at its original resolution.
+
+        Args:
+            key (str): Key of the image.
+            name (str): Name of the teacher module.
+
+        Returns:
+            Tensor: The float16 feature of shape (C, H, W) on cpu.
+        """
+        shard, offset, channels, height, width, ori_h, ori_w = \
+            self.features[key][name]
+        shard_map = self._maps.get(shard)
+        if shard_map is None:
+            shard_map = np.memmap(
+                osp.join(self.store_dir, self.shards[shard]),
+                dtype=np.float16,
+                mode='r')
+            self._maps[shard] = shard_map
+        start = offset // 2
+        end = start + channels * height * width
+        feat = torch.tensor(shard_map[start:end]).view(channels, height, width)
+        if (height, width) != (ori_h, ori_w):
+            feat = F.interpolate(
+                feat[None].float(), size=(ori_h, ori_w),
+                mode='bilinear')[0].half()
+        return feat
+
+    def get_batch(self, data_samples: Sequence[DetDataSample], name: str,
+                  size: Sequence[int],
+                  device: torch.device) -> Optional[Tensor]:
+        """Assemble the features of a batch.
+
+        Each feature is placed at the top left corner of a zero batch, like
+        the padded inputs of the batch.
+
+        Args:
+            data_samples (Sequence[:obj:`DetDataSample`]): Data samples of
+                the batch.
+            name (str): Name of the teacher module.
+            size (Sequence[int]): Spatial size (H, W) of the batch features.
+            device (torch.device): Device of the returned batch.
+
+        Returns:
+            Tensor, optional: Float32 features of shape (N, C, H, W), None if
+            an image of the batch is not in the store.
+        """
+        keys = [teacher_feat_key(data_sample) for data_sample in data_samples]
+        if any(key not in self.features for key in keys):
+            return None
+        feats = [self.get(key, name) for key in keys]
+        batch = feats[0].new_zeros((len(feats), feats[0].shape[0], *size))
+        for i, feat in enumerate(feats):
+            height = min(feat.shape[1], size[0])
+            width = min(feat.shape[2], size[1])
+            batch[i, :, :height, :width] = feat[:, :height, :width]
+        return batch.to(device, non_blocking=True).float()
@@ -0,0 +1,93 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from typing import Any, Callable, Iterable, Optional
+
+import torch
+import torch.nn as nn
+from torch import Tensor
+
+_AUTOCAST_DTYPES = dict(fp16=torch.float16, bf16=torch.bfloat16)
+
+
+class TeacherRunner:
+    """Run a frozen teacher without autograd and in reduced precision.
+
+    The teacher forward runs under :func:`torch.inference_mode`, so no graph
+    or activation is kept for backward, optionally under autocast and with
+    channels_last inputs. Its outputs are returned as plain float32 tensors
+    created outside inference mode, so the distillation losses can save
+    them for the backward of the student.
+
+    Args:
+        autocast_dtype (str, optional): ``'fp16'`` or ``'bf16'`` to run the
+            teacher under autocast, None to run it in float32.
+            Defaults to None.
+        channels_last (bool): Whether to run the teacher in the
+            ``torch.channels_last`` memory format. Defaults to False.
+    """
+
+    def __init__(self,
+                 autocast_dtype: Optional[str] = None,
+                 channels_last: bool = False) -> None:
+        assert autocast_dtype is None or autocast_dtype in _AUTOCAST_DTYPES, \
+            f'autocast_dtype should be one of {list(_AUTOCAST_DTYPES)}, ' \
+            f'got {autocast_dtype}'
+        self.autocast_dtype = autocast_dtype
+        self.channels_last = channels_last
+
+    def prepare(self, modules: Iterable[nn.Module]) -> None:
+        """Freeze the teacher modules and set their memory format.
+
+        Args:
+            modules (Iterable[nn.Module]): Modules of the teacher.
+        """
+        for module in modules:
+            module.requires_grad_(False)
+            if self.channels_last:
+                module.to(memory_format=torch.channels_last)
+
+    def __call__(self, forward: Callable, batch_inputs: Tensor) -> Any:
+        """Run the teacher forward.
+
+        Args:
+            forward (Callable): Teacher forward taking the batch inputs.
+            batch_inputs (Tensor): Inputs with shape (N, C, H, W).
+
+        Returns:
+            The outputs of ``forward`` with every tensor converted by
+            :meth:`to_plain`.
+        """
+        if self.channels_last:
+            batch_inputs = batch_inputs.contiguous(
+                memory_format=torch.channels_last)
+        with torch.inference_mode(), torch.autocast(
+                device_type=batch_inputs.device.type,
+                dtype=_AUTOCAST_DTYPES.get(self.autocast_dtype),
+                enabled=self.autocast_dtype is not None):
+            outputs = forward(batch_inputs)
+        return self.to_plain(outputs)
+
+    def to_plain(self, outputs: Any) -> Any:
+        """Convert the tensors of teacher outputs to plain float32 tensors.
+
+        Inference tensors cannot be saved for backward, so they are copied
+        outside inference mode, which the float32 cast does anyway for
+        autocast outputs.
+
+        Args:
+            outputs: Tensor or (nested) tuple, list or dict of tensors.
+
+        Returns:
+            The outputs with the same structure.
+        """
+        if isinstance(outputs, Tensor):
+            if outputs.dtype != torch.float32:
+                return outputs.float()
+            return outputs.clone()
+        if isinstance(outputs, (tuple, list)):
+            return type(outputs)(self.to_plain(output) for output in outputs)
+        if isinstance(outputs, dict):
+            return {
+                key: self.to_plain(output)
+                for key, output in outputs.items()
+            }
+        return outputs
@@ -0,0 +1,131 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Precompute the teacher features of an FGD distillation config.
+
+The teacher of ``TwoStageFGDDetector`` is frozen, so its features only
+depend on the image and its augmentation. This tool runs the teacher once
+per image and augmentation of the training pipeline and saves the features
+of the ``teacher_module`` of every ``distill_cfg`` item in a
+:class:`TeacherFeatureStore`, which the detector then reads with
+``model.teacher_feat_store=<out_dir>``.
+
+``RandomFlip`` is unrolled: the features are computed once without and once
+with the flip. Other random augmentations are sampled once, images whose
+augmentation is not in the store are passed to the teacher during training.
+
+Example:
+    python projects/Distillation/tools/cache_teacher_features.py \\
+        projects/Distillation/configs/Distill_r50_fpn_1x_kaist_fgd.py \\
+        data/kaist_teacher_feats --pool 2
+"""
+import argparse
+import copy
+
+import torch
+from mmengine.config import Config, DictAction
+from mmengine.registry import init_default_scope
+from mmengine.runner import Runner
+from mmengine.utils import ProgressBar
+
+from mmdet.registry import MODELS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Precompute the teacher features of a distillation '
+        'config')
+    parser.add_argument('config', help='distillation config file path')
+    parser.add_argument('out_dir', help='directory to save the features')
+    parser.add_argument(
+        '--pool',
+        type=int,
+        default=1,
+        help='spatial pooling factor of the saved features')
+    parser.add_argument(
+        '--no-flip',
+        action='store_true',
+        help='do not save the features of the flipped images')
+    parser.add_argument(
+        '--shard-size',
+        type=int,
+        default=1024,
+        help='maximum size of a shard in MB')
+    parser.add_argument(
+        '--device', default='cuda:0', help='device used for inference')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file. If the value to '
+        'be overwritten is a list, it should be like key="[a,b]" or key=a,b '
+        'It also allows nested list/tuple values, e.g. key="[(a,b),(c,d)]" '
+        'Note that the quotation marks are necessary and that no white space '
+        'is allowed.')
+    args = parser.parse_args()
+    return args
+
+
+def set_flip_prob(pipeline, prob):
+    """Force the ``RandomFlip`` transforms of a pipeline config."""
+    pipeline = copy.deepcopy(pipeline)
+    for transform in pipeline:
+        if transform['type'] == 'RandomFlip':
+            transform['prob'] = prob
+    return pipeline
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+
+    # register all modules in mmdet into the registries
+    init_default_scope(cfg.get('default_scope', 'mmdet'))
+
+    from projects.Distillation.distillation import TeacherFeatureStore
+    from projects.Distillation.distillation import teacher_feat_key
+
+    # the teacher must run, not read a previous store
+    cfg.model.teacher_feat_store = None
+    model = MODELS.build(cfg.model).to(args.device)
+    model.eval()
+    assert model.with_teacher, 'the config has no teacher'
+    teacher_modules = {
+        item_loc.teacher_module:
+        'teacher_' + item_loc.teacher_module.replace('.', '_')
+        for item_loc in model.distill_cfg
+    }
+
+    store = TeacherFeatureStore(
+        args.out_dir, mode='w', pool=args.pool, shard_size=args.shard_size)
+    flip_probs = [0.] if args.no_flip else [0., 1.]
+    for flip_prob in flip_probs:
+        dataloader_cfg = copy.deepcopy(cfg.train_dataloader)
+        # one image per batch so that the features have no batch padding
+        dataloader_cfg.batch_size = 1
+        dataloader_cfg.sampler = dict(type='DefaultSampler', shuffle=False)
+        dataloader_cfg.pop('batch_sampler', None)
+        dataset_cfg = dataloader_cfg.dataset
+        dataset_cfg.pipeline = set_flip_prob(dataset_cfg.pipeline, flip_prob)
+        dataloader = Runner.build_dataloader(dataloader_cfg)
+
+        progress_bar = ProgressBar(len(dataloader.dataset))
+        for data in dataloader:
+            with torch.no_grad():
+                data = model.data_preprocessor(data, False)
+            model.run_teacher(data['inputs'])
+            data_sample = data['data_samples'][0]
+            store.add(
+                teacher_feat_key(data_sample), {
+                    name: model.distill_feats[feat_name][0]
+                    for name, feat_name in teacher_modules.items()
+                })
+            progress_bar.update()
+    store.close()
+    print(f'\nSaved the teacher features of {len(store.features)} images '
+          f'in {args.out_dir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -144,6 +144,49 @@ class TestDetInferencer(TestCase):
                 osp.join(tmp_dir, 'preds', 'color.json'))
             self.assertEqual(res['predictions'][0], dumped_res)
 
+    @mock.patch('mmengine.infer.infer._load_checkpoint', return_value=None)
+    def test_stream(self, mock):
+        inferencer = DetInferencer('rtmdet-t', show_progress=False)
+        rng = np.random.RandomState(0)
+        frames = [
+            rng.randint(0, 255, (64, 96, 3), dtype=np.uint8) for _ in range(5)
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            frame_dir = osp.join(tmp_dir, 'frames')
+            for i, frame in enumerate(frames):
+                mmcv.imwrite(frame, osp.join(frame_dir, f'{i:06d}.png'))
+            frame_paths = [
+                osp.join(frame_dir, f'{i:06d}.png') for i in range(5)
+            ]
+            res_call = inferencer(frame_paths, batch_size=2)
+
+            # frame directory
+            out_video = osp.join(tmp_dir, 'out.mp4')
+            res_stream = inferencer.stream(
+                frame_dir,
+                batch_size=2,
+                num_workers=2,
+                queue_depth=1,
+                out_video=out_video)
+            self.assertEqual(len(res_stream['predictions']), 5)
+            self.assert_predictions_equal(res_call['predictions'],
+                                          res_stream['predictions'])
+            self.assertEqual(res_stream['visualization'], [])
+            for stage in ('decode', 'preprocess', 'forward', 'visualize',
+                          'postprocess', 'fps'):
+                self.assertIn(stage, res_stream['stage_times'])
+            self.assertEqual(len(mmcv.VideoReader(out_video)), 5)
+
+            # video file
+            res_video = inferencer.stream(out_video, return_vis=True)
+            self.assertEqual(len(res_video['predictions']), 5)
+            self.assertEqual(len(res_video['visualization']), 5)
+
+        # errors of the pipeline are raised in the calling thread
+        with self.assertRaises(Exception):
+            inferencer.stream(['not_exist.jpg'])
+
     @mock.patch('mmengine.infer.infer._load_checkpoint', return_value=None)
     def test_pred2dict(self, mock):
         data_sample = DetDataSample()
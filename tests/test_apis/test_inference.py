@@ -1,11 +1,16 @@
 import os
+import time
 from pathlib import Path
+from unittest.mock import patch
 
 import numpy as np
 import pytest
 import torch
+from mmengine.config import Config
+from mmengine.structures import InstanceData
 
-from mmdet.apis import inference_detector, init_detector
+from mmdet.apis import (MultiStreamTracker, inference_detector, inference_mot,
+                        init_detector, init_track_model)
 from mmdet.structures import DetDataSample
 from mmdet.utils import register_all_modules
 
@@ -74,3 +79,80 @@ def test_inference_detector(config, devices):
         assert isinstance(result, DetDataSample)
         result = inference_detector(model, [img1, img2])
         assert isinstance(result, list) and len(result) == 2
+
+
+def test_multi_stream_tracker():
+    config = Config.fromfile(
+        'configs/bytetrack/bytetrack_yolox_x_8xb4-80e_crowdhuman-'
+        'mot17halftrain_test-mot17halfval.py')
+    config.test_dataloader.dataset.pipeline[0].transforms[1].scale = (64, 48)
+    config.model.detector.backbone.update(
+        deepen_factor=0.33, widen_factor=0.125)
+    config.model.detector.neck.update(
+        in_channels=[32, 64, 128], out_channels=32, num_csp_blocks=1)
+    config.model.detector.bbox_head.update(in_channels=32, feat_channels=32)
+    model = init_track_model(config, device='cpu')
+
+    def predict(imgs, data_samples):
+        # boxes moving with the frames, shifted per stream
+        for img, data_sample in zip(imgs, data_samples):
+            offset = 20 * (img.mean() > 0).item()
+            xy = torch.arange(6.).view(3, 2) * 10 + data_sample.frame_id
+            data_sample.pred_instances = InstanceData(
+                bboxes=torch.cat([xy, xy + 8], dim=1) + offset,
+                scores=torch.full((3, ), 0.9),
+                labels=torch.zeros(3, dtype=torch.long))
+        return data_samples
+
+    frames = dict(
+        cam0=np.zeros((48, 64, 3), dtype=np.uint8),
+        cam1=np.full((48, 64, 3), 255, dtype=np.uint8))
+    with patch.object(model.detector, 'predict', predict):
+        expected = dict()
+        for stream_id, frame in frames.items():
+            model.tracker.reset()
+            expected[stream_id] = [
+                inference_mot(model, frame, frame_id=i, video_len=3)
+                for i in range(3)
+            ]
+
+        tracker = MultiStreamTracker(model, idle_timeout=10)
+        for i in range(3):
+            results = tracker.track(frames)
+            assert set(results) == set(frames)
+            for stream_id, result in results.items():
+                pred = result[0].pred_track_instances
+                expected_pred = expected[stream_id][i][0].pred_track_instances
+                # the streams are tracked independently
+                assert torch.equal(pred.instances_id,
+                                   expected_pred.instances_id)
+                assert torch.allclose(pred.bboxes, expected_pred.bboxes)
+
+        # the streams of a call are not dropped for one another
+        tracker = MultiStreamTracker(model, max_streams=2)
+        tracker.track(dict(cam1=frames['cam1']))
+        tracker.track(dict(cam0=frames['cam0']))
+        cam1_stream = tracker.streams['cam1']
+        results = tracker.track(dict(cam2=frames['cam0'], cam1=frames['cam1']))
+        assert list(tracker.streams) == ['cam2', 'cam1']
+        assert tracker.streams['cam1'] is cam1_stream
+        assert cam1_stream['frame_id'] == 2
+        pred = results['cam1'][0].pred_track_instances
+        expected_pred = expected['cam1'][1][0].pred_track_instances
+        assert torch.equal(pred.instances_id, expected_pred.instances_id)
+
+        # more streams than max_streams in one call are all tracked
+        tracker = MultiStreamTracker(model, max_streams=1)
+        results = tracker.track(frames)
+        assert set(results) == set(frames)
+        assert len(tracker) == 2
+        tracker.track(dict(cam1=frames['cam1']))
+        assert list(tracker.streams) == ['cam1']
+        assert tracker.streams['cam1']['frame_id'] == 2
+
+    tracker = MultiStreamTracker(model, idle_timeout=10)
+    tracker.track(frames)
+    assert len(tracker) == 2
+    assert tracker.evict_idle_streams(time.monotonic() +
+                                      11) == ['cam0', 'cam1']
+    assert len(tracker) == 0
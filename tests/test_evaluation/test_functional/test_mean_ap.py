@@ -0,0 +1,266 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from unittest import TestCase
+
+import numpy as np
+
+from mmdet.evaluation.functional import bbox_overlaps, eval_map
+from mmdet.evaluation.functional.mean_ap import (close_eval_pools,
+                                                 get_eval_pool, tpfp_default,
+                                                 tpfp_imagenet)
+
+
+def _loop_tpfp_default(det_bboxes,
+                       gt_bboxes,
+                       gt_bboxes_ignore=None,
+                       iou_thr=0.5,
+                       area_ranges=None,
+                       use_legacy_coordinate=False):
+    """The previous implementation of :func:`tpfp_default`, looping over
+    the dets in score order."""
+    extra_length = 1. if use_legacy_coordinate else 0.
+    gt_ignore_inds = np.concatenate(
+        (np.zeros(gt_bboxes.shape[0],
+                  dtype=bool), np.ones(gt_bboxes_ignore.shape[0], dtype=bool)))
+    gt_bboxes = np.vstack((gt_bboxes, gt_bboxes_ignore))
+    num_dets = det_bboxes.shape[0]
+    num_gts = gt_bboxes.shape[0]
+    if area_ranges is None:
+        area_ranges = [(None, None)]
+    num_scales = len(area_ranges)
+    tp = np.zeros((num_scales, num_dets), dtype=np.float32)
+    fp = np.zeros((num_scales, num_dets), dtype=np.float32)
+    if gt_bboxes.shape[0] == 0:
+        if area_ranges == [(None, None)]:
+            fp[...] = 1
+        else:
+            det_areas = (
+                det_bboxes[:, 2] - det_bboxes[:, 0] + extra_length) * (
+                    det_bboxes[:, 3] - det_bboxes[:, 1] + extra_length)
+            for i, (min_area, max_area) in enumerate(area_ranges):
+                fp[i, (det_areas >= min_area) & (det_areas < max_area)] = 1
+        return tp, fp
+
+    ious = bbox_overlaps(
+        det_bboxes, gt_bboxes, use_legacy_coordinate=use_legacy_coordinate)
+    ious_max = ious.max(axis=1)
+    ious_argmax = ious.argmax(axis=1)
+    sort_inds = np.argsort(-det_bboxes[:, -1])
+    for k, (min_area, max_area) in enumerate(area_ranges):
+        gt_covered = np.zeros(num_gts, dtype=bool)
+        if min_area is None:
+            gt_area_ignore = np.zeros_like(gt_ignore_inds, dtype=bool)
+        else:
+            gt_areas = (gt_bboxes[:, 2] - gt_bboxes[:, 0] + extra_length) * (
+                gt_bboxes[:, 3] - gt_bboxes[:, 1] + extra_length)
+            gt_area_ignore = (gt_areas < min_area) | (gt_areas >= max_area)
+        for i in sort_inds:
+            if ious_max[i] >= iou_thr:
+                matched_gt = ious_argmax[i]
+                if not (gt_ignore_inds[matched_gt]
+                        or gt_area_ignore[matched_gt]):
+                    if not gt_covered[matched_gt]:
+                        gt_covered[matched_gt] = True
+                        tp[k, i] = 1
+                    else:
+                        fp[k, i] = 1
+            elif min_area is None:
+                fp[k, i] = 1
+            else:
+                bbox = det_bboxes[i, :4]
+                area = (bbox[2] - bbox[0] + extra_length) * (
+                    bbox[3] - bbox[1] + extra_length)
+                if area >= min_area and area < max_area:
+                    fp[k, i] = 1
+    return tp, fp
+
+
+def _loop_tpfp_imagenet(det_bboxes,
+                        gt_bboxes,
+                        gt_bboxes_ignore=None,
+                        default_iou_thr=0.5,
+                        area_ranges=None,
+                        use_legacy_coordinate=False):
+    """The previous implementation of :func:`tpfp_imagenet`, looping over
+    the dets in score order and over the gts."""
+    extra_length = 1. if use_legacy_coordinate else 0.
+    gt_ignore_inds = np.concatenate(
+        (np.zeros(gt_bboxes.shape[0],
+                  dtype=bool), np.ones(gt_bboxes_ignore.shape[0], dtype=bool)))
+    gt_bboxes = np.vstack((gt_bboxes, gt_bboxes_ignore))
+    num_dets = det_bboxes.shape[0]
+    num_gts = gt_bboxes.shape[0]
+    if area_ranges is None:
+        area_ranges = [(None, None)]
+    num_scales = len(area_ranges)
+    tp = np.zeros((num_scales, num_dets), dtype=np.float32)
+    fp = np.zeros((num_scales, num_dets), dtype=np.float32)
+    if gt_bboxes.shape[0] == 0:
+        if area_ranges == [(None, None)]:
+            fp[...] = 1
+        else:
+            det_areas = (
+                det_bboxes[:, 2] - det_bboxes[:, 0] + extra_length) * (
+                    det_bboxes[:, 3] - det_bboxes[:, 1] + extra_length)
+            for i, (min_area, max_area) in enumerate(area_ranges):
+                fp[i, (det_areas >= min_area) & (det_areas < max_area)] = 1
+        return tp, fp
+    ious = bbox_overlaps(
+        det_bboxes, gt_bboxes - 1, use_legacy_coordinate=use_legacy_coordinate)
+    gt_w = gt_bboxes[:, 2] - gt_bboxes[:, 0] + extra_length
+    gt_h = gt_bboxes[:, 3] - gt_bboxes[:, 1] + extra_length
+    iou_thrs = np.minimum((gt_w * gt_h) / ((gt_w + 10.0) * (gt_h + 10.0)),
+                          default_iou_thr)
+    sort_inds = np.argsort(-det_bboxes[:, -1])
+    for k, (min_area, max_area) in enumerate(area_ranges):
+        gt_covered = np.zeros(num_gts, dtype=bool)
+        if min_area is None:
+            gt_area_ignore = np.zeros_like(gt_ignore_inds, dtype=bool)
+        else:
+            gt_areas = gt_w * gt_h
+            gt_area_ignore = (gt_areas < min_area) | (gt_areas >= max_area)
+        for i in sort_inds:
+            max_iou = -1
+            matched_gt = -1
+            for j in range(num_gts):
+                if gt_covered[j]:
+                    continue
+                elif ious[i, j] >= iou_thrs[j] and ious[i, j] > max_iou:
+                    max_iou = ious[i, j]
+                    matched_gt = j
+            if matched_gt >= 0:
+                gt_covered[matched_gt] = 1
+                if not (gt_ignore_inds[matched_gt]
+                        or gt_area_ignore[matched_gt]):
+                    tp[k, i] = 1
+            elif min_area is None:
+                fp[k, i] = 1
+            else:
+                bbox = det_bboxes[i, :4]
+                area = (bbox[2] - bbox[0] + extra_length) * (
+                    bbox[3] - bbox[1] + extra_length)
+                if area >= min_area and area < max_area:
+                    fp[k, i] = 1
+    return tp, fp
+
+
+def _random_bboxes(rng, num_bboxes, max_size=60):
+    """Integer boxes, so that equal IoUs and areas on the range bounds
+    happen."""
+    xy = rng.randint(0, 100, size=(num_bboxes, 2))
+    wh = rng.randint(1, max_size, size=(num_bboxes, 2))
+    return np.concatenate([xy, xy + wh], axis=1).astype(np.float32)
+
+
+def _random_dets(rng, gt_bboxes, num_dets):
+    """Dets jittered around the gts, with tied scores."""
+    bboxes = _random_bboxes(rng, num_dets)
+    if len(gt_bboxes) > 0:
+        near_gt = rng.rand(num_dets) < 0.7
+        inds = rng.randint(0, len(gt_bboxes), size=num_dets)
+        bboxes[near_gt] = gt_bboxes[inds[near_gt]] + rng.randint(
+            -4, 5, size=(near_gt.sum(), 4))
+    scores = rng.randint(0, 10, size=(num_dets, 1)) / 10
+    return np.concatenate([bboxes, scores], axis=1).astype(np.float32)
+
+
+def _random_dataset(rng, num_imgs, num_classes):
+    """Images with ignored gts, and without gts, dets or both."""
+    det_results, annotations = [], []
+    for i in range(num_imgs):
+        num_gts = 0 if i % 5 == 0 else rng.randint(1, 12)
+        num_ignore = rng.randint(0, 3) if i % 3 else 0
+        ann = dict(
+            bboxes=_random_bboxes(rng, num_gts),
+            labels=rng.randint(0, num_classes, size=num_gts))
+        if i % 4 != 1:
+            ann['bboxes_ignore'] = _random_bboxes(rng, num_ignore)
+            ann['labels_ignore'] = rng.randint(0, num_classes, size=num_ignore)
+        all_gt_bboxes = np.vstack(
+            [ann['bboxes'],
+             ann.get('bboxes_ignore', np.zeros((0, 4)))])
+        img_dets = []
+        for _ in range(num_classes):
+            num_dets = 0 if i % 7 == 0 else rng.randint(0, 10)
+            img_dets.append(_random_dets(rng, all_gt_bboxes, num_dets))
+        det_results.append(img_dets)
+        annotations.append(ann)
+    return det_results, annotations
+
+
+class TestMeanAP(TestCase):
+
+    area_ranges = [(0, 32**2), (32**2, 1e5), (16**2, 48**2)]
+
+    def _check_tpfp(self, tpfp_fn, loop_tpfp_fn):
+        rng = np.random.RandomState(0)
+        for i in range(200):
+            gt_bboxes = _random_bboxes(rng, rng.randint(0, 10) if i % 4 else 0)
+            gt_bboxes_ignore = _random_bboxes(rng, rng.randint(0, 3))
+            det_bboxes = _random_dets(rng,
+                                      np.vstack([gt_bboxes, gt_bboxes_ignore]),
+                                      rng.randint(0, 15) if i % 6 else 0)
+            for area_ranges in (None, self.area_ranges):
+                for use_legacy_coordinate in (False, True):
+                    args = (det_bboxes, gt_bboxes, gt_bboxes_ignore, 0.5,
+                            area_ranges, use_legacy_coordinate)
+                    tp, fp = tpfp_fn(*args)
+                    expected_tp, expected_fp = loop_tpfp_fn(*args)
+                    np.testing.assert_array_equal(tp, expected_tp)
+                    np.testing.assert_array_equal(fp, expected_fp)
+
+    def test_tpfp_default(self):
+        self._check_tpfp(tpfp_default, _loop_tpfp_default)
+
+    def test_tpfp_imagenet(self):
+        self._check_tpfp(tpfp_imagenet, _loop_tpfp_imagenet)
+
+    def _check_eval_results(self, results, expected_results):
+        mean_ap, eval_results = results
+        expected_mean_ap, expected_eval_results = expected_results
+        np.testing.assert_allclose(mean_ap, expected_mean_ap)
+        self.assertEqual(len(eval_results), len(expected_eval_results))
+        for cls_result, expected_cls_result in zip(eval_results,
+                                                   expected_eval_results):
+            self.assertEqual(cls_result.keys(), expected_cls_result.keys())
+            for key, value in cls_result.items():
+                np.testing.assert_allclose(value, expected_cls_result[key])
+
+    def test_eval_map(self):
+        det_results, annotations = _random_dataset(
+            np.random.RandomState(0), num_imgs=40, num_classes=5)
+        # a class without gts and a class without dets
+        for img_dets, ann in zip(det_results, annotations):
+            keep = ann['labels'] != 3
+            ann['bboxes'], ann['labels'] = ann['bboxes'][keep], ann['labels'][
+                keep]
+            img_dets[4] = np.zeros((0, 5), dtype=np.float32)
+
+        for dataset, loop_tpfp_fn in (('voc', _loop_tpfp_default),
+                                      ('det', _loop_tpfp_imagenet)):
+            for scale_ranges in (None, [(0, 32), (32, 1e5)]):
+                expected_results = eval_map(
+                    det_results,
+                    annotations,
+                    scale_ranges=scale_ranges,
+                    tpfp_fn=loop_tpfp_fn,
+                    logger='silent')
+                for nproc in (1, 2):
+                    results = eval_map(
+                        det_results,
+                        annotations,
+                        scale_ranges=scale_ranges,
+                        dataset=dataset,
+                        nproc=nproc,
+                        logger='silent')
+                    self._check_eval_results(results, expected_results)
+
+        # the pools are kept across the calls
+        pool = get_eval_pool(2)
+        self.assertIs(get_eval_pool(2), pool)
+
+        # the closed pools do not accept tasks and are not reused
+        close_eval_pools()
+        with self.assertRaises(ValueError):
+            pool.apply(abs, (-1, ))
+        self.assertIsNot(get_eval_pool(2), pool)
+        close_eval_pools()
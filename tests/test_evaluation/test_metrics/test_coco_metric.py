@@ -1,4 +1,5 @@
 import os.path as osp
+import pickle
 import tempfile
 from unittest import TestCase
 
@@ -7,7 +8,7 @@ import pycocotools.mask as mask_util
 import torch
 from mmengine.fileio import dump
 
-from mmdet.evaluation import CocoMetric
+from mmdet.evaluation import CocoMetric, DetResultBuffer
 
 
 class TestCocoMetric(TestCase):
@@ -399,3 +400,51 @@ class TestCocoMetric(TestCase):
         eval_results = coco_metric.evaluate(size=1)
         self.assertDictEqual(eval_results, dict())
         self.assertTrue(osp.exists(f'{self.tmp_dir.name}/test.bbox.json'))
+
+    def test_gather_ranks(self):
+        fake_json_file = osp.join(self.tmp_dir.name, 'fake_data.json')
+        self._create_dummy_coco_json(fake_json_file)
+        dummy_pred = self._create_dummy_results()
+        data_samples = [
+            dict(pred_instances=dummy_pred, img_id=0, ori_shape=(640, 640)),
+            dict(
+                pred_instances={k: v[:2]
+                                for k, v in dummy_pred.items()},
+                img_id=1,
+                ori_shape=(640, 640)),
+            dict(
+                pred_instances={k: v[2:]
+                                for k, v in dummy_pred.items()},
+                img_id=2,
+                ori_shape=(640, 640))
+        ]
+
+        coco_metric = CocoMetric(ann_file=fake_json_file, metric='bbox')
+        coco_metric.dataset_meta = dict(classes=['car', 'bicycle'])
+        coco_metric.process({}, data_samples)
+        buffer = coco_metric.results[0]
+        self.assertIsInstance(buffer, DetResultBuffer)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.offsets.tolist(), [0, 4, 6, 8])
+        self.assertEqual(buffer.get_dets('bboxes').shape, (8, 4))
+        self.assertEqual(buffer[1]['img_id'], 1)
+        np.testing.assert_array_equal(buffer[2]['labels'], [1, 0])
+        expected = buffer.to_coco_dicts([1, 2])
+
+        # the first image is padded by the sampler on the second rank
+        ranks = []
+        for samples in (data_samples[0::2],
+                        data_samples[1:2] + data_samples[:1]):
+            rank_metric = CocoMetric(ann_file=fake_json_file, metric='bbox')
+            rank_metric.dataset_meta = dict(classes=['car', 'bicycle'])
+            rank_metric.process({}, samples)
+            ranks.append(pickle.loads(pickle.dumps(rank_metric.results[0])))
+        merged = DetResultBuffer.from_results(ranks)
+        self.assertEqual(merged.get_img_ids(), [0, 1, 2])
+        self.assertEqual(merged.to_coco_dicts([1, 2]), expected)
+
+        # lists of result pairs are still accepted
+        pairs = [(dict(img_id=result['img_id']), result) for result in buffer]
+        self.assertEqual(
+            DetResultBuffer.from_results(pairs).to_coco_dicts([1, 2]),
+            expected)
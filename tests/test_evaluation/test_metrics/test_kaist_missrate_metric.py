@@ -0,0 +1,452 @@
+import copy
+import os.path as osp
+import pickle
+import tempfile
+from collections import defaultdict
+from unittest import TestCase
+
+import numpy as np
+import torch
+from mmengine.fileio import dump
+
+from mmdet.datasets.api_wrappers import COCO
+from mmdet.evaluation import (FLIRMissrateMetric, GlareKAISTMissrateMetric,
+                              KAISTMissrateMetric)
+from mmdet.evaluation.functional import (DetResultBuffer, missrate_bbox_iou,
+                                         missrate_greedy_match,
+                                         missrate_gt_ignore)
+from mmdet.evaluation.metrics.kaist_missrate_metric import KAISTPedEval
+
+
+def _random_scene(rng, num_gts, num_dts, img_id=1, cat_id=1):
+    """Build gt/dt annotations with overlapping, duplicated and ignored
+    boxes so that ties and ignore regions are exercised."""
+    gt_xy = rng.uniform(0, 600, size=(num_gts, 2))
+    gt_wh = rng.uniform(10, 120, size=(num_gts, 2))
+    gt_bboxes = np.concatenate([gt_xy, gt_wh], axis=1)
+    gts = []
+    for i, bbox in enumerate(gt_bboxes):
+        gts.append(
+            dict(
+                id=i + 1,
+                image_id=img_id,
+                category_id=cat_id,
+                bbox=bbox.tolist(),
+                ignore=int(rng.random() < 0.3)))
+
+    dts = []
+    for i in range(num_dts):
+        if num_gts > 0 and rng.random() < 0.7:
+            # jitter a gt box so that the detection overlaps it
+            bbox = gt_bboxes[rng.integers(num_gts)].copy()
+            bbox[:2] += rng.normal(0, 8, size=2)
+            bbox[2:] *= rng.uniform(0.8, 1.2, size=2)
+        else:
+            bbox = np.concatenate(
+                [rng.uniform(0, 600, size=2),
+                 rng.uniform(10, 120, size=2)])
+        if dts and rng.random() < 0.1:
+            # exact duplicates produce tied IoUs and tied scores
+            bbox = np.array(dts[-1]['bbox'])
+            score = dts[-1]['score']
+        else:
+            score = float(np.round(rng.random(), 2))
+        dts.append(
+            dict(
+                id=i + 1,
+                image_id=img_id,
+                category_id=cat_id,
+                bbox=bbox.tolist(),
+                score=score))
+    return gts, dts
+
+
+def _build_eval(gts, dts, vectorized, iou_thrs=(0.5, )):
+    kaist_eval = KAISTPedEval(iouType='bbox', vectorized=vectorized)
+    kaist_eval.params.catIds = [1]
+    kaist_eval.params.iouThrs = np.array(iou_thrs)
+    kaist_eval._gts = defaultdict(list)
+    kaist_eval._dts = defaultdict(list)
+    for gt in gts:
+        kaist_eval._gts[gt['image_id'], gt['category_id']].append(dict(gt))
+    for dt in dts:
+        kaist_eval._dts[dt['image_id'], dt['category_id']].append(dict(dt))
+    kaist_eval.ious = {(1, 1): kaist_eval.computeIoU(1, 1)}
+    return kaist_eval
+
+
+class TestMissrateMatching(TestCase):
+
+    def assertEvalImgEqual(self, ref, res):
+        if ref is None:
+            self.assertIsNone(res)
+            return
+        self.assertEqual(ref.keys(), res.keys())
+        for key in ('dtMatches', 'gtMatches', 'dtIgnore', 'gtIgnore'):
+            self.assertEqual(ref[key].dtype, res[key].dtype)
+            np.testing.assert_array_equal(ref[key], res[key])
+        for key in ('dtIds', 'gtIds', 'dtScores'):
+            self.assertEqual(ref[key], res[key])
+
+    def test_iou_parity(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            gts, dts = _random_scene(rng, rng.integers(0, 10),
+                                     rng.integers(0, 30))
+            ref = _build_eval(gts, dts, vectorized=False)
+            res = _build_eval(gts, dts, vectorized=True)
+            ref_ious = np.asarray(ref.ious[1, 1])
+            res_ious = np.asarray(res.ious[1, 1])
+            self.assertEqual(ref_ious.shape, res_ious.shape)
+            # bit-identical, not just close
+            np.testing.assert_array_equal(ref_ious, res_ious)
+
+    def test_iou_integer_boxes(self):
+        dts = np.array([[0, 0, 10, 10], [5, 5, 10, 10], [20, 20, 5, 5]])
+        gts = np.array([[0, 0, 10, 10], [4, 4, 8, 8]])
+        ignore = np.array([0, 1])
+        ious = missrate_bbox_iou(dts, gts, ignore)
+        self.assertEqual(ious.shape, (3, 2))
+        self.assertEqual(ious[0, 0], 1.0)
+        self.assertEqual(ious[1, 0], 25 / 175)
+        # ignored gt uses the detection area as union
+        self.assertEqual(ious[0, 1], 36 / 100)
+        self.assertTrue((ious[2] == 0).all())
+
+    def test_evaluate_img_parity(self):
+        rng = np.random.default_rng(1)
+        hRng, oRng = [55, 1e5**2], [0, 1]
+        for _ in range(200):
+            gts, dts = _random_scene(rng, rng.integers(0, 12),
+                                     rng.integers(0, 40))
+            for iou_thrs in [(0.5, ), (0.3, 0.5, 0.7, 1.0)]:
+                ref = _build_eval(gts, dts, False, iou_thrs).evaluateImg(
+                    1, 1, hRng, oRng, 1000)
+                res = _build_eval(gts, dts, True, iou_thrs).evaluateImg(
+                    1, 1, hRng, oRng, 1000)
+                self.assertEvalImgEqual(ref, res)
+
+    def test_evaluate_img_max_det(self):
+        rng = np.random.default_rng(2)
+        gts, dts = _random_scene(rng, 8, 60)
+        ref = _build_eval(gts, dts, False).evaluateImg(1, 1, None, None, 20)
+        res = _build_eval(gts, dts, True).evaluateImg(1, 1, None, None, 20)
+        self.assertEqual(len(res['dtIds']), 20)
+        self.assertEvalImgEqual(ref, res)
+
+    def test_gt_ignore(self):
+        bboxes = np.array([[10, 10, 20, 60], [10, 10, 20, 40], [2, 10, 20, 60],
+                           [600, 10, 40, 60], [10, 10, 20, 60],
+                           [10, 10, 20, 60]])
+        ignore = missrate_gt_ignore(bboxes, [0, 0, 0, 0, 1, 0], bboxes[:, 3],
+                                    [0, 0, 0, 0, 0, 2])
+        self.assertEqual(ignore.tolist(),
+                         [False, True, True, True, True, True])
+        ignore = missrate_gt_ignore(
+            bboxes, [0, 0, 0, 0, 1, 0],
+            bboxes[:, 3], [0, 0, 0, 0, 0, 2],
+            height_range=(20, 100),
+            occ_range=(0, 1, 2),
+            bnd_range=(0, 0, 640, 512))
+        self.assertEqual(ignore.tolist(),
+                         [False, False, False, False, True, False])
+
+    def test_greedy_match(self):
+        # dt0 takes the best regular gt, dt1 falls back to the next one,
+        # dt2 is absorbed by the ignored gt and dt3 stays unmatched
+        ious = np.array([[0.6, 0.9, 0.0], [0.7, 0.8, 0.6], [0.0, 0.0, 0.9],
+                         [0.1, 0.1, 0.1]])
+        gt_ignore = np.array([0, 0, 1])
+        dtm, gtm, dtIg = missrate_greedy_match(ious, gt_ignore, [1, 2, 3, 4],
+                                               [11, 12, 13], [0.5])
+        np.testing.assert_array_equal(dtm, [[12, 11, 13, 0]])
+        np.testing.assert_array_equal(gtm, [[2, 1, 0]])
+        np.testing.assert_array_equal(dtIg, [[0, 0, 1, 0]])
+
+        # ties between regular gts resolve to the last one
+        dtm, gtm, _ = missrate_greedy_match(
+            np.array([[0.6, 0.6]]), np.array([0, 0]), [1], [11, 12], [0.5])
+        np.testing.assert_array_equal(dtm, [[12]])
+        np.testing.assert_array_equal(gtm, [[0, 1]])
+
+        # no ground truth at all
+        dtm, gtm, dtIg = missrate_greedy_match(
+            np.zeros((3, 0)), np.zeros(0), [1, 2, 3], [], [0.5])
+        self.assertEqual(dtm.shape, (1, 3))
+        self.assertEqual(gtm.shape, (1, 0))
+        self.assertFalse(dtm.any() or dtIg.any())
+
+
+def _create_kaist_json(rng, im_names):
+    images, annotations = [], []
+    for img_id, im_name in enumerate(im_names):
+        images.append(dict(id=img_id, im_name=im_name, width=640, height=512))
+        for _ in range(rng.integers(0, 5)):
+            x, y = rng.uniform(10, 500, size=2)
+            w, h = rng.uniform(20, 60), rng.uniform(40, 120)
+            annotations.append(
+                dict(
+                    id=len(annotations) + 1,
+                    image_id=img_id,
+                    category_id=1,
+                    bbox=[x, y, w, h],
+                    height=h,
+                    occlusion=int(rng.integers(0, 3)),
+                    ignore=0,
+                    iscrowd=0,
+                    area=w * h))
+    return dict(
+        images=images,
+        annotations=annotations,
+        categories=[dict(id=1, name='person')])
+
+
+def _create_predictions(rng, coco_json):
+    preds = defaultdict(list)
+    for ann in coco_json['annotations']:
+        x, y, w, h = ann['bbox']
+        if rng.random() < 0.8:
+            jitter = rng.normal(0, 4, size=4)
+            preds[ann['image_id']].append([
+                x + jitter[0], y + jitter[1], x + w + jitter[2],
+                y + h + jitter[3],
+                rng.random()
+            ])
+    for img in coco_json['images']:
+        for _ in range(rng.integers(0, 4)):
+            x, y = rng.uniform(0, 560, size=2)
+            preds[img['id']].append([x, y, x + 40, y + 80, rng.random()])
+    data_samples = []
+    for img in coco_json['images']:
+        pred = np.array(preds[img['id']]).reshape(-1, 5)
+        # detectors output the boxes of an image by descending score
+        pred = pred[np.argsort(-pred[:, 4], kind='mergesort')]
+        data_samples.append(
+            dict(
+                img_id=img['id'],
+                ori_shape=(512, 640),
+                pred_instances=dict(
+                    bboxes=torch.from_numpy(pred[:, :4]).float(),
+                    scores=torch.from_numpy(pred[:, 4]).float(),
+                    labels=torch.zeros(len(pred), dtype=torch.long))))
+    return data_samples
+
+
+class TestKAISTMissrateMetric(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        im_names = [f'set06/V000/I{i:05d}' for i in range(6)] + \
+            [f'set10/V000/I{i:05d}' for i in range(4)]
+        self.coco_json = _create_kaist_json(rng, im_names)
+        self.ann_file = osp.join(self.tmp_dir.name, 'kaist.json')
+        dump(self.coco_json, self.ann_file)
+        self.data_samples = _create_predictions(rng, self.coco_json)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _evaluate_subset_separately(self, metric, img_ids):
+        """Reference: evaluate the subset from scratch."""
+        coco_gt = COCO(self.ann_file)
+        preds = [
+            dict(
+                img_id=data_sample['img_id'],
+                bboxes=data_sample['pred_instances']['bboxes'].numpy(),
+                scores=data_sample['pred_instances']['scores'].numpy(),
+                labels=data_sample['pred_instances']['labels'].numpy())
+            for data_sample in self.data_samples
+        ]
+        result_files = metric.results2json(preds,
+                                           osp.join(self.tmp_dir.name, 'ref'))
+        coco_dt = coco_gt.loadRes(result_files['bbox'])
+        kaist_eval = KAISTPedEval(coco_gt, coco_dt, 'bbox')
+        kaist_eval.params.catIds = [1]
+        kaist_eval.params.imgIds = img_ids
+        kaist_eval.evaluate(0)
+        kaist_eval.accumulate()
+        return kaist_eval.summarize(0), kaist_eval.eval
+
+    def test_accumulate_subsets(self):
+        metric = KAISTMissrateMetric(ann_file=self.ann_file)
+        metric.dataset_meta = dict(classes=('person', ))
+        metric.process({}, copy.deepcopy(self.data_samples))
+        eval_results = metric.evaluate(size=len(self.data_samples))
+
+        subsets = dict(
+            all=list(range(10)), day=list(range(6)), night=list(range(6, 10)))
+        for name, img_ids in subsets.items():
+            miss_rate, ref_eval = self._evaluate_subset_separately(
+                metric, img_ids)
+            self.assertEqual(eval_results[f'coco/{name}'], miss_rate)
+            self.assertEqual(eval_results[f'coco/recall_{name}'],
+                             1 - ref_eval['yy'][0][-1])
+
+    def test_match_on_rank(self):
+        metric = KAISTMissrateMetric(ann_file=self.ann_file)
+        metric.dataset_meta = dict(classes=('person', ))
+        metric.process({}, copy.deepcopy(self.data_samples))
+        eval_results = metric.evaluate(size=len(self.data_samples))
+
+        # each rank matches its own images and only keeps compact records
+        ranks = []
+        for rank in range(2):
+            rank_metric = KAISTMissrateMetric(ann_file=self.ann_file)
+            rank_metric.dataset_meta = dict(classes=('person', ))
+            rank_metric.process({}, copy.deepcopy(self.data_samples[rank::2]))
+            ranks.append(rank_metric)
+        results = ranks[0].results + ranks[1].results
+        self.assertEqual(len(results), 2)
+        for buffer in results:
+            self.assertIsInstance(buffer, DetResultBuffer)
+            self.assertEqual(buffer.det_fields, ())
+            self.assertIn('missrate_record', buffer.img_fields)
+        # buffers are gathered across ranks as pickles
+        results = [pickle.loads(pickle.dumps(buffer)) for buffer in results]
+        metric = KAISTMissrateMetric(ann_file=self.ann_file)
+        metric.dataset_meta = dict(classes=('person', ))
+        self.assertEqual(
+            metric.compute_metrics(results),
+            {k.split('/')[1]: v
+             for k, v in eval_results.items()})
+
+    def test_outfile_prefix(self):
+        metric = KAISTMissrateMetric(ann_file=self.ann_file)
+        metric.dataset_meta = dict(classes=('person', ))
+        metric.process({}, copy.deepcopy(self.data_samples))
+        eval_results = metric.evaluate(size=len(self.data_samples))
+        self.assertEqual(
+            list(eval_results), [
+                'coco/all', 'coco/recall_all', 'coco/day', 'coco/recall_day',
+                'coco/night', 'coco/recall_night'
+            ])
+
+        # json files are only written on request
+        outfile_prefix = osp.join(self.tmp_dir.name, 'test')
+        metric = KAISTMissrateMetric(
+            ann_file=self.ann_file, outfile_prefix=outfile_prefix)
+        metric.dataset_meta = dict(classes=('person', ))
+        metric.process({}, copy.deepcopy(self.data_samples))
+        self.assertEqual(
+            metric.evaluate(size=len(self.data_samples)), eval_results)
+        self.assertTrue(osp.isfile(f'{outfile_prefix}.bbox.json'))
+
+        metric = KAISTMissrateMetric(
+            ann_file=self.ann_file,
+            format_only=True,
+            outfile_prefix=f'{outfile_prefix}_format')
+        metric.dataset_meta = dict(classes=('person', ))
+        metric.process({}, copy.deepcopy(self.data_samples))
+        self.assertEqual(metric.evaluate(size=len(self.data_samples)), {})
+        self.assertTrue(osp.isfile(f'{outfile_prefix}_format.bbox.json'))
+
+    def test_without_ann_file(self):
+        data_samples = copy.deepcopy(self.data_samples)
+        img_anns = defaultdict(list)
+        for ann in self.coco_json['annotations']:
+            img_anns[ann['image_id']].append(ann)
+        for data_sample in data_samples:
+            instances = []
+            for ann in img_anns[data_sample['img_id']]:
+                x, y, w, h = ann['bbox']
+                instances.append(
+                    dict(
+                        bbox=[x, y, x + w, y + h], bbox_label=0,
+                        ignore_flag=0))
+            data_sample['instances'] = instances
+
+        metric = KAISTMissrateMetric(subsets=dict(all=None))
+        metric.dataset_meta = dict(classes=('person', ))
+        metric.process({}, data_samples)
+        eval_results = metric.evaluate(size=len(data_samples))
+        self.assertIn('coco/all', eval_results)
+        self.assertIn('coco/recall_all', eval_results)
+
+    def test_gt_index_cache(self):
+        metric = KAISTMissrateMetric(ann_file=self.ann_file)
+        metric.dataset_meta = dict(classes=('person', ))
+        metric.process({}, copy.deepcopy(self.data_samples))
+        eval_results = metric.evaluate(size=len(self.data_samples))
+        missrate_eval = metric.get_missrate_eval()
+
+        # the prepared gt index is reused across evaluations and metrics
+        metric.process({}, copy.deepcopy(self.data_samples))
+        self.assertEqual(
+            metric.evaluate(size=len(self.data_samples)), eval_results)
+        self.assertIs(metric.get_missrate_eval(), missrate_eval)
+        metric = KAISTMissrateMetric(ann_file=self.ann_file, prefix='test')
+        metric.dataset_meta = dict(classes=('person', ))
+        self.assertIs(metric.get_missrate_eval(), missrate_eval)
+
+        # other setups get their own index
+        metric = KAISTMissrateMetric(
+            ann_file=self.ann_file, height_range=(20, 1e5**2))
+        metric.dataset_meta = dict(classes=('person', ))
+        self.assertIsNot(metric.get_missrate_eval(), missrate_eval)
+        self.assertEqual(metric.get_missrate_eval().height_range, (20, 1e5**2))
+        metric = FLIRMissrateMetric(ann_file=self.ann_file)
+        metric.dataset_meta = dict(classes=('person', ))
+        self.assertIsNot(metric.get_missrate_eval(), missrate_eval)
+
+    def test_flir_metric(self):
+        # FLIR uses the box height and considers every person visible
+        for ann in self.coco_json['annotations']:
+            ann['bbox'][3] = ann.pop('height')
+            ann.pop('occlusion')
+        dump(self.coco_json, self.ann_file)
+        metric = FLIRMissrateMetric(ann_file=self.ann_file)
+        metric.dataset_meta = dict(classes=('person', ))
+        metric.process({}, copy.deepcopy(self.data_samples))
+        eval_results = metric.evaluate(size=len(self.data_samples))
+        self.assertEqual(eval_results['coco/all'], eval_results['coco/day'])
+        self.assertEqual(eval_results['coco/all'], eval_results['coco/night'])
+
+        for ann in self.coco_json['annotations']:
+            ann['height'] = ann['bbox'][3]
+            ann['occlusion'] = 0
+        kaist_ann_file = osp.join(self.tmp_dir.name, 'kaist_visible.json')
+        dump(self.coco_json, kaist_ann_file)
+        metric = KAISTMissrateMetric(
+            ann_file=kaist_ann_file, subsets=dict(all=None))
+        metric.dataset_meta = dict(classes=('person', ))
+        metric.process({}, copy.deepcopy(self.data_samples))
+        self.assertEqual(
+            metric.evaluate(size=len(self.data_samples))['coco/all'],
+            eval_results['coco/all'])
+
+    def test_subset_rules(self):
+        metric = KAISTMissrateMetric(
+            ann_file=self.ann_file,
+            subsets=dict(
+                day=dict(key='im_name', pattern=r'set0[6-8]/'),
+                first=dict(key='id', value=0),
+                missing=dict(key='im_name', pattern='set11')))
+        subset_img_ids = metric.get_subset_img_ids(list(range(10)))
+        self.assertEqual(list(subset_img_ids), ['day', 'first', 'missing'])
+        self.assertEqual(subset_img_ids['day'], list(range(6)))
+        self.assertEqual(subset_img_ids['first'], [0])
+        self.assertEqual(subset_img_ids['missing'], [])
+
+        metric = KAISTMissrateMetric(
+            ann_file=self.ann_file,
+            subsets=dict(day=dict(key='tag', value='day')))
+        with self.assertRaisesRegex(KeyError, 'tag'):
+            metric.get_subset_img_ids([0])
+
+    def test_glare_subsets(self):
+        rng = np.random.default_rng(1)
+        im_names = ['set06/V000/I00001', 'set09/V000/I00001']
+        im_names += [f'complex_light_new/{name}' for name in im_names]
+        dump(_create_kaist_json(rng, im_names), self.ann_file)
+        metric = GlareKAISTMissrateMetric(ann_file=self.ann_file)
+        subset_img_ids = metric.get_subset_img_ids([0, 1, 2, 3])
+        self.assertEqual(
+            subset_img_ids,
+            dict(
+                normal_all=[0, 1],
+                normal_day=[0],
+                normal_night=[1],
+                glare_all=[2, 3],
+                glare_day=[2],
+                glare_night=[3]))
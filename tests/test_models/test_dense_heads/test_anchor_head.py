@@ -75,3 +75,50 @@ class TestAnchorHead(TestCase):
         onegt_box_loss = sum(one_gt_losses['loss_bbox'])
         assert onegt_cls_loss.item() > 0, 'cls loss should be non-zero'
         assert onegt_box_loss.item() > 0, 'box loss should be non-zero'
+
+    def test_anchor_head_batch_assign(self):
+        """Tests the targets of the anchors assigned for the whole batch."""
+        s = 256
+        img_metas = [{
+            'img_shape': (s, s, 3),
+            'pad_shape': (s, s, 3),
+            'scale_factor': 1,
+        }, {
+            'img_shape': (200, 160, 3),
+            'pad_shape': (s, s, 3),
+            'scale_factor': 1,
+        }]
+        cfg = Config(
+            dict(
+                assigner=dict(
+                    type='MaxIoUAssigner',
+                    pos_iou_thr=0.5,
+                    neg_iou_thr=0.4,
+                    min_pos_iou=0,
+                    ignore_iof_thr=-1),
+                allowed_border=0,
+                pos_weight=-1,
+                debug=False))
+        anchor_head = AnchorHead(num_classes=4, in_channels=1, train_cfg=cfg)
+        feats = (
+            torch.rand(2, 1, s // (2**(i + 2)), s // (2**(i + 2)))
+            for i in range(len(anchor_head.prior_generator.strides)))
+        cls_scores, bbox_preds = anchor_head.forward(feats)
+        batch_gt_instances = [
+            InstanceData(
+                bboxes=torch.Tensor([[23.6667, 23.8757, 238.6326, 151.8874],
+                                     [10., 20., 60., 90.]]),
+                labels=torch.LongTensor([2, 0])),
+            InstanceData(
+                bboxes=torch.Tensor([[30., 40., 150., 120.]]),
+                labels=torch.LongTensor([1]))
+        ]
+
+        losses = anchor_head.loss_by_feat(cls_scores, bbox_preds,
+                                          batch_gt_instances, img_metas)
+        cfg.batch_assign = True
+        batch_losses = anchor_head.loss_by_feat(cls_scores, bbox_preds,
+                                                batch_gt_instances, img_metas)
+        for name, loss in losses.items():
+            self.assertTrue(
+                torch.allclose(sum(loss), sum(batch_losses[name])), name)
@@ -92,3 +92,66 @@ class TestATSSHead(TestCase):
                            'box loss should be non-zero')
         self.assertGreater(onegt_centerness_loss.item(), 0,
                            'centerness loss should be non-zero')
+
+    def test_atss_head_batch_assign(self):
+        """Tests the targets of the anchors assigned for the whole batch."""
+        s = 256
+        img_metas = [{
+            'img_shape': (s, s, 3),
+            'pad_shape': (s, s, 3),
+            'scale_factor': 1
+        }, {
+            'img_shape': (200, 160, 3),
+            'pad_shape': (s, s, 3),
+            'scale_factor': 1
+        }]
+        cfg = Config(
+            dict(
+                assigner=dict(type='ATSSAssigner', topk=9),
+                allowed_border=0,
+                pos_weight=-1,
+                debug=False))
+        atss_head = ATSSHead(
+            num_classes=4,
+            in_channels=1,
+            stacked_convs=1,
+            feat_channels=1,
+            norm_cfg=None,
+            train_cfg=cfg,
+            anchor_generator=dict(
+                type='AnchorGenerator',
+                ratios=[1.0],
+                octave_base_scale=8,
+                scales_per_octave=1,
+                strides=[8, 16, 32, 64, 128]),
+            loss_cls=dict(
+                type='FocalLoss',
+                use_sigmoid=True,
+                gamma=2.0,
+                alpha=0.25,
+                loss_weight=1.0),
+            loss_bbox=dict(type='GIoULoss', loss_weight=2.0))
+        feat = [
+            torch.rand(2, 1, s // feat_size, s // feat_size)
+            for feat_size in [8, 16, 32, 64, 128]
+        ]
+        cls_scores, bbox_preds, centernesses = atss_head.forward(feat)
+        batch_gt_instances = [
+            InstanceData(
+                bboxes=torch.Tensor([[23.6667, 23.8757, 238.6326, 151.8874],
+                                     [10.3, 20.1, 60.7, 90.2]]),
+                labels=torch.LongTensor([2, 0])),
+            InstanceData(
+                bboxes=torch.Tensor([[30.2, 40.6, 150.1, 120.3]]),
+                labels=torch.LongTensor([1]))
+        ]
+
+        losses = atss_head.loss_by_feat(cls_scores, bbox_preds, centernesses,
+                                        batch_gt_instances, img_metas)
+        cfg.batch_assign = True
+        batch_losses = atss_head.loss_by_feat(cls_scores, bbox_preds,
+                                              centernesses, batch_gt_instances,
+                                              img_metas)
+        for name, loss in losses.items():
+            self.assertTrue(
+                torch.allclose(sum(loss), sum(batch_losses[name])), name)
@@ -191,3 +191,48 @@ class TestTOODHead(TestCase):
         self.assertEqual(
             sum(empty_box_loss).item(), 0,
             'there should be no box loss when there are no true boxes')
+
+    def test_tood_head_batch_assign(self):
+        """Tests the targets of the anchors assigned for the whole batch."""
+        s = 256
+        img_metas = [{
+            'img_shape': (s, s, 3),
+            'pad_shape': (s, s, 3),
+            'scale_factor': 1
+        }, {
+            'img_shape': (200, 160, 3),
+            'pad_shape': (s, s, 3),
+            'scale_factor': 1
+        }]
+        tood_head = _tood_head('anchor_based')
+        tood_head.train_cfg.allowed_border = 0
+        tood_head.init_weights()
+        feat = [
+            torch.rand(2, 1, s // feat_size, s // feat_size)
+            for feat_size in [8, 16, 32, 64, 128]
+        ]
+        cls_scores, bbox_preds = tood_head(feat)
+        batch_gt_instances = [
+            InstanceData(
+                bboxes=torch.Tensor([[23.6667, 23.8757, 238.6326, 151.8874],
+                                     [10.3, 20.1, 60.7, 90.2]]),
+                labels=torch.LongTensor([2, 0])),
+            InstanceData(
+                bboxes=torch.Tensor([[30.2, 40.6, 150.1, 120.3]]),
+                labels=torch.LongTensor([1]))
+        ]
+
+        message_hub = MessageHub.get_instance('runtime_info')
+        # the initial assigner and the alignment assigner
+        for epoch in (0, 4):
+            message_hub.update_info('epoch', epoch)
+            tood_head.train_cfg.batch_assign = False
+            losses = tood_head.loss_by_feat(cls_scores, bbox_preds,
+                                            batch_gt_instances, img_metas)
+            tood_head.train_cfg.batch_assign = True
+            batch_losses = tood_head.loss_by_feat(cls_scores, bbox_preds,
+                                                  batch_gt_instances,
+                                                  img_metas)
+            for name, loss in losses.items():
+                self.assertTrue(
+                    torch.allclose(sum(loss), sum(batch_losses[name])), name)
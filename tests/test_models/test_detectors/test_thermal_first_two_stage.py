@@ -0,0 +1,76 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from types import SimpleNamespace
+from unittest import TestCase
+
+import torch
+from mmengine.structures import InstanceData
+
+from mmdet.registry import MODELS
+from mmdet.structures import DetDataSample
+from mmdet.structures.bbox import bbox2roi
+from mmdet.testing import get_roi_head_cfg
+from mmdet.utils import register_all_modules
+from projects.BAANet.baanet.detectors.thermal_first_two_stage_detector import \
+    ThermalFirstTwoStageDetector
+
+
+class TestThermalFirstTwoStageDetector(TestCase):
+
+    def setUp(self):
+        register_all_modules()
+        torch.manual_seed(0)
+        roi_head_cfg = get_roi_head_cfg(
+            'cascade_rcnn/cascade-rcnn_r50_fpn_1x_coco.py')
+        for bbox_head_cfg in roi_head_cfg.bbox_head:
+            bbox_head_cfg.num_classes = 1
+        roi_head = MODELS.build(roi_head_cfg)
+        roi_head.eval()
+        for param in roi_head.parameters():
+            torch.nn.init.normal_(param, std=0.05)
+        # ``predict_cascade_early_exit`` only needs the RoI head and the
+        # early exit counters of the detector
+        self.detector = SimpleNamespace(
+            roi_head=roi_head,
+            early_exit_stats=dict(num_rois=0, num_exited_rois=0))
+
+        self.img_meta = dict(
+            img_shape=(256, 320),
+            ori_shape=(256, 320),
+            scale_factor=(1., 1.),
+            batch_input_shape=(256, 320))
+        self.x = [
+            torch.randn(1, 256, 64 // 2**i, 80 // 2**i) for i in range(5)
+        ]
+        xy = torch.rand(50, 2) * 200
+        wh = torch.rand(50, 2) * 60 + 10
+        self.proposals = InstanceData(bboxes=torch.cat([xy, xy + wh], dim=1))
+
+    def test_predict_cascade_early_exit_at_first_stage(self):
+        roi_head = self.detector.roi_head
+        # thresholds out of the score range make every RoI exit after the
+        # first stage
+        early_exit_cfg = dict(bg_score_thr=2., fg_score_thr=2.)
+        with torch.no_grad():
+            results = ThermalFirstTwoStageDetector.predict_cascade_early_exit(
+                self.detector, self.x, [self.proposals],
+                [DetDataSample(metainfo=self.img_meta)], early_exit_cfg,
+                False)[0]
+
+            rois = bbox2roi([self.proposals.bboxes])
+            bbox_results = roi_head._bbox_forward(0, self.x, rois)
+            labels = bbox_results['cls_score'][:, :-1].argmax(dim=1)
+            expected_bboxes = roi_head.bbox_head[0].regress_by_class(
+                rois[:, 1:], labels, bbox_results['bbox_pred'], self.img_meta)
+
+        self.assertEqual(self.detector.early_exit_stats,
+                         dict(num_rois=50, num_exited_rois=50))
+        self.assertGreater(len(results), 0)
+        # the kept boxes are the ones refined by the first stage, not
+        # decoded again with the deltas of a later stage
+        dists = torch.cdist(
+            results.bboxes,
+            expected_bboxes,
+            compute_mode='donot_use_mm_for_euclid_dist')
+        self.assertTrue(
+            torch.allclose(
+                dists.min(dim=1)[0], dists.new_zeros(len(results)), atol=1e-4))
@@ -0,0 +1,75 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import pytest
+import torch
+
+from mmdet.models.layers import batched_multiclass_nms, multiclass_nms
+
+
+def _random_inputs(batch_size, num_boxes, num_classes, class_agnostic):
+    xy = torch.rand(batch_size, num_boxes, 1, 2) * 100
+    wh = torch.rand(batch_size, num_boxes, 1, 2) * 40 + 2
+    bboxes = torch.cat([xy, xy + wh], dim=-1)
+    if not class_agnostic:
+        bboxes = bboxes.expand(-1, -1, num_classes, -1)
+        bboxes = bboxes + torch.rand_like(bboxes) * 3
+    bboxes = bboxes.reshape(batch_size, num_boxes, -1)
+    scores = torch.rand(batch_size, num_boxes, num_classes + 1)
+    return bboxes, scores
+
+
+@pytest.mark.parametrize('num_classes,class_agnostic', [(1, True), (3, False),
+                                                        (5, True)])
+def test_batched_multiclass_nms(num_classes, class_agnostic):
+    torch.manual_seed(0)
+    nms_cfg = dict(type='nms', iou_threshold=0.5)
+    bboxes, scores = _random_inputs(3, 120, num_classes, class_agnostic)
+    score_factors = torch.rand(3, 120)
+    valid_mask = torch.ones(3, 120, dtype=torch.bool)
+    valid_mask[1, 80:] = False
+
+    dets, labels, valid, inds = batched_multiclass_nms(
+        bboxes,
+        scores,
+        0.3,
+        nms_cfg,
+        max_num=40,
+        score_factors=score_factors,
+        valid_mask=valid_mask,
+        return_inds=True)
+    assert dets.shape == (3, 40, 5)
+    assert labels.shape == valid.shape == inds.shape == (3, 40)
+    for i in range(3):
+        num_boxes = int(valid_mask[i].sum())
+        ref_dets, ref_labels, ref_inds = multiclass_nms(
+            bboxes[i, :num_boxes],
+            scores[i, :num_boxes],
+            0.3,
+            nms_cfg,
+            max_num=40,
+            score_factors=score_factors[i, :num_boxes],
+            return_inds=True)
+        num_dets = int(valid[i].sum())
+        assert num_dets == len(ref_dets)
+        assert valid[i, :num_dets].all()
+        assert torch.allclose(dets[i, :num_dets], ref_dets)
+        assert torch.equal(labels[i, :num_dets], ref_labels)
+        assert torch.equal(inds[i, :num_dets], ref_inds)
+        assert (labels[i, num_dets:] == -1).all()
+        assert (dets[i, num_dets:] == 0).all()
+
+    # pre-NMS top-k keeps at most nms_pre boxes of each class
+    dets, labels, valid = batched_multiclass_nms(
+        bboxes, scores, 0., nms_cfg, nms_pre=2)
+    assert dets.shape == (3, 2 * num_classes, 5)
+    for label in range(num_classes):
+        assert ((labels == label) & valid).sum(dim=1).le(2).all()
+
+    # empty inputs
+    dets, labels, valid = batched_multiclass_nms(
+        bboxes[:, :0], scores[:, :0], 0.3, nms_cfg, max_num=10)
+    assert dets.shape == (3, 0, 5)
+    assert labels.shape == valid.shape == (3, 0)
+
+    with pytest.raises(AssertionError):
+        batched_multiclass_nms(bboxes, scores, 0.3,
+                               dict(type='soft_nms', iou_threshold=0.5))
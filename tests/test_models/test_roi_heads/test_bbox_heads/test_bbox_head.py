@@ -60,6 +60,39 @@ class TestBboxHead(TestCase):
         self.assertEqual(len(result_list[0].scores.shape), 1)
         self.assertEqual(len(result_list[0].labels.shape), 1)
 
+        # with batched nms
+        batched_result_list = bbox_head.predict_by_feat(
+            rois=tuple(rois),
+            cls_scores=tuple(cls_scores),
+            bbox_preds=tuple(bbox_preds),
+            batch_img_metas=img_metas,
+            rcnn_test_cfg=ConfigDict(rcnn_test_cfg, batched_nms=True))
+        self.assertTrue(
+            torch.allclose(batched_result_list[0].bboxes,
+                           result_list[0].bboxes))
+        self.assertTrue(
+            torch.allclose(batched_result_list[0].scores,
+                           result_list[0].scores))
+        self.assertTrue(
+            torch.equal(batched_result_list[0].labels, result_list[0].labels))
+        # nms_pre defaults to max_per_img and must be positive
+        batched_result_list = bbox_head.predict_by_feat(
+            rois=tuple(rois),
+            cls_scores=tuple(cls_scores),
+            bbox_preds=tuple(bbox_preds),
+            batch_img_metas=img_metas,
+            rcnn_test_cfg=ConfigDict(
+                rcnn_test_cfg, batched_nms=True, max_per_img=1))
+        self.assertEqual(len(batched_result_list[0]), 1)
+        with self.assertRaises(AssertionError):
+            bbox_head.predict_by_feat(
+                rois=tuple(rois),
+                cls_scores=tuple(cls_scores),
+                bbox_preds=tuple(bbox_preds),
+                batch_img_metas=img_metas,
+                rcnn_test_cfg=ConfigDict(
+                    rcnn_test_cfg, batched_nms=True, nms_pre=-1))
+
         # without nms
         result_list = bbox_head.predict_by_feat(
             rois=tuple(rois),
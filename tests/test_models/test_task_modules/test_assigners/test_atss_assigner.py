@@ -145,3 +145,39 @@ class TestATSSAssigner(TestCase):
         assign_result = atss_assigner.assign(pred_instances, num_level_bboxes,
                                              gt_instances)
         self.assertEqual(len(assign_result.gt_inds), 0)
+
+    def test_atss_assigner_batch_assign(self):
+        atss_assigner = ATSSAssigner(topk=3, ignore_iof_thr=0.5)
+        generator = torch.Generator().manual_seed(0)
+        batch_pred_instances, batch_num_level_bboxes = [], []
+        batch_gt_instances, batch_gt_instances_ignore = [], []
+        for num_level_bboxes, num_gts in [([6, 2], 2), ([4, 3], 1), ([5,
+                                                                      1], 0)]:
+            xy = torch.rand(sum(num_level_bboxes), 2, generator=generator) * 50
+            batch_pred_instances.append(
+                InstanceData(priors=torch.cat([xy, xy + 15], dim=1)))
+            batch_num_level_bboxes.append(num_level_bboxes)
+            xy = torch.rand(num_gts, 2, generator=generator) * 40
+            batch_gt_instances.append(
+                InstanceData(
+                    bboxes=torch.cat([xy, xy + 25], dim=1),
+                    labels=torch.arange(num_gts)))
+            batch_gt_instances_ignore.append(
+                InstanceData(bboxes=torch.FloatTensor([[40, 0, 70, 20]])))
+
+        assign_results = atss_assigner.batch_assign(batch_pred_instances,
+                                                    batch_num_level_bboxes,
+                                                    batch_gt_instances,
+                                                    batch_gt_instances_ignore)
+        for i, assign_result in enumerate(assign_results):
+            expected_result = atss_assigner.assign(
+                batch_pred_instances[i], batch_num_level_bboxes[i],
+                batch_gt_instances[i], batch_gt_instances_ignore[i])
+            self.assertEqual(assign_result.num_gts, expected_result.num_gts)
+            self.assertTrue(
+                torch.equal(assign_result.gt_inds, expected_result.gt_inds))
+            self.assertTrue(
+                torch.allclose(assign_result.max_overlaps,
+                               expected_result.max_overlaps))
+            self.assertTrue(
+                torch.equal(assign_result.labels, expected_result.labels))
@@ -72,3 +72,35 @@ class TestDynamicSoftLabelAssigner(TestCase):
 
         expected_gt_inds = torch.LongTensor([1, 0])
         assert_allclose(assign_result.gt_inds, expected_gt_inds)
+
+    def test_batch_assign(self):
+        assigner = DynamicSoftLabelAssigner(
+            soft_center_radius=3.0, topk=3, iou_weight=3.0)
+        generator = torch.Generator().manual_seed(0)
+        batch_pred_instances, batch_gt_instances = [], []
+        for num_bboxes, num_gts in [(12, 2), (6, 1), (5, 0)]:
+            points = torch.rand(num_bboxes, 2, generator=generator) * 50
+            strides = torch.full((num_bboxes, 2), 8.)
+            batch_pred_instances.append(
+                InstanceData(
+                    priors=torch.cat([points, strides], dim=1),
+                    bboxes=torch.cat([points - 8, points + 8], dim=1),
+                    scores=torch.randn(num_bboxes, 3, generator=generator)))
+            xy = torch.rand(num_gts, 2, generator=generator) * 30
+            batch_gt_instances.append(
+                InstanceData(
+                    bboxes=torch.cat([xy, xy + 20], dim=1),
+                    labels=torch.arange(num_gts)))
+        # an image without priors inside its gt
+        batch_gt_instances[1].bboxes = torch.Tensor([[100, 100, 101, 101]])
+
+        assign_results = assigner.batch_assign(batch_pred_instances,
+                                               batch_gt_instances)
+        for i, assign_result in enumerate(assign_results):
+            expected_result = assigner.assign(batch_pred_instances[i],
+                                              batch_gt_instances[i])
+            self.assertEqual(assign_result.num_gts, expected_result.num_gts)
+            assert_allclose(assign_result.gt_inds, expected_result.gt_inds)
+            assert_allclose(assign_result.max_overlaps,
+                            expected_result.max_overlaps)
+            assert_allclose(assign_result.labels, expected_result.labels)
@@ -5,11 +5,14 @@ CommandLine:
     pytest  tests/test_core/test_bbox/test_assigners/test_max_iou_assigner.py
     xdoctest  tests/test_core/test_bbox/test_assigners/test_max_iou_assigner.py zero
 """ # noqa
+from unittest.mock import patch
+
 import pytest
 import torch
 from mmengine.structures import InstanceData
 
 from mmdet.models.task_modules.assigners import MaxIoUAssigner
+from mmdet.structures.bbox import bbox_overlaps
 
 
 @pytest.mark.parametrize('neg_iou_thr', [0.5, (0, 0.5)])
@@ -160,3 +163,189 @@ def test_max_iou_assigner_with_empty_priors_and_gt():
     gt_instances = InstanceData(bboxes=gt_bboxes, labels=gt_labels)
     assign_result = self.assign(pred_instances, gt_instances)
     assert len(assign_result.gt_inds) == 0
+
+
+@pytest.mark.parametrize('gt_max_assign_all', [True, False])
+def test_max_iou_assigner_with_chunks(gt_max_assign_all):
+    """Test that the assignment by chunks of priors is the same as the
+    assignment with all the overlaps."""
+    kwargs = dict(
+        pos_iou_thr=0.5,
+        neg_iou_thr=0.4,
+        min_pos_iou=0.1,
+        gt_max_assign_all=gt_max_assign_all,
+        ignore_iof_thr=0.5)
+    self = MaxIoUAssigner(chunk_size=3, **kwargs)
+    priors = torch.FloatTensor([
+        [0, 0, 10, 10],
+        [10, 10, 20, 20],
+        [5, 5, 15, 15],
+        [30, 32, 40, 42],
+        [0, 0, 10, 10],
+        [40, 40, 50, 50],
+        [3, 10, 13, 20],
+    ])
+    gt_bboxes = torch.FloatTensor([
+        [0, 0, 10, 9],
+        [0, 10, 10, 19],
+        [38, 38, 52, 52],
+    ])
+    gt_labels = torch.LongTensor([2, 3, 4])
+    gt_bboxes_ignore = torch.Tensor([
+        [30, 30, 40, 40],
+    ])
+
+    pred_instances = InstanceData(priors=priors)
+    gt_instances = InstanceData(bboxes=gt_bboxes, labels=gt_labels)
+    gt_instances_ignore = InstanceData(bboxes=gt_bboxes_ignore)
+    assign_result = self.assign(
+        pred_instances, gt_instances, gt_instances_ignore=gt_instances_ignore)
+    expected_result = MaxIoUAssigner(**kwargs).assign(
+        pred_instances, gt_instances, gt_instances_ignore=gt_instances_ignore)
+    assert torch.equal(assign_result.gt_inds, expected_result.gt_inds)
+    assert torch.allclose(assign_result.max_overlaps,
+                          expected_result.max_overlaps)
+    assert torch.equal(assign_result.labels, expected_result.labels)
+    assert assign_result.num_gts == 3
+
+
+def test_max_iou_assigner_chunks_memory():
+    """Test that the assignment by chunks only keeps the priors reaching the
+    positive maximum overlap of their gt, with grid-ordered priors."""
+    kwargs = dict(
+        pos_iou_thr=0.5,
+        neg_iou_thr=0.4,
+        min_pos_iou=0.,
+        gt_max_assign_all=True)
+    self = MaxIoUAssigner(chunk_size=64, **kwargs)
+    # 3 anchors on a 32 x 32 grid, ordered by position
+    ys, xs = torch.meshgrid(
+        torch.arange(32.) * 8, torch.arange(32.) * 8, indexing='ij')
+    centers = torch.stack([xs, ys], dim=-1).view(-1, 1, 2)
+    sizes = torch.tensor([[8., 8.], [16., 8.], [8., 16.]])
+    priors = torch.cat([centers - sizes / 2, centers + sizes / 2],
+                       dim=-1).view(-1, 4)
+    gt_bboxes = torch.rand(30, 4, generator=torch.Generator().manual_seed(0))
+    gt_bboxes[:, :2] *= 200
+    gt_bboxes[:, 2:] = gt_bboxes[:, :2] + 10 + gt_bboxes[:, 2:] * 40
+    # gts without overlap match all the priors with overlap 0
+    gt_bboxes[-2:] = torch.FloatTensor([[300, 300, 310, 310],
+                                        [400, 0, 420, 20]])
+    gt_labels = torch.randint(
+        0, 5, (30, ), generator=torch.Generator().manual_seed(1))
+
+    pred_instances = InstanceData(priors=priors)
+    gt_instances = InstanceData(bboxes=gt_bboxes, labels=gt_labels)
+    num_candidates = []
+    update_candidates = MaxIoUAssigner._update_candidates
+
+    def record_candidates(*args):
+        candidates = update_candidates(*args)
+        num_candidates.append(candidates.size(1))
+        return candidates
+
+    with patch.object(MaxIoUAssigner, '_update_candidates',
+                      staticmethod(record_candidates)):
+        assign_result = self.assign(pred_instances, gt_instances)
+    expected_result = MaxIoUAssigner(**kwargs).assign(pred_instances,
+                                                      gt_instances)
+    assert torch.equal(assign_result.gt_inds, expected_result.gt_inds)
+    assert torch.allclose(assign_result.max_overlaps,
+                          expected_result.max_overlaps)
+    assert torch.equal(assign_result.labels, expected_result.labels)
+    assert (assign_result.gt_inds == 30).sum() > len(priors) // 2
+    # only the ties of the positive maximum overlaps are kept, not the
+    # priors of every chunk for the gts without overlap
+    overlaps = bbox_overlaps(gt_bboxes, priors)
+    gt_max_overlaps = overlaps.max(dim=1, keepdim=True)[0]
+    num_ties = ((overlaps == gt_max_overlaps) & (gt_max_overlaps > 0)).sum()
+    assert len(num_candidates) == 48
+    assert max(num_candidates) <= num_ties < len(priors) // 10
+
+
+def test_max_iou_assigner_batched_chunks():
+    """Test the assignment of a batch of images with padded gts."""
+    self = MaxIoUAssigner(pos_iou_thr=0.5, neg_iou_thr=0.5, chunk_size=2)
+    priors = torch.FloatTensor([
+        [0, 0, 10, 10],
+        [10, 10, 20, 20],
+        [5, 5, 15, 15],
+        [32, 32, 38, 42],
+    ])
+    gt_bboxes = [
+        torch.FloatTensor([[0, 0, 10, 9], [0, 10, 10, 19]]),
+        torch.FloatTensor([[10, 10, 20, 19]]),
+        torch.empty(0, 4),
+    ]
+    gt_labels = [torch.LongTensor([2, 3]), torch.LongTensor([1])]
+    gt_labels.append(torch.empty(0, dtype=torch.long))
+
+    batch_gt_bboxes = torch.zeros(3, 2, 4)
+    batch_gt_labels = torch.zeros(3, 2, dtype=torch.long)
+    gt_valid_mask = torch.zeros(3, 2, dtype=torch.bool)
+    for i, (bboxes, gt_label) in enumerate(zip(gt_bboxes, gt_labels)):
+        batch_gt_bboxes[i, :len(bboxes)] = bboxes
+        batch_gt_labels[i, :len(bboxes)] = gt_label
+        gt_valid_mask[i, :len(bboxes)] = True
+    gt_inds, max_overlaps, labels = self.assign_wrt_chunks(
+        batch_gt_bboxes, priors, batch_gt_labels, gt_valid_mask=gt_valid_mask)
+    assert gt_inds.shape == (3, 4)
+
+    for i, (bboxes, gt_label) in enumerate(zip(gt_bboxes, gt_labels)):
+        assign_result = self.assign(
+            InstanceData(priors=priors),
+            InstanceData(bboxes=bboxes, labels=gt_label))
+        assert torch.equal(gt_inds[i], assign_result.gt_inds)
+        assert torch.allclose(max_overlaps[i], assign_result.max_overlaps)
+        assert torch.equal(labels[i], assign_result.labels)
+
+
+@pytest.mark.parametrize('chunk_size', [-1, 3])
+def test_max_iou_assigner_batch_assign(chunk_size):
+    """Test that the assignment of a batch of images is the same as the
+    assignment image by image."""
+    self = MaxIoUAssigner(
+        pos_iou_thr=0.5,
+        neg_iou_thr=0.4,
+        min_pos_iou=0.1,
+        ignore_iof_thr=0.5,
+        chunk_size=chunk_size)
+    priors = torch.FloatTensor([
+        [0, 0, 10, 10],
+        [10, 10, 20, 20],
+        [5, 5, 15, 15],
+        [30, 32, 40, 42],
+        [40, 40, 50, 50],
+        [3, 10, 13, 20],
+    ])
+    batch_pred_instances = [
+        InstanceData(priors=priors),
+        InstanceData(priors=priors[1:4]),
+        InstanceData(priors=priors[:5]),
+    ]
+    batch_gt_instances = [
+        InstanceData(
+            bboxes=torch.FloatTensor([[0, 0, 10, 9], [38, 38, 52, 52]]),
+            labels=torch.LongTensor([2, 4])),
+        InstanceData(
+            bboxes=torch.FloatTensor([[10, 10, 20, 19]]),
+            labels=torch.LongTensor([1])),
+        InstanceData(
+            bboxes=torch.empty(0, 4), labels=torch.empty(0, dtype=torch.long)),
+    ]
+    batch_gt_instances_ignore = [
+        InstanceData(bboxes=torch.FloatTensor([[30, 30, 40, 40]])), None, None
+    ]
+    assign_results = self.batch_assign(batch_pred_instances,
+                                       batch_gt_instances,
+                                       batch_gt_instances_ignore)
+    for assign_result, pred_instances, gt_instances, gt_instances_ignore in \
+            zip(assign_results, batch_pred_instances, batch_gt_instances,
+                batch_gt_instances_ignore):
+        expected_result = self.assign(pred_instances, gt_instances,
+                                      gt_instances_ignore)
+        assert assign_result.num_gts == expected_result.num_gts
+        assert torch.equal(assign_result.gt_inds, expected_result.gt_inds)
+        assert torch.allclose(assign_result.max_overlaps,
+                              expected_result.max_overlaps)
+        assert torch.equal(assign_result.labels, expected_result.labels)
@@ -55,3 +55,39 @@ class TestTaskAlignedAssigner(TestCase):
         assign_result = assigner.assign(pred_instances, gt_instances)
         expected_gt_inds = torch.LongTensor([0, 0, 0, 0])
         self.assertTrue(torch.all(assign_result.gt_inds == expected_gt_inds))
+
+    def test_task_aligned_assigner_batch_assign(self):
+        assigner = TaskAlignedAssigner(topk=3)
+        generator = torch.Generator().manual_seed(0)
+        batch_pred_instances, batch_gt_instances = [], []
+        for num_bboxes, num_gts in [(8, 2), (5, 1), (6, 0)]:
+            xy = torch.rand(num_bboxes, 2, generator=generator) * 50
+            priors = torch.cat([xy, xy + 15], dim=1)
+            batch_pred_instances.append(
+                InstanceData(
+                    priors=priors,
+                    bboxes=priors +
+                    torch.rand(num_bboxes, 4, generator=generator) * 5,
+                    scores=torch.rand(num_bboxes, 3, generator=generator)))
+            xy = torch.rand(num_gts, 2, generator=generator) * 40
+            batch_gt_instances.append(
+                InstanceData(
+                    bboxes=torch.cat([xy, xy + 25], dim=1),
+                    labels=torch.arange(num_gts)))
+
+        assign_results = assigner.batch_assign(
+            batch_pred_instances, batch_gt_instances, alpha=1, beta=6)
+        for i, assign_result in enumerate(assign_results):
+            expected_result = assigner.assign(batch_pred_instances[i],
+                                              batch_gt_instances[i])
+            self.assertEqual(assign_result.num_gts, expected_result.num_gts)
+            self.assertTrue(
+                torch.equal(assign_result.gt_inds, expected_result.gt_inds))
+            self.assertTrue(
+                torch.allclose(assign_result.max_overlaps,
+                               expected_result.max_overlaps))
+            self.assertTrue(
+                torch.equal(assign_result.labels, expected_result.labels))
+            self.assertTrue(
+                torch.allclose(assign_result.assign_metrics,
+                               expected_result.assign_metrics))
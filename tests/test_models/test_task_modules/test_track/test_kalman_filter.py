@@ -35,3 +35,22 @@ class TestKalmanFilter(TestCase):
         mean, covariance = self.kf.update(mean, covariance, measurement, score)
         assert len(mean) == 8
         assert covariance.shape == (8, 8)
+
+    def test_multi(self):
+        measurements = np.random.rand(5, 4) * 100 + 10
+        means, covariances = self.kf.multi_initiate(measurements)
+        assert means.shape == (5, 8)
+        assert covariances.shape == (5, 8, 8)
+        for i in range(5):
+            mean, covariance = self.kf.initiate(measurements[i])
+            assert np.allclose(means[i], mean)
+            assert np.allclose(covariances[i], covariance)
+
+        means, covariances = self.kf.multi_predict(means, covariances)
+        new_means, new_covariances = self.kf.multi_update(
+            means, covariances, measurements + 1)
+        for i in range(5):
+            mean, covariance = self.kf.update(means[i], covariances[i],
+                                              measurements[i] + 1)
+            assert np.allclose(new_means[i], mean)
+            assert np.allclose(new_covariances[i], covariance)
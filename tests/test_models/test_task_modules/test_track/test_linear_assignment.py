@@ -0,0 +1,96 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from unittest import TestCase
+
+import numpy as np
+import torch
+from mmengine.registry import init_default_scope
+
+from mmdet.registry import TASK_UTILS
+
+
+class TestLinearAssignment(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        init_default_scope('mmdet')
+        cls.lapjv = TASK_UTILS.build(dict(type='LapJVAssignment'))
+        cls.auction = TASK_UTILS.build(dict(type='AuctionAssignment'))
+
+    def _total_cost(self, cost, rows, cost_limit):
+        matched = rows >= 0
+        total = cost[matched, rows[matched]].sum().item()
+        if cost_limit is not None:
+            # unmatched rows and columns cost half the limit each
+            num_unmatched = sum(cost.shape) - 2 * matched.sum().item()
+            total += num_unmatched * cost_limit / 2
+        return total, matched.sum().item()
+
+    def test_lapjv(self):
+        cost = torch.tensor([[0.1, 0.9, 0.8], [0.2, 0.3, 0.9]])
+        rows, cols = self.lapjv(cost, cost_limit=0.5)
+        self.assertEqual(rows.tolist(), [0, 1])
+        self.assertEqual(cols.tolist(), [0, 1, -1])
+        rows, cols = self.lapjv(cost, cost_limit=0.25)
+        self.assertEqual(rows.tolist(), [0, -1])
+        self.assertEqual(cols.tolist(), [0, -1, -1])
+
+        # missing pairs are never matched
+        cost = torch.tensor([[float('inf'), 0.5], [float('inf'), 0.1]])
+        rows, cols = self.lapjv(cost)
+        self.assertEqual(rows.tolist(), [-1, 1])
+        self.assertEqual(cols.tolist(), [-1, 1])
+
+        # numpy costs and empty problems
+        rows, cols = self.lapjv(np.zeros((0, 3)))
+        self.assertEqual(rows.shape, (0, ))
+        self.assertEqual(cols.tolist(), [-1, -1, -1])
+
+    def test_auction(self):
+        rng = np.random.RandomState(0)
+        for i in range(60):
+            cost = torch.from_numpy(rng.rand(*rng.randint(0, 10, 2)))
+            if i % 3 == 0:
+                cost[torch.rand(cost.shape) < 0.3] = float('inf')
+            cost_limit = 0.6 if i % 2 else None
+            rows, cols = self.auction(cost, cost_limit)
+            ref_rows, _ = self.lapjv(cost, cost_limit)
+            # the rows and the columns are consistent
+            matched = rows >= 0
+            self.assertTrue(
+                torch.equal(cols[rows[matched]],
+                            torch.nonzero(matched).flatten()))
+            self.assertEqual((cols >= 0).sum(), matched.sum())
+            total, num_matched = self._total_cost(cost, rows, cost_limit)
+            ref_total, ref_num_matched = self._total_cost(
+                cost, ref_rows, cost_limit)
+            self.assertAlmostEqual(total, ref_total, places=2)
+            if cost_limit is None:
+                self.assertEqual(num_matched, ref_num_matched)
+
+        # close options of the rows, solved by the square problems
+        cost = torch.ones(7, 8)
+        cost[torch.rand(7, 8, generator=torch.Generator().manual_seed(0)) <
+             0.6] = 1e6
+        rows, _ = self.auction(cost)
+        ref_rows, _ = self.lapjv(cost)
+        self.assertAlmostEqual(
+            self._total_cost(cost, rows, None)[0],
+            self._total_cost(cost, ref_rows, None)[0])
+
+    def test_solve_batch(self):
+        costs = [
+            torch.rand(n, m, generator=torch.Generator().manual_seed(n))
+            for n, m in [(3, 5), (6, 2), (0, 4), (4, 4)]
+        ]
+        for solver in (self.lapjv, self.auction):
+            rows, cols = solver.solve_batch(costs, cost_limit=0.7)
+            self.assertEqual(rows.shape, (4, 6))
+            self.assertEqual(cols.shape, (4, 5))
+            for i, cost in enumerate(costs):
+                ref_rows, ref_cols = self.lapjv(cost, cost_limit=0.7)
+                n, m = cost.shape
+                self.assertTrue(torch.equal(rows[i, :n], ref_rows))
+                self.assertTrue(torch.equal(cols[i, :m], ref_cols))
+                # the padding is unmatched
+                self.assertTrue((rows[i, n:] == -1).all())
+                self.assertTrue((cols[i, m:] == -1).all())
@@ -0,0 +1,65 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from unittest import TestCase
+
+import numpy as np
+import torch
+
+from mmdet.models.task_modules.tracking import TrackStore
+
+
+class TestTrackStore(TestCase):
+
+    def test_add_append(self):
+        store = TrackStore(
+            num_history=3, momentums=dict(embeds=0.5), capacity=2)
+        store.add([3, 5, 7],
+                  dict(
+                      bboxes=torch.rand(3, 4),
+                      frame_ids=torch.zeros(3, dtype=torch.long),
+                      embeds=torch.ones(3, 2)))
+        # the store grows when the slots run out
+        self.assertEqual(store.ids, [3, 5, 7])
+        self.assertGreaterEqual(store.capacity, 3)
+
+        for frame_id in range(1, 5):
+            store.append([5, 7],
+                         dict(
+                             bboxes=torch.rand(2, 4),
+                             frame_ids=torch.full((2, ), frame_id),
+                             embeds=torch.zeros(2, 2)))
+        self.assertEqual(store.last('frame_ids').tolist(), [0, 4, 4])
+        self.assertEqual(store.get_num_updates([5]).tolist(), [5])
+        # the ring buffers keep the last frames
+        self.assertEqual(
+            torch.cat(list(store[5].frame_ids)).tolist(), [2, 3, 4])
+        self.assertTrue(
+            torch.allclose(
+                store.last('embeds', [3, 5]),
+                torch.tensor([[1., 1.], [1 / 16, 1 / 16]])))
+
+        slot_inds, pos_inds, valid = store.window([3, 5], 2)
+        frame_ids = store.history['frame_ids'][torch.from_numpy(slot_inds),
+                                               torch.from_numpy(pos_inds)]
+        self.assertEqual(valid.tolist(), [[False, True], [True, True]])
+        self.assertEqual(frame_ids[torch.from_numpy(valid)].tolist(),
+                         [0, 3, 4])
+
+    def test_columns(self):
+        store = TrackStore(capacity=1)
+        store.add([0, 1], dict(frame_ids=torch.zeros(2, dtype=torch.long)))
+        store.set_column('mean', np.ones((2, 8)))
+        store[1].mean = np.zeros(8)
+        store[1].obs = [None]
+        self.assertEqual(store.get_column('mean').sum(), 8)
+        self.assertEqual(store[1].obs, [None])
+        self.assertIn(1, store)
+
+        # the slot of a removed track is reused
+        store.remove([0])
+        self.assertNotIn(0, store)
+        slots = store.add([2], dict(frame_ids=torch.ones(1).long()))
+        self.assertEqual(slots.tolist(), [0])
+        self.assertEqual(store.get_column('mean', [2]).sum(), 0)
+        self.assertEqual(store.ids, [1, 2])
+        with self.assertRaises(AttributeError):
+            store[2].obs
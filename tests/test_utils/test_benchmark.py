@@ -6,13 +6,15 @@ import unittest
 import torch
 from mmengine import Config, MMLogger
 from mmengine.dataset import Compose
+from mmengine.fileio import load
 from mmengine.model import BaseModel
 from torch.utils.data import Dataset
 
 from mmdet.registry import DATASETS, MODELS
 from mmdet.utils import register_all_modules
 from mmdet.utils.benchmark import (DataLoaderBenchmark, DatasetBenchmark,
-                                   InferenceBenchmark)
+                                   InferenceBenchmark, average_stage_times,
+                                   dump_benchmark_results)
 
 
 @MODELS.register_module()
@@ -160,6 +162,50 @@ class TestInferenceBenchmark(unittest.TestCase):
         os.remove(checkpoint_path)
         os.remove('temp.log')
 
+    def test_run_on_cpu(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_path = os.path.join(tmp_dir, 'checkpoint.pth')
+            torch.save(ToyDetector().state_dict(), checkpoint_path)
+
+            cfg = copy.deepcopy(self.cfg)
+            inference_benchmark = InferenceBenchmark(
+                cfg,
+                checkpoint_path,
+                False,
+                False,
+                self.max_iter,
+                self.log_interval,
+                num_warmup=2,
+                device='cpu',
+                stage_timings=True)
+            self.assertFalse(inference_benchmark.with_cuda)
+            results = inference_benchmark.run(2)
+            self.assertEqual(len(results['fps_list']), 2)
+            self.assertNotIn('peak_cuda_memory', results)
+            # the toy dataset has no pipeline, so only the data loading and
+            # the data preprocessor of the toy detector are timed
+            stage_times = results['stage_times']
+            self.assertEqual(set(stage_times), {'data', 'preprocess'})
+            self.assertTrue(
+                all(elapsed >= 0 for elapsed in stage_times.values()))
+
+            result = inference_benchmark.run_once()
+            self.assertEqual(set(result['stage_times']), set(stage_times))
+            self.assertEqual(
+                average_stage_times([result, result]), {
+                    stage: round(elapsed, 3)
+                    for stage, elapsed in result['stage_times'].items()
+                })
+
+            out_file = os.path.join(tmp_dir, 'results.json')
+            dump_benchmark_results(
+                results, out_file, task='inference', device='cpu')
+            saved = load(out_file)
+            self.assertEqual(list(saved)[:2], ['task', 'device'])
+            self.assertEqual(saved['device'], 'cpu')
+            self.assertEqual(saved['fps_list'], results['fps_list'])
+            self.assertEqual(saved['stage_times'], stage_times)
+
 
 class TestDataLoaderBenchmark(unittest.TestCase):
 
@@ -6,10 +6,10 @@ from mmengine import MMLogger
 from mmengine.config import Config, DictAction
 from mmengine.dist import init_dist
 from mmengine.registry import init_default_scope
-from mmengine.utils import mkdir_or_exist
+from mmengine.utils import get_git_hash, mkdir_or_exist
 
 from mmdet.utils.benchmark import (DataLoaderBenchmark, DatasetBenchmark,
-                                   InferenceBenchmark)
+                                   InferenceBenchmark, dump_benchmark_results)
 
 
 def parse_args():
@@ -37,6 +37,20 @@ def parse_args():
         action='store_true',
         help='Whether to fuse conv and bn, this will slightly increase'
         'the inference speed')
+    parser.add_argument(
+        '--device',
+        default='cuda',
+        help='device used for the inference benchmark, e.g. cuda or cpu')
+    parser.add_argument(
+        '--stage-timings',
+        action='store_true',
+        help='Whether to report the time of every stage of the inference, '
+        'e.g. decode, preprocess, the backbone branches, fusion modules, '
+        'neck, heads and nms')
+    parser.add_argument(
+        '--out',
+        help='the json file to save the benchmark results, e.g. to compare '
+        'them across commits')
     parser.add_argument(
         '--dataset-type',
         choices=['train', 'val', 'test'],
@@ -77,7 +91,9 @@ def inference_benchmark(args, cfg, distributed, logger):
         args.max_iter,
         args.log_interval,
         args.num_warmup,
-        logger=logger)
+        logger=logger,
+        device=args.device,
+        stage_timings=args.stage_timings)
     return benchmark
 
 
@@ -126,7 +142,17 @@ def main():
         'mmdet', log_file=log_file, log_level='INFO')
 
     benchmark = eval(f'{args.task}_benchmark')(args, cfg, distributed, logger)
-    benchmark.run(args.repeat_num)
+    results = benchmark.run(args.repeat_num)
+
+    if args.out:
+        meta = dict(
+            config=args.config,
+            task=args.task,
+            commit=get_git_hash(fallback=None))
+        if args.task == 'inference':
+            meta['device'] = args.device
+        dump_benchmark_results(results, args.out, **meta)
+        logger.info(f'Results have been saved to {args.out}')
 
 
 if __name__ == '__main__':
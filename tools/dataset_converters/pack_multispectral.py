@@ -0,0 +1,141 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Pack the visible/thermal pairs of a multispectral dataset into shards.
+
+Every pair is loaded once with the ``LoadBGR3TFrom*`` transform of the
+config, so the pairing rules of KAIST, FLIR and LLVIP are reused as is, and
+the decoded HxWx6 uint8 images are appended to raw shard files that
+``LoadBGR3TFromPacked`` maps into memory. The output directory contains:
+
+- ``shard_xxxxx.bin``: concatenated raw images.
+- ``index.json``: shard names and, for every image id, the shard, the byte
+  offset and the shape of the image.
+- a copy of the annotation file of the packed split.
+
+Example:
+    python tools/dataset_converters/pack_multispectral.py \\
+        projects/BAANet/configs/BAANet_r50_fpn_1x_kaist.py \\
+        data/kaist_packed/train --split train
+"""
+import argparse
+import os
+import os.path as osp
+import shutil
+
+import mmengine
+from mmengine.config import Config, DictAction
+from mmengine.fileio import get_local_path
+from mmengine.registry import init_default_scope
+from mmengine.utils import ProgressBar
+
+from mmdet.registry import DATASETS, TRANSFORMS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Pack a multispectral dataset into 6-channel shards')
+    parser.add_argument('config', help='config file path')
+    parser.add_argument('out_dir', help='directory to save the packed split')
+    parser.add_argument(
+        '--split',
+        default='train',
+        choices=['train', 'val', 'test'],
+        help='dataloader of the config to pack')
+    parser.add_argument(
+        '--shard-size',
+        type=int,
+        default=1024,
+        help='maximum size of a shard in MB')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file. If the value to '
+        'be overwritten is a list, it should be like key="[a,b]" or key=a,b '
+        'It also allows nested list/tuple values, e.g. key="[(a,b),(c,d)]" '
+        'Note that the quotation marks are necessary and that no white space '
+        'is allowed.')
+    args = parser.parse_args()
+    return args
+
+
+def get_loader_cfg(pipeline):
+    """Find the transform loading the visible/thermal pairs."""
+    for transform in pipeline:
+        if transform['type'].startswith('LoadBGR3T'):
+            return transform
+    raise ValueError('The pipeline has no LoadBGR3T* transform to pack the '
+                     'images with.')
+
+
+def pack_dataset(dataset, loader, out_dir, shard_size):
+    """Write the images of a dataset into shards.
+
+    Args:
+        dataset (BaseDataset): Dataset providing the data infos.
+        loader (BaseTransform): Transform loading one HxWx6 image.
+        out_dir (str): Directory to save the shards.
+        shard_size (int): Maximum size of a shard in bytes. A single image
+            larger than it gets a shard of its own.
+
+    Returns:
+        dict: The index of the shards.
+    """
+    shards, images = [], dict()
+    shard_file, offset = None, 0
+    progress_bar = ProgressBar(len(dataset))
+    for idx in range(len(dataset)):
+        data_info = dataset.get_data_info(idx)
+        img = loader(data_info)['img']
+        assert img.dtype == 'uint8' and img.ndim == 3 and \
+            img.shape[2] == 6, \
+            f'expected a HxWx6 uint8 image, got {img.dtype} {img.shape}'
+        if shard_file is None or offset + img.nbytes > shard_size:
+            if shard_file is not None:
+                shard_file.close()
+            shards.append(f'shard_{len(shards):05d}.bin')
+            shard_file = open(osp.join(out_dir, shards[-1]), 'wb')
+            offset = 0
+        images[str(data_info['img_id'])] = [
+            len(shards) - 1, offset, img.shape[0], img.shape[1]
+        ]
+        shard_file.write(img.tobytes())
+        offset += img.nbytes
+        progress_bar.update()
+    if shard_file is not None:
+        shard_file.close()
+    return dict(channels=6, shards=shards, images=images)
+
+
+def main():
+    args = parse_args()
+    cfg = Config.fromfile(args.config)
+    if args.cfg_options is not None:
+        cfg.merge_from_dict(args.cfg_options)
+
+    # register all modules in mmdet into the registries
+    init_default_scope(cfg.get('default_scope', 'mmdet'))
+
+    dataset_cfg = cfg[f'{args.split}_dataloader'].dataset
+    while 'dataset' in dataset_cfg:
+        # unwrap dataset wrappers such as RepeatDataset
+        dataset_cfg = dataset_cfg.dataset
+    loader = TRANSFORMS.build(get_loader_cfg(dataset_cfg.pipeline))
+    # pack every image of the annotation file, whatever the training filter
+    dataset_cfg.pipeline = []
+    dataset_cfg.filter_cfg = None
+    dataset = DATASETS.build(dataset_cfg)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    index = pack_dataset(dataset, loader, args.out_dir,
+                         args.shard_size * 1024**2)
+    index['ann_file'] = osp.basename(dataset.ann_file)
+    with get_local_path(dataset.ann_file) as local_path:
+        shutil.copyfile(local_path, osp.join(args.out_dir, index['ann_file']))
+    mmengine.dump(index, osp.join(args.out_dir, 'index.json'))
+    print(f'\nPacked {len(index["images"])} images into '
+          f'{len(index["shards"])} shards in {args.out_dir}')
+
+
+if __name__ == '__main__':
+    main()